@@ -0,0 +1,135 @@
+<?php
+
+require_once(__DIR__ . '/../../config.php');
+
+use mod_flashcards\local\profiler;
+
+require_login();
+
+$context = context_system::instance();
+require_capability('moodle/site:config', $context);
+
+$hours = optional_param('hours', 24, PARAM_INT);
+if (!in_array($hours, [1, 24, 168], true)) {
+    $hours = 24;
+}
+
+$baseurl = new moodle_url('/mod/flashcards/admin/performance.php', ['hours' => $hours]);
+
+$PAGE->set_context($context);
+$PAGE->set_url($baseurl);
+$PAGE->set_pagelayout('admin');
+$PAGE->set_title(get_string('perfreport_title', 'mod_flashcards'));
+$PAGE->set_heading(get_string('perfreport_title', 'mod_flashcards'));
+$PAGE->navbar->add(get_string('pluginname', 'mod_flashcards'));
+$PAGE->navbar->add(get_string('perfreport_title', 'mod_flashcards'));
+
+echo $OUTPUT->header();
+
+// Period filter.
+echo html_writer::start_tag('form', ['method' => 'get', 'class' => 'mform fc-perfreport-filters mb-3']);
+echo html_writer::label(get_string('perfreport_period', 'mod_flashcards'), 'id_hours', false, ['class' => 'form-label mr-2']);
+$periods = [];
+foreach ([1, 24, 168] as $option) {
+    $periods[$option] = get_string('perfreport_hours', 'mod_flashcards', $option);
+}
+echo html_writer::select($periods, 'hours', $hours, null, ['id' => 'id_hours']);
+echo ' ' . html_writer::tag('button', get_string('filter'), ['type' => 'submit', 'class' => 'btn btn-primary']);
+echo html_writer::end_tag('form');
+
+$summary = profiler::summary(time() - $hours * HOURSECS);
+if (!$summary['rows']) {
+    echo $OUTPUT->notification(get_string('perfreport_empty', 'mod_flashcards'), 'notifymessage');
+    echo $OUTPUT->footer();
+    exit;
+}
+
+$sampled = array_sum(array_column($summary['actions'], 'count'));
+echo html_writer::tag('p', get_string('perfreport_summary', 'mod_flashcards',
+    (object)['rows' => $summary['rows'], 'sampled' => $sampled]));
+
+if ($summary['actions']) {
+    echo $OUTPUT->heading(get_string('perfreport_actions', 'mod_flashcards'), 3);
+    $table = new html_table();
+    $table->head = [
+        get_string('perfreport_action', 'mod_flashcards'),
+        get_string('perfreport_count', 'mod_flashcards'),
+        get_string('perfreport_p50', 'mod_flashcards'),
+        get_string('perfreport_p95', 'mod_flashcards'),
+        get_string('perfreport_p99', 'mod_flashcards'),
+        get_string('perfreport_dbqueries', 'mod_flashcards'),
+        get_string('perfreport_dbms', 'mod_flashcards'),
+        get_string('perfreport_external_share', 'mod_flashcards'),
+        get_string('perfreport_memory', 'mod_flashcards'),
+    ];
+    foreach ($summary['actions'] as $action => $row) {
+        $table->data[] = [
+            s($action),
+            $row['count'],
+            $row['p50'],
+            $row['p95'],
+            $row['p99'],
+            format_float($row['dbqueries'], 1) . ' / ' . $row['dbqueries_p95'],
+            $row['dbms_p95'],
+            format_float($row['external_share'] * 100, 0) . '%',
+            display_size($row['memory_p95']),
+        ];
+    }
+    echo html_writer::table($table);
+}
+
+if ($summary['dependencies']) {
+    echo $OUTPUT->heading(get_string('perfreport_dependencies', 'mod_flashcards'), 3);
+    $table = new html_table();
+    $table->head = [
+        get_string('perfreport_dependency', 'mod_flashcards'),
+        get_string('perfreport_count', 'mod_flashcards'),
+        get_string('perfreport_calls', 'mod_flashcards'),
+        get_string('perfreport_p50', 'mod_flashcards'),
+        get_string('perfreport_p95', 'mod_flashcards'),
+        get_string('perfreport_p99', 'mod_flashcards'),
+        get_string('perfreport_usedby', 'mod_flashcards'),
+    ];
+    foreach ($summary['dependencies'] as $dependency => $row) {
+        $table->data[] = [
+            s($dependency),
+            $row['requests'],
+            $row['calls'],
+            $row['p50'],
+            $row['p95'],
+            $row['p99'],
+            s(implode(', ', $row['actions'])),
+        ];
+    }
+    echo html_writer::table($table);
+}
+
+echo $OUTPUT->heading(get_string('perfreport_slowest', 'mod_flashcards'), 3);
+$table = new html_table();
+$table->head = [
+    get_string('perfreport_time', 'mod_flashcards'),
+    get_string('perfreport_action', 'mod_flashcards'),
+    get_string('perfreport_wall', 'mod_flashcards'),
+    get_string('perfreport_db', 'mod_flashcards'),
+    get_string('perfreport_externals', 'mod_flashcards'),
+    get_string('perfreport_peakmemory', 'mod_flashcards'),
+    get_string('perfreport_sampled', 'mod_flashcards'),
+];
+foreach ($summary['slowest'] as $row) {
+    $externals = [];
+    foreach (json_decode($row->externals ?? '', true) ?: [] as $dependency => [$calls, $ms]) {
+        $externals[] = s($dependency) . ' ×' . (int)$calls . ': ' . (int)$ms . ' ms';
+    }
+    $table->data[] = [
+        userdate($row->timecreated, get_string('strftimedatetimeshort', 'langconfig')),
+        s($row->action),
+        $row->wallms,
+        $row->dbqueries . ' / ' . $row->dbms . ' ms',
+        implode('<br>', $externals),
+        display_size($row->memory),
+        $row->sampled ? get_string('yes') : get_string('no'),
+    ];
+}
+echo html_writer::table($table);
+
+echo $OUTPUT->footer();
@@ -265,43 +265,7 @@ function mod_flashcards_normalize_token(string $token): string {
  * @return string
  */
 function mod_flashcards_choose_front_audio_text(string $fronttext, array $examples): string {
-    $fronttext = trim($fronttext);
-    if ($fronttext === '') {
-        return '';
-    }
-    $articles = ['en','ei','et'];
-    $markers = ['a','å','aa'];
-    $count = 0;
-    foreach (preg_split('/\s+/u', $fronttext) as $part) {
-        $clean = trim($part, " \t\n\r\0\x0B,.;:!?<>\"'()[]{}");
-        if ($clean === '') {
-            continue;
-        }
-        $lower = core_text::strtolower($clean);
-        if (in_array($lower, $articles, true) || in_array($lower, $markers, true)) {
-            continue;
-        }
-        $count++;
-    }
-    if ($count >= 3) {
-        return $fronttext;
-    }
-    if (!empty($examples)) {
-        $first = $examples[0];
-        if (is_string($first)) {
-            $parts = explode('|', $first, 2);
-            $candidate = trim($parts[0] ?? '');
-            if ($candidate !== '') {
-                return $candidate;
-            }
-        } else if (is_array($first)) {
-            $candidate = trim((string)($first['text'] ?? $first['no'] ?? ''));
-            if ($candidate !== '') {
-                return $candidate;
-            }
-        }
-    }
-    return $fronttext;
+    return \mod_flashcards\local\tts_service::front_audio_text($fronttext, $examples);
 }
 
 /**
@@ -503,7 +467,7 @@ function mod_flashcards_word_tokens_with_offsets(string $text): array {
 }
 
 /**
- * Analyze text with spaCy (cached); returns empty array on failure.
+ * Analyze text with spaCy (memoised per request and cached); returns empty array on failure.
  *
  * @param string $text
  * @return array
@@ -1600,29 +1564,21 @@ function mod_flashcards_expression_candidates_from_words(array $words, array $le
 }
 
 /**
- * Resolve lexical multiword expressions directly from token spans via Ordbokene cache/lookup.
+ * Lemma phrases of the 2..5-token windows that may hold a lexical expression, in sentence order.
  *
  * @param array<int,string> $surfaceTokens
  * @param array<int,string> $lemmaTokens
  * @param array<int,string> $posMap
- * @param string $lang
- * @param int $maxLookups
- * @return array<int,array<string,mixed>>
+ * @return array<int,string>
  */
-function mod_flashcards_resolve_lexical_expressions(array $surfaceTokens, array $lemmaTokens, array $posMap, array $words = [], string $sentenceText = '', string $lang = 'begge', int $maxLookups = 10): array {
+function mod_flashcards_lexical_expression_windows(array $surfaceTokens, array $lemmaTokens, array $posMap): array {
     $out = [];
     $count = count($surfaceTokens);
-    if ($count < 2) {
-        return $out;
-    }
     $minLen = 2;
     $maxLen = 5;
     $reflexives = ['seg','meg','deg','oss','dere','dem'];
     $contentPos = ['VERB','NOUN','ADJ','ADV'];
     $allowedPos = ['VERB','NOUN','ADJ','ADV','ADP','CONJ','PART','PRON','DET'];
-    $seenCand = [];
-    $seenExpr = [];
-    $lookups = 0;
 
     for ($start = 0; $start < $count; $start++) {
         for ($end = $start + $minLen - 1; $end < $count && $end < $start + $maxLen; $end++) {
@@ -1631,7 +1587,6 @@ function mod_flashcards_resolve_lexical_expressions(array $surfaceTokens, array
             $hasContent = false;
             $invalid = false;
             $lemmaParts = [];
-            $surfaceParts = [];
             for ($i = $start; $i <= $end; $i++) {
                 $lemmaTok = $lemmaTokens[$i] ?? '';
                 $surfaceTok = $surfaceTokens[$i] ?? '';
@@ -1653,7 +1608,6 @@ function mod_flashcards_resolve_lexical_expressions(array $surfaceTokens, array
                 }
                 $posSeq[] = $pos;
                 $lemmaParts[] = $lemmaTok;
-                $surfaceParts[] = $surfaceTok;
             }
             if ($invalid) {
                 continue;
@@ -1665,134 +1619,182 @@ function mod_flashcards_resolve_lexical_expressions(array $surfaceTokens, array
             if (!$hasContent && !$isAdpConjAdp) {
                 continue;
             }
-            $lemmaPhrase = trim(implode(' ', $lemmaParts));
-            $surfacePhrase = trim(implode(' ', $surfaceParts));
             // Для поиска по орфословарю используем только лемматизированную форму.
             // Если леммы нет (редкие случаи), кандидат пропускаем.
-            if ($lemmaPhrase === '') {
-                continue;
+            $lemmaPhrase = trim(implode(' ', $lemmaParts));
+            if ($lemmaPhrase !== '') {
+                $out[] = $lemmaPhrase;
             }
-            $candidates = [$lemmaPhrase];
-            foreach ($candidates as $cand) {
-                $key = core_text::strtolower($cand);
-                if (isset($seenCand[$key])) {
-                    continue;
-                }
-                $seenCand[$key] = true;
-                $match = null;
-                if (\mod_flashcards\local\orbokene_repository::is_enabled()) {
-                    $cached = \mod_flashcards\local\orbokene_repository::find($cand);
-                    if (!empty($cached)) {
-                        $cachedmeta = is_array($cached['meta'] ?? null) ? $cached['meta'] : [];
-                        $cacheddictmeta = $cachedmeta['dictmeta'] ?? null;
-                        if (!is_array($cacheddictmeta)) {
-                            $cacheddictmeta = ['source' => 'cache'];
-                        } else if (empty($cacheddictmeta['source'])) {
-                            $cacheddictmeta['source'] = 'cache';
-                        }
-                        $cachedsource = (string)($cachedmeta['source'] ?? 'cache');
-                        // If this cache entry came from Ordbøkene freetext but lacks dict meta (older cached row),
-                        // refresh it once and treat as Ordbøkene-confirmed.
-                        if ($cachedsource === 'ordbokene_freetext' && (empty($cacheddictmeta['url']) || empty($cacheddictmeta['lang']))) {
-                            try {
-                                $refresh = mod_flashcards_ordbokene_freetext_confirm_map([$cand], $lang, $words);
-                                $rk = \mod_flashcards\local\orbokene_repository::normalize_phrase($cand);
-                                if ($rk !== '' && !empty($refresh[$rk]) && is_array($refresh[$rk])) {
-                                    $match = $refresh[$rk];
-                                }
-                            } catch (\Throwable $e) {
-                                // ignore refresh errors, fallback to cached payload
-                            }
-                        }
-                        if (!empty($match)) {
-                            // refreshed already
-                        } else {
-                        $expression = $cached['baseform'] ?? $cached['entry'] ?? $cand;
-                        $meaning = $cached['definition'] ?? $cached['translation'] ?? '';
-                        $matchsource = ($cachedsource === 'ordbokene_freetext') ? 'ordbokene' : 'cache';
-                        if ($matchsource === 'ordbokene') {
-                            $cacheddictmeta['source'] = 'ordbokene';
-                        }
-                        $match = [
-                            'expression' => $expression,
-                            'meanings' => $meaning ? [$meaning] : [],
-                            'examples' => $cached['examples'] ?? [],
-                            'dictmeta' => $cacheddictmeta,
-                            'source' => $matchsource,
-                            'variants' => $cachedmeta['variants'] ?? [],
-                            'chosenMeaning' => $cachedmeta['chosenMeaning'] ?? null,
-                            'meanings_all' => $cachedmeta['meanings_all'] ?? null,
-                        ];
+        }
+    }
+    return $out;
+}
+
+/**
+ * Resolve lexical multiword expressions directly from token spans via Ordbokene cache/lookup.
+ *
+ * Known expressions (flashcards_orbokene, flashcards_expr_translations, ordbank verb frames)
+ * are found in one pass by expression_automaton, gapped and reflexive ones included, and come
+ * first; the POS-filtered windows follow for the remote lookups. With the automaton the cache
+ * table is only read for keys it holds.
+ *
+ * @param array<int,string> $surfaceTokens
+ * @param array<int,string> $lemmaTokens
+ * @param array<int,string> $posMap
+ * @param string $lang
+ * @param int $maxLookups
+ * @return array<int,array<string,mixed>>
+ */
+function mod_flashcards_resolve_lexical_expressions(array $surfaceTokens, array $lemmaTokens, array $posMap, array $words = [], string $sentenceText = '', string $lang = 'begge', int $maxLookups = 10): array {
+    $out = [];
+    $count = count($surfaceTokens);
+    if ($count < 2) {
+        return $out;
+    }
+    $seenCand = [];
+    $seenExpr = [];
+    $lookups = 0;
+    $automaton = \mod_flashcards\local\expression_automaton::get();
+    $candidates = [];
+    if ($automaton !== null) {
+        $cacheKeys = [];
+        $otherKeys = [];
+        foreach ($automaton->match($lemmaTokens, $surfaceTokens, 1) as $hit) {
+            if ($hit['sources'] & \mod_flashcards\local\expression_automaton::SOURCE_ORBOKENE) {
+                $cacheKeys[] = $hit['key'];
+            } else {
+                $otherKeys[] = $hit['key'];
+            }
+        }
+        $candidates = array_merge($cacheKeys, $otherKeys);
+    }
+    $candidates = array_merge($candidates, mod_flashcards_lexical_expression_windows($surfaceTokens, $lemmaTokens, $posMap));
+
+    foreach ($candidates as $cand) {
+        $key = core_text::strtolower($cand);
+        if (isset($seenCand[$key])) {
+            continue;
+        }
+        $seenCand[$key] = true;
+        $match = null;
+        // The automaton holds every cache key, so a phrase it lacks would miss the table too.
+        $cacheable = $automaton === null
+            || $automaton->has($cand, \mod_flashcards\local\expression_automaton::SOURCE_ORBOKENE);
+        if ($cacheable && \mod_flashcards\local\orbokene_repository::is_enabled()) {
+            $cached = \mod_flashcards\local\orbokene_repository::find($cand);
+            if (!empty($cached)) {
+                $cachedmeta = is_array($cached['meta'] ?? null) ? $cached['meta'] : [];
+                $cacheddictmeta = $cachedmeta['dictmeta'] ?? null;
+                if (!is_array($cacheddictmeta)) {
+                    $cacheddictmeta = ['source' => 'cache'];
+                } else if (empty($cacheddictmeta['source'])) {
+                    $cacheddictmeta['source'] = 'cache';
+                }
+                $cachedsource = (string)($cachedmeta['source'] ?? 'cache');
+                // If this cache entry came from Ordbøkene freetext but lacks dict meta (older cached row),
+                // refresh it once and treat as Ordbøkene-confirmed.
+                if ($cachedsource === 'ordbokene_freetext' && (empty($cacheddictmeta['url']) || empty($cacheddictmeta['lang']))) {
+                    try {
+                        $refresh = mod_flashcards_ordbokene_freetext_confirm_map([$cand], $lang, $words);
+                        $rk = \mod_flashcards\local\orbokene_repository::normalize_phrase($cand);
+                        if ($rk !== '' && !empty($refresh[$rk]) && is_array($refresh[$rk])) {
+                            $match = $refresh[$rk];
                         }
+                    } catch (\Throwable $e) {
+                        // ignore refresh errors, fallback to cached payload
                     }
                 }
-                if (empty($match) && $lookups < $maxLookups) {
-                    $lookups++;
-                    $match = mod_flashcards_lookup_or_search_expression($cand, $lang);
-                }
-                if (empty($match)) {
-                    continue;
-                }
-                $expression = (string)($match['expression'] ?? $cand);
-                $exprTokens = mod_flashcards_word_tokens($expression);
-                if (count($exprTokens) < 2) {
-                    continue;
-                }
-                $exprMatch = mod_flashcards_find_phrase_match($lemmaTokens, $exprTokens, 1);
-                if ($exprMatch === null) {
-                    $exprMatch = mod_flashcards_find_phrase_match($surfaceTokens, $exprTokens, 1);
-                }
-                if ($exprMatch === null) {
-                    continue;
-                }
-                $mkey = core_text::strtolower($expression);
-                if (isset($seenExpr[$mkey])) {
-                    continue;
-                }
-                $seenExpr[$mkey] = true;
-                $meaning = '';
-                if (!empty($match['meanings']) && is_array($match['meanings'])) {
-                    $meaning = trim((string)($match['meanings'][0] ?? ''));
-                }
-                $source = $match['source'] ?? 'ordbokene';
-                if ($source === 'ordbokene' && !empty($words) && is_array($words)) {
-                    $match = mod_flashcards_pick_ordbokene_sense_for_sentence($match, $words, $exprMatch['indices'] ?? []);
-                    if (!empty($match['meanings']) && is_array($match['meanings'])) {
-                        $meaning = trim((string)($match['meanings'][0] ?? ''));
-                    }
-                }
-                $confidence = ($source === 'cache' || $source === 'ordbokene') ? 'high' : 'medium';
-                // Variants are only orthographic variants provided by Ordbøkene itself (e.g. "løse, løyse").
-                // Do not include inflected surface forms.
-                $variants = [];
-                if (!empty($match['variants']) && is_array($match['variants'])) {
-                    $variants = array_values(array_unique(array_filter(array_map('trim', array_map('strval', $match['variants'])))));
-                    if (count($variants) < 2) {
-                        $variants = [];
-                    } else if (count($variants) > 4) {
-                        $variants = array_slice($variants, 0, 4);
-                    }
+                if (!empty($match)) {
+                    // refreshed already
+                } else {
+                $expression = $cached['baseform'] ?? $cached['entry'] ?? $cand;
+                $meaning = $cached['definition'] ?? $cached['translation'] ?? '';
+                $matchsource = ($cachedsource === 'ordbokene_freetext') ? 'ordbokene' : 'cache';
+                if ($matchsource === 'ordbokene') {
+                    $cacheddictmeta['source'] = 'ordbokene';
                 }
-                $out[] = [
+                $match = [
                     'expression' => $expression,
-                    'translation' => '',
-                    'explanation' => $meaning,
-                    'examples' => $match['examples'] ?? [],
-                    'examples_sentence' => ($source === 'ordbokene' && empty($match['examples'])) ? [($sentenceText !== '' ? $sentenceText : trim(implode(' ', $surfaceTokens)))] : [],
-                    'dictmeta' => $match['dictmeta'] ?? [],
-                    'source' => $source,
-                    'confidence' => $confidence,
-                    'variants' => $variants,
-                    'chosenMeaning' => $match['chosenMeaning'] ?? null,
-                    'meanings_all' => $match['meanings_all'] ?? null,
-                    'rule' => 'lexical_orbokene',
-                    'start' => $exprMatch['start'],
-                    'end' => $exprMatch['end'],
-                    'indices' => $exprMatch['indices'],
-                    'len' => count($exprTokens),
+                    'meanings' => $meaning ? [$meaning] : [],
+                    'examples' => $cached['examples'] ?? [],
+                    'dictmeta' => $cacheddictmeta,
+                    'source' => $matchsource,
+                    'variants' => $cachedmeta['variants'] ?? [],
+                    'chosenMeaning' => $cachedmeta['chosenMeaning'] ?? null,
+                    'meanings_all' => $cachedmeta['meanings_all'] ?? null,
                 ];
+                }
+            }
+        }
+        if (empty($match) && $lookups < $maxLookups) {
+            $lookups++;
+            $match = mod_flashcards_lookup_or_search_expression($cand, $lang);
+        }
+        if (empty($match)) {
+            continue;
+        }
+        $expression = (string)($match['expression'] ?? $cand);
+        $exprTokens = mod_flashcards_word_tokens($expression);
+        if (count($exprTokens) < 2) {
+            continue;
+        }
+        $exprMatch = mod_flashcards_find_phrase_match($lemmaTokens, $exprTokens, 1);
+        if ($exprMatch === null) {
+            $exprMatch = mod_flashcards_find_phrase_match($surfaceTokens, $exprTokens, 1);
+        }
+        if ($exprMatch === null) {
+            // Mixed lemma/surface and reflexive forms ("gleder meg over" for "glede seg over").
+            $exprMatch = \mod_flashcards\local\expression_automaton::locate($expression, $lemmaTokens, $surfaceTokens, 1);
+        }
+        if ($exprMatch === null) {
+            continue;
+        }
+        $mkey = core_text::strtolower($expression);
+        if (isset($seenExpr[$mkey])) {
+            continue;
+        }
+        $seenExpr[$mkey] = true;
+        $meaning = '';
+        if (!empty($match['meanings']) && is_array($match['meanings'])) {
+            $meaning = trim((string)($match['meanings'][0] ?? ''));
+        }
+        $source = $match['source'] ?? 'ordbokene';
+        if ($source === 'ordbokene' && !empty($words) && is_array($words)) {
+            $match = mod_flashcards_pick_ordbokene_sense_for_sentence($match, $words, $exprMatch['indices'] ?? []);
+            if (!empty($match['meanings']) && is_array($match['meanings'])) {
+                $meaning = trim((string)($match['meanings'][0] ?? ''));
+            }
+        }
+        $confidence = ($source === 'cache' || $source === 'ordbokene') ? 'high' : 'medium';
+        // Variants are only orthographic variants provided by Ordbøkene itself (e.g. "løse, løyse").
+        // Do not include inflected surface forms.
+        $variants = [];
+        if (!empty($match['variants']) && is_array($match['variants'])) {
+            $variants = array_values(array_unique(array_filter(array_map('trim', array_map('strval', $match['variants'])))));
+            if (count($variants) < 2) {
+                $variants = [];
+            } else if (count($variants) > 4) {
+                $variants = array_slice($variants, 0, 4);
             }
         }
+        $out[] = [
+            'expression' => $expression,
+            'translation' => '',
+            'explanation' => $meaning,
+            'examples' => $match['examples'] ?? [],
+            'examples_sentence' => ($source === 'ordbokene' && empty($match['examples'])) ? [($sentenceText !== '' ? $sentenceText : trim(implode(' ', $surfaceTokens)))] : [],
+            'dictmeta' => $match['dictmeta'] ?? [],
+            'source' => $source,
+            'confidence' => $confidence,
+            'variants' => $variants,
+            'chosenMeaning' => $match['chosenMeaning'] ?? null,
+            'meanings_all' => $match['meanings_all'] ?? null,
+            'rule' => 'lexical_orbokene',
+            'start' => $exprMatch['start'],
+            'end' => $exprMatch['end'],
+            'indices' => $exprMatch['indices'],
+            'len' => count($exprTokens),
+        ];
     }
     return $out;
 }
@@ -2023,6 +2025,11 @@ function mod_flashcards_filter_expression_overlaps(array $expressions, array $po
 function mod_flashcards_tokens_to_lemma(array $tokens): array {
     static $cache = [];
     $out = [];
+    try {
+        \mod_flashcards\local\ordbank_helper::find_candidates_batch(array_diff($tokens, array_keys($cache)));
+    } catch (\Throwable $e) {
+        // Per-token lookups below still apply.
+    }
     foreach ($tokens as $tok) {
         $tok = core_text::strtolower($tok);
         if ($tok === '') {
@@ -2633,6 +2640,7 @@ function mod_flashcards_decode_pos(array $tokens, int $clickedIdx, array $spacyP
     }
     // Build candidates per token.
     $candlist = [];
+    \mod_flashcards\local\ordbank_helper::find_candidates_batch($tokens);
     foreach ($tokens as $tok) {
         $cands = \mod_flashcards\local\ordbank_helper::find_candidates($tok);
         if (empty($cands)) {
@@ -2863,6 +2871,7 @@ function mod_flashcards_context_from_sentence(string $sentence, string $clicked)
 
 $cmid = optional_param('cmid', 0, PARAM_INT); // CHANGED: optional for global mode
 $action = required_param('action', PARAM_ALPHANUMEXT);
+\mod_flashcards\local\profiler::start($action);
 
 require_sesskey();
 
@@ -2891,11 +2900,11 @@ if ($globalmode) {
         if (!$createallowed) {
             throw new moodle_exception('access_create_blocked', 'mod_flashcards');
         }
-    } else if ($action === 'fetch' || $action === 'get_due_cards' || $action === 'get_deck_cards' || $action === 'list_decks' || $action === 'ordbank_focus_helper' || $action === 'sentence_elements') {
+    } else if ($action === 'fetch' || $action === 'fetch_changes' || $action === 'get_due_cards' || $action === 'get_due_queue' || $action === 'get_deck_cards' || $action === 'list_decks' || $action === 'ordbank_focus_helper' || $action === 'sentence_elements') {
         if (!$access['can_view']) {
             throw new moodle_exception('access_denied', 'mod_flashcards');
         }
-    } else if ($action === 'save' || $action === 'review_card') {
+    } else if ($action === 'save' || $action === 'review_card' || $action === 'review_cards') {
         if (!$access['can_review']) {
             throw new moodle_exception('access_denied', 'mod_flashcards');
         }
@@ -3258,14 +3267,22 @@ switch ($action) {
         echo json_encode([ 'ok' => true, 'data' => \mod_flashcards\local\api::fetch_progress($flashcardsid, $userid) ]);
         break;
 
+    case 'fetch_changes':
+        // Delta sync: pass back data.cursor as since until data.more is false (see progress_sync).
+        $since = optional_param('since', null, PARAM_RAW_TRIMMED);
+        $limit = optional_param('limit', 1000, PARAM_INT);
+        echo json_encode(['ok' => true, 'data' => \mod_flashcards\local\api::fetch_progress_changes($flashcardsid, $userid, $since, $limit)]);
+        break;
+
     case 'save':
         $raw = file_get_contents('php://input');
         $payload = json_decode($raw, true);
         if (!is_array($payload) || !isset($payload['records']) || !is_array($payload['records'])) {
             throw new invalid_parameter_exception('Invalid payload');
         }
-        \mod_flashcards\local\api::save_progress_batch($flashcardsid, $userid, $payload['records']);
-        echo json_encode(['ok' => true]);
+        // data.conflicts: server rows that won (newer lastAt) for the client to adopt.
+        $result = \mod_flashcards\local\api::save_progress_batch($flashcardsid, $userid, $payload['records']);
+        echo json_encode(['ok' => true, 'data' => $result]);
         break;
 
     case 'upload_media':
@@ -3500,6 +3517,13 @@ switch ($action) {
         $limit = optional_param('limit', 1000, PARAM_INT); // Increased from 100 to 1000
         echo json_encode(['ok' => true, 'data' => \mod_flashcards\local\api::get_due_cards_optimized($userid, $flashcardsid, $limit, $globalmode)]);
         break;
+    case 'get_due_queue':
+        // Keyset-paginated due queue: pass back data.next as after_due/after_id for the next page.
+        $limit = optional_param('limit', 250, PARAM_INT);
+        $afterdue = optional_param('after_due', null, PARAM_INT);
+        $afterid = optional_param('after_id', null, PARAM_INT);
+        echo json_encode(['ok' => true, 'data' => \mod_flashcards\local\api::get_due_queue_page($userid, $limit, $afterdue, $afterid)]);
+        break;
     case 'upsert_card':
         $raw = file_get_contents('php://input');
         $payload = json_decode($raw, true);
@@ -3528,6 +3552,17 @@ switch ($action) {
         echo json_encode(['ok' => true]);
         break;
 
+    case 'review_cards':
+        // Ordered batch of {id, deckId, cardId, rating, reviewedAt}; resending a batch is safe.
+        $raw = file_get_contents('php://input');
+        $payload = json_decode($raw, true);
+        if (!is_array($payload) || !isset($payload['events']) || !is_array($payload['events'])) {
+            throw new invalid_parameter_exception('Invalid payload');
+        }
+        $result = \mod_flashcards\local\api::review_cards($userid, $flashcardsid, $payload['events']);
+        echo json_encode(['ok' => true, 'data' => $result]);
+        break;
+
     // --- Dashboard & Statistics ---
     case 'get_dashboard_data':
         $data = \mod_flashcards\local\api::get_dashboard_data($userid);
@@ -3535,12 +3570,7 @@ switch ($action) {
         break;
 
     case 'recalculate_stats':
-        $actual_count = \mod_flashcards\local\api::recalculate_total_cards($userid);
-        $active_vocab = \mod_flashcards\local\api::calculate_active_vocab($userid);
-        echo json_encode(['ok' => true, 'data' => [
-            'totalCardsCreated' => $actual_count,
-            'activeVocab' => round($active_vocab, 2),
-        ]]);
+        echo json_encode(['ok' => true, 'data' => \mod_flashcards\local\api::recalculate_stats($userid)]);
         break;
 
     case 'check_text_errors':
@@ -3556,7 +3586,7 @@ switch ($action) {
         $language = clean_param($payload['language'] ?? 'no', PARAM_ALPHANUMEXT);
 
         $helper = new \mod_flashcards\local\ai_helper();
-        $result = $helper->check_norwegian_text($text, $language, $userid);
+        $result = $helper->check_text_by_sentence($text, $language, $userid);
 
         echo json_encode($result);
         break;
@@ -3676,6 +3706,13 @@ switch ($action) {
         $exprLemmaMap = $lemmaMap;
         $t0 = microtime(true);
         $ordbankCache = [];
+        $verbTokens = [];
+        foreach ($words as $i => $w) {
+            if (($posMap[$i] ?? '') === 'VERB') {
+                $verbTokens[] = mod_flashcards_normalize_token((string)($w['text'] ?? ''));
+            }
+        }
+        \mod_flashcards\local\ordbank_helper::find_candidates_batch($verbTokens);
         foreach ($words as $i => $w) {
             $token = mod_flashcards_normalize_token((string)($w['text'] ?? ''));
             if ($token === '') {
@@ -4525,6 +4562,7 @@ switch ($action) {
                     'text' => $spacy['text'] ?? '',
                     'token_count' => is_array($spacy['tokens'] ?? null) ? count($spacy['tokens']) : 0,
                     'tokens' => $debugtokens,
+                    'stats' => \mod_flashcards\local\spacy_client::stats(),
                 ],
                 'expr_probe' => [
                     'verb_preps' => $verbPrepsMap,
@@ -5749,7 +5787,38 @@ switch ($action) {
         // Use the last token for local ordbank prefix search (handles "dreie s" -> search "s").
         $parts = preg_split('/\s+/u', $query);
         $prefix = is_array($parts) && count($parts) ? trim((string)end($parts)) : $query;
-        if (core_text::strlen($prefix) >= 2) {
+        // Compiled prefix index (tools/suggest_index.py): Ordbøkene is only asked on a miss.
+        $suggestindex = \mod_flashcards\local\suggest_index::instance();
+        $phrasehits = 0;
+        if ($suggestindex) {
+            $addlocal = function(array $item) use (&$results, &$seen, $mergeordbokene, $limit): bool {
+                if ($item['dict'] === 'ordbokene') {
+                    return $mergeordbokene($item);
+                }
+                $key = core_text::strtolower($item['lemma'] . '|ordbank');
+                if (!isset($seen[$key])) {
+                    $seen[$key] = true;
+                    $results[] = $item;
+                }
+                return count($results) < $limit;
+            };
+            if ($isMultiWord) {
+                $phrase = $suggestindex->complete_phrase($query, $limit);
+                $phrasehits = count($phrase);
+                foreach ($phrase as $item) {
+                    if (!$addlocal($item)) {
+                        break;
+                    }
+                }
+            }
+            if (core_text::strlen($prefix) >= 2 && count($results) < $limit) {
+                foreach ($suggestindex->complete($prefix, $limit) as $item) {
+                    if (!$addlocal($item)) {
+                        break;
+                    }
+                }
+            }
+        } else if (core_text::strlen($prefix) >= 2) {
             try {
                 $records = $DB->get_records_sql(
                     "SELECT DISTINCT f.OPPSLAG AS lemma, f.LEMMA_ID, l.GRUNNFORM AS baseform
@@ -5788,10 +5857,12 @@ switch ($action) {
             break;
         }
 
-        // Note: for multi-word queries we keep going to remote to fetch expressions that match all tokens.
+        // Note: for multi-word queries we keep going to remote to fetch expressions that match all tokens,
+        // unless the prefix index already had phrase matches.
+        $remote = !$suggestindex || !$isMultiWord || $phrasehits === 0;
 
         // Suggest endpoint (includes expressions/inflections) first.
-        if (count($results) < $limit) {
+        if ($remote && count($results) < $limit) {
             $suggestRemote = flashcards_fetch_ordbokene_suggest($query, $limit);
             $suggestRemote = flashcards_filter_multiword($suggestRemote, $query);
             foreach ($suggestRemote as $item) {
@@ -5802,7 +5873,7 @@ switch ($action) {
         }
 
         // Remote expressions (ord.uib.no full query to prioritize multi-word hits).
-        if (count($results) < $limit) {
+        if ($remote && count($results) < $limit) {
             $expressions = flashcards_fetch_ordbokene_expressions($query, 6);
             $expressions = flashcards_filter_multiword($expressions, $query);
             foreach ($expressions as $item) {
@@ -5813,7 +5884,7 @@ switch ($action) {
         }
 
         // Fallback: direct lookup for spans to pull baseforms when expressions array is empty.
-        if (count($results) < $limit) {
+        if ($remote && count($results) < $limit) {
             $lookupspans = flashcards_fetch_ordbokene_lookup_spans($query, $limit);
             foreach ($lookupspans as $item) {
                 if (!$mergeordbokene($item)) {
@@ -5823,7 +5894,7 @@ switch ($action) {
         }
 
         // Remote lemma suggestions next (ord.uib.no full query).
-        if (count($results) < $limit) {
+        if ($remote && count($results) < $limit) {
             try {
                 $remote = flashcards_fetch_ordbokene_suggestions($query, $limit);
                 $remote = flashcards_filter_multiword($remote, $query);
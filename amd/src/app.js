@@ -135,9 +135,10 @@ define(['core/str'], function(str) {
     async function idbGet(k){const db=await openDB();return new Promise((res,rej)=>{const tx=db.transaction("files","readonly");const rq=tx.objectStore("files").get(k);rq.onsuccess=()=>res(rq.result||null);rq.onerror=()=>rej(rq.error);});}
     async function urlFor(k){const b=await idbGet(k);return b?URL.createObjectURL(b):null;}
     // ===== server sync helpers =====
-    async function apiFetch(action, body) {
+    async function apiFetch(action, body, params) {
       try {
-        const url = M.cfg.wwwroot + '/mod/flashcards/ajax.php?action=' + encodeURIComponent(action) + '&cmid=' + encodeURIComponent(cmid) + '&sesskey=' + encodeURIComponent(sesskey);
+        const url = M.cfg.wwwroot + '/mod/flashcards/ajax.php?action=' + encodeURIComponent(action) + '&cmid=' + encodeURIComponent(cmid) + '&sesskey=' + encodeURIComponent(sesskey)
+          + (params ? '&' + new URLSearchParams(params).toString() : '');
         const opt = { method: body? 'POST':'GET', credentials: 'same-origin', headers: { 'Content-Type': 'application/json' } };
         if (body) opt.body = JSON.stringify(body);
         const res = await fetch(url, opt);
@@ -146,10 +147,24 @@ define(['core/str'], function(str) {
       } catch(e) { return {ok:false}; }
     }
     async function pullServerProgress(){
-      const resp = await apiFetch('fetch');
-      if (!resp || !resp.ok) return;
-      const data = resp.data || {};
       if (!state) loadState(); if (!state.decks) state.decks={};
+      // Delta sync: only rows changed since state.progressCursor, plus tombstones.
+      let more = true;
+      while (more) {
+        const resp = await apiFetch('fetch_changes', null, state.progressCursor ? {since: state.progressCursor} : null);
+        if (!resp || !resp.ok || !resp.data) return;
+        const page = resp.data;
+        (page.deleted || []).forEach(t=>{
+          if (state.decks[t.deckId]) delete state.decks[t.deckId][t.cardId];
+          if (state.hidden && state.hidden[t.deckId]) delete state.hidden[t.deckId][t.cardId];
+        });
+        applyServerProgress(page.changes || {});
+        state.progressCursor = page.cursor || state.progressCursor;
+        more = !!page.more;
+      }
+      saveState();
+    }
+    function applyServerProgress(data){
       Object.keys(data).forEach(deckId=>{
         if(!state.decks[deckId]) state.decks[deckId]={};
         const m = state.decks[deckId];
@@ -159,7 +174,6 @@ define(['core/str'], function(str) {
           if (r.hidden){ if(!state.hidden) state.hidden={}; if(!state.hidden[deckId]) state.hidden[deckId]={}; state.hidden[deckId][cardId]=true; }
         });
       });
-      saveState();
     }
 
     /* ===== render card ===== */
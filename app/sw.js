@@ -1,29 +1,308 @@
-const CACHE = "srs-cache-v11";
-const ASSETS = [
-  // Empty cache - Service Worker will be registered but won't cache anything
-  // This is minimal config just to enable PWA install prompt
-  // Manifest icons will be loaded via manifest.webmanifest reference
-];
-
-self.addEventListener("install", e=>{
-  e.waitUntil(caches.open(CACHE).then(c=>c.addAll(ASSETS)));
+// Flashcards service worker.
+//
+// sw.php serves this file with the precache manifest (app/precache.json, written by
+// tools/sw_manifest.py) prepended as self.__FLASHCARDS_PRECACHE, so the worker sits at the
+// plugin root and controls my/index.php and view.php. Caches:
+//   fc-shell-<version>  the app shell from the manifest, cache-first; one cache per version,
+//                       files whose hash did not change are copied over from the previous one.
+//   fc-pages            plugin pages, network-first; the cached copy is used offline or when the
+//                       network takes longer than NAV_TIMEOUT_MS.
+//   fc-static           Moodle theme and JS bundles (revisioned URLs), cache-first.
+//   fc-media            card audio and images, cache-first with an LRU byte/entry limit kept in
+//                       IndexedDB; Range requests are answered from the cached file.
+//   fc-api              read-only ajax actions, stale-while-revalidate, keyed by their parameters
+//                       (sesskey included); write actions drop the entries they make stale.
+// Loaded directly (the old app/sw.js registration) there is no manifest: nothing is cached and
+// only the notification handlers below are active.
+
+const PRECACHE = self.__FLASHCARDS_PRECACHE || null;
+const SCOPE = new URL('./', self.location).href;
+const SCOPE_PATH = new URL(SCOPE).pathname;
+const SITE_PATH = new URL('../../', SCOPE).pathname;
+
+const SHELL_CACHE = PRECACHE ? 'fc-shell-' + PRECACHE.version : null;
+const PAGES_CACHE = 'fc-pages';
+const STATIC_CACHE = 'fc-static';
+const MEDIA_CACHE = 'fc-media';
+const API_CACHE = 'fc-api';
+const OWN_CACHES = [SHELL_CACHE, PAGES_CACHE, STATIC_CACHE, MEDIA_CACHE, API_CACHE];
+
+const NAV_TIMEOUT_MS = 4000;
+const PAGES_MAX_ENTRIES = 20;
+const STATIC_MAX_ENTRIES = 150;
+const API_MAX_ENTRIES = 60;
+const MEDIA_MAX_BYTES = 150 * 1024 * 1024;
+const MEDIA_MAX_ENTRIES = 3000;
+const MEDIA_MAX_ITEM_BYTES = 20 * 1024 * 1024;
+
+const SHELL_PATHS = new Set(PRECACHE ? PRECACHE.assets.map(a => new URL(a.url, SCOPE).pathname) : []);
+const STATIC_PREFIXES = ['theme/styles.php/', 'theme/image.php/', 'theme/font.php/', 'theme/yui_combo.php',
+  'lib/javascript.php/', 'lib/requirejs.php/'].map(p => SITE_PATH + p);
+const API_READ = new Set(['fetch', 'get_due_cards', 'get_due_queue', 'get_dashboard_data', 'list_decks',
+  'get_deck_cards']);
+// Write actions and the read actions whose cached answers they make stale (null: all of them).
+const API_WRITE = new Map([['save', null], ['upsert_card', null], ['delete_card', null], ['create_deck', null],
+  ['review_card', null], ['review_cards', null], ['recalculate_stats', ['get_dashboard_data']]]);
+
+// Bumped around every write, so a revalidation that started before it does not store old data.
+let apiGeneration = 0;
+
+self.addEventListener("install", e => {
   self.skipWaiting();
+  if (!PRECACHE) return;
+  e.waitUntil(caches.open(SHELL_CACHE).then(cache => Promise.all(PRECACHE.assets.map(async asset => {
+    // Keyed by content hash, so a file that did not change is copied from the previous shell.
+    const key = new URL(asset.url + '?v=' + asset.hash, SCOPE).href;
+    let response = await caches.match(key);
+    if (!response) {
+      response = await fetch(key, { cache: "no-cache" });
+      if (!response.ok) throw new Error('precache ' + asset.url + ': HTTP ' + response.status);
+    }
+    return cache.put(key, response);
+  }))));
 });
 
-self.addEventListener("activate", e=>{
+self.addEventListener("activate", e => {
   e.waitUntil(
-    caches.keys().then(keys=>Promise.all(keys.filter(k=>k!==CACHE).map(k=>caches.delete(k))))
+    caches.keys().then(keys => Promise.all(keys.filter(k =>
+      k.startsWith('srs-cache') || (PRECACHE && k.startsWith('fc-') && !OWN_CACHES.includes(k))
+    ).map(k => caches.delete(k))))
       .then(() => self.clients.claim())
   );
 });
 
-self.addEventListener("fetch", e=>{
+self.addEventListener("fetch", e => {
+  if (!PRECACHE) return;
   const req = e.request;
-  e.respondWith(
-    caches.match(req).then(cached => cached || fetch(req).catch(()=> cached))
-  );
+  const url = new URL(req.url);
+  if (url.origin !== self.location.origin) return;
+  if (url.pathname === SCOPE_PATH + 'ajax.php') {
+    const action = url.searchParams.get('action');
+    // get_dashboard_data is posted as a form, with the action in the body.
+    if (API_READ.has(action) || API_WRITE.has(action) || (!action && req.method === 'POST' && isForm(req))) {
+      respond(e, keep => apiResponse(req, url, keep));
+    }
+    return;
+  }
+  if (req.method !== 'GET') return;
+  if (req.mode === 'navigate') {
+    respond(e, keep => pageResponse(req, keep));
+  } else if (SHELL_PATHS.has(url.pathname)) {
+    e.respondWith(caches.open(SHELL_CACHE)
+      .then(cache => cache.match(req, { ignoreSearch: true, ignoreVary: true }))
+      .then(cached => cached || fetch(req)));
+  } else if (isMedia(url)) {
+    respond(e, keep => mediaResponse(req, keep));
+  } else if (STATIC_PREFIXES.some(p => url.pathname.startsWith(p)) && !(url.pathname + url.search).includes('/-1/')) {
+    // Revision -1 is Moodle's developer mode: those URLs are not versioned.
+    respond(e, keep => staticResponse(req, keep));
+  }
 });
 
+// respondWith() plus waitUntil() for the cache writes behind the response. waitUntil() may only
+// be called while the event is dispatched, so the handler hands its background work to keep().
+function respond(e, handler) {
+  const background = [];
+  let finish;
+  e.waitUntil(new Promise(resolve => { finish = resolve; }));
+  const response = handler(work => { background.push(Promise.resolve(work).catch(() => {})); });
+  e.respondWith(response);
+  response.catch(() => {}).then(() => Promise.all(background)).then(finish);
+}
+
+function isForm(req) {
+  return (req.headers.get('Content-Type') || '').startsWith('application/x-www-form-urlencoded');
+}
+
+function isMedia(url) {
+  return (url.pathname.startsWith(SITE_PATH + 'pluginfile.php/') && url.pathname.includes('/mod_flashcards/media/'))
+    || url.pathname.startsWith(SCOPE_PATH + 'app/audio/');
+}
+
+// Drops the oldest entries (Cache keeps insertion order; put() moves a key to the end).
+async function trim(cache, max) {
+  const keys = await cache.keys();
+  await Promise.all(keys.slice(0, Math.max(0, keys.length - max)).map(k => cache.delete(k)));
+}
+
+function cacheable(response) {
+  return response.ok && response.status === 200 && response.type === 'basic' && !response.redirected;
+}
+
+async function pageResponse(req, keep) {
+  const cache = await caches.open(PAGES_CACHE);
+  let stored = null;
+  const network = fetch(req).then(response => {
+    // A redirect here is usually the login page: keep the last good copy instead.
+    if (cacheable(response)) {
+      stored = cache.put(req.url, response.clone()).then(() => trim(cache, PAGES_MAX_ENTRIES));
+    }
+    return response;
+  });
+  keep(network.then(() => stored));
+  let timer;
+  const slow = new Promise(resolve => { timer = setTimeout(resolve, NAV_TIMEOUT_MS, null); });
+  try {
+    return (await Promise.race([network, slow]))
+      || (await cache.match(req.url, { ignoreVary: true }))
+      || await network;
+  } catch (err) {
+    const cached = await cache.match(req.url, { ignoreVary: true });
+    if (cached) return cached;
+    throw err;
+  } finally {
+    clearTimeout(timer);
+  }
+}
+
+async function staticResponse(req, keep) {
+  const cache = await caches.open(STATIC_CACHE);
+  const cached = await cache.match(req, { ignoreVary: true });
+  if (cached) return cached;
+  const response = await fetch(req);
+  if (cacheable(response)) {
+    keep(cache.put(req, response.clone()).then(() => trim(cache, STATIC_MAX_ENTRIES)));
+  }
+  return response;
+}
+
+async function apiResponse(req, url, keep) {
+  let params = url.searchParams;
+  if (req.method === 'POST' && isForm(req)) {
+    params = new URLSearchParams(await req.clone().text());
+    url.searchParams.forEach((value, name) => { if (!params.has(name)) params.set(name, value); });
+  }
+  const action = params.get('action') || '';
+  if (API_WRITE.has(action)) {
+    const stale = API_WRITE.get(action);
+    apiGeneration++;
+    const network = fetch(req);
+    // Invalidated whatever the answer (an error may still have been applied), but not when the
+    // request never reached the server, so an offline session keeps its cached reads.
+    keep(network.then(() => apiInvalidate(stale)));
+    return network;
+  }
+  if (!API_READ.has(action)) return fetch(req);
+
+  const cache = await caches.open(API_CACHE);
+  const key = SCOPE + 'ajax.php?' + new URLSearchParams([...params].sort((a, b) => (a[0] < b[0] ? -1 : a[0] > b[0] ? 1 : 0)));
+  const generation = apiGeneration;
+  let stored = null;
+  const network = fetch(req).then(response => {
+    if (cacheable(response)) {
+      const copy = response.clone();
+      stored = copy.clone().json().then(json => {
+        if (json && json.ok === true && generation === apiGeneration) {
+          return cache.put(key, copy).then(() => trim(cache, API_MAX_ENTRIES));
+        }
+      });
+    }
+    return response;
+  });
+  keep(network.then(() => stored));
+  const cached = await cache.match(key);
+  return cached || network;
+}
+
+async function apiInvalidate(actions) {
+  apiGeneration++;
+  if (!actions) return caches.delete(API_CACHE);
+  const cache = await caches.open(API_CACHE);
+  const keys = await cache.keys();
+  await Promise.all(keys.filter(k => actions.includes(new URL(k.url).searchParams.get('action')))
+    .map(k => cache.delete(k)));
+}
+
+async function mediaResponse(req, keep) {
+  const cache = await caches.open(MEDIA_CACHE);
+  const cached = await cache.match(req.url, { ignoreVary: true });
+  if (cached) {
+    keep(mediaTouch(req.url));
+    return req.headers.has('Range') ? slice(req, cached, await cached.blob()) : cached;
+  }
+  // Always the whole file, also for a Range request: it is cached once and sliced here.
+  const response = await fetch(req.url, { credentials: "same-origin" });
+  if (!cacheable(response)) return response;
+  const blob = await response.blob();
+  const full = new Response(blob, { status: 200, statusText: 'OK', headers: response.headers });
+  if (blob.size <= MEDIA_MAX_ITEM_BYTES) {
+    keep(cache.put(req.url, full.clone())
+      .then(() => mediaRecord(req.url, blob.size))
+      .then(mediaTrim));
+  }
+  return req.headers.has('Range') ? slice(req, full, blob) : full;
+}
+
+// 206 for a single "bytes=" range of the blob; other forms get the whole file, as HTTP allows.
+function slice(req, response, blob) {
+  const m = /^bytes=(\d*)-(\d*)$/.exec((req.headers.get('Range') || '').trim());
+  if (!m || (m[1] === '' && m[2] === '')) return response;
+  const size = blob.size;
+  let start = m[1] === '' ? Math.max(0, size - Number(m[2])) : Number(m[1]);
+  let end = m[1] === '' || m[2] === '' ? size - 1 : Math.min(Number(m[2]), size - 1);
+  if (start > end || start >= size) {
+    return new Response(null, { status: 416, statusText: 'Range Not Satisfiable',
+      headers: { 'Content-Range': 'bytes */' + size } });
+  }
+  const headers = new Headers(response.headers);
+  headers.set('Content-Range', 'bytes ' + start + '-' + end + '/' + size);
+  headers.set('Content-Length', String(end - start + 1));
+  headers.set('Accept-Ranges', 'bytes');
+  return new Response(blob.slice(start, end + 1), { status: 206, statusText: 'Partial Content', headers });
+}
+
+// fc-media bookkeeping: { url, size, atime } per cached file in IndexedDB "fc-sw".
+let mediaDbPromise = null;
+
+function mediaStore(mode, fn) {
+  if (!mediaDbPromise) {
+    mediaDbPromise = new Promise((resolve, reject) => {
+      const open = indexedDB.open('fc-sw', 1);
+      open.onupgradeneeded = () => open.result.createObjectStore('media', { keyPath: 'url' });
+      open.onsuccess = () => resolve(open.result);
+      open.onerror = () => { mediaDbPromise = null; reject(open.error); };
+    });
+  }
+  return mediaDbPromise.then(db => new Promise((resolve, reject) => {
+    const tx = db.transaction('media', mode);
+    const request = fn(tx.objectStore('media'));
+    tx.oncomplete = () => resolve(request ? request.result : undefined);
+    tx.onerror = () => reject(tx.error);
+  }));
+}
+
+function mediaRecord(url, size) {
+  return mediaStore('readwrite', store => store.put({ url, size, atime: Date.now() }));
+}
+
+function mediaTouch(url) {
+  return mediaStore('readwrite', store => {
+    const request = store.get(url);
+    request.onsuccess = () => {
+      if (request.result) store.put({ ...request.result, atime: Date.now() });
+    };
+    return null;
+  });
+}
+
+async function mediaTrim() {
+  const entries = (await mediaStore('readonly', store => store.getAll())) || [];
+  let bytes = entries.reduce((sum, entry) => sum + entry.size, 0);
+  let count = entries.length;
+  if (bytes <= MEDIA_MAX_BYTES && count <= MEDIA_MAX_ENTRIES) return;
+  entries.sort((a, b) => a.atime - b.atime);
+  const evict = [];
+  for (const entry of entries) {
+    if (bytes <= MEDIA_MAX_BYTES && count <= MEDIA_MAX_ENTRIES) break;
+    evict.push(entry.url);
+    bytes -= entry.size;
+    count--;
+  }
+  const cache = await caches.open(MEDIA_CACHE);
+  await Promise.all(evict.map(url => cache.delete(url)));
+  await mediaStore('readwrite', store => { evict.forEach(url => store.delete(url)); return null; });
+}
+
 // Push notification handler
 self.addEventListener("push", e => {
   if (!e.data) return;
@@ -3,7 +3,41 @@ import { log as baseDebugLog } from './modules/debug.js';
 import { idbPut, idbGet, urlFor } from './modules/storage.js';
 import { createIOSRecorder } from './modules/recorder.js';
 
+// Feature modules loaded on first use (dynamic import) and prefetched when the page is idle. They
+// get this module's ?v= query, so a new release does not mix old and new code from the HTTP cache.
+const FEATURE_MODULES = {
+  dictation: './modules/dictation.js',
+  aiChat: './modules/ai-chat.js',
+  dashboard: './modules/dashboard.js',
+  push: './modules/push.js',
+};
+const FEATURE_QUERY = new URL(import.meta.url).search;
+const featureLoads = {};
+
+function loadFeature(name){
+  if(!featureLoads[name]){
+    featureLoads[name] = import(FEATURE_MODULES[name] + FEATURE_QUERY).catch(err => {
+      delete featureLoads[name];
+      throw err;
+    });
+  }
+  return featureLoads[name];
+}
+
+function whenIdle(fn){
+  if(typeof window.requestIdleCallback === 'function'){
+    window.requestIdleCallback(fn, {timeout: 5000});
+  }else{
+    setTimeout(fn, 1500);
+  }
+}
+
+function prefetchFeatures(names){
+  names.forEach(name => whenIdle(() => { loadFeature(name).catch(() => {}); }));
+}
+
 function flashcardsInit(rootid, baseurl, cmid, instanceid, sesskey, globalMode){
+    try { performance.mark('flashcards:init'); } catch(_e) {}
     const root = document.getElementById(rootid);
     if(!root) return;
     const $ = s => root.querySelector(s);
@@ -6848,6 +6882,9 @@ function flashcardsInit(rootid, baseurl, cmid, instanceid, sesskey, globalMode){
         if(extraOpts.signal){
           opts.signal = extraOpts.signal;
         }
+        if(extraOpts.keepalive){
+          opts.keepalive = true;
+        }
       }
       const url = new URL(M.cfg.wwwroot + '/mod/flashcards/ajax.php');
       // In global mode, pass cmid=0; in activity mode, pass actual cmid
@@ -6945,9 +6982,63 @@ function flashcardsInit(rootid, baseurl, cmid, instanceid, sesskey, globalMode){
       };
     }
 
+    const DUE_QUEUE_PAGE_SIZE = 250;
+
+    // Stream the due queue page by page (keyset cursor); fall back to the single-shot endpoint.
+    async function fetchDueQueue(){
+      const items = [];
+      let cursor = null;
+      try{
+        do{
+          const params = {limit: DUE_QUEUE_PAGE_SIZE};
+          if(cursor){
+            params.after_due = cursor.due;
+            params.after_id = cursor.id;
+          }
+          const page = await api('get_due_queue', params);
+          if(page && Array.isArray(page.cards)){
+            items.push(...page.cards);
+          }
+          cursor = page && page.next ? page.next : null;
+        }while(cursor);
+        return items;
+      }catch(err){
+        console.warn('get_due_queue failed, falling back to get_due_cards', err);
+        return api('get_due_cards', {limit: 1000}).catch(()=>[]);
+      }
+    }
+
+    const PROGRESS_SYNC_PAGE_SIZE = 1000;
+
+    // Pull progress changed since state.progressCursor (all pages): {changes, deleted, cursor}.
+    // Without a cursor (first run, or state was reset) the server sends a full snapshot.
+    async function fetchProgressChanges(){
+      const out = {changes:{}, deleted:[], cursor:(state && state.progressCursor) || ''};
+      let more = true;
+      while(more){
+        const params = {limit: PROGRESS_SYNC_PAGE_SIZE};
+        if(out.cursor) params.since = out.cursor;
+        const page = await api('fetch_changes', params);
+        if(!page) break;
+        (page.deleted || []).forEach(t => {
+          const deck = out.changes[t.deckId];
+          if(deck) delete deck[t.cardId];
+          out.deleted.push(t);
+        });
+        Object.entries(page.changes || {}).forEach(([deckId, cards])=>{
+          out.changes[deckId] = Object.assign(out.changes[deckId] || {}, cards || {});
+        });
+        out.cursor = page.cursor || out.cursor;
+        more = !!page.more;
+      }
+      return out;
+    }
+
     async function syncFromServer(){
       try{
-        const dueItems = await api('get_due_cards', {limit: 1000}).catch(()=>[]);
+        // Send queued reviews first so the progress pulled below already includes them.
+        await flushReviews();
+        const dueItems = await fetchDueQueue();
         const deckCards = {};
         const deckTitles = {};
         const fallbackProgress = {};
@@ -6967,8 +7058,10 @@ function flashcardsInit(rootid, baseurl, cmid, instanceid, sesskey, globalMode){
           }
         });
 
+        let progressDelta = null;
         try{
-          progressData = await api('fetch');
+          progressDelta = await fetchProgressChanges();
+          progressData = progressDelta.changes;
         }catch(err){
           console.error('fetch progress failed', err);
         }
@@ -7044,7 +7137,8 @@ function flashcardsInit(rootid, baseurl, cmid, instanceid, sesskey, globalMode){
 
         if(!progressData){
           try{
-            progressData = await api('fetch');
+            progressDelta = await fetchProgressChanges();
+            progressData = progressDelta.changes;
           }catch(err){
             console.error('fetch progress failed', err);
           }
@@ -7069,12 +7163,18 @@ function flashcardsInit(rootid, baseurl, cmid, instanceid, sesskey, globalMode){
         };
 
         if(progressData && typeof progressData === 'object'){
+          // Tombstones: progress rows deleted on the server since the last pull.
+          (progressDelta.deleted || []).forEach(({deckId, cardId})=>{
+            if(state.decks[deckId]) delete state.decks[deckId][cardId];
+            if(state.hidden[deckId]) delete state.hidden[deckId][cardId];
+          });
           Object.entries(progressData).forEach(([deckKey, cards])=>{
             const deckId = String(deckKey || MY_DECK_ID);
             Object.entries(cards || {}).forEach(([cardId, prog])=>{
               applyProgress(deckId, cardId, prog);
             });
           });
+          state.progressCursor = progressDelta.cursor;
         } else {
           Object.entries(fallbackProgress).forEach(([deckId, cards])=>{
             Object.entries(cards || {}).forEach(([cardId, prog])=>{
@@ -8944,7 +9044,7 @@ let lastStudyAudioRate=1;
       let checkCount = 0;
 
       // Check button - verify user input and show visual feedback
-      checkBtn.addEventListener('click', () => {
+      checkBtn.addEventListener('click', async () => {
         const userInput = inputEl.value.trim();
 
         if(!userInput){
@@ -8953,6 +9053,16 @@ let lastStudyAudioRate=1;
           return;
         }
 
+        // Grading lives in assets/modules/dictation.js (usually prefetched by now).
+        let dictation;
+        try {
+          dictation = await loadFeature('dictation');
+        } catch (err) {
+          console.error('[Dictation] Error loading module:', err);
+          return;
+        }
+        const { compareTexts, renderComparisonResult } = dictation;
+
         checkCount++;
 
         // Compare user input with correct text
@@ -9004,1612 +9114,187 @@ let lastStudyAudioRate=1;
       });
     }
 
-    // Compare two texts character by character and word by word
-    // Compare dictation answers with move-aware logic
-    function compareTexts(userInput, correctText){
-      const userNorm = (userInput || '').trim();
-      const correctNorm = (correctText || '').trim();
-
-      const userTokens = tokenizeText(userNorm);
-      const originalTokens = tokenizeText(correctNorm);
-
-      const emptyPlan = buildEmptyMovePlan(userTokens.length);
-
-      if(userNorm === correctNorm){
-        return {
-          isCorrect: true,
-          mode: 'arrows',
-          userTokens,
-          originalTokens,
-          matches: [],
-          extras: [],
-          missing: [],
-          movePlan: emptyPlan,
-          errorCount: 0,
-          orderIssues: 0,
-          moveIssues: 0
-        };
-      }
-
-      const similarity = buildSimilarityMatrix(userTokens, originalTokens);
-      const assignment = solveMaxAssignment(similarity);
-      const { matches, matchedUser, matchedOrig } = extractMatches(assignment, userTokens, originalTokens);
-
-      const extras = userTokens
-        .map((token, index) => matchedUser.has(index) ? null : { userIndex: index, token })
-        .filter(Boolean);
-
-      const missing = originalTokens
-        .map((token, index) => matchedOrig.has(index) ? null : { origIndex: index, token })
-        .filter(Boolean);
-
-      // Compute LIS directly from matches (by origIndex order)
-      const lisIndices = computeLisWithTies(matches);
-      const lisSet = new Set(lisIndices.map(idx => matches[idx]?.id).filter(Boolean));
-
-      const movePlan = buildMovePlan({
-        matches,
-        lisSet,
-        userTokens,
-        originalTokens,
-        missing
-      });
-
-      // Count only real spelling/punctuation mismatches: for words, raw diff or low score; for punct, only raw diff (not score bias < 1)
-      const spellingIssues = matches.filter(m => {
-        const rawDiffers = m.userToken.raw !== m.origToken.raw;
-        if(m.userToken.type === 'punct'){
-          return rawDiffers;
-        }
-        return rawDiffers || m.score < 1;
-      }).length;
-      const orderIssues = matches.filter(m => !lisSet.has(m.id)).length;
-      const moveIssues = movePlan.mode === 'rewrite'
-        ? (movePlan.rewriteGroups.length ? 1 : 0)
-        : movePlan.moveBlocks.length;
-      const errorCount = extras.length + missing.length + spellingIssues + moveIssues;
-      const isCorrect = errorCount === 0;
-
-      return {
-        isCorrect,
-        mode: movePlan.mode,
-        userTokens,
-        originalTokens,
-        matches,
-        extras,
-        missing,
-        movePlan,
-        errorCount,
-        orderIssues,
-        moveIssues,
-        crossedBoundaries: movePlan.crossedBoundaries || [],
-        overloadedBoundaries: movePlan.overloadedBoundaries || [],
-        boundaryCounts: movePlan.boundaryCounts || []
-      };
+    function escapeHtml(str){
+      const div = document.createElement('div');
+      div.textContent = str;
+      return div.innerHTML;
     }
 
-    const MIN_SIMILARITY_SCORE = 0.35;
-    const STEM_SIMILARITY_SCORE = 0.85;
-    const STRONG_ANCHOR_SCORE = 5;
-    const PUNCT_MATCH_SCORE = 0.8;
-    const PUNCT_MISMATCH_SCORE = 0.2;
-    const TYPE_MISMATCH_SCORE = 0.05;
-    const GAP_PENALTY = 1.0;
+    function renderTranscriptionHTML(text){
+      if(!text) return '';
+      const tokens=[];
+      let buffer='';
 
-    function buildEmptyMovePlan(len){
-      return {
-        mode: 'arrows',
-        moveBlocks: [],
-        rewriteGroups: [],
-        tokenMeta: Array(len).fill(null),
-        gapMeta: {},
-        gapsNeeded: new Set(),
-        missingByPosition: {}
+      const pushSyllable=(trailingDot=false)=>{
+        if(!buffer && !trailingDot) return;
+        tokens.push(buffer + (trailingDot?'.':''));
+        buffer='';
       };
-    }
 
-    function tokenizeText(text){
-      const tokens = [];
-      if(!text){
-        return tokens;
-      }
-      const pattern = /[\p{L}\p{M}`{}\[\]]+|\d+|[^\s\p{L}\p{M}\d]/gu;
-      let match;
-      let idx = 0;
-      while((match = pattern.exec(text)) !== null){
-        const raw = match[0];
-        tokens.push({
-          raw,
-          norm: raw.toLowerCase(),
-          type: /^[\p{L}\p{M}\d`{}\[\]]+$/u.test(raw) ? 'word' : 'punct',
-          index: idx++
-        });
-      }
-      return tokens;
-    }
-
-    function normalizePunctuation(char){
-      const map = {
-        '\u2013': '-',
-        '\u2014': '-',
-        '\u2011': '-',
-        '\u2026': '...',
-        '\u00ab': '\"',
-        '\u00bb': '\"',
-        '\u201c': '\"',
-        '\u201d': '\"',
-        '\u201e': '\"',
-        '\u2019': '\'',
-        '\u2018': '\'',
-        '`': '\'',
-        '\u00b4': '\''
-      };
-      return map[char] || char;
-    }
-
-    function simpleStem(value){
-      if(!value) return '';
-      const normalized = value.toLowerCase().replace(/^[^\p{L}\p{M}]+|[^\p{L}\p{M}]+$/gu, '');
-      return normalized.replace(/(ene|ane|het|ers|ene|er|en|et|e)$/u, '');
-    }
-
-    function levenshtein(a,b){
-      if(a === b) return 0;
-      if(!a.length) return b.length;
-      if(!b.length) return a.length;
-      const dp = Array.from({length: a.length + 1}, (_, i) => i);
-      for(let j = 1; j <= b.length; j++){
-        let prev = j - 1;
-        dp[0] = j;
-        for(let i = 1; i <= a.length; i++){
-          const temp = dp[i];
-          if(a[i-1] === b[j-1]){
-            dp[i] = prev;
-          } else {
-            dp[i] = 1 + Math.min(prev, dp[i-1], dp[i]);
-          }
-          prev = temp;
+      for(const ch of text){
+        if(ch === '.'){
+          pushSyllable(true);
+          continue;
         }
+        buffer+=ch;
       }
-      return dp[a.length];
-    }
+      pushSyllable(false);
 
-    function tokenSimilarity(a, b){
-      if(!a || !b) return 0;
-      if(a.type !== b.type){
-        return TYPE_MISMATCH_SCORE;
-      }
-      if(a.type === 'punct'){
-        const normA = normalizePunctuation(a.raw);
-        const normB = normalizePunctuation(b.raw);
-        return normA === normB ? PUNCT_MATCH_SCORE : PUNCT_MISMATCH_SCORE;
-      }
-      if(a.norm === b.norm){
-        return STRONG_ANCHOR_SCORE;
-      }
-      const stemA = simpleStem(a.norm);
-      const stemB = simpleStem(b.norm);
-      if(stemA && stemA === stemB){
-        return STEM_SIMILARITY_SCORE;
-      }
-      const distance = levenshtein(a.norm, b.norm);
-      const maxLen = Math.max(a.norm.length, b.norm.length) || 1;
-      const closeness = Math.max(0, 1 - (distance / maxLen));
-      if(closeness >= 0.8) return 0.6 + (closeness * 0.2);
-      if(closeness >= 0.6) return 0.5 + (closeness * 0.1);
-      return closeness * 0.5;
-    }
+      const pieces=tokens.map((t,i)=>{
+        const delay=i*1500; // 1.5s pause between syllables
+        return `<span class="transcription-piece transcription-piece--drop" style="animation-delay:${delay}ms">${escapeHtml(t)}</span>`;
+      }).join('');
 
-    function buildSimilarityMatrix(userTokens, originalTokens){
-      const matrix = [];
-      const maxLen = Math.max(userTokens.length, originalTokens.length, 1);
-      for(let i = 0; i < userTokens.length; i++){
-        matrix[i] = [];
-        for(let j = 0; j < originalTokens.length; j++){
-          const base = tokenSimilarity(userTokens[i], originalTokens[j]);
-          const dist = Math.abs(i - j) / maxLen;
-          const proximityBonus = (1 - dist) * 0.35;
-          const distancePenalty = dist * 0.25;
-          const weight = base + proximityBonus - distancePenalty;
-          matrix[i][j] = weight;
-        }
-      }
-      return matrix;
+      return `<div class="transcription-text">${pieces}</div>`;
     }
 
-    function solveMaxAssignment(weights){
-      const rows = weights.length;
-      const cols = weights[0] ? weights[0].length : 0;
-      const n = Math.max(rows, cols);
-      if(!n) return [];
-      let maxWeight = 0;
-      for(let i = 0; i < rows; i++){
-        for(let j = 0; j < cols; j++){
-          maxWeight = Math.max(maxWeight, weights[i][j]);
-        }
+    function ensureTranscriptionAnimation(card, slot){
+      if(!slot) return Promise.resolve();
+      const inner = slot.querySelector('.transcription-text');
+      if(!inner) return Promise.resolve();
+      if(card._transcriptionAnimated){
+        return Promise.resolve();
       }
-      const big = maxWeight + 1;
-      const cost = Array.from({length: n}, (_, i)=>{
-        const row = [];
-        for(let j = 0; j < n; j++){
-          if(i < rows && j < cols){
-            row.push(big - weights[i][j]);
-          } else {
-            row.push(big);
+      return new Promise(resolve => {
+        const pieces = Array.from(inner.querySelectorAll('.transcription-piece'));
+        let resolved=false;
+        const finalize = () => {
+          if(resolved) return;
+          resolved=true;
+          card._transcriptionAnimated = true;
+          resolve();
+        };
+        let fallback=null;
+        const cleanup = () => {
+          if(fallback){
+            clearTimeout(fallback);
+            fallback=null;
           }
+          finalize();
+        };
+        if(pieces.length===0){
+          inner.classList.add('transcription-animate');
+          finalize();
+          return;
         }
-        return row;
-      });
-      const u = Array(n + 1).fill(0);
-      const v = Array(n + 1).fill(0);
-      const p = Array(n + 1).fill(0);
-      const way = Array(n + 1).fill(0);
-      for(let i = 1; i <= n; i++){
-        p[0] = i;
-        let j0 = 0;
-        const minv = Array(n + 1).fill(Infinity);
-        const used = Array(n + 1).fill(false);
-        do{
-          used[j0] = true;
-          const i0 = p[j0];
-          let delta = Infinity;
-          let j1 = 0;
-          for(let j = 1; j <= n; j++){
-            if(used[j]) continue;
-            const cur = cost[i0 - 1][j - 1] - u[i0] - v[j];
-            if(cur < minv[j]){
-              minv[j] = cur;
-              way[j] = j0;
-            }
-            if(minv[j] < delta){
-              delta = minv[j];
-              j1 = j;
-            }
-          }
-          for(let j = 0; j <= n; j++){
-            if(used[j]){
-              u[p[j]] += delta;
-              v[j] -= delta;
-            } else {
-              minv[j] -= delta;
-            }
+        const totalDuration = ((pieces.length - 1) * 1500) + 1400 + 200;
+        let remaining = pieces.length;
+        const onPieceAnimationEnd = () => {
+          remaining--;
+          if(remaining <= 0){
+            pieces.forEach(piece => piece.removeEventListener('animationend', onPieceAnimationEnd));
+            cleanup();
           }
-          j0 = j1;
-        } while(p[j0] !== 0);
-        do{
-          const j1 = way[j0];
-          p[j0] = p[j1];
-          j0 = j1;
-        } while(j0 !== 0);
-      }
-      const result = [];
-      for(let j = 1; j <= n; j++){
-        if(p[j] && p[j] - 1 < rows && j - 1 < cols){
-          result.push({ row: p[j] - 1, col: j - 1, weight: weights[p[j] - 1][j - 1] });
-        }
-      }
-      return result;
-    }
-
-    function extractMatches(assignment, userTokens, originalTokens){
-      const matches = [];
-      const matchedUser = new Set();
-      const matchedOrig = new Set();
-      assignment.forEach((item, idx) => {
-        if(!item) return;
-        const { row, col, weight } = item;
-        if(row >= userTokens.length || col >= originalTokens.length) return;
-        if(weight < MIN_SIMILARITY_SCORE) return;
-        matches.push({
-          id: idx,
-          userIndex: row,
-          origIndex: col,
-          userToken: userTokens[row],
-          origToken: originalTokens[col],
-          score: weight
-        });
-        matchedUser.add(row);
-        matchedOrig.add(col);
+        };
+        fallback = setTimeout(() => {
+          pieces.forEach(piece => piece.removeEventListener('animationend', onPieceAnimationEnd));
+          cleanup();
+        }, totalDuration);
+        pieces.forEach(piece => piece.addEventListener('animationend', onPieceAnimationEnd));
+        inner.classList.add('transcription-animate');
       });
-      matches.sort((a,b)=> a.userIndex - b.userIndex);
-      matches.forEach((m, index)=>{ m.id = index; });
-      return { matches, matchedUser, matchedOrig };
-    }
-
-    function computeLisWithTies(matches){
-      if(!matches.length) return [];
-      const values = matches.map(m => m.origIndex);
-      const dp = [];
-      const prev = Array(values.length).fill(-1);
-      for(let i = 0; i < values.length; i++){
-        dp[i] = { len: 1, breaks: 0, start: i };
-        for(let j = 0; j < i; j++){
-          if(values[j] < values[i]){
-            const candidate = {
-              len: dp[j].len + 1,
-              breaks: dp[j].breaks + (values[i] === values[j] + 1 ? 0 : 1),
-              start: dp[j].start
-            };
-            if(isBetterLis(candidate, dp[i])){
-              dp[i] = candidate;
-              prev[i] = j;
-            }
-          }
-        }
-      }
-      let bestIdx = 0;
-      for(let i = 1; i < dp.length; i++){
-        if(isBetterLis(dp[i], dp[bestIdx])){
-          bestIdx = i;
-        }
-      }
-      const result = [];
-      let k = bestIdx;
-      while(k !== -1){
-        result.push(k);
-        k = prev[k];
-      }
-      return result.reverse();
-    }
-
-    function isBetterLis(a, b){
-      if(!b) return true;
-      if(a.len !== b.len) return a.len > b.len;
-      if(a.breaks !== b.breaks) return a.breaks < b.breaks;
-      return a.start < b.start;
-    }
-
-    // Monotone alignment (NeedlemanWunsch) to derive non-crossing anchors
-    function monotoneAlignment(userTokens, originalTokens){
-      const n = userTokens.length;
-      const m = originalTokens.length;
-      const dp = Array.from({length: n + 1}, () => Array(m + 1).fill(-Infinity));
-      const dir = Array.from({length: n + 1}, () => Array(m + 1).fill(0)); // 0=diag,1=up,2=left
-      dp[0][0] = 0;
-      for(let i = 1; i <= n; i++){
-        dp[i][0] = dp[i-1][0] - GAP_PENALTY;
-        dir[i][0] = 1;
-      }
-      for(let j = 1; j <= m; j++){
-        dp[0][j] = dp[0][j-1] - GAP_PENALTY;
-        dir[0][j] = 2;
-      }
-      for(let i = 1; i <= n; i++){
-        for(let j = 1; j <= m; j++){
-          const sim = tokenSimilarity(userTokens[i-1], originalTokens[j-1]);
-          const diag = dp[i-1][j-1] + sim;
-          const up = dp[i-1][j] - GAP_PENALTY;
-          const left = dp[i][j-1] - GAP_PENALTY;
-          const best = Math.max(diag, up, left);
-          dp[i][j] = best;
-          if(best === diag){
-            dir[i][j] = 0;
-          } else if(best === up){
-            dir[i][j] = 1;
-          } else {
-            dir[i][j] = 2;
-          }
-        }
-      }
-      const matches = [];
-      let i = n, j = m;
-      while(i > 0 && j > 0){
-        const d = dir[i][j];
-        if(d === 0){
-          const sim = tokenSimilarity(userTokens[i-1], originalTokens[j-1]);
-          if(sim >= MIN_SIMILARITY_SCORE){
-            matches.push({
-              userIndex: i - 1,
-              origIndex: j - 1,
-              score: sim
-            });
-          }
-          i--; j--;
-        } else if(d === 1){
-          i--;
-        } else {
-          j--;
-        }
-      }
-      return matches.reverse();
     }
 
-    function buildGapKey(before, after){
-      const left = before === undefined ? -1 : before;
-      const right = after === null || after === undefined ? 'END' : after;
-      return `${left}-${right}`;
-    }
 
-    function buildMovePlan({ matches, lisSet, userTokens, originalTokens, missing }){ // eslint-disable-line max-params
-      const missingTokens = Array.isArray(missing) ? missing : [];
-      const orderedMatches = [...matches];
-      const lisMatches = orderedMatches.filter(m=>lisSet.has(m.id));
-      const lisOrigSorted = lisMatches.map(m=>m.origIndex).sort((a,b)=>a-b);
-      const lisOrigToUser = new Map();
-      lisMatches.forEach(m=> lisOrigToUser.set(m.origIndex, m.userIndex));
+    function buildExampleDictationSlot(card){
+      if(!card) return null;
+      const parsedExamples = parseExamples(card.examples || [], card.exampleTranslations || null, userLang2);
+      const firstExample = parsedExamples.length ? parsedExamples[0] : null;
+      if(!firstExample || !firstExample.no){
+        return null;
+      }
+      const dictationId = 'dictation-' + Math.random().toString(36).substr(2, 9);
+      const exampleText = firstExample.no;
+      const exampleTranslation =
+        card.translation ||
+        (firstExample.translations && (firstExample.translations[userLang2] || firstExample.translations.en)) ||
+        '';
+      const safeExampleTextAttr = escapeHtml(exampleText).replace(/"/g, '&quot;');
+      const safeExampleTextDisplay = escapeHtml(exampleText);
+      const safePrompt = escapeHtml(exampleTranslation || '');
 
-      console.log('[DEBUG] LIS tokens:', lisMatches.map(m => ({
-        origIndex: m.origIndex,
-        userIndex: m.userIndex,
-        origToken: m.origToken.raw,
-        userToken: m.userToken.raw
-      })));
-      console.log('[DEBUG] All matches:', orderedMatches.map(m => ({
-        origIndex: m.origIndex,
-        userIndex: m.userIndex,
-        origToken: m.origToken.raw,
-        userToken: m.userToken.raw,
-        inLIS: lisSet.has(m.id)
-      })));
+      const el = document.createElement('div');
+      el.className = 'slot';
+      el.dataset.dictationId = dictationId;
+      el.dataset.slotType = 'dictation-example';
+      el.innerHTML = `
+        <div class="dictation-exercise example-dictation-exercise" data-dictation-id="${dictationId}">
+          <div class="dictation-translation-prompt">${safePrompt}</div>
+          <div class="dictation-input-wrapper">
+            <textarea
+              class="dictation-input"
+              placeholder="${aiStrings.dictationPlaceholder || 'Type what you hear...'}"
+              rows="3"
+              data-correct-text="${safeExampleTextAttr}"
+            ></textarea>
+          </div>
+          <div class="dictation-controls">
+            <button type="button" class="dictation-check-btn primary">
+              Check
+            </button>
+          </div>
+          <div class="dictation-result hidden"></div>
+          <div class="dictation-correct-answer hidden">
+            <div class="correct-answer-label">${aiStrings.dictationCorrectAnswer || ' :'}</div>
+            <div class="correct-answer-text">${safeExampleTextDisplay}</div>
+          </div>
+        </div>
+      `;
 
-      // Create a map of ALL matched words (not just LIS) for better gap calculation
-      const allOrigToUser = new Map();
-      orderedMatches.forEach(m => allOrigToUser.set(m.origIndex, m.userIndex));
-
-      console.log('[DEBUG] LIS original indices (stay in place):', lisOrigSorted);
-
-      const metaByUser = Array(userTokens.length).fill(null);
-      const gapMeta = {};
-      const tokensPerGap = {}; // Track which tokens belong to each gap
-
-      orderedMatches.forEach((m)=>{
-        const inLis = lisSet.has(m.id);
-
-        // For both gap and targetBoundary calculation, use LIS tokens (stable positions)
-        // Find the nearest LIS tokens to determine where this token should go
-        let prevLIS = -1;
-        let nextLIS = null;
-        for(const idx of lisOrigSorted){
-          if(idx < m.origIndex){
-            prevLIS = idx;
-          } else if(idx > m.origIndex){
-            nextLIS = idx;
-            break;
-          }
-        }
+      setTimeout(() => {
+        setupDictationExercise(el, card, dictationId);
+      }, 100);
 
-        // Use LIS-based gap key so tokens between same LIS anchors share the same gap
-        const gapKey = buildGapKey(prevLIS, nextLIS);
+      return el;
+    }
 
-        // Calculate beforeUser and afterUser based on LIS positions (stable anchors)
-        let beforeUser = -1;
-        if(prevLIS !== -1){
-          beforeUser = lisOrigToUser.get(prevLIS) ?? -1;
-        }
 
-        let afterUser = userTokens.length;
-        if(nextLIS !== null){
-          afterUser = lisOrigToUser.get(nextLIS) ?? userTokens.length;
-        }
+    async function buildSlot(kind, card){
+      const el=document.createElement("div");
+      el.className="slot";
+      const cardOrder = Array.isArray(card.order) ? card.order : [];
+      if(kind==="transcription" && card.transcription){
+        el.innerHTML=renderTranscriptionHTML(card.transcription);
+        el.dataset.slotType = 'transcription';
+        return el;
+      }
+      if(kind==="text" && card.text){
+        const showInlineTranscription = card.transcription && !cardOrder.includes('transcription');
+        const tr = showInlineTranscription ? renderTranscriptionHTML(card.transcription) : "";
 
-        if(!gapMeta[gapKey]){
-          gapMeta[gapKey] = {
-            before: prevLIS,
-            after: nextLIS,
-            beforeUser,
-            afterUser,
-            targetBoundary: beforeUser + 1
-          };
-          tokensPerGap[gapKey] = [];
-          console.log(`[DEBUG] Created gap ${gapKey}: before=${prevLIS}, after=${nextLIS}, beforeUser=${beforeUser}, afterUser=${afterUser}, targetBoundary=${beforeUser + 1}`);
-        }
+        // DICTATION EXERCISE: Create interactive text input exercise
+        const dictationId = 'dictation-' + Math.random().toString(36).substr(2, 9);
+
+        el.innerHTML=`
+          <div class="dictation-exercise" data-dictation-id="${dictationId}">
+            <div class="dictation-input-wrapper">
+              <textarea
+                class="dictation-input"
+                placeholder="${aiStrings.dictationPlaceholder || 'Type what you hear...'}"
+                rows="3"
+                data-correct-text="${card.text.replace(/"/g, '&quot;')}"
+              ></textarea>
+            </div>
+            <div class="dictation-controls">
+              <button type="button" class="dictation-check-btn primary">
+                Check
+              </button>
+            </div>
+            <div class="dictation-result hidden"></div>
+            <div class="dictation-correct-answer hidden">
+              <div class="correct-answer-label">${aiStrings.dictationCorrectAnswer || ' :'}</div>
+              <div class="correct-answer-text">${card.text}</div>
+            </div>
+          </div>
+          ${tr}
+        `;
 
-        // Track which tokens go into this gap (for calculating offset)
-        if(!inLis){
-          tokensPerGap[gapKey].push(m.origIndex);
+        // Get audio URL for dictation autoplay
+        const dictationAudioUrl = await resolveAudioUrl(card, 'front');
+        if(dictationAudioUrl){
+          el.dataset.autoplay = dictationAudioUrl;
         }
-
-        const hasError = m.score < 1 || m.userToken.raw !== m.origToken.raw;
-        metaByUser[m.userIndex] = {
-          match: m,
-          inLis,
-          targetGapKey: gapKey,
-          targetGap: { before: prevLIS, after: nextLIS },
-          hasError,
-          needsMove: !inLis
-        };
-      });
-
-      // Sort tokens in each gap by their original index to assign correct offsets
-      Object.keys(tokensPerGap).forEach(gapKey => {
-        tokensPerGap[gapKey].sort((a, b) => a - b);
-      });
-
-      const movableMatches = orderedMatches.filter(m=>!lisSet.has(m.id));
-      const moveBlocks = buildMoveBlocks(movableMatches, metaByUser, gapMeta, tokensPerGap, userTokens.length);
-
-      const boundaryCounts = Array(userTokens.length + 1).fill(0);
-      moveBlocks.forEach(block=>{
-        const crossed = collectCrossedBoundaries(block);
-        block.crossed = crossed;
-        crossed.forEach(idx=>{
-          boundaryCounts[idx] = (boundaryCounts[idx] || 0) + 1;
-        });
-      });
-      const overloadedBoundaries = new Set(boundaryCounts.map((count, idx)=> ({count, idx})).filter(item=>item.count > 1).map(item=>item.idx));
-      const overloadBlocks = new Set();
-      moveBlocks.forEach(block=>{
-        const crossed = block.crossed || collectCrossedBoundaries(block);
-        if(crossed.some(idx=>overloadedBoundaries.has(idx))){
-          overloadBlocks.add(block.id);
-        }
-      });
-      // Use rewrite when:
-      // 1. A boundary is overloaded (2+ blocks through same boundary), OR
-      // 2. Too many errors (>60% of tokens need correction)
-      const crossingBlocks = new Set(); // crossings no longer trigger rewrite alone
-      const totalTokens = userTokens.length;
-      const errorTokenCount = movableMatches.length + missingTokens.length;
-      const errorRate = totalTokens > 0 ? errorTokenCount / totalTokens : 0;
-      const tooManyErrors = errorRate > 0.6;
-
-      console.log(`[DEBUG] Error rate: ${errorTokenCount}/${totalTokens} = ${(errorRate * 100).toFixed(1)}%, tooManyErrors=${tooManyErrors}`);
-
-      const mode = (overloadedBoundaries.size || tooManyErrors) ? 'rewrite' : 'arrows';
-      // When tooManyErrors=true, include ALL moveBlocks in problemIds (even filtered out ones)
-      // Use allBlocksBeforeFilter to get complete list of blocks
-      const allBlocks = moveBlocks.allBlocksBeforeFilter || moveBlocks;
-      const problemIds = tooManyErrors
-        ? new Set(allBlocks.map(b => b.id))
-        : new Set([...overloadBlocks]);
-
-      console.log(`[DEBUG] Mode=${mode}, problemIds=${Array.from(problemIds).join(', ')}, overloadedBoundaries=${overloadedBoundaries.size}, allBlocks=${allBlocks.length}, filteredBlocks=${moveBlocks.length}`);
-      // When tooManyErrors=true, pass allBlocks to buildRewriteGroups so it can find ALL problematic tokens
-      const rewriteGroups = mode === 'rewrite' ? buildRewriteGroups({
-        moveBlocks: tooManyErrors ? allBlocks : moveBlocks,
-        problemIds,
-        matches: orderedMatches,
-        userTokens,
-        originalTokens,
-        metaByUser,
-        missingTokens
-      }) : [];
-
-      // Create a set of token indices that are in moveBlocks
-      const tokensInMoveBlocks = new Set();
-      moveBlocks.forEach(block=>{
-        if(block.resolvedByRewrite) return;
-        block.tokens.forEach(idx=>{
-          tokensInMoveBlocks.add(idx);
-          if(!metaByUser[idx]) metaByUser[idx] = {};
-          metaByUser[idx].moveBlockId = block.id;
-          metaByUser[idx].targetGapKey = block.targetGapKey;
-          metaByUser[idx].targetGap = block.targetGap;
-        });
-      });
-
-      // Clear needsMove for tokens that were filtered out (not in any move block)
-      metaByUser.forEach((meta, idx) => {
-        if(meta && meta.needsMove && !tokensInMoveBlocks.has(idx)){
-          meta.needsMove = false;
-        }
-      });
-
-      const gapsNeeded = new Set();
-      if(mode === 'arrows'){
-        moveBlocks.forEach(block=> gapsNeeded.add(block.targetGapKey));
-      }
-
-      const matchedByOrig = new Map();
-      orderedMatches.forEach(m=> matchedByOrig.set(m.origIndex, m.userIndex));
-      const missingByPosition = buildMissingByPosition(missingTokens, orderedMatches, userTokens.length);
-
-      // CRITICAL: For missing tokens, we need to find gaps based on LIS tokens only
-      // This ensures missing tokens share gaps with moveBlocks correctly
-      missingTokens.forEach(item=>{
-        // Find where this missing token should appear in the ORIGINAL order
-        // by finding its neighbors in LIS (tokens that stay in place)
-        let prevOrig = -1;
-        let nextOrig = null;
-
-        // Find neighbors in LIS ONLY (tokens that stay in place)
-        // If no LIS neighbors found, prev=-1 or next=null means gap extends to start/end
-        for(let i = item.origIndex - 1; i >= 0; i--){
-          // Check if this original position is in LIS (stays in place)
-          if(lisOrigToUser.has(i)){
-            prevOrig = i;
-            break;
-          }
-        }
-        for(let i = item.origIndex + 1; i < originalTokens.length; i++){
-          if(lisOrigToUser.has(i)){
-            nextOrig = i;
-            break;
-          }
-        }
-
-        // Now find where these neighbors are in the USER sequence
-        let prevUser = prevOrig !== -1 ? (lisOrigToUser.get(prevOrig) ?? matchedByOrig.get(prevOrig)) : -1;
-        let nextUser = nextOrig !== null ? (lisOrigToUser.get(nextOrig) ?? matchedByOrig.get(nextOrig)) : userTokens.length;
-
-        const gapKey = buildGapKey(prevOrig, nextOrig);
-        const beforeUser = prevUser;
-        const afterUser = nextUser;
-
-        // CRITICAL: Check if there's already a gap with this key (from moveBlocks)
-        // If so, reuse it. Missing tokens share gaps with moveBlocks.
-        if(!gapMeta[gapKey]){
-          gapMeta[gapKey] = {
-            before: prevOrig,
-            after: nextOrig,
-            beforeUser,
-            afterUser,
-            targetBoundary: beforeUser + 1
-          };
-          console.log(`[DEBUG] Created NEW gap for missing token ${item.token.raw} (orig_${item.origIndex}): gap=${gapKey}, prevOrig=${prevOrig}, nextOrig=${nextOrig}, beforeUser=${beforeUser}, afterUser=${afterUser}, targetBoundary=${beforeUser + 1}`);
-        } else {
-          console.log(`[DEBUG] Missing token ${item.token.raw} (orig_${item.origIndex}) SHARES gap ${gapKey} (prevOrig=${prevOrig}, nextOrig=${nextOrig}) with existing element (boundary=${gapMeta[gapKey].targetBoundary})`);
-        }
-        // CRITICAL: Save the correct gapKey to the missing token object
-        item.gapKey = gapKey;
-        gapsNeeded.add(gapKey);
-      });
-
-      const crossedBoundaries = boundaryCounts
-        .map((count, idx)=>({boundary: idx, count}))
-        .filter(item=>item.count > 0);
-
-      return {
-        mode,
-        moveBlocks,
-        rewriteGroups,
-        tokenMeta: metaByUser,
-        gapMeta,
-        gapsNeeded,
-        missingByPosition,
-        missingTokens, // CRITICAL: Return missingTokens with correct gapKey
-        boundaryCounts,
-        crossedBoundaries,
-        overloadedBoundaries: Array.from(overloadedBoundaries)
-      };
-    }
-
-    function buildMoveBlocks(movableMatches, metaByUser, gapMeta, tokensPerGap, userLength){
-      const blocks = [];
-      let current = null;
-      movableMatches.forEach(m=>{
-        const meta = metaByUser[m.userIndex] || {};
-        const gapKey = meta.targetGapKey || buildGapKey(-1, null);
-        const gap = gapMeta[gapKey] || { before: -1, after: null, beforeUser: -1, afterUser: userLength, targetBoundary: 0 };
-
-        // Calculate offset within the gap based on original position
-        const tokensInThisGap = tokensPerGap[gapKey] || [];
-        const offsetInGap = tokensInThisGap.indexOf(m.origIndex);
-        const targetBoundary = (gap.beforeUser ?? -1) + 1 + offsetInGap;
-
-        const lastOrig = current && current.origIndices.length ? current.origIndices[current.origIndices.length - 1] : -Infinity;
-        const expectedNextOrig = current ? lastOrig + 1 : null;
-        const adjacent = current
-          && current.targetGapKey === gapKey
-          && m.userIndex === current.end + 1
-          && m.origIndex === expectedNextOrig; // merge only if user-adjacent AND orig-adjacent
-        if(adjacent){
-          current.tokens.push(m.userIndex);
-          current.origIndices.push(m.origIndex);
-          current.end = m.userIndex;
-          current.hasError = current.hasError || !!meta.hasError;
-        } else {
-          if(current){
-            blocks.push(current);
-          }
-          current = {
-            id: `move-${blocks.length + 1}`,
-            tokens: [m.userIndex],
-            origIndices: [m.origIndex],
-            start: m.userIndex,
-            end: m.userIndex,
-            targetGapKey: gapKey,
-            targetGap: meta.targetGap || { before: -1, after: null },
-            beforeUser: gap.beforeUser ?? -1,
-            afterUser: gap.afterUser ?? userLength,
-            targetBoundary: targetBoundary,
-            hasError: !!meta.hasError,
-            resolvedByRewrite: false
-          };
-        }
-      });
-      if(current){
-        blocks.push(current);
-      }
-
-      console.log('[DEBUG] All moveBlocks created:', blocks.map(b => ({
-        id: b.id,
-        tokens: b.tokens,
-        start: b.start,
-        end: b.end,
-        targetBoundary: b.targetBoundary,
-        beforeUser: b.beforeUser,
-        afterUser: b.afterUser,
-        targetGapKey: b.targetGapKey
-      })));
-
-      // Filter out blocks that don't actually need to move
-      // A block doesn't need to move if it's already in the target position
-      const filtered = blocks.filter(block => {
-        // Check if the block is already in the correct position
-        // Block is at correct position if targetBoundary is between start and end+1
-        const alreadyInPlace = block.targetBoundary >= block.start && block.targetBoundary <= block.end + 1;
-        if(alreadyInPlace){
-          console.log('[DEBUG] Filtering out block:', block.id, 'tokens:', block.tokens, 'targetBoundary:', block.targetBoundary, 'start:', block.start, 'end:', block.end);
-        }
-        return !alreadyInPlace;
-      });
-      console.log('[DEBUG] Blocks before filter:', blocks.length, 'after filter:', filtered.length);
-      console.log('[DEBUG] Filtered blocks:', filtered.map(b => ({
-        id: b.id,
-        tokens: b.tokens,
-        start: b.start,
-        end: b.end,
-        targetBoundary: b.targetBoundary
-      })));
-
-      // Store all blocks (before filtering) for error rate calculation
-      filtered.allBlocksBeforeFilter = blocks;
-
-      return filtered;
-    }
-
-    function collectCrossedBoundaries(block){
-      const crossed = [];
-      if(block.targetBoundary < block.start){
-        for(let b = block.targetBoundary; b < block.start; b++){
-          crossed.push(b);
-        }
-      } else if(block.targetBoundary > block.end + 1){
-        for(let b = block.end + 1; b < block.targetBoundary; b++){
-          crossed.push(b);
-        }
-      }
-      return crossed;
-    }
-
-    function detectCrossingBlocks(blocks){
-      const set = new Set();
-      for(let i = 0; i < blocks.length; i++){
-        for(let j = i + 1; j < blocks.length; j++){
-          const a = blocks[i];
-          const b = blocks[j];
-          const orderInverts = (a.start < b.start && a.targetBoundary > b.targetBoundary) ||
-                               (a.start > b.start && a.targetBoundary < b.targetBoundary);
-          const targetInside = (a.targetBoundary > b.start && a.targetBoundary < b.end + 1) ||
-                               (b.targetBoundary > a.start && b.targetBoundary < a.end + 1);
-          if(orderInverts || targetInside){
-            set.add(a.id);
-            set.add(b.id);
-          }
-        }
-      }
-      return set;
-    }
-
-    function buildRewriteGroups({ moveBlocks, problemIds, matches, userTokens, originalTokens, metaByUser, missingTokens = [] }){ // eslint-disable-line max-params
-      if(!problemIds.size || !moveBlocks.length){
-        return [];
-      }
-      const problemBlocks = moveBlocks.filter(b=>problemIds.has(b.id));
-      console.log(`[DEBUG] buildRewriteGroups: moveBlocks=${moveBlocks.length}, problemIds=${Array.from(problemIds).join(',')}, problemBlocks=${problemBlocks.length}`);
-      console.log(`[DEBUG] problemBlocks origIndices:`, problemBlocks.map(b => `${b.id}:[${b.origIndices.join(',')}]`).join(' '));
-      if(!problemBlocks.length){
-        return [];
-      }
-      // Start with coverage based on sources/targets to include all crossed boundaries
-      let coverUserMin = Infinity;
-      let coverUserMax = -Infinity;
-      problemBlocks.forEach(block=>{
-        const coverStart = Math.min(block.start, block.targetBoundary);
-        const coverEnd = Math.max(block.end, block.targetBoundary - 1);
-        coverUserMin = Math.min(coverUserMin, coverStart);
-        coverUserMax = Math.max(coverUserMax, coverEnd);
-      });
-      let origMin = Infinity;
-      let origMax = -Infinity;
-      problemBlocks.forEach(block=>{
-        block.origIndices.forEach(idx=>{
-          origMin = Math.min(origMin, idx);
-          origMax = Math.max(origMax, idx);
-        });
-      });
-
-      // CRITICAL: Include missing tokens in the initial range calculation
-      // This ensures that missing tokens between problemBlocks are included in the rewrite group
-      if(missingTokens && missingTokens.length > 0){
-        console.log(`[DEBUG] Checking ${missingTokens.length} missing tokens for range expansion`);
-        missingTokens.forEach(item => {
-          // Temporarily expand range to see if this missing token is "near" the problem area
-          const nearProblemArea = item.origIndex >= origMin - 1 && item.origIndex <= origMax + 1;
-          if(nearProblemArea){
-            console.log(`[DEBUG] Including missing token ${item.token.raw} (orig_${item.origIndex}) in rewrite range`);
-            origMin = Math.min(origMin, item.origIndex);
-            origMax = Math.max(origMax, item.origIndex);
-          }
-        });
-      }
-
-      if(!Number.isFinite(origMin) || !Number.isFinite(origMax)){
-        return [];
-      }
-      let userMin = Number.isFinite(coverUserMin) ? coverUserMin : Infinity;
-      let userMax = Number.isFinite(coverUserMax) ? coverUserMax : -Infinity;
-      matches.forEach(m=>{
-        if(m.origIndex >= origMin && m.origIndex <= origMax){
-          userMin = Math.min(userMin, m.userIndex);
-          userMax = Math.max(userMax, m.userIndex);
-        }
-      });
-      if(!Number.isFinite(userMin)){
-        userMin = 0;
-        userMax = userTokens.length ? userTokens.length - 1 : 0;
-      }
-      matches.forEach(m=>{
-        if(m.userIndex >= userMin && m.userIndex <= userMax){
-          origMin = Math.min(origMin, m.origIndex);
-          origMax = Math.max(origMax, m.origIndex);
-        }
-      });
-      // Expand student span again to ensure we cover all tokens mapping to expanded orig span
-      matches.forEach(m=>{
-        if(m.origIndex >= origMin && m.origIndex <= origMax){
-          userMin = Math.min(userMin, m.userIndex);
-          userMax = Math.max(userMax, m.userIndex);
-        }
-      });
-      const correctTokens = originalTokens.filter(t=>t.index >= origMin && t.index <= origMax);
-      const correctText = correctTokens.map(t=>t.raw).join(' ');
-      const group = {
-        id: 'rewrite-1',
-        start: userMin,
-        end: userMax,
-        origMin,
-        origMax,
-        targetGapKey: buildGapKey(origMin - 1, origMax + 1),
-        correctText
-      };
-      console.log(`[DEBUG] Created rewrite group: origMin=${origMin}, origMax=${origMax}, userMin=${userMin}, userMax=${userMax}, correctText="${correctText}"`);
-      for(let i = group.start; i <= group.end; i++){
-        metaByUser[i] = metaByUser[i] || {};
-        metaByUser[i].rewriteGroupId = group.id;
-        metaByUser[i].targetGapKey = group.targetGapKey;
-      }
-      moveBlocks.forEach(block=>{
-        if(problemIds.has(block.id)){
-          block.resolvedByRewrite = true;
-        }
-      });
-      return [group];
-    }
-
-    function buildMissingByPosition(missing, matches, userLength){
-      const map = {};
-      if(!missing || !missing.length){
-        return map;
-      }
-      const matchedByOrig = new Map();
-      matches.forEach(m=>{
-        matchedByOrig.set(m.origIndex, m.userIndex);
-      });
-      const sortedMissing = [...missing].sort((a,b)=>a.origIndex - b.origIndex);
-      sortedMissing.forEach(item=>{
-        let prevOrig = -1;
-        let prevUser = -1;
-        let nextOrig = null;
-        matchedByOrig.forEach((userIdx, origIdx)=>{
-          if(origIdx < item.origIndex && origIdx > prevOrig){
-            prevOrig = origIdx;
-            prevUser = userIdx;
-          }
-          if(origIdx > item.origIndex){
-            if(nextOrig === null || origIdx < nextOrig){
-              nextOrig = origIdx;
-            }
-          }
-        });
-        const gapKey = buildGapKey(prevOrig, nextOrig);
-        const pos = Math.max(0, prevUser + 1);
-        if(!map[pos]){
-          map[pos] = [];
-        }
-        map[pos].push({ token: item.token, gapKey });
-      });
-      Object.keys(map).forEach(key=>{
-        map[key] = map[key].sort((a,b)=>a.token.index - b.token.index);
-      });
-      if(map[userLength]){
-        map[userLength] = map[userLength].sort((a,b)=>a.token.index - b.token.index);
-      }
-      return map;
-    }
-
-function renderComparisonResult(resultEl, comparison){
-      resultEl.innerHTML = '';
-      const wrapper = document.createElement('div');
-      wrapper.className = 'dictation-comparison';
-
-      if(comparison.isCorrect){
-        const success = document.createElement('div');
-        success.className = 'dictation-success-msg';
-        success.textContent = 'Perfect! Well done!';
-        wrapper.appendChild(success);
-        resultEl.appendChild(wrapper);
-        return;
-      }
-
-      const errorCount = comparison.errorCount || 0;
-      const errorWord = errorCount === 1 ? 'error' : 'errors';
-      const summary = document.createElement('div');
-      summary.className = 'dictation-errors-summary';
-      summary.textContent = `Found ${errorCount} ${errorWord}`;
-      wrapper.appendChild(summary);
-
-      const visual = document.createElement('div');
-      visual.className = 'dictation-visual';
-
-      const userRow = buildUserLine(comparison);
-      const correctRow = buildCorrectLine(comparison);
-      visual.appendChild(userRow);
-      visual.appendChild(correctRow);
-
-      wrapper.appendChild(visual);
-      resultEl.appendChild(wrapper);
-
-      requestAnimationFrame(()=> drawDictationArrows(visual));
-    }
-
-    function buildUserLine(comparison){
-      const row = document.createElement('div');
-      row.className = 'dictation-comparison-row';
-      const label = document.createElement('div');
-      label.className = 'dictation-comparison-label';
-      label.textContent = 'Your answer:';
-      const line = document.createElement('div');
-      line.className = 'dictation-line dictation-line-user';
-
-      const gapsNeeded = comparison.movePlan.gapsNeeded || new Set();
-      const gapMeta = comparison.movePlan.gapMeta || {};
-      const missingTokens = comparison.movePlan.missingTokens || [];
-      const rewriteGroups = comparison.movePlan.rewriteGroups || [];
-
-      // Filter out missing tokens that are inside rewrite groups
-      // They should not be inserted separately as they're already handled in the rewrite block
-      const rewriteOrigRanges = rewriteGroups.map(g => ({
-        origMin: g.origMin,
-        origMax: g.origMax
-      }));
-
-      const filteredMissingTokens = missingTokens.filter(item => {
-        // Check if this missing token is inside any rewrite group
-        const insideRewrite = rewriteOrigRanges.some(range =>
-          item.origIndex >= range.origMin && item.origIndex <= range.origMax
-        );
-        if(insideRewrite){
-          console.log(`[DEBUG] Excluding missing token ${item.token.raw} (orig_${item.origIndex}) - inside rewrite group`);
-        }
-        return !insideRewrite;
-      });
-
-      // Build missingByGapKey map using the CORRECT gapKey from filteredMissingTokens
-      const missingByGapKey = new Map();
-      filteredMissingTokens.forEach(item => {
-        const gapKey = item.gapKey; // Use the corrected gapKey from planMovesAndGaps
-        if(!gapKey){
-          console.warn('[WARN] Missing token without gapKey:', item);
-          return;
-        }
-        if(!missingByGapKey.has(gapKey)){
-          missingByGapKey.set(gapKey, []);
-        }
-        missingByGapKey.get(gapKey).push(item);
-      });
-
-      // Calculate adjusted boundaries accounting for moveBlocks
-      // moveBlocks will be skipped, so gaps after them need to shift left
-      const moveBlockIndices = new Set();
-      comparison.movePlan.moveBlocks.forEach(block => {
-        for(let i = block.start; i <= block.end; i++){
-          moveBlockIndices.add(i);
-        }
-      });
-
-      const gapsByBoundary = new Map();
-      // Use actual moveBlocks' targetBoundary instead of gapMeta baseline
-      comparison.movePlan.moveBlocks.forEach(block => {
-        const key = block.targetGapKey;
-        if(!gapsNeeded.has(key)) return;
-
-        let boundary = block.targetBoundary;
-
-        // Adjust boundary: subtract number of moveBlock tokens before this boundary
-        let adjustment = 0;
-        for(let i = 0; i < boundary; i++){
-          if(moveBlockIndices.has(i)){
-            adjustment++;
-          }
-        }
-        boundary -= adjustment;
-
-        const clamped = Math.max(0, Math.min(boundary, comparison.userTokens.length));
-        console.log(`[DEBUG] Gap ${key}: original boundary=${block.targetBoundary}, adjustment=${adjustment}, final boundary=${boundary}`);
-        if(!gapsByBoundary.has(clamped)){
-          gapsByBoundary.set(clamped, []);
-        }
-        // Store gap only once per boundary (avoid duplicates)
-        if(!gapsByBoundary.get(clamped).includes(key)){
-          gapsByBoundary.get(clamped).push(key);
-        }
-      });
-
-      // Helper function to check if token is punctuation
-      const isPunctuation = (text) => {
-        return /^[.,!?;:—–\-…]$/.test(text.trim());
-      };
-
-      const insertAnchors = (boundaryIdx)=>{
-        const list = gapsByBoundary.get(boundaryIdx) || [];
-        console.log(`[DEBUG] insertAnchors(${boundaryIdx}): gaps=${list.length > 0 ? list.join(', ') : 'none'}`);
-        list.forEach(key=>{
-          // Get all missing tokens for this gap
-          const missingForGap = missingByGapKey.get(key) || [];
-
-          // Find all moveBlocks that target this gap to determine their origIndex
-          const moveBlocksForGap = comparison.movePlan.moveBlocks.filter(b => b.targetGapKey === key);
-          const moveBlockOrigIndices = moveBlocksForGap.flatMap(b => b.origIndices || []);
-
-          // Find min origIndex among moveBlocks (anchor represents where they'll go)
-          const minMoveBlockOrigIndex = moveBlockOrigIndices.length > 0 ? Math.min(...moveBlockOrigIndices) : Infinity;
-
-          // Sort missing tokens by origIndex
-          const sortedMissing = [...missingForGap].sort((a, b) => a.origIndex - b.origIndex);
-
-          // Split missing tokens into BEFORE and AFTER anchor based on origIndex
-          const missingBefore = sortedMissing.filter(m => m.origIndex < minMoveBlockOrigIndex);
-          const missingAfter = sortedMissing.filter(m => m.origIndex >= minMoveBlockOrigIndex);
-
-          console.log(`[DEBUG] Gap ${key} at boundary ${boundaryIdx}: moveBlock origIndices=${moveBlockOrigIndices.join(',')}, missing before=${missingBefore.map(m => `${m.token.raw}(${m.origIndex})`).join(', ')}, missing after=${missingAfter.map(m => `${m.token.raw}(${m.origIndex})`).join(', ')}`);
-
-          // If there are no moveBlocks for this gap, we cannot determine correct position
-          // These missing tokens will be shown inline with user tokens instead
-          if(moveBlockOrigIndices.length === 0){
-            console.log(`[DEBUG] Skipping gap ${key} - no moveBlocks to anchor missing tokens`);
-            return;
-          }
-
-          // Insert missing tokens BEFORE anchor (those with origIndex < moveBlock origIndex)
-          missingBefore.forEach(miss=>{
-            const isPunc = isPunctuation(miss.token.raw);
-            const missSpan = document.createElement('span');
-            missSpan.className = isPunc ? 'dictation-missing-token dictation-missing-punctuation' : 'dictation-missing-token';
-            const word = document.createElement('span');
-            word.className = 'dictation-missing-word';
-            word.textContent = miss.token.raw;
-            missSpan.appendChild(word);
-            // Only add caret if NOT punctuation
-            if (!isPunc) {
-              const caret = document.createElement('span');
-              caret.className = 'dictation-missing-caret';
-              missSpan.appendChild(caret);
-            }
-            line.appendChild(missSpan);
-            console.log(`[DEBUG] Inserted missing token BEFORE anchor: ${miss.token.raw} (orig_${miss.origIndex})${isPunc ? ' [PUNCTUATION]' : ''}`);
-          });
-
-          // Insert anchor for move blocks
-          const anchor = document.createElement('span');
-          anchor.className = 'dictation-gap-anchor';
-          anchor.dataset.gapAnchor = key;
-          const mark = document.createElement('span');
-          mark.className = 'dictation-gap-mark';
-          anchor.appendChild(mark);
-          line.appendChild(anchor);
-
-          // Insert missing tokens AFTER anchor (those with origIndex >= moveBlock origIndex)
-          missingAfter.forEach(miss=>{
-            const isPunc = isPunctuation(miss.token.raw);
-            const missSpan = document.createElement('span');
-            missSpan.className = isPunc ? 'dictation-missing-token dictation-missing-punctuation' : 'dictation-missing-token';
-            const word = document.createElement('span');
-            word.className = 'dictation-missing-word';
-            word.textContent = miss.token.raw;
-            missSpan.appendChild(word);
-            // Only add caret if NOT punctuation
-            if (!isPunc) {
-              const caret = document.createElement('span');
-              caret.className = 'dictation-missing-caret';
-              missSpan.appendChild(caret);
-            }
-            line.appendChild(missSpan);
-            console.log(`[DEBUG] Inserted missing token AFTER anchor: ${miss.token.raw} (orig_${miss.origIndex})${isPunc ? ' [PUNCTUATION]' : ''}`);
-          });
-        });
-      };
-
-      insertAnchors(0);
-      const meta = comparison.movePlan.tokenMeta || [];
-
-      // Build mapping: for each user position, which missing tokens should come AFTER it
-      // This is ONLY for gaps with no moveBlocks (otherwise they're handled by anchor)
-      const gapsWithMoveBlocks = new Set();
-      comparison.movePlan.moveBlocks.forEach(block => {
-        gapsWithMoveBlocks.add(block.targetGapKey);
-      });
-
-      const missingAfterUserPos = new Map();
-      filteredMissingTokens.forEach(item => {
-        // Skip if this missing token's gap has moveBlocks (will be handled by anchor)
-        if(gapsWithMoveBlocks.has(item.gapKey)){
-          return;
-        }
-
-        // Find which user token this missing token should come after
-        // It should go after the last user token that has origIndex < item.origIndex
-        let afterUserIdx = -1;
-        for(let i = 0; i < comparison.userTokens.length; i++){
-          const userMeta = meta[i];
-          if(userMeta && userMeta.match && userMeta.match.origIndex < item.origIndex){
-            afterUserIdx = i;
-          }
-        }
-        if(!missingAfterUserPos.has(afterUserIdx)){
-          missingAfterUserPos.set(afterUserIdx, []);
-        }
-        missingAfterUserPos.get(afterUserIdx).push(item);
-      });
-
-      // Sort missing tokens by origIndex for each position
-      missingAfterUserPos.forEach((tokens, pos) => {
-        tokens.sort((a, b) => a.origIndex - b.origIndex);
-      });
-
-      let idx = 0;
-      let renderedPos = 0; // Track actual rendered position (excluding moved blocks)
-      while(idx < comparison.userTokens.length){
-        const token = comparison.userTokens[idx];
-        const metaInfo = meta[idx] || {};
-        if(metaInfo.rewriteGroupId){
-          const group = comparison.movePlan.rewriteGroups.find(r=>r.id === metaInfo.rewriteGroupId);
-          const start = group ? group.start : idx;
-          const end = group ? group.end : idx;
-          const segmentTokens = comparison.userTokens.slice(start, end + 1).map(t=>t.raw).join(' ');
-          const rewriteEl = document.createElement('span');
-          rewriteEl.className = 'dictation-rewrite-block';
-          // NOTE: Rewrite blocks don't need arrows - they show the correction inline
-          // Do NOT set data-target-gap here
-          const corrected = document.createElement('span');
-          corrected.className = 'dictation-rewrite-correct';
-          corrected.textContent = group ? group.correctText : '';
-          const original = document.createElement('span');
-          original.className = 'dictation-rewrite-original';
-          original.textContent = segmentTokens;
-          rewriteEl.appendChild(corrected);
-          rewriteEl.appendChild(original);
-          line.appendChild(rewriteEl);
-          idx = end + 1;
-          renderedPos++; // Rewrite block counts as one position
-          insertAnchors(renderedPos);
-          continue;
-        }
-        if(metaInfo.moveBlockId){
-          const block = comparison.movePlan.moveBlocks.find(b=>b.id === metaInfo.moveBlockId);
-          // Skip if block was filtered out (doesn't actually need to move)
-          if(!block){
-            const span = createTokenSpan(token, metaInfo);
-            line.appendChild(span);
-            idx++;
-            renderedPos++;
-            insertAnchors(renderedPos);
-            continue;
-          }
-          const blockEl = document.createElement('span');
-          blockEl.className = 'dictation-move-block';
-          blockEl.dataset.targetGap = metaInfo.targetGapKey;
-          block.tokens.forEach(tIdx=>{
-            const tMeta = meta[tIdx] || {};
-            const t = comparison.userTokens[tIdx];
-            const span = createTokenSpan(t, tMeta);
-            span.classList.add('dictation-token-move');
-            blockEl.appendChild(span);
-          });
-          line.appendChild(blockEl);
-          idx = block.end + 1;
-          // Move blocks don't add to renderedPos - they're moved elsewhere
-          continue;
-        }
-        const span = createTokenSpan(token, metaInfo);
-        line.appendChild(span);
-
-        // Insert missing tokens that should come AFTER this user token
-        const missingAfter = missingAfterUserPos.get(idx) || [];
-        missingAfter.forEach(miss => {
-          const isPunc = isPunctuation(miss.token.raw);
-          const missSpan = document.createElement('span');
-          missSpan.className = isPunc ? 'dictation-missing-token dictation-missing-punctuation' : 'dictation-missing-token';
-          const word = document.createElement('span');
-          word.className = 'dictation-missing-word';
-          word.textContent = miss.token.raw;
-          missSpan.appendChild(word);
-          // Only add caret if NOT punctuation
-          if (!isPunc) {
-            const caret = document.createElement('span');
-            caret.className = 'dictation-missing-caret';
-            missSpan.appendChild(caret);
-          }
-          line.appendChild(missSpan);
-          console.log(`[DEBUG] Inserted missing token inline AFTER user token ${idx}: ${miss.token.raw} (orig_${miss.origIndex})${isPunc ? ' [PUNCTUATION]' : ''}`);
-        });
-
-        idx++;
-        renderedPos++;
-        insertAnchors(renderedPos);
-      }
-      row.appendChild(label);
-      row.appendChild(line);
-      return row;
-    }
-
-    function buildCorrectLine(comparison){
-      const row = document.createElement('div');
-      row.className = 'dictation-comparison-row';
-      const label = document.createElement('div');
-      label.className = 'dictation-comparison-label';
-      label.textContent = 'Correct answer:';
-      const line = document.createElement('div');
-      line.className = 'dictation-line dictation-line-correct';
-      comparison.originalTokens.forEach((token, idx)=>{
-        const span = document.createElement('span');
-        span.className = 'dictation-token dictation-token-ok';
-        span.textContent = token.raw;
-        line.appendChild(span);
-      });
-
-      row.appendChild(label);
-      row.appendChild(line);
-      return row;
-    }
-
-    function createTokenSpan(token, meta){
-      const wrapper = document.createElement('span');
-      wrapper.className = 'dictation-token';
-
-      const hasError = meta && meta.hasError;
-      if(hasError){
-        wrapper.classList.add('dictation-token-has-correction');
-        const correction = document.createElement('span');
-        correction.className = 'dictation-token-correction';
-        correction.textContent = meta && meta.match ? meta.match.origToken.raw : '';
-        wrapper.appendChild(correction);
-      }
-
-      const inner = document.createElement('span');
-      inner.className = 'dictation-token-inner';
-      inner.textContent = token.raw;
-
-      // Apply state classes to inner to keep backgrounds on the user row only
-      if(meta && meta.match && meta.inLis && !hasError){
-        inner.classList.add('dictation-token-ok');
-      }
-      if(meta && meta.needsMove){
-        inner.classList.add('dictation-token-move');
-      }
-      if(!meta || (!meta.match && !meta.hasError && !meta.moveBlockId && !meta.rewriteGroupId)){
-        inner.classList.add('dictation-token-extra');
-      }
-
-      // Colors: user text always white; corrections are red; strikethrough is red over white text
-      inner.classList.add('dictation-token-user');
-      if(hasError){
-        inner.classList.add('dictation-token-wrong-text');
-      }
-
-      wrapper.appendChild(inner);
-      return wrapper;
-    }
-
-    function drawDictationArrows(container){
-      const svgNS = 'http://www.w3.org/2000/svg';
-      const old = container.querySelector('.dictation-arrow-layer');
-      if(old){
-        old.remove();
-      }
-      const blocks = container.querySelectorAll('[data-target-gap]');
-      const anchors = container.querySelectorAll('[data-gap-anchor]');
-      if(!blocks.length || !anchors.length){
-        return;
-      }
-      const svg = document.createElementNS(svgNS, 'svg');
-      svg.classList.add('dictation-arrow-layer');
-      svg.setAttribute('width', container.offsetWidth);
-      svg.setAttribute('height', container.offsetHeight);
-      svg.setAttribute('viewBox', `0 0 ${container.offsetWidth} ${container.offsetHeight}`);
-      const containerRect = container.getBoundingClientRect();
-      blocks.forEach(block=>{
-        const gapKey = block.dataset.targetGap;
-        const target = container.querySelector(`[data-gap-anchor="${gapKey}"]`);
-        if(!target){
-          return;
-        }
-        const blockRect = block.getBoundingClientRect();
-        const targetRect = target.getBoundingClientRect();
-
-        // Start: top center of the block that needs to move
-        const startX = blockRect.left + (blockRect.width / 2) - containerRect.left;
-        const startY = blockRect.top - containerRect.top;
-
-        // End: center of target anchor
-        const endX = targetRect.left + (targetRect.width / 2) - containerRect.left;
-        const endY = targetRect.top + (targetRect.height / 2) - containerRect.top;
-
-        // Calculate distances
-        const horizontalDist = Math.abs(endX - startX);
-        const verticalDist = Math.abs(endY - startY);
-        const totalDistance = Math.sqrt(horizontalDist * horizontalDist + verticalDist * verticalDist);
-
-        // Horizontal control points direction
-        const direction = Math.sign(endX - startX);
-
-        // Check if multiline (words on different lines)
-        const isMultiline = verticalDist > 30;
-
-        let cx1, cy1, cx2, cy2, arcHeight;
-
-        if (isMultiline) {
-          // MULTILINE: Use S-curve for vertical transitions
-          // Dynamic arc height based on total distance
-          arcHeight = Math.max(20, totalDistance * 0.25);
-
-          // S-curve with two bends
-          cx1 = startX + direction * horizontalDist * 0.3;
-          cy1 = startY - arcHeight * 0.6;
-          cx2 = endX - direction * horizontalDist * 0.2;
-          cy2 = endY - arcHeight * 0.8;
-        } else {
-          // SINGLE LINE: Shallow arc parallel to text (original behavior)
-          arcHeight = 20;
-
-          // First control point - small rise above text
-          cy1 = startY - arcHeight;
-          // Second control point - EXACTLY ABOVE endX at same height
-          // This creates vertical 90 drop
-          cy2 = startY - arcHeight;
-
-          // First control point at 40% of the way
-          cx1 = startX + direction * horizontalDist * 0.4;
-          // Second control point EXACTLY ABOVE endX (same X-coordinate!)
-          // This forces arrow to drop vertically at 90
-          cx2 = endX;
-        }
-
-        // Draw smooth curved path
-        const p = document.createElementNS(svgNS, 'path');
-        const d = `M ${startX} ${startY} C ${cx1} ${cy1}, ${cx2} ${cy2}, ${endX} ${endY}`;
-        p.setAttribute('d', d);
-        p.setAttribute('fill', 'none');
-        p.setAttribute('stroke', '#ef4444');
-        p.setAttribute('stroke-width', '2.5');
-        p.setAttribute('stroke-linecap', 'round');
-        svg.appendChild(p);
-
-        // Professional arrowhead using cubic Bezier derivative at t=0.95 (closer to endpoint for precise landing)
-        const t = 0.95;
-        const mt = 1 - t;
-        const mt2 = mt * mt;
-        const mt3 = mt2 * mt;
-        const t2 = t * t;
-        const t3 = t2 * t;
-
-        // Cubic Bezier derivative: B'(t) = 3(1-t)?(P1-P0) + 6(1-t)t(P2-P1) + 3t?(P3-P2)
-        const dx = 3*mt2*(cx1 - startX) + 6*mt*t*(cx2 - cx1) + 3*t2*(endX - cx2);
-        const dy = 3*mt2*(cy1 - startY) + 6*mt*t*(cy2 - cy1) + 3*t2*(endY - cy2);
-
-        const mag = Math.hypot(dx, dy) || 1;
-        const ux = dx / mag;
-        const uy = dy / mag;
-
-        // Larger, more visible arrowhead
-        const arrowLength = 12;
-        const arrowWidth = 5;
-
-        const tipX = endX;
-        const tipY = endY;
-        const baseX = tipX - ux * arrowLength;
-        const baseY = tipY - uy * arrowLength;
-
-        // Perpendicular vector for arrow wings
-        const perpX = -uy;
-        const perpY = ux;
-
-        const leftX = baseX + perpX * arrowWidth;
-        const leftY = baseY + perpY * arrowWidth;
-        const rightX = baseX - perpX * arrowWidth;
-        const rightY = baseY - perpY * arrowWidth;
-
-        const poly = document.createElementNS(svgNS, 'polygon');
-        poly.setAttribute('points', `${tipX},${tipY} ${leftX},${leftY} ${rightX},${rightY}`);
-        poly.setAttribute('fill', '#ef4444');
-        poly.setAttribute('stroke', 'none');
-        svg.appendChild(poly);
-      });
-      container.appendChild(svg);
-    }
-
-    function escapeHtml(str){
-      const div = document.createElement('div');
-      div.textContent = str;
-      return div.innerHTML;
-    }
-
-    function renderTranscriptionHTML(text){
-      if(!text) return '';
-      const tokens=[];
-      let buffer='';
-
-      const pushSyllable=(trailingDot=false)=>{
-        if(!buffer && !trailingDot) return;
-        tokens.push(buffer + (trailingDot?'.':''));
-        buffer='';
-      };
-
-      for(const ch of text){
-        if(ch === '.'){
-          pushSyllable(true);
-          continue;
-        }
-        buffer+=ch;
-      }
-      pushSyllable(false);
-
-      const pieces=tokens.map((t,i)=>{
-        const delay=i*1500; // 1.5s pause between syllables
-        return `<span class="transcription-piece transcription-piece--drop" style="animation-delay:${delay}ms">${escapeHtml(t)}</span>`;
-      }).join('');
-
-      return `<div class="transcription-text">${pieces}</div>`;
-    }
-
-    function ensureTranscriptionAnimation(card, slot){
-      if(!slot) return Promise.resolve();
-      const inner = slot.querySelector('.transcription-text');
-      if(!inner) return Promise.resolve();
-      if(card._transcriptionAnimated){
-        return Promise.resolve();
-      }
-      return new Promise(resolve => {
-        const pieces = Array.from(inner.querySelectorAll('.transcription-piece'));
-        let resolved=false;
-        const finalize = () => {
-          if(resolved) return;
-          resolved=true;
-          card._transcriptionAnimated = true;
-          resolve();
-        };
-        let fallback=null;
-        const cleanup = () => {
-          if(fallback){
-            clearTimeout(fallback);
-            fallback=null;
-          }
-          finalize();
-        };
-        if(pieces.length===0){
-          inner.classList.add('transcription-animate');
-          finalize();
-          return;
-        }
-        const totalDuration = ((pieces.length - 1) * 1500) + 1400 + 200;
-        let remaining = pieces.length;
-        const onPieceAnimationEnd = () => {
-          remaining--;
-          if(remaining <= 0){
-            pieces.forEach(piece => piece.removeEventListener('animationend', onPieceAnimationEnd));
-            cleanup();
-          }
-        };
-        fallback = setTimeout(() => {
-          pieces.forEach(piece => piece.removeEventListener('animationend', onPieceAnimationEnd));
-          cleanup();
-        }, totalDuration);
-        pieces.forEach(piece => piece.addEventListener('animationend', onPieceAnimationEnd));
-        inner.classList.add('transcription-animate');
-      });
-    }
-
-
-    function buildExampleDictationSlot(card){
-      if(!card) return null;
-      const parsedExamples = parseExamples(card.examples || [], card.exampleTranslations || null, userLang2);
-      const firstExample = parsedExamples.length ? parsedExamples[0] : null;
-      if(!firstExample || !firstExample.no){
-        return null;
-      }
-      const dictationId = 'dictation-' + Math.random().toString(36).substr(2, 9);
-      const exampleText = firstExample.no;
-      const exampleTranslation =
-        card.translation ||
-        (firstExample.translations && (firstExample.translations[userLang2] || firstExample.translations.en)) ||
-        '';
-      const safeExampleTextAttr = escapeHtml(exampleText).replace(/"/g, '&quot;');
-      const safeExampleTextDisplay = escapeHtml(exampleText);
-      const safePrompt = escapeHtml(exampleTranslation || '');
-
-      const el = document.createElement('div');
-      el.className = 'slot';
-      el.dataset.dictationId = dictationId;
-      el.dataset.slotType = 'dictation-example';
-      el.innerHTML = `
-        <div class="dictation-exercise example-dictation-exercise" data-dictation-id="${dictationId}">
-          <div class="dictation-translation-prompt">${safePrompt}</div>
-          <div class="dictation-input-wrapper">
-            <textarea
-              class="dictation-input"
-              placeholder="${aiStrings.dictationPlaceholder || 'Type what you hear...'}"
-              rows="3"
-              data-correct-text="${safeExampleTextAttr}"
-            ></textarea>
-          </div>
-          <div class="dictation-controls">
-            <button type="button" class="dictation-check-btn primary">
-              Check
-            </button>
-          </div>
-          <div class="dictation-result hidden"></div>
-          <div class="dictation-correct-answer hidden">
-            <div class="correct-answer-label">${aiStrings.dictationCorrectAnswer || ' :'}</div>
-            <div class="correct-answer-text">${safeExampleTextDisplay}</div>
-          </div>
-        </div>
-      `;
-
-      setTimeout(() => {
-        setupDictationExercise(el, card, dictationId);
-      }, 100);
-
-      return el;
-    }
-
-
-    async function buildSlot(kind, card){
-      const el=document.createElement("div");
-      el.className="slot";
-      const cardOrder = Array.isArray(card.order) ? card.order : [];
-      if(kind==="transcription" && card.transcription){
-        el.innerHTML=renderTranscriptionHTML(card.transcription);
-        el.dataset.slotType = 'transcription';
-        return el;
-      }
-      if(kind==="text" && card.text){
-        const showInlineTranscription = card.transcription && !cardOrder.includes('transcription');
-        const tr = showInlineTranscription ? renderTranscriptionHTML(card.transcription) : "";
-
-        // DICTATION EXERCISE: Create interactive text input exercise
-        const dictationId = 'dictation-' + Math.random().toString(36).substr(2, 9);
-
-        el.innerHTML=`
-          <div class="dictation-exercise" data-dictation-id="${dictationId}">
-            <div class="dictation-input-wrapper">
-              <textarea
-                class="dictation-input"
-                placeholder="${aiStrings.dictationPlaceholder || 'Type what you hear...'}"
-                rows="3"
-                data-correct-text="${card.text.replace(/"/g, '&quot;')}"
-              ></textarea>
-            </div>
-            <div class="dictation-controls">
-              <button type="button" class="dictation-check-btn primary">
-                Check
-              </button>
-            </div>
-            <div class="dictation-result hidden"></div>
-            <div class="dictation-correct-answer hidden">
-              <div class="correct-answer-label">${aiStrings.dictationCorrectAnswer || ' :'}</div>
-              <div class="correct-answer-text">${card.text}</div>
-            </div>
-          </div>
-          ${tr}
-        `;
-
-        // Get audio URL for dictation autoplay
-        const dictationAudioUrl = await resolveAudioUrl(card, 'front');
-        if(dictationAudioUrl){
-          el.dataset.autoplay = dictationAudioUrl;
-        }
-        el.dataset.slotType = 'dictation';
+        el.dataset.slotType = 'dictation';
 
         // Setup dictation exercise behavior
         setTimeout(() => {
@@ -11027,9 +9712,114 @@ function renderComparisonResult(resultEl, comparison){
     async function syncProgressToServer(deckId, cardId, rec){
       try{
         const payload = {records:[{deckId, cardId, step:rec.step, due:Math.floor(rec.due/1000), addedAt:Math.floor(rec.addedAt/1000), lastAt:Math.floor(rec.lastAt/1000), hidden:rec.hidden||0}]};
-        await api('save', {}, 'POST', payload);
+        const result = await api('save', {}, 'POST', payload);
+        // The server kept a newer review of this card (another device): adopt it.
+        const conflicts = result && result.conflicts;
+        const server = conflicts && conflicts[deckId] && conflicts[deckId][cardId];
+        if(server && state.decks && state.decks[deckId]){
+          state.decks[deckId][cardId] = {
+            step: server.step || 0,
+            due: (server.due || 0) * 1000,
+            addedAt: (server.addedAt || 0) * 1000,
+            lastAt: (server.lastAt || 0) * 1000,
+            hidden: server.hidden ? 1 : 0
+          };
+          saveState();
+        }
       }catch(e){ console.error('Failed to sync progress:', e); }
     }
+    // ===== Review buffer =====
+    // Ratings are queued as events (persisted, so offline reviews survive a reload) and sent to
+    // 'review_cards' in batches: when REVIEW_FLUSH_SIZE are waiting, after REVIEW_FLUSH_DELAY_MS,
+    // when the page is hidden and when the device comes back online. Event ids make resends safe.
+    const STORAGE_REVIEWS = "srs-v6:reviews";
+    const REVIEW_FLUSH_SIZE = 20;
+    const REVIEW_FLUSH_DELAY_MS = 4000;
+    const REVIEW_BATCH_MAX = 100;
+    let reviewBuffer = null;
+    let reviewFlushTimer = null;
+    let reviewFlushing = null;
+    function loadReviewBuffer(){
+      if(!reviewBuffer){
+        try{ reviewBuffer = JSON.parse(localStorage.getItem(storageKey(STORAGE_REVIEWS)) || '[]'); }
+        catch(_e){ reviewBuffer = []; }
+        if(!Array.isArray(reviewBuffer)) reviewBuffer = [];
+      }
+      return reviewBuffer;
+    }
+    function saveReviewBuffer(){
+      localStorage.setItem(storageKey(STORAGE_REVIEWS), JSON.stringify(reviewBuffer || []));
+    }
+    function newReviewEventId(){
+      if(window.crypto && typeof window.crypto.randomUUID === 'function'){
+        return window.crypto.randomUUID().replace(/-/g, '');
+      }
+      return Date.now().toString(36) + Math.random().toString(36).slice(2, 12);
+    }
+    function queueReview(deckId, cardId, rating, reviewedAt){
+      loadReviewBuffer().push({id: newReviewEventId(), deckId, cardId, rating, reviewedAt: Math.floor(reviewedAt / 1000)});
+      saveReviewBuffer();
+      if(reviewBuffer.length >= REVIEW_FLUSH_SIZE){
+        flushReviews();
+      }else{
+        scheduleReviewFlush();
+      }
+    }
+    function scheduleReviewFlush(){
+      if(reviewFlushTimer) return;
+      reviewFlushTimer = setTimeout(()=>{ reviewFlushTimer = null; flushReviews(); }, REVIEW_FLUSH_DELAY_MS);
+    }
+    function flushReviews(extraOpts){
+      if(reviewFlushing) return reviewFlushing;
+      if(reviewFlushTimer){ clearTimeout(reviewFlushTimer); reviewFlushTimer = null; }
+      const batch = loadReviewBuffer().slice(0, REVIEW_BATCH_MAX);
+      if(!batch.length || navigator.onLine === false) return Promise.resolve();
+      reviewFlushing = (async()=>{
+        let sent = false;
+        try{
+          const result = await api('review_cards', {}, 'POST', {events: batch}, extraOpts) || {};
+          const done = new Set([...(result.applied || []), ...(result.duplicates || [])]);
+          (result.rejected || []).forEach(r => done.add(r.id));
+          reviewBuffer = loadReviewBuffer().filter(ev => !done.has(ev.id));
+          saveReviewBuffer();
+          // Cards the server does not know (local-only decks) keep syncing their progress record.
+          (result.rejected || []).filter(r => r.reason === 'missing_card').forEach(r => {
+            const ev = batch.find(e => e.id === r.id);
+            const rec = ev && state.decks && state.decks[ev.deckId] && state.decks[ev.deckId][ev.cardId];
+            if(rec) syncProgressToServer(ev.deckId, ev.cardId, rec);
+          });
+          adoptServerProgress(result.progress);
+          sent = true;
+        }catch(e){
+          console.warn('Review flush failed, will retry:', e);
+        }finally{
+          reviewFlushing = null;
+        }
+        if(reviewBuffer.length && (sent || navigator.onLine !== false)) scheduleReviewFlush();
+      })();
+      return reviewFlushing;
+    }
+    // Take the server's result for reviewed cards that have no newer events still queued.
+    function adoptServerProgress(progress){
+      if(!progress || !state || !state.decks) return;
+      const pending = new Set(loadReviewBuffer().map(ev => ev.deckId + '/' + ev.cardId));
+      Object.entries(progress).forEach(([deckId, cards])=>{
+        Object.entries(cards || {}).forEach(([cardId, prog])=>{
+          if(pending.has(deckId + '/' + cardId) || !state.decks[deckId] || !state.decks[deckId][cardId]) return;
+          const rec = state.decks[deckId][cardId];
+          rec.step = prog.step || 0;
+          rec.due = (prog.due || 0) * 1000;
+          rec.lastAt = (prog.lastAt || 0) * 1000;
+        });
+      });
+      saveState();
+    }
+    window.addEventListener('online', ()=>flushReviews());
+    document.addEventListener('visibilitychange', ()=>{
+      if(document.visibilityState === 'hidden') flushReviews({keepalive: true});
+    });
+    window.addEventListener('pagehide', ()=>flushReviews({keepalive: true}));
+
     // Easy: advance stage, full interval (2^n)
     function rateEasy(){
       if(!currentItem) return;
@@ -11042,7 +9832,7 @@ function renderComparisonResult(resultEl, comparison){
       it.rec.due = calculateDue(now, it.rec.step, true); // true = easy (full interval)
 
       saveState();
-      syncProgressToServer(it.deckId, it.card.id, it.rec);
+      queueReview(it.deckId, it.card.id, 3, now);
 
       // Remove from queue
       queue.splice(current, 1);
@@ -11068,7 +9858,7 @@ function renderComparisonResult(resultEl, comparison){
       it.rec.due = calculateDue(now, it.rec.step, false); // false = normal (half interval)
 
       saveState();
-      syncProgressToServer(it.deckId, it.card.id, it.rec);
+      queueReview(it.deckId, it.card.id, 2, now);
 
       // Remove from queue
       queue.splice(current, 1);
@@ -11093,7 +9883,7 @@ function renderComparisonResult(resultEl, comparison){
       it.rec.due = now + (1 * 60 * 1000); // +1 minute
 
       saveState();
-      syncProgressToServer(it.deckId, it.card.id, it.rec);
+      queueReview(it.deckId, it.card.id, 1, now);
 
       // Move to end of queue
       queue.push(it);
@@ -13591,127 +12381,28 @@ function renderComparisonResult(resultEl, comparison){
       }
     })();
 
-    try { if('serviceWorker' in navigator){ navigator.serviceWorker.register(baseurl + 'sw.js'); } } catch(e){}
+    // sw.php serves app/sw.js from the plugin root, so the worker's scope covers this page.
+    try { if('serviceWorker' in navigator){ navigator.serviceWorker.register(baseurl.replace(/\/app\/?$/, '') + '/sw.php'); } } catch(e){}
     try { if (!document.querySelector('link[rel="manifest"]')) { const l=document.createElement('link'); l.rel='manifest'; l.href=baseurl + 'manifest.webmanifest'; document.head.appendChild(l);} } catch(e){}
 
     // ========== PUSH NOTIFICATIONS ==========
-    const PUSH_SUBSCRIPTION_KEY = 'flashcards_push_subscribed';
-
-    async function initPushNotifications() {
-      if (!('serviceWorker' in navigator) || !('PushManager' in window)) {
-        debugLog('[Push] Push notifications not supported');
-        return;
-      }
-
-      // Check if already subscribed
-      const alreadySubscribed = localStorage.getItem(PUSH_SUBSCRIPTION_KEY) === 'true';
-      if (alreadySubscribed) {
-        debugLog('[Push] Already subscribed');
-        return;
-      }
-
-      // Wait a bit before showing permission request (not immediately on load)
-      // Only ask after user has used the app for a while
-      const visitCount = parseInt(localStorage.getItem('flashcards_visit_count') || '0', 10);
-      localStorage.setItem('flashcards_visit_count', String(visitCount + 1));
-
-      // Ask for permission after 3rd visit
-      if (visitCount < 3) {
-        debugLog('[Push] Waiting for more visits before asking for permission');
-        return;
-      }
-
-      // Check current permission state
-      if (Notification.permission === 'denied') {
-        debugLog('[Push] Notification permission denied');
-        return;
-      }
-
-      // If permission not yet granted, we'll need to ask
-      // For now, we auto-subscribe if permission is already granted
-      if (Notification.permission === 'granted') {
-        await subscribeToPush();
-      }
-    }
-
-    async function subscribeToPush() {
-      try {
-        // Get VAPID public key from server
-        const vapidResp = await fetch(baseurl + 'ajax.php?cmid=0&action=get_vapid_key&sesskey=' + M.cfg.sesskey);
-        const vapidData = await vapidResp.json();
-
-        if (!vapidData.ok || !vapidData.data?.publicKey) {
-          debugLog('[Push] VAPID key not available');
-          return;
-        }
-
-        const vapidPublicKey = vapidData.data.publicKey;
-
-        // Get service worker registration
-        const registration = await navigator.serviceWorker.ready;
-
-        // Subscribe to push
-        const subscription = await registration.pushManager.subscribe({
-          userVisibleOnly: true,
-          applicationServerKey: urlBase64ToUint8Array(vapidPublicKey)
-        });
-
-        // Send subscription to server
-        const lang = currentInterfaceLang || 'en';
-        const resp = await fetch(baseurl + 'ajax.php?cmid=0&action=push_subscribe&sesskey=' + M.cfg.sesskey, {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({
-            subscription: subscription.toJSON(),
-            lang: lang
-          })
-        });
-
-        const result = await resp.json();
-        if (result.ok) {
-          localStorage.setItem(PUSH_SUBSCRIPTION_KEY, 'true');
-          debugLog('[Push] Subscribed successfully');
-        } else {
-          debugLog('[Push] Subscription failed:', result);
-        }
-      } catch (err) {
-        debugLog('[Push] Error subscribing:', err);
-      }
-    }
-
-    async function updatePushSubscriptionLang(newLang) {
-      if (localStorage.getItem(PUSH_SUBSCRIPTION_KEY) !== 'true') {
-        return;
-      }
-
-      try {
-        await fetch(baseurl + 'ajax.php?cmid=0&action=push_update_lang&sesskey=' + M.cfg.sesskey, {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ lang: newLang })
+    // assets/modules/push.js, loaded when the page is idle.
+    let pushFeature = null;
+    function loadPush() {
+      pushFeature = pushFeature || loadFeature('push')
+        .then(({ createPush }) => createPush({ baseurl, debugLog, interfaceLang: () => currentInterfaceLang }))
+        .catch(err => {
+          pushFeature = null;
+          throw err;
         });
-        debugLog('[Push] Language updated to:', newLang);
-      } catch (err) {
-        debugLog('[Push] Error updating language:', err);
-      }
-    }
-
-    function urlBase64ToUint8Array(base64String) {
-      const padding = '='.repeat((4 - base64String.length % 4) % 4);
-      const base64 = (base64String + padding).replace(/-/g, '+').replace(/_/g, '/');
-      const rawData = window.atob(base64);
-      const outputArray = new Uint8Array(rawData.length);
-      for (let i = 0; i < rawData.length; ++i) {
-        outputArray[i] = rawData.charCodeAt(i);
-      }
-      return outputArray;
+      return pushFeature;
     }
 
     // Initialize push notifications
-    initPushNotifications();
+    whenIdle(() => loadPush().then(push => push.initPushNotifications()).catch(err => debugLog('[Push] Error loading module:', err)));
 
     // Make updatePushSubscriptionLang available for language change handler
-    window.flashcards_updatePushLang = updatePushSubscriptionLang;
+    window.flashcards_updatePushLang = newLang => loadPush().then(push => push.updatePushSubscriptionLang(newLang)).catch(err => debugLog('[Push] Error loading module:', err));
     // ========== END PUSH NOTIFICATIONS ==========
 
     // Add iOS-specific meta tags for PWA
@@ -14623,120 +13314,18 @@ function renderComparisonResult(resultEl, comparison){
             studyBadge.classList.toggle('hidden', dueToday <= 0);
           }
 
-          // Render charts
-          renderStageChart(data.stageDistribution);
-          renderActivityChart(data.activityData);
-
-          // Update achievements
-          updateAchievements(data.stats);
+          // Render charts and achievements (assets/modules/dashboard.js)
+          const { createDashboard } = await loadFeature('dashboard');
+          const dashboard = createDashboard({ $, debugLog });
+          dashboard.renderStageChart(data.stageDistribution);
+          dashboard.renderActivityChart(data.activityData);
+          dashboard.updateAchievements(data.stats);
+          try { performance.mark('flashcards:dashboard'); } catch(_e) {}
         } catch (err) {
           debugLog('[Dashboard] Error loading data:', err);
         }
       }
 
-      // Render Stage Distribution Chart (Chart.js)
-      function renderStageChart(stageData) {
-        const canvas = $('#stageChart');
-        if (!canvas || typeof Chart === 'undefined') {
-          debugLog('[Dashboard] Chart.js not loaded or canvas not found');
-          return;
-        }
-
-        const labels = stageData.map(d => `Stage ${d.stage}`);
-        const data = stageData.map(d => d.count);
-        const stageEmojis = ['??', '??', '??', '??', '??', '??', '??', '??', '??', '?', '??', '??'];
-
-        new Chart(canvas, {
-          type: 'doughnut',
-          data: {
-            labels: labels.map((label, i) => `${stageEmojis[i] || ''} ${label}`),
-            datasets: [{
-              data: data,
-              backgroundColor: [
-                '#8B4513', '#90EE90', '#32CD32', '#228B22', '#00FF00',
-                '#FFB6C1', '#FFD700', '#00CED1', '#1E90FF', '#FF69B4'
-              ]
-            }]
-          },
-          options: {
-            responsive: true,
-            maintainAspectRatio: false,
-            plugins: {
-              legend: { position: 'right' }
-            }
-          }
-        });
-      }
-
-      // Render Activity Chart (Chart.js)
-      function renderActivityChart(activityData) {
-        const canvas = $('#activityChart');
-        if (!canvas || typeof Chart === 'undefined') return;
-
-        const labels = activityData.map(d => {
-          const date = new Date(d.date * 1000);
-          return date.toLocaleDateString('en-US', { month: 'short', day: 'numeric' });
-        });
-        const reviews = activityData.map(d => d.reviews);
-        const cardsCreated = activityData.map(d => d.cardsCreated);
-
-        new Chart(canvas, {
-          type: 'bar',
-          data: {
-            labels: labels,
-            datasets: [
-              {
-                label: 'Reviews',
-                data: reviews,
-                backgroundColor: '#3B82F6'
-              },
-              {
-                label: 'Cards Created',
-                data: cardsCreated,
-                backgroundColor: '#10B981'
-              }
-            ]
-          },
-          options: {
-            responsive: true,
-            maintainAspectRatio: false,
-            scales: {
-              y: { beginAtZero: true, ticks: { stepSize: 1 } }
-            }
-          }
-        });
-      }
-
-      // Update Achievement Progress
-      function updateAchievements(stats) {
-        const activeVocab = Math.round(stats.activeVocab || 0);
-
-        const achievements = [
-          { id: 2, threshold: 7, current: stats.currentStreak, icon: '??' },
-
-          // Language Level Achievements (based on Active Vocabulary)
-          { id: 5, threshold: 100, current: activeVocab, icon: '??' },  // A0
-          { id: 6, threshold: 600, current: activeVocab, icon: '??' },  // A1
-          { id: 7, threshold: 1500, current: activeVocab, icon: '??' }, // A2
-          { id: 8, threshold: 2500, current: activeVocab, icon: '??' }, // B1
-          { id: 9, threshold: 4500, current: activeVocab, icon: '??' }  // B2
-        ];
-
-        achievements.forEach(ach => {
-          const card = $(`#achievement${ach.id}`);
-          const progress = $(`#ach${ach.id}Progress`);
-          if (!card || !progress) return;
-
-          const completed = ach.current >= ach.threshold;
-          if (completed) {
-            card.classList.add('fc-achievement-completed');
-            progress.textContent = '? Completed';
-          } else {
-            progress.textContent = `${ach.current}/${ach.threshold}`;
-          }
-        });
-      }
-
       // Initialize: Default to Quick Input tab
       switchTab('quickInput');
 
@@ -14930,171 +13519,6 @@ function renderComparisonResult(resultEl, comparison){
     // ERROR CHECKING & CONSTRUCTION DETECTION
     // ==========================================================================
 
-    /**
-     * Chat Session Manager (in-memory storage with localStorage backup)
-     */
-    const ChatSessionManager = {
-      currentSession: null,
-
-      createSession(originalText) {
-        const sessionId = 'correction_' + Date.now();
-        this.currentSession = {
-          id: sessionId,
-          originalText: originalText,
-          messages: [],
-          createdAt: new Date().toISOString()
-        };
-        this.saveToLocalStorage();
-        return this.currentSession;
-      },
-
-      addMessage(role, content) {
-        if (!this.currentSession) return;
-        const message = {
-          id: 'msg_' + Date.now() + '_' + Math.random().toString(36).substr(2, 9),
-          role: role, // 'system' | 'user' | 'assistant'
-          content: content,
-          createdAt: new Date().toISOString()
-        };
-        this.currentSession.messages.push(message);
-        this.saveToLocalStorage();
-        return message;
-      },
-
-      getMessagesForAPI(maxMessages = 10) {
-        if (!this.currentSession) return [];
-
-        // Always include system message
-        const systemMsg = {
-          role: 'system',
-          content: this.getSystemPrompt()
-        };
-
-        // Take last N messages (user/assistant pairs)
-        const recentMessages = this.currentSession.messages.slice(-maxMessages);
-
-        return [systemMsg, ...recentMessages];
-      },
-
-      getSystemPrompt() {
-        const langMap = {
-          'uk': `Ти — дуже строгий і обережний коректор норвезької мови (bokmål).
-
-Правила:
-- "Виправлено" - це ОСНОВНЕ виправлення помилок. "Більш природний варіант" - додаткове стилістичне поліпшення.
-- Коли аналізуєш текст, фокусуйся на ВСІХ помилках з "Виправлено", не тільки на одній. Не ігноруй основні помилки.
-- Пояснюй КОРОТКО, природною мовою — 2-3 речення максимум.
-- Якщо не впевнена у граматичному правилі на 100%, прямо пиши що не впевнена.
-- Не вигадуй різницю між "розмовною" та "письмовою" норвезькою, не посилайся на діалекти.
-- Ніколи не називай неправильний варіант "більш природнім".`,
-
-          'ru': `Ты — очень строгий и осторожный корректор норвежского языка (bokmål).
-
-Правила:
-- "Исправлено" - это ОСНОВНОЕ исправление ошибок. "Более естественный вариант" - дополнительное стилистическое улучшение.
-- Когда анализируешь текст, фокусируйся на ВСЕХ ошибках из "Исправлено", не только на одной. Не игнорируй основные ошибки.
-- Объясняй КРАТКО, естественным языком — 2-3 предложения максимум.
-- Если не уверен в грамматическом правиле на 100%, прямо пиши что не уверен.
-- Не выдумывай разницу между "разговорным" и "письменным" норвежским, не ссылайся на диалекты.
-- Никогда не называй неправильный вариант "более естественным".`,
-
-          'en': `You are a very strict and careful Norwegian (bokmål) corrector.
-
-Rules:
-- "Corrected" is the MAIN error correction. "More natural alternative" is additional stylistic improvement.
-- When analyzing text, focus on ALL errors from "Corrected", not just one. Don't ignore main errors.
-- Explain BRIEFLY, in natural language — 2-3 sentences maximum.
-- If not 100% sure about a grammar rule, state that you're not sure.
-- Don't invent spoken/written differences, don't refer to dialects.
-- Never call an incorrect variant "more natural".`,
-
-          'pl': `Jesteś bardzo surowym i ostrożnym korektorem norweskiego (bokmål).
-
-Zasady:
-- "Poprawiono" to GŁÓWNA korekta błędów. "Bardziej naturalny wariant" to dodatkowa poprawa stylistyczna.
-- Analizując tekst, skup się na WSZYSTKICH błędach z "Poprawiono", nie tylko na jednym. Nie ignoruj głównych błędów.
-- Wyjaśniaj KRÓTKO, naturalnym językiem — maksymalnie 2-3 zdania.
-- Jeśli nie jesteś pewien zasady na 100%, napisz że nie jesteś pewien.
-- Nie wymyślaj różnic potoczny/pisany, nie odwołuj się do dialektów.
-- Nigdy nie nazywaj błędnego wariantu "bardziej naturalnym".`,
-
-          'fr': `Tu es un correcteur très strict et prudent du norvégien (bokmål).
-
-Règles:
-- "Corrigé" est la correction d'erreurs PRINCIPALE. "Alternative plus naturelle" est une amélioration stylistique supplémentaire.
-- En analysant le texte, concentre-toi sur TOUTES les erreurs de "Corrigé", pas qu'une seule. N'ignore pas les erreurs principales.
-- Explique BRIÈVEMENT, en langage naturel — 2-3 phrases maximum.
-- Si pas sûr à 100% d'une règle, dis-le directement.
-- N'invente pas de différences parlé/écrit, ne réfère pas aux dialectes.
-- Ne qualifie jamais une variante incorrecte de "plus naturelle".`,
-
-          'es': `Eres un corrector muy estricto y cuidadoso del noruego (bokmål).
-
-Reglas:
-- "Corregido" es la corrección de errores PRINCIPAL. "Alternativa más natural" es mejora estilística adicional.
-- Al analizar el texto, enfócate en TODOS los errores de "Corregido", no solo en uno. No ignores los errores principales.
-- Explica BREVEMENTE, en lenguaje natural — 2-3 oraciones máximo.
-- Si no estás 100% seguro de una regla, dilo directamente.
-- No inventes diferencias hablado/escrito, no refieras dialectos.
-- Nunca llames a una variante incorrecta "más natural".`,
-
-          'it': `Sei un correttore molto rigoroso e attento del norvegese (bokmål).
-
-Regole:
-- "Corretto" è la correzione degli errori PRINCIPALE. "Alternativa più naturale" è miglioramento stilistico aggiuntivo.
-- Analizzando il testo, concentrati su TUTTI gli errori di "Corretto", non solo su uno. Non ignorare gli errori principali.
-- Spiega BREVEMENTE, in linguaggio naturale — 2-3 frasi massimo.
-- Se non sei sicuro al 100% di una regola, dillo direttamente.
-- Non inventare differenze parlato/scritto, non riferire dialetti.
-- Non chiamare mai una variante errata "più naturale".`,
-
-          'de': `Du bist ein sehr strenger und vorsichtiger Korrektor des Norwegischen (bokmål).
-
-Regeln:
-- "Korrigiert" ist die HAUPTFEHLERKORREKTUR. "Natürlichere Alternative" ist zusätzliche stilistische Verbesserung.
-- Wenn du Text analysierst, konzentriere dich auf ALLE Fehler aus "Korrigiert", nicht nur auf einen. Ignoriere Hauptfehler nicht.
-- Erkläre KURZ, in natürlicher Sprache — maximal 2-3 Sätze.
-- Wenn nicht 100% sicher über eine Regel, sage es direkt.
-- Erfinde keine Unterschiede gesprochen/geschrieben, verweise nicht auf Dialekte.
-- Nenne niemals eine falsche Variante "natürlicher".`
-        };
-
-        const language = currentInterfaceLang || 'en';
-        return langMap[language] || langMap['en'];
-      },
-
-      saveToLocalStorage() {
-        if (!this.currentSession) return;
-        try {
-          localStorage.setItem('flashcards_chat_session', JSON.stringify(this.currentSession));
-        } catch (e) {
-          console.warn('Could not save chat session to localStorage:', e);
-        }
-      },
-
-      loadFromLocalStorage() {
-        try {
-          const saved = localStorage.getItem('flashcards_chat_session');
-          if (saved) {
-            this.currentSession = JSON.parse(saved);
-            return this.currentSession;
-          }
-        } catch (e) {
-          console.warn('Could not load chat session from localStorage:', e);
-        }
-        return null;
-      },
-
-      clearSession() {
-        this.currentSession = null;
-        try {
-          localStorage.removeItem('flashcards_chat_session');
-        } catch (e) {
-          // ignore
-        }
-      }
-    };
-
     /**
      * Check Norwegian text for grammatical errors
      */
@@ -15678,419 +14102,27 @@ Regeln:
       });
     }
 
-    /**
-     * Ask AI about the correction
-     */
-    function renderSentenceCheck(label, sentence, status, comment){
-      if (!sentence) return '';
-      const safeSentence = escapeHtml(sentence);
-      const safeComment = comment ? escapeHtml(comment) : '';
-      const isOk = status === 'ok';
-      const icon = isOk ? '✓' : '!';
-      const iconClass = isOk ? 'ai-check-ok' : 'ai-check-warn';
-      return `
-        <div class="ai-check-item">
-          <div class="ai-check-header">
-            <span class="ai-check-label">${escapeHtml(label)}: <span class="ai-check-icon ${iconClass}">${icon}</span></span>
-          </div>
-          <div class="ai-answer-highlight">${safeSentence}</div>
-          ${safeComment ? `<div class="ai-answer-note">${safeComment}</div>` : ''}
-        </div>
-      `;
-    }
-
-    function formatAIAnswer(answerText) {
-      if (!answerText || typeof answerText !== 'string') {
-        return { html: `<div class="ai-answer-plain">${escapeHtml(String(answerText || ''))}</div>`, parsed: null };
-      }
-
-      const cleanText = answerText.trim().replace(/^```[a-z]*\n?/i, '').replace(/```$/i, '').trim();
-      let parsed = null;
-      try {
-        parsed = JSON.parse(cleanText);
-      } catch (_err) {
-        // fallback: show plain text
-        return { html: `<div class="ai-answer-plain">${escapeHtml(answerText)}</div>`, parsed: null };
-      }
-
-      if (!parsed || typeof parsed !== 'object') {
-        return { html: `<div class="ai-answer-plain">${escapeHtml(answerText)}</div>`, parsed: null };
-      }
-
-      const sections = [];
-      if (parsed.recheck) {
-        const reStatus = (parsed.recheck.status || '').toLowerCase() === 'ok' ? 'ok' : 'needs_fix';
-        const finalSentence = (parsed.recheck.finalSentence || '').trim();
-        const confidence = parsed.recheck.confidenceComment || '';
-        let altBlock = '';
-        if (parsed.alternative && parsed.alternative.status && parsed.alternative.status !== 'absent' && parsed.alternative.sentence) {
-          altBlock = renderSentenceCheck(t('ai_alternative') || 'Alternative', parsed.alternative.sentence, parsed.alternative.status.toLowerCase() === 'ok' ? 'ok' : 'needs_fix', parsed.alternative.comment || '');
-        }
-        sections.push(`
-          <div class="ai-answer-section">
-            <div class="ai-answer-title">${t('ai_sure') || 'Are you sure?'}</div>
-            ${renderSentenceCheck(t('ai_corrected') || 'Corrected', finalSentence, reStatus, confidence)}
-            ${altBlock}
-          </div>
-        `);
-      }
-
-      const renderExampleText = raw => {
-        const safe = escapeHtml(raw || '');
-        return safe.replace(/\[\[(.+?)\]\]/g, '<span class="ai-example-hl">$1</span>');
-      };
-
-      if (Array.isArray(parsed.examples) && parsed.examples.length > 0) {
-        const list = parsed.examples.map(ex => {
-          if (typeof ex === 'string') {
-            return `<li>${renderExampleText(ex)}</li>`;
-          }
-          const text = renderExampleText(ex.text || '');
-          const tr = escapeHtml(ex.translation || '');
-          return `<li>${text}${tr ? `<div class="ai-example-tr">${tr}</div>` : ''}</li>`;
-        }).join('');
-        sections.push(`
-          <div class="ai-answer-section">
-            <div class="ai-answer-title">${t('ai_examples_title') || 'Examples:'}</div>
-            <ul class="ai-answer-list">${list}</ul>
-          </div>
-        `);
-      }
-
-      const mwes = Array.isArray(parsed.multiwordExpressions) ? parsed.multiwordExpressions : [];
-      const expressionSource = (parsed.recheck?.finalSentence || parsed.alternative?.sentence || (frontInput ? frontInput.value : '') || '').trim();
-      setFocusExpressionSuggestions(mwes, expressionSource);
-      const hasMwes = mwes.length > 0 && !parsed.noMultiwordExpressions;
-      if (hasMwes) {
-        const list = mwes.map(item => {
-          const expr = escapeHtml(item.expression || '');
-          const translation = escapeHtml(item.translation || '');
-          const explanation = escapeHtml(item.explanation || '');
-          const examples = Array.isArray(item.examples) && item.examples.length
-            ? item.examples
-            : (item.example || item.exampleTranslation
-                ? [{ text: item.example || '', translation: item.exampleTranslation || '' }]
-                : []);
-          const examplesHtml = examples.map(ex => {
-            const text = renderExampleText(ex.text || '');
-            const tr = escapeHtml(ex.translation || '');
-            return `<div class="ai-mwe-example">${text}</div>${tr ? `<div class="ai-example-tr">${tr}</div>` : ''}`;
-          }).join('');
-          return `
-            <li class="ai-mwe-item">
-              <div class="ai-mwe-head">
-                <span class="ai-mwe-term">${expr}</span>
-                ${translation ? `<span class="ai-mwe-translation">${translation}</span>` : ''}
-              </div>
-              ${explanation ? `<div class="ai-mwe-expl">${explanation}</div>` : ''}
-              ${examplesHtml}
-            </li>
-          `;
-        }).join('');
-        sections.push(`
-          <div class="ai-answer-section">
-            <div class="ai-answer-title">${t('ai_expressions_title') || 'Expressions:'}</div>
-            <ul class="ai-mwe-list">${list}</ul>
-          </div>
-        `);
-      } else if (parsed.noMultiwordExpressions) {
-        const noExpressionNote =
-          parsed.multiwordExpressionsNote ||
-          parsed.noMultiwordExpressionsNote ||
-          parsed.multiwordExpressionsMessage ||
-          parsed.noMultiwordExpressionsMessage ||
-          t('ai_no_expressions') ||
-          'No fixed expressions found.';
-        sections.push(`
-          <div class="ai-answer-section">
-            <div class="ai-answer-title">${t('ai_expressions_title') || 'Expressions:'}</div>
-            <div class="ai-answer-note">${escapeHtml(noExpressionNote)}</div>
-          </div>
-        `);
-      }
-
-      if (sections.length === 0) {
-        return { html: `<div class="ai-answer-plain">${escapeHtml(answerText)}</div>`, parsed };
-      }
-
-      return { html: `<div class="ai-answer-structured">${sections.join('')}</div>`, parsed };
-    }
-
-    function stripYuiArtifacts(container) {
-      if (!container) return;
-      const walker = document.createTreeWalker(container, NodeFilter.SHOW_TEXT, null);
-      const toRemove = [];
-      while (walker.nextNode()) {
-        const node = walker.currentNode;
-        if (node && typeof node.nodeValue === 'string' && node.nodeValue.trim().startsWith('yui_')) {
-          toRemove.push(node);
-        }
-      }
-      toRemove.forEach(n => n.parentNode && n.parentNode.removeChild(n));
-    }
-
+    // Follow-up questions to the AI (assets/modules/ai-chat.js), loaded on first use.
+    let aiChat = null;
     async function askAIAboutCorrection(questionType, originalText, result) {
-      const answerBlock = document.getElementById('aiAnswerBlock');
-      if (!answerBlock) return;
-
-      const language = currentInterfaceLang || 'en';
-      const thinkingText = t('ai_thinking') || 'Thinking...';
-
-      // Show loading
-      answerBlock.style.display = 'block';
-      answerBlock.innerHTML = `<div class="ai-answer-loading">${thinkingText}</div>`;
-
-      // Always start a fresh session for every quick question to avoid stacking history
-      if (ChatSessionManager.currentSession) {
-        ChatSessionManager.clearSession();
-      }
-
-      // Initialize chat session if first request (or after reset above)
-      if (!ChatSessionManager.currentSession) {
-        ChatSessionManager.createSession(originalText);
-
-        // Add user's original text as first user message
-        const checkLabels = {
-          'uk': 'Перевір цей текст',
-          'ru': 'Проверь этот текст',
-          'en': 'Check this text',
-          'pl': 'Sprawdź ten tekst',
-          'fr': 'Vérifie ce texte',
-          'es': 'Verifica este texto',
-          'it': 'Controlla questo testo',
-          'de': 'Überprüfe diesen Text'
-        };
-        const checkLabel = checkLabels[language] || checkLabels['en'];
-        ChatSessionManager.addMessage('user', `${checkLabel}: "${originalText}"`);
-
-        // Add initial correction as first assistant message with clear structure
-        const correctedLabels = {
-          'uk': 'Виправлено',
-          'ru': 'Исправлено',
-          'en': 'Corrected',
-          'pl': 'Poprawiono',
-          'fr': 'Corrigé',
-          'es': 'Corregido',
-          'it': 'Corretto',
-          'de': 'Korrigiert'
-        };
-        const naturalLabels = {
-          'uk': 'Більш природний варіант',
-          'ru': 'Более естественный вариант',
-          'en': 'More natural alternative',
-          'pl': 'Bardziej naturalny wariant',
-          'fr': 'Alternative plus naturelle',
-          'es': 'Alternativa más natural',
-          'it': 'Alternativa più naturale',
-          'de': 'Natürlichere Alternative'
-        };
-
-        const correctedLabel = correctedLabels[language] || correctedLabels['en'];
-        const naturalLabel = naturalLabels[language] || naturalLabels['en'];
-
-        // Start the chat history with the corrected sentence itself,
-        // without a rigid "Corrected:" prefix so the AI can answer more naturally.
-        // Use correctedText (the field returned from the backend); fall back to original text if needed.
-        const correctedSentence = result.correctedText || result.corrected || originalText || '';
-        let correctionMsg = correctedSentence ? correctedSentence : '';
-        if (result.suggestion && result.suggestion.trim() && result.suggestion !== correctedSentence) {
-          correctionMsg += `\n${naturalLabel}: ${result.suggestion}`;
-        }
-        ChatSessionManager.addMessage('assistant', correctionMsg);
-      }
-
-      // Build prompt based on question type (strict format per spec)
-      let userPrompt = '';
-      const correctedSentenceValue = result.correctedText || result.corrected || originalText || '';
-      const userLanguage = language || 'en';
-      const escapeForPrompt = value => String(value || '').replace(/`/g, '\\`');
-
-      // Other quick-question prompts are temporarily disabled; only the "Are you sure?" flow is active.
-      if (questionType === 'sure') {
-        const safeOriginal = escapeForPrompt(originalText);
-        const safeCorrected = escapeForPrompt(correctedSentenceValue);
-        const safeAlternative = escapeForPrompt(result.suggestion || '');
-        userPrompt = `
-You are a careful and conservative Norwegian (Bokmål) teacher.
-You must be very cautious with Norwegian grammar: if you are not sure something is wrong or right, clearly say that you are not sure instead of inventing a rule.
-
-USER_LANGUAGE = ${userLanguage}
-
-Your task is to:
-1) Re-check an already corrected Norwegian sentence and assess its correctness.
-2) Generate three additional example sentences using the same key structure(s) in natural, learner-friendly Bokmål.
-3) Identify multiword expressions in the corrected sentence and explain them.
-
-Input
-- originalSentence: "${safeOriginal}"
-- correctedSentence: "${safeCorrected}"
-- alternativeSentence: "${safeAlternative || ''}" (may be empty)
-
-Always base your analysis primarily on correctedSentence, but:
-- use originalSentence to understand what the learner intended, and
-- treat alternativeSentence (if not empty) as another serious candidate, not just a comment.
-Your goal is to choose the best version among correctedSentence, alternativeSentence (if present) and any clearly better variant you know.
-
-Part 1 - Re-check the corrected sentence ("Are you sure?" logic)
-1. Carefully assess whether correctedSentence is:
-   - grammatically correct Bokmål,
-   - natural and standard enough that a careful native teacher would accept it as a model sentence,
-   - faithful to the meaning of originalSentence.
-2. Be conservative:
-   - Avoid false corrections.
-   - If you are not sure that something is wrong, treat it as acceptable and explicitly say you are not sure.
-   - Also ask yourself whether a typical native teacher would almost automatically suggest a more standard pattern; if yes, prefer that more standard variant.
-3. Decide whether you would:
-   - keep correctedSentence as it is, OR
-   - replace it with a slightly improved or more standard version (still simple and learner-friendly, without changing the meaning), OR
-   - use alternativeSentence as the finalSentence if it is clearly the best option.
-
-Output for this part:
-- A short confidence comment in USER_LANGUAGE (for example: that the sentence is correct and natural, or that you have some doubts).
-- A field with the final recommended version of the sentence (either equal to correctedSentence, or with a minimal improvement).
-
-Part 2 - Generate three example sentences ("Give more examples" logic)
-Based on the key structure(s) used in the final recommended sentence from Part 1:
-1. Identify 1-2 main grammatical patterns or constructions that are important for the learner.
-2. Create exactly THREE new example sentences in simple, natural Bokmål (A2-B2 level) that demonstrate these same patterns.
-3. Keep sentences short and clear. Do not introduce unnecessary rare vocabulary.
-4. The examples must be correct and natural Bokmål. If you are not fully sure about a sentence, do NOT use it.
-5. For EVERY example, provide a natural translation into USER_LANGUAGE.
-
-Output for this part:
-- A list of exactly three example objects, each with the Norwegian sentence and its translation into USER_LANGUAGE.
-
-Part 3 - Multiword expressions in the corrected sentence
-Now focus on multiword expressions in the final recommended Norwegian sentence from Part 1.
-
-Definitions:
-- A "multiword expression" is two or more words that:
-  - are commonly used together in real language, AND
-  - are perceived as a single semantic unit with a somewhat fixed form or special meaning, not just a sum of their parts.
-
-Instructions:
-1. Identify all valid multiword expressions (2+ words) in the final recommended sentence that frequently occur together and convey a unified meaning.
-2. Write each expression in normal dictionary form (grunnform).
-3. For EACH expression:
-   - Give the expression in Norwegian (grunnform).
-   - Give a natural, meaning-based translation into USER_LANGUAGE (not word-for-word).
-   - Provide a short explanation in USER_LANGUAGE: when/how it is used. Never leave this in Norwegian; if USER_LANGUAGE is English, the explanation must be in English.
-   - Give ONE simple Norwegian example sentence that shows this expression in context (different from the original sentence and from the three examples in Part 2).
-   - Give a translation of that example sentence into USER_LANGUAGE.
-4. Only include an expression if you are clearly confident that it is a real multiword expression (fixed phrase or strongly conventional pattern). Do NOT list combinations that are just normal grammar (for example, a common adverb + verb) unless there is a special meaning or strongly fixed usage.
-5. If you are uncertain whether something is a fixed/multiword expression or about its meaning, it is safer to skip it (do not add it to the list) and instead explain briefly in USER_LANGUAGE that you do not see clear multiword expressions here.
-6. If NO suitable multiword expressions are found, explicitly say that in USER_LANGUAGE.
-
-Output format
-Return a single JSON object with the following structure:
-
-{
-  "recheck": {
-    "status": "ok" | "needs_fix",
-    "finalSentence": "Norwegian sentence (your final recommended version)",
-    "confidenceComment": "VERY short comment in USER_LANGUAGE (max 120 chars). If status is ok, just a brief confirmation; if needs_fix, a brief reason and key fix. Always respond in USER_LANGUAGE (never Norwegian when USER_LANGUAGE is English)."
-  },
-  "alternative": {
-    "status": "ok" | "needs_fix" | "absent",
-    "sentence": "alternative sentence if provided, otherwise empty",
-    "comment": "VERY short comment in USER_LANGUAGE (max 120 chars). If no alternative, set status to absent and leave sentence empty."
-  },
-  "examples": [
-    { "text": "Norwegian example sentence 1", "translation": "Translation into USER_LANGUAGE" },
-    { "text": "Norwegian example sentence 2", "translation": "Translation into USER_LANGUAGE" },
-    { "text": "Norwegian example sentence 3", "translation": "Translation into USER_LANGUAGE" }
-  ],
-  "multiwordExpressions": [
-    {
-      "expression": "expression in Norwegian (grunnform)",
-      "translation": "natural translation into USER_LANGUAGE",
-      "explanation": "short explanation in USER_LANGUAGE",
-      "examples": [
-        { "text": "Norwegian example sentence 1 with this expression", "translation": "translation of example 1 into USER_LANGUAGE" },
-        { "text": "Norwegian example sentence 2 with this expression", "translation": "translation of example 2 into USER_LANGUAGE" },
-        { "text": "Norwegian example sentence 3 with this expression", "translation": "translation of example 3 into USER_LANGUAGE" }
-      ]
-    }
-  ],
-  "noMultiwordExpressions": false
-}
-
-Rules:
-- If you find at least one multiword expression, set "noMultiwordExpressions" to false.
-- If you find none, set:
-  - "multiwordExpressions": []
-  - "noMultiwordExpressions": true
-  - and in "confidenceComment" or a short note inside "multiwordExpressions" explanation, clearly state in USER_LANGUAGE that there are no fixed expressions.
-- Do NOT repeat the same expression in both the confidenceComment and the multiwordExpressions section; keep each section focused and concise.
-- Keep confidenceComment concise (max 120 characters). If status is "ok", keep it to a single short confirmation; if "needs_fix", give one short reason.
-- Avoid repeating the same examples in multiple sections.
-- Ensure every example and every expression example includes a translation into USER_LANGUAGE.
- - All explanations/translations must be in USER_LANGUAGE (including English UI). Do not leave explanations in Norwegian.
-- If alternativeSentence is empty, set alternative.status to "absent". If present, evaluate it separately from correctedSentence.
-- Output MUST be valid JSON:
-  - Use ONLY double quotes for all strings.
-  - No trailing commas.
-  - Booleans must be: true or false (not strings).
-- All non-Norwegian text (comments, explanations and translations) must be in USER_LANGUAGE.
-- Do NOT add any extra text outside the JSON.
-`;
-      } else {
-        const errorMsg = t('ai_chat_error') || 'The AI could not answer that question.';
-        answerBlock.innerHTML = `<div class="ai-answer-error">${errorMsg}</div>`;
-        return;
-      }
-
-      // Add user message to chat history
-      ChatSessionManager.addMessage('user', userPrompt);
-
-      // Get full message history for API
-      // Send consistent minimal context: system + original check + corrected + current question
-      const messages = ChatSessionManager.getMessagesForAPI(4);
-
-      try {
-        const url = new URL(M.cfg.wwwroot + '/mod/flashcards/ajax.php');
-        url.searchParams.set('action', 'ai_answer_question');
-        url.searchParams.set('sesskey', M.cfg.sesskey);
-
-        const response = await fetch(url.toString(), {
-          method: 'POST',
-          headers: {
-            'Content-Type': 'application/json'
-          },
-          body: JSON.stringify({
-            action: 'ai_answer_question',
-            messages: messages,  // Send full conversation history
-            language: language
-          })
-        });
-
-        const data = await response.json();
-
-        if (data.answer) {
-          // Add assistant response to chat history
-          ChatSessionManager.addMessage('assistant', data.answer);
-
-          const { html: formatted, parsed } = formatAIAnswer(data.answer);
-          answerBlock.innerHTML = formatted;
-          stripYuiArtifacts(answerBlock);
-          if (parsed?.recheck?.finalSentence) {
-            const finalSentence = (parsed.recheck.finalSentence || '').trim();
-            if (finalSentence) {
-              const block = $('#errorCheckBlock');
-              if (block) {
-                block.dataset.latestCorrection = finalSentence;
-              }
-            }
+      if (!aiChat) {
+        try {
+          const { createAiChat } = await loadFeature('aiChat');
+          aiChat = aiChat || createAiChat({
+            $, t, escapeHtml, interfaceLang: () => currentInterfaceLang, frontInput, setFocusExpressionSuggestions
+          });
+        } catch (error) {
+          console.error('Error loading the AI chat module:', error);
+          const answerBlock = document.getElementById('aiAnswerBlock');
+          if (answerBlock) {
+            const errorMsg = t('ai_chat_error') || 'The AI could not answer that question.';
+            answerBlock.style.display = 'block';
+            answerBlock.innerHTML = `<div class="ai-answer-error">${errorMsg}</div>`;
           }
-        } else {
-          const errorMsg = t('ai_chat_error') || 'The AI could not answer that question.';
-          answerBlock.innerHTML = `<div class="ai-answer-error">${errorMsg}</div>`;
+          return;
         }
-      } catch (error) {
-        console.error('Error asking AI:', error);
-        const errorMsg = t('ai_chat_error') || 'The AI could not answer that question.';
-        answerBlock.innerHTML = `<div class="ai-answer-error">${errorMsg}</div>`;
       }
+      return aiChat.askAIAboutCorrection(questionType, originalText, result);
     }
 
     /**
@@ -16459,5 +14491,7 @@ Rules:
       copyExplanationToClipboard(explanation);
     });
 
+    // Fetch the on-demand feature modules once the page is idle, so their first use does not wait.
+    prefetchFeatures(['dictation', 'dashboard', 'aiChat']);
   }
 export { flashcardsInit };
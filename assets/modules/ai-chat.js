@@ -0,0 +1,585 @@
+// Follow-up questions to the AI about a text check result (the quick question buttons).
+// Loaded by flashcards.js on the first question.
+export function createAiChat({ $, t, escapeHtml, interfaceLang, frontInput, setFocusExpressionSuggestions }){
+    /**
+     * Chat Session Manager (in-memory storage with localStorage backup)
+     */
+    const ChatSessionManager = {
+      currentSession: null,
+
+      createSession(originalText) {
+        const sessionId = 'correction_' + Date.now();
+        this.currentSession = {
+          id: sessionId,
+          originalText: originalText,
+          messages: [],
+          createdAt: new Date().toISOString()
+        };
+        this.saveToLocalStorage();
+        return this.currentSession;
+      },
+
+      addMessage(role, content) {
+        if (!this.currentSession) return;
+        const message = {
+          id: 'msg_' + Date.now() + '_' + Math.random().toString(36).substr(2, 9),
+          role: role, // 'system' | 'user' | 'assistant'
+          content: content,
+          createdAt: new Date().toISOString()
+        };
+        this.currentSession.messages.push(message);
+        this.saveToLocalStorage();
+        return message;
+      },
+
+      getMessagesForAPI(maxMessages = 10) {
+        if (!this.currentSession) return [];
+
+        // Always include system message
+        const systemMsg = {
+          role: 'system',
+          content: this.getSystemPrompt()
+        };
+
+        // Take last N messages (user/assistant pairs)
+        const recentMessages = this.currentSession.messages.slice(-maxMessages);
+
+        return [systemMsg, ...recentMessages];
+      },
+
+      getSystemPrompt() {
+        const langMap = {
+          'uk': `Ти — дуже строгий і обережний коректор норвезької мови (bokmål).
+
+Правила:
+- "Виправлено" - це ОСНОВНЕ виправлення помилок. "Більш природний варіант" - додаткове стилістичне поліпшення.
+- Коли аналізуєш текст, фокусуйся на ВСІХ помилках з "Виправлено", не тільки на одній. Не ігноруй основні помилки.
+- Пояснюй КОРОТКО, природною мовою — 2-3 речення максимум.
+- Якщо не впевнена у граматичному правилі на 100%, прямо пиши що не впевнена.
+- Не вигадуй різницю між "розмовною" та "письмовою" норвезькою, не посилайся на діалекти.
+- Ніколи не називай неправильний варіант "більш природнім".`,
+
+          'ru': `Ты — очень строгий и осторожный корректор норвежского языка (bokmål).
+
+Правила:
+- "Исправлено" - это ОСНОВНОЕ исправление ошибок. "Более естественный вариант" - дополнительное стилистическое улучшение.
+- Когда анализируешь текст, фокусируйся на ВСЕХ ошибках из "Исправлено", не только на одной. Не игнорируй основные ошибки.
+- Объясняй КРАТКО, естественным языком — 2-3 предложения максимум.
+- Если не уверен в грамматическом правиле на 100%, прямо пиши что не уверен.
+- Не выдумывай разницу между "разговорным" и "письменным" норвежским, не ссылайся на диалекты.
+- Никогда не называй неправильный вариант "более естественным".`,
+
+          'en': `You are a very strict and careful Norwegian (bokmål) corrector.
+
+Rules:
+- "Corrected" is the MAIN error correction. "More natural alternative" is additional stylistic improvement.
+- When analyzing text, focus on ALL errors from "Corrected", not just one. Don't ignore main errors.
+- Explain BRIEFLY, in natural language — 2-3 sentences maximum.
+- If not 100% sure about a grammar rule, state that you're not sure.
+- Don't invent spoken/written differences, don't refer to dialects.
+- Never call an incorrect variant "more natural".`,
+
+          'pl': `Jesteś bardzo surowym i ostrożnym korektorem norweskiego (bokmål).
+
+Zasady:
+- "Poprawiono" to GŁÓWNA korekta błędów. "Bardziej naturalny wariant" to dodatkowa poprawa stylistyczna.
+- Analizując tekst, skup się na WSZYSTKICH błędach z "Poprawiono", nie tylko na jednym. Nie ignoruj głównych błędów.
+- Wyjaśniaj KRÓTKO, naturalnym językiem — maksymalnie 2-3 zdania.
+- Jeśli nie jesteś pewien zasady na 100%, napisz że nie jesteś pewien.
+- Nie wymyślaj różnic potoczny/pisany, nie odwołuj się do dialektów.
+- Nigdy nie nazywaj błędnego wariantu "bardziej naturalnym".`,
+
+          'fr': `Tu es un correcteur très strict et prudent du norvégien (bokmål).
+
+Règles:
+- "Corrigé" est la correction d'erreurs PRINCIPALE. "Alternative plus naturelle" est une amélioration stylistique supplémentaire.
+- En analysant le texte, concentre-toi sur TOUTES les erreurs de "Corrigé", pas qu'une seule. N'ignore pas les erreurs principales.
+- Explique BRIÈVEMENT, en langage naturel — 2-3 phrases maximum.
+- Si pas sûr à 100% d'une règle, dis-le directement.
+- N'invente pas de différences parlé/écrit, ne réfère pas aux dialectes.
+- Ne qualifie jamais une variante incorrecte de "plus naturelle".`,
+
+          'es': `Eres un corrector muy estricto y cuidadoso del noruego (bokmål).
+
+Reglas:
+- "Corregido" es la corrección de errores PRINCIPAL. "Alternativa más natural" es mejora estilística adicional.
+- Al analizar el texto, enfócate en TODOS los errores de "Corregido", no solo en uno. No ignores los errores principales.
+- Explica BREVEMENTE, en lenguaje natural — 2-3 oraciones máximo.
+- Si no estás 100% seguro de una regla, dilo directamente.
+- No inventes diferencias hablado/escrito, no refieras dialectos.
+- Nunca llames a una variante incorrecta "más natural".`,
+
+          'it': `Sei un correttore molto rigoroso e attento del norvegese (bokmål).
+
+Regole:
+- "Corretto" è la correzione degli errori PRINCIPALE. "Alternativa più naturale" è miglioramento stilistico aggiuntivo.
+- Analizzando il testo, concentrati su TUTTI gli errori di "Corretto", non solo su uno. Non ignorare gli errori principali.
+- Spiega BREVEMENTE, in linguaggio naturale — 2-3 frasi massimo.
+- Se non sei sicuro al 100% di una regola, dillo direttamente.
+- Non inventare differenze parlato/scritto, non riferire dialetti.
+- Non chiamare mai una variante errata "più naturale".`,
+
+          'de': `Du bist ein sehr strenger und vorsichtiger Korrektor des Norwegischen (bokmål).
+
+Regeln:
+- "Korrigiert" ist die HAUPTFEHLERKORREKTUR. "Natürlichere Alternative" ist zusätzliche stilistische Verbesserung.
+- Wenn du Text analysierst, konzentriere dich auf ALLE Fehler aus "Korrigiert", nicht nur auf einen. Ignoriere Hauptfehler nicht.
+- Erkläre KURZ, in natürlicher Sprache — maximal 2-3 Sätze.
+- Wenn nicht 100% sicher über eine Regel, sage es direkt.
+- Erfinde keine Unterschiede gesprochen/geschrieben, verweise nicht auf Dialekte.
+- Nenne niemals eine falsche Variante "natürlicher".`
+        };
+
+        const language = interfaceLang() || 'en';
+        return langMap[language] || langMap['en'];
+      },
+
+      saveToLocalStorage() {
+        if (!this.currentSession) return;
+        try {
+          localStorage.setItem('flashcards_chat_session', JSON.stringify(this.currentSession));
+        } catch (e) {
+          console.warn('Could not save chat session to localStorage:', e);
+        }
+      },
+
+      loadFromLocalStorage() {
+        try {
+          const saved = localStorage.getItem('flashcards_chat_session');
+          if (saved) {
+            this.currentSession = JSON.parse(saved);
+            return this.currentSession;
+          }
+        } catch (e) {
+          console.warn('Could not load chat session from localStorage:', e);
+        }
+        return null;
+      },
+
+      clearSession() {
+        this.currentSession = null;
+        try {
+          localStorage.removeItem('flashcards_chat_session');
+        } catch (e) {
+          // ignore
+        }
+      }
+    };
+
+    /**
+     * Ask AI about the correction
+     */
+    function renderSentenceCheck(label, sentence, status, comment){
+      if (!sentence) return '';
+      const safeSentence = escapeHtml(sentence);
+      const safeComment = comment ? escapeHtml(comment) : '';
+      const isOk = status === 'ok';
+      const icon = isOk ? '✓' : '!';
+      const iconClass = isOk ? 'ai-check-ok' : 'ai-check-warn';
+      return `
+        <div class="ai-check-item">
+          <div class="ai-check-header">
+            <span class="ai-check-label">${escapeHtml(label)}: <span class="ai-check-icon ${iconClass}">${icon}</span></span>
+          </div>
+          <div class="ai-answer-highlight">${safeSentence}</div>
+          ${safeComment ? `<div class="ai-answer-note">${safeComment}</div>` : ''}
+        </div>
+      `;
+    }
+
+    function formatAIAnswer(answerText) {
+      if (!answerText || typeof answerText !== 'string') {
+        return { html: `<div class="ai-answer-plain">${escapeHtml(String(answerText || ''))}</div>`, parsed: null };
+      }
+
+      const cleanText = answerText.trim().replace(/^```[a-z]*\n?/i, '').replace(/```$/i, '').trim();
+      let parsed = null;
+      try {
+        parsed = JSON.parse(cleanText);
+      } catch (_err) {
+        // fallback: show plain text
+        return { html: `<div class="ai-answer-plain">${escapeHtml(answerText)}</div>`, parsed: null };
+      }
+
+      if (!parsed || typeof parsed !== 'object') {
+        return { html: `<div class="ai-answer-plain">${escapeHtml(answerText)}</div>`, parsed: null };
+      }
+
+      const sections = [];
+      if (parsed.recheck) {
+        const reStatus = (parsed.recheck.status || '').toLowerCase() === 'ok' ? 'ok' : 'needs_fix';
+        const finalSentence = (parsed.recheck.finalSentence || '').trim();
+        const confidence = parsed.recheck.confidenceComment || '';
+        let altBlock = '';
+        if (parsed.alternative && parsed.alternative.status && parsed.alternative.status !== 'absent' && parsed.alternative.sentence) {
+          altBlock = renderSentenceCheck(t('ai_alternative') || 'Alternative', parsed.alternative.sentence, parsed.alternative.status.toLowerCase() === 'ok' ? 'ok' : 'needs_fix', parsed.alternative.comment || '');
+        }
+        sections.push(`
+          <div class="ai-answer-section">
+            <div class="ai-answer-title">${t('ai_sure') || 'Are you sure?'}</div>
+            ${renderSentenceCheck(t('ai_corrected') || 'Corrected', finalSentence, reStatus, confidence)}
+            ${altBlock}
+          </div>
+        `);
+      }
+
+      const renderExampleText = raw => {
+        const safe = escapeHtml(raw || '');
+        return safe.replace(/\[\[(.+?)\]\]/g, '<span class="ai-example-hl">$1</span>');
+      };
+
+      if (Array.isArray(parsed.examples) && parsed.examples.length > 0) {
+        const list = parsed.examples.map(ex => {
+          if (typeof ex === 'string') {
+            return `<li>${renderExampleText(ex)}</li>`;
+          }
+          const text = renderExampleText(ex.text || '');
+          const tr = escapeHtml(ex.translation || '');
+          return `<li>${text}${tr ? `<div class="ai-example-tr">${tr}</div>` : ''}</li>`;
+        }).join('');
+        sections.push(`
+          <div class="ai-answer-section">
+            <div class="ai-answer-title">${t('ai_examples_title') || 'Examples:'}</div>
+            <ul class="ai-answer-list">${list}</ul>
+          </div>
+        `);
+      }
+
+      const mwes = Array.isArray(parsed.multiwordExpressions) ? parsed.multiwordExpressions : [];
+      const expressionSource = (parsed.recheck?.finalSentence || parsed.alternative?.sentence || (frontInput ? frontInput.value : '') || '').trim();
+      setFocusExpressionSuggestions(mwes, expressionSource);
+      const hasMwes = mwes.length > 0 && !parsed.noMultiwordExpressions;
+      if (hasMwes) {
+        const list = mwes.map(item => {
+          const expr = escapeHtml(item.expression || '');
+          const translation = escapeHtml(item.translation || '');
+          const explanation = escapeHtml(item.explanation || '');
+          const examples = Array.isArray(item.examples) && item.examples.length
+            ? item.examples
+            : (item.example || item.exampleTranslation
+                ? [{ text: item.example || '', translation: item.exampleTranslation || '' }]
+                : []);
+          const examplesHtml = examples.map(ex => {
+            const text = renderExampleText(ex.text || '');
+            const tr = escapeHtml(ex.translation || '');
+            return `<div class="ai-mwe-example">${text}</div>${tr ? `<div class="ai-example-tr">${tr}</div>` : ''}`;
+          }).join('');
+          return `
+            <li class="ai-mwe-item">
+              <div class="ai-mwe-head">
+                <span class="ai-mwe-term">${expr}</span>
+                ${translation ? `<span class="ai-mwe-translation">${translation}</span>` : ''}
+              </div>
+              ${explanation ? `<div class="ai-mwe-expl">${explanation}</div>` : ''}
+              ${examplesHtml}
+            </li>
+          `;
+        }).join('');
+        sections.push(`
+          <div class="ai-answer-section">
+            <div class="ai-answer-title">${t('ai_expressions_title') || 'Expressions:'}</div>
+            <ul class="ai-mwe-list">${list}</ul>
+          </div>
+        `);
+      } else if (parsed.noMultiwordExpressions) {
+        const noExpressionNote =
+          parsed.multiwordExpressionsNote ||
+          parsed.noMultiwordExpressionsNote ||
+          parsed.multiwordExpressionsMessage ||
+          parsed.noMultiwordExpressionsMessage ||
+          t('ai_no_expressions') ||
+          'No fixed expressions found.';
+        sections.push(`
+          <div class="ai-answer-section">
+            <div class="ai-answer-title">${t('ai_expressions_title') || 'Expressions:'}</div>
+            <div class="ai-answer-note">${escapeHtml(noExpressionNote)}</div>
+          </div>
+        `);
+      }
+
+      if (sections.length === 0) {
+        return { html: `<div class="ai-answer-plain">${escapeHtml(answerText)}</div>`, parsed };
+      }
+
+      return { html: `<div class="ai-answer-structured">${sections.join('')}</div>`, parsed };
+    }
+
+    function stripYuiArtifacts(container) {
+      if (!container) return;
+      const walker = document.createTreeWalker(container, NodeFilter.SHOW_TEXT, null);
+      const toRemove = [];
+      while (walker.nextNode()) {
+        const node = walker.currentNode;
+        if (node && typeof node.nodeValue === 'string' && node.nodeValue.trim().startsWith('yui_')) {
+          toRemove.push(node);
+        }
+      }
+      toRemove.forEach(n => n.parentNode && n.parentNode.removeChild(n));
+    }
+
+    async function askAIAboutCorrection(questionType, originalText, result) {
+      const answerBlock = document.getElementById('aiAnswerBlock');
+      if (!answerBlock) return;
+
+      const language = interfaceLang() || 'en';
+      const thinkingText = t('ai_thinking') || 'Thinking...';
+
+      // Show loading
+      answerBlock.style.display = 'block';
+      answerBlock.innerHTML = `<div class="ai-answer-loading">${thinkingText}</div>`;
+
+      // Always start a fresh session for every quick question to avoid stacking history
+      if (ChatSessionManager.currentSession) {
+        ChatSessionManager.clearSession();
+      }
+
+      // Initialize chat session if first request (or after reset above)
+      if (!ChatSessionManager.currentSession) {
+        ChatSessionManager.createSession(originalText);
+
+        // Add user's original text as first user message
+        const checkLabels = {
+          'uk': 'Перевір цей текст',
+          'ru': 'Проверь этот текст',
+          'en': 'Check this text',
+          'pl': 'Sprawdź ten tekst',
+          'fr': 'Vérifie ce texte',
+          'es': 'Verifica este texto',
+          'it': 'Controlla questo testo',
+          'de': 'Überprüfe diesen Text'
+        };
+        const checkLabel = checkLabels[language] || checkLabels['en'];
+        ChatSessionManager.addMessage('user', `${checkLabel}: "${originalText}"`);
+
+        // Add initial correction as first assistant message with clear structure
+        const correctedLabels = {
+          'uk': 'Виправлено',
+          'ru': 'Исправлено',
+          'en': 'Corrected',
+          'pl': 'Poprawiono',
+          'fr': 'Corrigé',
+          'es': 'Corregido',
+          'it': 'Corretto',
+          'de': 'Korrigiert'
+        };
+        const naturalLabels = {
+          'uk': 'Більш природний варіант',
+          'ru': 'Более естественный вариант',
+          'en': 'More natural alternative',
+          'pl': 'Bardziej naturalny wariant',
+          'fr': 'Alternative plus naturelle',
+          'es': 'Alternativa más natural',
+          'it': 'Alternativa più naturale',
+          'de': 'Natürlichere Alternative'
+        };
+
+        const correctedLabel = correctedLabels[language] || correctedLabels['en'];
+        const naturalLabel = naturalLabels[language] || naturalLabels['en'];
+
+        // Start the chat history with the corrected sentence itself,
+        // without a rigid "Corrected:" prefix so the AI can answer more naturally.
+        // Use correctedText (the field returned from the backend); fall back to original text if needed.
+        const correctedSentence = result.correctedText || result.corrected || originalText || '';
+        let correctionMsg = correctedSentence ? correctedSentence : '';
+        if (result.suggestion && result.suggestion.trim() && result.suggestion !== correctedSentence) {
+          correctionMsg += `\n${naturalLabel}: ${result.suggestion}`;
+        }
+        ChatSessionManager.addMessage('assistant', correctionMsg);
+      }
+
+      // Build prompt based on question type (strict format per spec)
+      let userPrompt = '';
+      const correctedSentenceValue = result.correctedText || result.corrected || originalText || '';
+      const userLanguage = language || 'en';
+      const escapeForPrompt = value => String(value || '').replace(/`/g, '\\`');
+
+      // Other quick-question prompts are temporarily disabled; only the "Are you sure?" flow is active.
+      if (questionType === 'sure') {
+        const safeOriginal = escapeForPrompt(originalText);
+        const safeCorrected = escapeForPrompt(correctedSentenceValue);
+        const safeAlternative = escapeForPrompt(result.suggestion || '');
+        userPrompt = `
+You are a careful and conservative Norwegian (Bokmål) teacher.
+You must be very cautious with Norwegian grammar: if you are not sure something is wrong or right, clearly say that you are not sure instead of inventing a rule.
+
+USER_LANGUAGE = ${userLanguage}
+
+Your task is to:
+1) Re-check an already corrected Norwegian sentence and assess its correctness.
+2) Generate three additional example sentences using the same key structure(s) in natural, learner-friendly Bokmål.
+3) Identify multiword expressions in the corrected sentence and explain them.
+
+Input
+- originalSentence: "${safeOriginal}"
+- correctedSentence: "${safeCorrected}"
+- alternativeSentence: "${safeAlternative || ''}" (may be empty)
+
+Always base your analysis primarily on correctedSentence, but:
+- use originalSentence to understand what the learner intended, and
+- treat alternativeSentence (if not empty) as another serious candidate, not just a comment.
+Your goal is to choose the best version among correctedSentence, alternativeSentence (if present) and any clearly better variant you know.
+
+Part 1 - Re-check the corrected sentence ("Are you sure?" logic)
+1. Carefully assess whether correctedSentence is:
+   - grammatically correct Bokmål,
+   - natural and standard enough that a careful native teacher would accept it as a model sentence,
+   - faithful to the meaning of originalSentence.
+2. Be conservative:
+   - Avoid false corrections.
+   - If you are not sure that something is wrong, treat it as acceptable and explicitly say you are not sure.
+   - Also ask yourself whether a typical native teacher would almost automatically suggest a more standard pattern; if yes, prefer that more standard variant.
+3. Decide whether you would:
+   - keep correctedSentence as it is, OR
+   - replace it with a slightly improved or more standard version (still simple and learner-friendly, without changing the meaning), OR
+   - use alternativeSentence as the finalSentence if it is clearly the best option.
+
+Output for this part:
+- A short confidence comment in USER_LANGUAGE (for example: that the sentence is correct and natural, or that you have some doubts).
+- A field with the final recommended version of the sentence (either equal to correctedSentence, or with a minimal improvement).
+
+Part 2 - Generate three example sentences ("Give more examples" logic)
+Based on the key structure(s) used in the final recommended sentence from Part 1:
+1. Identify 1-2 main grammatical patterns or constructions that are important for the learner.
+2. Create exactly THREE new example sentences in simple, natural Bokmål (A2-B2 level) that demonstrate these same patterns.
+3. Keep sentences short and clear. Do not introduce unnecessary rare vocabulary.
+4. The examples must be correct and natural Bokmål. If you are not fully sure about a sentence, do NOT use it.
+5. For EVERY example, provide a natural translation into USER_LANGUAGE.
+
+Output for this part:
+- A list of exactly three example objects, each with the Norwegian sentence and its translation into USER_LANGUAGE.
+
+Part 3 - Multiword expressions in the corrected sentence
+Now focus on multiword expressions in the final recommended Norwegian sentence from Part 1.
+
+Definitions:
+- A "multiword expression" is two or more words that:
+  - are commonly used together in real language, AND
+  - are perceived as a single semantic unit with a somewhat fixed form or special meaning, not just a sum of their parts.
+
+Instructions:
+1. Identify all valid multiword expressions (2+ words) in the final recommended sentence that frequently occur together and convey a unified meaning.
+2. Write each expression in normal dictionary form (grunnform).
+3. For EACH expression:
+   - Give the expression in Norwegian (grunnform).
+   - Give a natural, meaning-based translation into USER_LANGUAGE (not word-for-word).
+   - Provide a short explanation in USER_LANGUAGE: when/how it is used. Never leave this in Norwegian; if USER_LANGUAGE is English, the explanation must be in English.
+   - Give ONE simple Norwegian example sentence that shows this expression in context (different from the original sentence and from the three examples in Part 2).
+   - Give a translation of that example sentence into USER_LANGUAGE.
+4. Only include an expression if you are clearly confident that it is a real multiword expression (fixed phrase or strongly conventional pattern). Do NOT list combinations that are just normal grammar (for example, a common adverb + verb) unless there is a special meaning or strongly fixed usage.
+5. If you are uncertain whether something is a fixed/multiword expression or about its meaning, it is safer to skip it (do not add it to the list) and instead explain briefly in USER_LANGUAGE that you do not see clear multiword expressions here.
+6. If NO suitable multiword expressions are found, explicitly say that in USER_LANGUAGE.
+
+Output format
+Return a single JSON object with the following structure:
+
+{
+  "recheck": {
+    "status": "ok" | "needs_fix",
+    "finalSentence": "Norwegian sentence (your final recommended version)",
+    "confidenceComment": "VERY short comment in USER_LANGUAGE (max 120 chars). If status is ok, just a brief confirmation; if needs_fix, a brief reason and key fix. Always respond in USER_LANGUAGE (never Norwegian when USER_LANGUAGE is English)."
+  },
+  "alternative": {
+    "status": "ok" | "needs_fix" | "absent",
+    "sentence": "alternative sentence if provided, otherwise empty",
+    "comment": "VERY short comment in USER_LANGUAGE (max 120 chars). If no alternative, set status to absent and leave sentence empty."
+  },
+  "examples": [
+    { "text": "Norwegian example sentence 1", "translation": "Translation into USER_LANGUAGE" },
+    { "text": "Norwegian example sentence 2", "translation": "Translation into USER_LANGUAGE" },
+    { "text": "Norwegian example sentence 3", "translation": "Translation into USER_LANGUAGE" }
+  ],
+  "multiwordExpressions": [
+    {
+      "expression": "expression in Norwegian (grunnform)",
+      "translation": "natural translation into USER_LANGUAGE",
+      "explanation": "short explanation in USER_LANGUAGE",
+      "examples": [
+        { "text": "Norwegian example sentence 1 with this expression", "translation": "translation of example 1 into USER_LANGUAGE" },
+        { "text": "Norwegian example sentence 2 with this expression", "translation": "translation of example 2 into USER_LANGUAGE" },
+        { "text": "Norwegian example sentence 3 with this expression", "translation": "translation of example 3 into USER_LANGUAGE" }
+      ]
+    }
+  ],
+  "noMultiwordExpressions": false
+}
+
+Rules:
+- If you find at least one multiword expression, set "noMultiwordExpressions" to false.
+- If you find none, set:
+  - "multiwordExpressions": []
+  - "noMultiwordExpressions": true
+  - and in "confidenceComment" or a short note inside "multiwordExpressions" explanation, clearly state in USER_LANGUAGE that there are no fixed expressions.
+- Do NOT repeat the same expression in both the confidenceComment and the multiwordExpressions section; keep each section focused and concise.
+- Keep confidenceComment concise (max 120 characters). If status is "ok", keep it to a single short confirmation; if "needs_fix", give one short reason.
+- Avoid repeating the same examples in multiple sections.
+- Ensure every example and every expression example includes a translation into USER_LANGUAGE.
+ - All explanations/translations must be in USER_LANGUAGE (including English UI). Do not leave explanations in Norwegian.
+- If alternativeSentence is empty, set alternative.status to "absent". If present, evaluate it separately from correctedSentence.
+- Output MUST be valid JSON:
+  - Use ONLY double quotes for all strings.
+  - No trailing commas.
+  - Booleans must be: true or false (not strings).
+- All non-Norwegian text (comments, explanations and translations) must be in USER_LANGUAGE.
+- Do NOT add any extra text outside the JSON.
+`;
+      } else {
+        const errorMsg = t('ai_chat_error') || 'The AI could not answer that question.';
+        answerBlock.innerHTML = `<div class="ai-answer-error">${errorMsg}</div>`;
+        return;
+      }
+
+      // Add user message to chat history
+      ChatSessionManager.addMessage('user', userPrompt);
+
+      // Get full message history for API
+      // Send consistent minimal context: system + original check + corrected + current question
+      const messages = ChatSessionManager.getMessagesForAPI(4);
+
+      try {
+        const url = new URL(M.cfg.wwwroot + '/mod/flashcards/ajax.php');
+        url.searchParams.set('action', 'ai_answer_question');
+        url.searchParams.set('sesskey', M.cfg.sesskey);
+
+        const response = await fetch(url.toString(), {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json'
+          },
+          body: JSON.stringify({
+            action: 'ai_answer_question',
+            messages: messages,  // Send full conversation history
+            language: language
+          })
+        });
+
+        const data = await response.json();
+
+        if (data.answer) {
+          // Add assistant response to chat history
+          ChatSessionManager.addMessage('assistant', data.answer);
+
+          const { html: formatted, parsed } = formatAIAnswer(data.answer);
+          answerBlock.innerHTML = formatted;
+          stripYuiArtifacts(answerBlock);
+          if (parsed?.recheck?.finalSentence) {
+            const finalSentence = (parsed.recheck.finalSentence || '').trim();
+            if (finalSentence) {
+              const block = $('#errorCheckBlock');
+              if (block) {
+                block.dataset.latestCorrection = finalSentence;
+              }
+            }
+          }
+        } else {
+          const errorMsg = t('ai_chat_error') || 'The AI could not answer that question.';
+          answerBlock.innerHTML = `<div class="ai-answer-error">${errorMsg}</div>`;
+        }
+      } catch (error) {
+        console.error('Error asking AI:', error);
+        const errorMsg = t('ai_chat_error') || 'The AI could not answer that question.';
+        answerBlock.innerHTML = `<div class="ai-answer-error">${errorMsg}</div>`;
+      }
+    }
+
+    return { askAIAboutCorrection };
+}
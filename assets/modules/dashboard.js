@@ -0,0 +1,107 @@
+// Dashboard charts and achievement progress. Loaded by flashcards.js with the dashboard data.
+export function createDashboard({ $, debugLog }){
+    // Render Stage Distribution Chart (Chart.js)
+    function renderStageChart(stageData) {
+      const canvas = $('#stageChart');
+      if (!canvas || typeof Chart === 'undefined') {
+        debugLog('[Dashboard] Chart.js not loaded or canvas not found');
+        return;
+      }
+
+      const labels = stageData.map(d => `Stage ${d.stage}`);
+      const data = stageData.map(d => d.count);
+      const stageEmojis = ['??', '??', '??', '??', '??', '??', '??', '??', '??', '?', '??', '??'];
+
+      new Chart(canvas, {
+        type: 'doughnut',
+        data: {
+          labels: labels.map((label, i) => `${stageEmojis[i] || ''} ${label}`),
+          datasets: [{
+            data: data,
+            backgroundColor: [
+              '#8B4513', '#90EE90', '#32CD32', '#228B22', '#00FF00',
+              '#FFB6C1', '#FFD700', '#00CED1', '#1E90FF', '#FF69B4'
+            ]
+          }]
+        },
+        options: {
+          responsive: true,
+          maintainAspectRatio: false,
+          plugins: {
+            legend: { position: 'right' }
+          }
+        }
+      });
+    }
+
+    // Render Activity Chart (Chart.js)
+    function renderActivityChart(activityData) {
+      const canvas = $('#activityChart');
+      if (!canvas || typeof Chart === 'undefined') return;
+
+      const labels = activityData.map(d => {
+        const date = new Date(d.date * 1000);
+        return date.toLocaleDateString('en-US', { month: 'short', day: 'numeric' });
+      });
+      const reviews = activityData.map(d => d.reviews);
+      const cardsCreated = activityData.map(d => d.cardsCreated);
+
+      new Chart(canvas, {
+        type: 'bar',
+        data: {
+          labels: labels,
+          datasets: [
+            {
+              label: 'Reviews',
+              data: reviews,
+              backgroundColor: '#3B82F6'
+            },
+            {
+              label: 'Cards Created',
+              data: cardsCreated,
+              backgroundColor: '#10B981'
+            }
+          ]
+        },
+        options: {
+          responsive: true,
+          maintainAspectRatio: false,
+          scales: {
+            y: { beginAtZero: true, ticks: { stepSize: 1 } }
+          }
+        }
+      });
+    }
+
+    // Update Achievement Progress
+    function updateAchievements(stats) {
+      const activeVocab = Math.round(stats.activeVocab || 0);
+
+      const achievements = [
+        { id: 2, threshold: 7, current: stats.currentStreak, icon: '??' },
+
+        // Language Level Achievements (based on Active Vocabulary)
+        { id: 5, threshold: 100, current: activeVocab, icon: '??' },  // A0
+        { id: 6, threshold: 600, current: activeVocab, icon: '??' },  // A1
+        { id: 7, threshold: 1500, current: activeVocab, icon: '??' }, // A2
+        { id: 8, threshold: 2500, current: activeVocab, icon: '??' }, // B1
+        { id: 9, threshold: 4500, current: activeVocab, icon: '??' }  // B2
+      ];
+
+      achievements.forEach(ach => {
+        const card = $(`#achievement${ach.id}`);
+        const progress = $(`#ach${ach.id}Progress`);
+        if (!card || !progress) return;
+
+        const completed = ach.current >= ach.threshold;
+        if (completed) {
+          card.classList.add('fc-achievement-completed');
+          progress.textContent = '? Completed';
+        } else {
+          progress.textContent = `${ach.current}/${ach.threshold}`;
+        }
+      });
+    }
+
+    return { renderStageChart, renderActivityChart, updateAchievements };
+}
@@ -0,0 +1,1508 @@
+// Dictation grading: compareTexts() (move-aware token alignment) and the comparison view.
+// Loaded by flashcards.js on the first check of a dictation answer; tools/dictation/parity.py
+// runs the compareTexts() block of this file against the Python port.
+
+// Compare two texts character by character and word by word
+// Compare dictation answers with move-aware logic
+function compareTexts(userInput, correctText){
+  const userNorm = (userInput || '').trim();
+  const correctNorm = (correctText || '').trim();
+
+  const userTokens = tokenizeText(userNorm);
+  const originalTokens = tokenizeText(correctNorm);
+
+  const emptyPlan = buildEmptyMovePlan(userTokens.length);
+
+  if(userNorm === correctNorm){
+    return {
+      isCorrect: true,
+      mode: 'arrows',
+      userTokens,
+      originalTokens,
+      matches: [],
+      extras: [],
+      missing: [],
+      movePlan: emptyPlan,
+      errorCount: 0,
+      orderIssues: 0,
+      moveIssues: 0
+    };
+  }
+
+  const similarity = buildSimilarityMatrix(userTokens, originalTokens);
+  const assignment = solveMaxAssignment(similarity);
+  const { matches, matchedUser, matchedOrig } = extractMatches(assignment, userTokens, originalTokens);
+
+  const extras = userTokens
+    .map((token, index) => matchedUser.has(index) ? null : { userIndex: index, token })
+    .filter(Boolean);
+
+  const missing = originalTokens
+    .map((token, index) => matchedOrig.has(index) ? null : { origIndex: index, token })
+    .filter(Boolean);
+
+  // Compute LIS directly from matches (by origIndex order)
+  const lisIndices = computeLisWithTies(matches);
+  const lisSet = new Set(lisIndices.map(idx => matches[idx]?.id).filter(Boolean));
+
+  const movePlan = buildMovePlan({
+    matches,
+    lisSet,
+    userTokens,
+    originalTokens,
+    missing
+  });
+
+  // Count only real spelling/punctuation mismatches: for words, raw diff or low score; for punct, only raw diff (not score bias < 1)
+  const spellingIssues = matches.filter(m => {
+    const rawDiffers = m.userToken.raw !== m.origToken.raw;
+    if(m.userToken.type === 'punct'){
+      return rawDiffers;
+    }
+    return rawDiffers || m.score < 1;
+  }).length;
+  const orderIssues = matches.filter(m => !lisSet.has(m.id)).length;
+  const moveIssues = movePlan.mode === 'rewrite'
+    ? (movePlan.rewriteGroups.length ? 1 : 0)
+    : movePlan.moveBlocks.length;
+  const errorCount = extras.length + missing.length + spellingIssues + moveIssues;
+  const isCorrect = errorCount === 0;
+
+  return {
+    isCorrect,
+    mode: movePlan.mode,
+    userTokens,
+    originalTokens,
+    matches,
+    extras,
+    missing,
+    movePlan,
+    errorCount,
+    orderIssues,
+    moveIssues,
+    crossedBoundaries: movePlan.crossedBoundaries || [],
+    overloadedBoundaries: movePlan.overloadedBoundaries || [],
+    boundaryCounts: movePlan.boundaryCounts || []
+  };
+}
+
+const MIN_SIMILARITY_SCORE = 0.35;
+const STEM_SIMILARITY_SCORE = 0.85;
+const STRONG_ANCHOR_SCORE = 5;
+const PUNCT_MATCH_SCORE = 0.8;
+const PUNCT_MISMATCH_SCORE = 0.2;
+const TYPE_MISMATCH_SCORE = 0.05;
+const GAP_PENALTY = 1.0;
+
+function buildEmptyMovePlan(len){
+  return {
+    mode: 'arrows',
+    moveBlocks: [],
+    rewriteGroups: [],
+    tokenMeta: Array(len).fill(null),
+    gapMeta: {},
+    gapsNeeded: new Set(),
+    missingByPosition: {}
+  };
+}
+
+function tokenizeText(text){
+  const tokens = [];
+  if(!text){
+    return tokens;
+  }
+  const pattern = /[\p{L}\p{M}`{}\[\]]+|\d+|[^\s\p{L}\p{M}\d]/gu;
+  let match;
+  let idx = 0;
+  while((match = pattern.exec(text)) !== null){
+    const raw = match[0];
+    tokens.push({
+      raw,
+      norm: raw.toLowerCase(),
+      type: /^[\p{L}\p{M}\d`{}\[\]]+$/u.test(raw) ? 'word' : 'punct',
+      index: idx++
+    });
+  }
+  return tokens;
+}
+
+function normalizePunctuation(char){
+  const map = {
+    '\u2013': '-',
+    '\u2014': '-',
+    '\u2011': '-',
+    '\u2026': '...',
+    '\u00ab': '\"',
+    '\u00bb': '\"',
+    '\u201c': '\"',
+    '\u201d': '\"',
+    '\u201e': '\"',
+    '\u2019': '\'',
+    '\u2018': '\'',
+    '`': '\'',
+    '\u00b4': '\''
+  };
+  return map[char] || char;
+}
+
+function simpleStem(value){
+  if(!value) return '';
+  const normalized = value.toLowerCase().replace(/^[^\p{L}\p{M}]+|[^\p{L}\p{M}]+$/gu, '');
+  return normalized.replace(/(ene|ane|het|ers|ene|er|en|et|e)$/u, '');
+}
+
+// Token pairs repeat across retries of the same sentence, so word similarity
+// is memoised for the session (bounded LRU: Map keeps insertion order).
+const WORD_SIMILARITY_CACHE_LIMIT = 5000;
+const wordSimilarityCache = new Map();
+
+function levenshtein(a,b){
+  if(a === b) return 0;
+  // Common prefix/suffix never changes the distance; inflected forms share long stems.
+  let start = 0;
+  while(start < a.length && start < b.length && a.charCodeAt(start) === b.charCodeAt(start)){
+    start++;
+  }
+  let endA = a.length;
+  let endB = b.length;
+  while(endA > start && endB > start && a.charCodeAt(endA - 1) === b.charCodeAt(endB - 1)){
+    endA--;
+    endB--;
+  }
+  if(start > 0 || endA < a.length || endB < b.length){
+    a = a.slice(start, endA);
+    b = b.slice(start, endB);
+  }
+  if(!a.length) return b.length;
+  if(!b.length) return a.length;
+  if(a.length > b.length){
+    const swap = a;
+    a = b;
+    b = swap;
+  }
+  if(a.length <= 32){
+    return myersDistance(a, b);
+  }
+  const dp = Array.from({length: a.length + 1}, (_, i) => i);
+  for(let j = 1; j <= b.length; j++){
+    let prev = j - 1;
+    dp[0] = j;
+    for(let i = 1; i <= a.length; i++){
+      const temp = dp[i];
+      if(a[i-1] === b[j-1]){
+        dp[i] = prev;
+      } else {
+        dp[i] = 1 + Math.min(prev, dp[i-1], dp[i]);
+      }
+      prev = temp;
+    }
+  }
+  return dp[a.length];
+}
+
+// Bit-parallel edit distance (Myers/Hyyro) for a pattern of at most 32 UTF-16 units:
+// one pass over `text` with a handful of 32-bit operations per character.
+function myersDistance(pattern, text){
+  const m = pattern.length;
+  const peq = new Map();
+  for(let i = 0; i < m; i++){
+    const code = pattern.charCodeAt(i);
+    peq.set(code, (peq.get(code) || 0) | (1 << i));
+  }
+  const last = 1 << (m - 1);
+  let pv = -1;
+  let mv = 0;
+  let score = m;
+  for(let j = 0; j < text.length; j++){
+    const eq = peq.get(text.charCodeAt(j)) || 0;
+    const xv = eq | mv;
+    const xh = (((eq & pv) + pv) ^ pv) | eq;
+    let ph = mv | ~(xh | pv);
+    let mh = pv & xh;
+    if(ph & last){
+      score++;
+    } else if(mh & last){
+      score--;
+    }
+    ph = (ph << 1) | 1;
+    mh = mh << 1;
+    pv = mh | ~(xv | ph);
+    mv = ph & xv;
+  }
+  return score;
+}
+
+function tokenSimilarity(a, b){
+  if(!a || !b) return 0;
+  if(a.type !== b.type){
+    return TYPE_MISMATCH_SCORE;
+  }
+  if(a.type === 'punct'){
+    const normA = normalizePunctuation(a.raw);
+    const normB = normalizePunctuation(b.raw);
+    return normA === normB ? PUNCT_MATCH_SCORE : PUNCT_MISMATCH_SCORE;
+  }
+  if(a.norm === b.norm){
+    return STRONG_ANCHOR_SCORE;
+  }
+  const key = `${a.norm}\u0000${b.norm}`;
+  const cached = wordSimilarityCache.get(key);
+  if(cached !== undefined){
+    wordSimilarityCache.delete(key);
+    wordSimilarityCache.set(key, cached);
+    return cached;
+  }
+  const score = wordSimilarity(a.norm, b.norm);
+  wordSimilarityCache.set(key, score);
+  if(wordSimilarityCache.size > WORD_SIMILARITY_CACHE_LIMIT){
+    wordSimilarityCache.delete(wordSimilarityCache.keys().next().value);
+  }
+  return score;
+}
+
+function wordSimilarity(normA, normB){
+  const stemA = simpleStem(normA);
+  const stemB = simpleStem(normB);
+  if(stemA && stemA === stemB){
+    return STEM_SIMILARITY_SCORE;
+  }
+  // Weak pairs still need the exact distance: their score feeds the assignment
+  // together with the proximity bonus, so there is no safe early cut-off here.
+  const distance = levenshtein(normA, normB);
+  const maxLen = Math.max(normA.length, normB.length) || 1;
+  const closeness = Math.max(0, 1 - (distance / maxLen));
+  if(closeness >= 0.8) return 0.6 + (closeness * 0.2);
+  if(closeness >= 0.6) return 0.5 + (closeness * 0.1);
+  return closeness * 0.5;
+}
+
+function buildSimilarityMatrix(userTokens, originalTokens){
+  const matrix = [];
+  const maxLen = Math.max(userTokens.length, originalTokens.length, 1);
+  for(let i = 0; i < userTokens.length; i++){
+    matrix[i] = [];
+    for(let j = 0; j < originalTokens.length; j++){
+      const base = tokenSimilarity(userTokens[i], originalTokens[j]);
+      const dist = Math.abs(i - j) / maxLen;
+      const proximityBonus = (1 - dist) * 0.35;
+      const distancePenalty = dist * 0.25;
+      const weight = base + proximityBonus - distancePenalty;
+      matrix[i][j] = weight;
+    }
+  }
+  return matrix;
+}
+
+function solveMaxAssignment(weights){
+  const rows = weights.length;
+  const cols = weights[0] ? weights[0].length : 0;
+  const n = Math.max(rows, cols);
+  if(!n) return [];
+  let maxWeight = 0;
+  for(let i = 0; i < rows; i++){
+    for(let j = 0; j < cols; j++){
+      maxWeight = Math.max(maxWeight, weights[i][j]);
+    }
+  }
+  const big = maxWeight + 1;
+  const cost = Array.from({length: n}, (_, i)=>{
+    const row = [];
+    for(let j = 0; j < n; j++){
+      if(i < rows && j < cols){
+        row.push(big - weights[i][j]);
+      } else {
+        row.push(big);
+      }
+    }
+    return row;
+  });
+  const u = Array(n + 1).fill(0);
+  const v = Array(n + 1).fill(0);
+  const p = Array(n + 1).fill(0);
+  const way = Array(n + 1).fill(0);
+  for(let i = 1; i <= n; i++){
+    p[0] = i;
+    let j0 = 0;
+    const minv = Array(n + 1).fill(Infinity);
+    const used = Array(n + 1).fill(false);
+    do{
+      used[j0] = true;
+      const i0 = p[j0];
+      let delta = Infinity;
+      let j1 = 0;
+      for(let j = 1; j <= n; j++){
+        if(used[j]) continue;
+        const cur = cost[i0 - 1][j - 1] - u[i0] - v[j];
+        if(cur < minv[j]){
+          minv[j] = cur;
+          way[j] = j0;
+        }
+        if(minv[j] < delta){
+          delta = minv[j];
+          j1 = j;
+        }
+      }
+      for(let j = 0; j <= n; j++){
+        if(used[j]){
+          u[p[j]] += delta;
+          v[j] -= delta;
+        } else {
+          minv[j] -= delta;
+        }
+      }
+      j0 = j1;
+    } while(p[j0] !== 0);
+    do{
+      const j1 = way[j0];
+      p[j0] = p[j1];
+      j0 = j1;
+    } while(j0 !== 0);
+  }
+  const result = [];
+  for(let j = 1; j <= n; j++){
+    if(p[j] && p[j] - 1 < rows && j - 1 < cols){
+      result.push({ row: p[j] - 1, col: j - 1, weight: weights[p[j] - 1][j - 1] });
+    }
+  }
+  return result;
+}
+
+function extractMatches(assignment, userTokens, originalTokens){
+  const matches = [];
+  const matchedUser = new Set();
+  const matchedOrig = new Set();
+  assignment.forEach((item, idx) => {
+    if(!item) return;
+    const { row, col, weight } = item;
+    if(row >= userTokens.length || col >= originalTokens.length) return;
+    if(weight < MIN_SIMILARITY_SCORE) return;
+    matches.push({
+      id: idx,
+      userIndex: row,
+      origIndex: col,
+      userToken: userTokens[row],
+      origToken: originalTokens[col],
+      score: weight
+    });
+    matchedUser.add(row);
+    matchedOrig.add(col);
+  });
+  matches.sort((a,b)=> a.userIndex - b.userIndex);
+  matches.forEach((m, index)=>{ m.id = index; });
+  return { matches, matchedUser, matchedOrig };
+}
+
+function computeLisWithTies(matches){
+  if(!matches.length) return [];
+  const values = matches.map(m => m.origIndex);
+  const dp = [];
+  const prev = Array(values.length).fill(-1);
+  for(let i = 0; i < values.length; i++){
+    dp[i] = { len: 1, breaks: 0, start: i };
+    for(let j = 0; j < i; j++){
+      if(values[j] < values[i]){
+        const candidate = {
+          len: dp[j].len + 1,
+          breaks: dp[j].breaks + (values[i] === values[j] + 1 ? 0 : 1),
+          start: dp[j].start
+        };
+        if(isBetterLis(candidate, dp[i])){
+          dp[i] = candidate;
+          prev[i] = j;
+        }
+      }
+    }
+  }
+  let bestIdx = 0;
+  for(let i = 1; i < dp.length; i++){
+    if(isBetterLis(dp[i], dp[bestIdx])){
+      bestIdx = i;
+    }
+  }
+  const result = [];
+  let k = bestIdx;
+  while(k !== -1){
+    result.push(k);
+    k = prev[k];
+  }
+  return result.reverse();
+}
+
+function isBetterLis(a, b){
+  if(!b) return true;
+  if(a.len !== b.len) return a.len > b.len;
+  if(a.breaks !== b.breaks) return a.breaks < b.breaks;
+  return a.start < b.start;
+}
+
+// Monotone alignment (NeedlemanWunsch) to derive non-crossing anchors
+function monotoneAlignment(userTokens, originalTokens){
+  const n = userTokens.length;
+  const m = originalTokens.length;
+  const dp = Array.from({length: n + 1}, () => Array(m + 1).fill(-Infinity));
+  const dir = Array.from({length: n + 1}, () => Array(m + 1).fill(0)); // 0=diag,1=up,2=left
+  dp[0][0] = 0;
+  for(let i = 1; i <= n; i++){
+    dp[i][0] = dp[i-1][0] - GAP_PENALTY;
+    dir[i][0] = 1;
+  }
+  for(let j = 1; j <= m; j++){
+    dp[0][j] = dp[0][j-1] - GAP_PENALTY;
+    dir[0][j] = 2;
+  }
+  for(let i = 1; i <= n; i++){
+    for(let j = 1; j <= m; j++){
+      const sim = tokenSimilarity(userTokens[i-1], originalTokens[j-1]);
+      const diag = dp[i-1][j-1] + sim;
+      const up = dp[i-1][j] - GAP_PENALTY;
+      const left = dp[i][j-1] - GAP_PENALTY;
+      const best = Math.max(diag, up, left);
+      dp[i][j] = best;
+      if(best === diag){
+        dir[i][j] = 0;
+      } else if(best === up){
+        dir[i][j] = 1;
+      } else {
+        dir[i][j] = 2;
+      }
+    }
+  }
+  const matches = [];
+  let i = n, j = m;
+  while(i > 0 && j > 0){
+    const d = dir[i][j];
+    if(d === 0){
+      const sim = tokenSimilarity(userTokens[i-1], originalTokens[j-1]);
+      if(sim >= MIN_SIMILARITY_SCORE){
+        matches.push({
+          userIndex: i - 1,
+          origIndex: j - 1,
+          score: sim
+        });
+      }
+      i--; j--;
+    } else if(d === 1){
+      i--;
+    } else {
+      j--;
+    }
+  }
+  return matches.reverse();
+}
+
+function buildGapKey(before, after){
+  const left = before === undefined ? -1 : before;
+  const right = after === null || after === undefined ? 'END' : after;
+  return `${left}-${right}`;
+}
+
+function buildMovePlan({ matches, lisSet, userTokens, originalTokens, missing }){ // eslint-disable-line max-params
+  const missingTokens = Array.isArray(missing) ? missing : [];
+  const orderedMatches = [...matches];
+  const lisMatches = orderedMatches.filter(m=>lisSet.has(m.id));
+  const lisOrigSorted = lisMatches.map(m=>m.origIndex).sort((a,b)=>a-b);
+  const lisOrigToUser = new Map();
+  lisMatches.forEach(m=> lisOrigToUser.set(m.origIndex, m.userIndex));
+
+  console.log('[DEBUG] LIS tokens:', lisMatches.map(m => ({
+    origIndex: m.origIndex,
+    userIndex: m.userIndex,
+    origToken: m.origToken.raw,
+    userToken: m.userToken.raw
+  })));
+  console.log('[DEBUG] All matches:', orderedMatches.map(m => ({
+    origIndex: m.origIndex,
+    userIndex: m.userIndex,
+    origToken: m.origToken.raw,
+    userToken: m.userToken.raw,
+    inLIS: lisSet.has(m.id)
+  })));
+
+  // Create a map of ALL matched words (not just LIS) for better gap calculation
+  const allOrigToUser = new Map();
+  orderedMatches.forEach(m => allOrigToUser.set(m.origIndex, m.userIndex));
+
+  console.log('[DEBUG] LIS original indices (stay in place):', lisOrigSorted);
+
+  const metaByUser = Array(userTokens.length).fill(null);
+  const gapMeta = {};
+  const tokensPerGap = {}; // Track which tokens belong to each gap
+
+  orderedMatches.forEach((m)=>{
+    const inLis = lisSet.has(m.id);
+
+    // For both gap and targetBoundary calculation, use LIS tokens (stable positions)
+    // Find the nearest LIS tokens to determine where this token should go
+    let prevLIS = -1;
+    let nextLIS = null;
+    for(const idx of lisOrigSorted){
+      if(idx < m.origIndex){
+        prevLIS = idx;
+      } else if(idx > m.origIndex){
+        nextLIS = idx;
+        break;
+      }
+    }
+
+    // Use LIS-based gap key so tokens between same LIS anchors share the same gap
+    const gapKey = buildGapKey(prevLIS, nextLIS);
+
+    // Calculate beforeUser and afterUser based on LIS positions (stable anchors)
+    let beforeUser = -1;
+    if(prevLIS !== -1){
+      beforeUser = lisOrigToUser.get(prevLIS) ?? -1;
+    }
+
+    let afterUser = userTokens.length;
+    if(nextLIS !== null){
+      afterUser = lisOrigToUser.get(nextLIS) ?? userTokens.length;
+    }
+
+    if(!gapMeta[gapKey]){
+      gapMeta[gapKey] = {
+        before: prevLIS,
+        after: nextLIS,
+        beforeUser,
+        afterUser,
+        targetBoundary: beforeUser + 1
+      };
+      tokensPerGap[gapKey] = [];
+      console.log(`[DEBUG] Created gap ${gapKey}: before=${prevLIS}, after=${nextLIS}, beforeUser=${beforeUser}, afterUser=${afterUser}, targetBoundary=${beforeUser + 1}`);
+    }
+
+    // Track which tokens go into this gap (for calculating offset)
+    if(!inLis){
+      tokensPerGap[gapKey].push(m.origIndex);
+    }
+
+    const hasError = m.score < 1 || m.userToken.raw !== m.origToken.raw;
+    metaByUser[m.userIndex] = {
+      match: m,
+      inLis,
+      targetGapKey: gapKey,
+      targetGap: { before: prevLIS, after: nextLIS },
+      hasError,
+      needsMove: !inLis
+    };
+  });
+
+  // Sort tokens in each gap by their original index to assign correct offsets
+  Object.keys(tokensPerGap).forEach(gapKey => {
+    tokensPerGap[gapKey].sort((a, b) => a - b);
+  });
+
+  const movableMatches = orderedMatches.filter(m=>!lisSet.has(m.id));
+  const moveBlocks = buildMoveBlocks(movableMatches, metaByUser, gapMeta, tokensPerGap, userTokens.length);
+
+  const boundaryCounts = Array(userTokens.length + 1).fill(0);
+  moveBlocks.forEach(block=>{
+    const crossed = collectCrossedBoundaries(block);
+    block.crossed = crossed;
+    crossed.forEach(idx=>{
+      boundaryCounts[idx] = (boundaryCounts[idx] || 0) + 1;
+    });
+  });
+  const overloadedBoundaries = new Set(boundaryCounts.map((count, idx)=> ({count, idx})).filter(item=>item.count > 1).map(item=>item.idx));
+  const overloadBlocks = new Set();
+  moveBlocks.forEach(block=>{
+    const crossed = block.crossed || collectCrossedBoundaries(block);
+    if(crossed.some(idx=>overloadedBoundaries.has(idx))){
+      overloadBlocks.add(block.id);
+    }
+  });
+  // Use rewrite when:
+  // 1. A boundary is overloaded (2+ blocks through same boundary), OR
+  // 2. Too many errors (>60% of tokens need correction)
+  const crossingBlocks = new Set(); // crossings no longer trigger rewrite alone
+  const totalTokens = userTokens.length;
+  const errorTokenCount = movableMatches.length + missingTokens.length;
+  const errorRate = totalTokens > 0 ? errorTokenCount / totalTokens : 0;
+  const tooManyErrors = errorRate > 0.6;
+
+  console.log(`[DEBUG] Error rate: ${errorTokenCount}/${totalTokens} = ${(errorRate * 100).toFixed(1)}%, tooManyErrors=${tooManyErrors}`);
+
+  const mode = (overloadedBoundaries.size || tooManyErrors) ? 'rewrite' : 'arrows';
+  // When tooManyErrors=true, include ALL moveBlocks in problemIds (even filtered out ones)
+  // Use allBlocksBeforeFilter to get complete list of blocks
+  const allBlocks = moveBlocks.allBlocksBeforeFilter || moveBlocks;
+  const problemIds = tooManyErrors
+    ? new Set(allBlocks.map(b => b.id))
+    : new Set([...overloadBlocks]);
+
+  console.log(`[DEBUG] Mode=${mode}, problemIds=${Array.from(problemIds).join(', ')}, overloadedBoundaries=${overloadedBoundaries.size}, allBlocks=${allBlocks.length}, filteredBlocks=${moveBlocks.length}`);
+  // When tooManyErrors=true, pass allBlocks to buildRewriteGroups so it can find ALL problematic tokens
+  const rewriteGroups = mode === 'rewrite' ? buildRewriteGroups({
+    moveBlocks: tooManyErrors ? allBlocks : moveBlocks,
+    problemIds,
+    matches: orderedMatches,
+    userTokens,
+    originalTokens,
+    metaByUser,
+    missingTokens
+  }) : [];
+
+  // Create a set of token indices that are in moveBlocks
+  const tokensInMoveBlocks = new Set();
+  moveBlocks.forEach(block=>{
+    if(block.resolvedByRewrite) return;
+    block.tokens.forEach(idx=>{
+      tokensInMoveBlocks.add(idx);
+      if(!metaByUser[idx]) metaByUser[idx] = {};
+      metaByUser[idx].moveBlockId = block.id;
+      metaByUser[idx].targetGapKey = block.targetGapKey;
+      metaByUser[idx].targetGap = block.targetGap;
+    });
+  });
+
+  // Clear needsMove for tokens that were filtered out (not in any move block)
+  metaByUser.forEach((meta, idx) => {
+    if(meta && meta.needsMove && !tokensInMoveBlocks.has(idx)){
+      meta.needsMove = false;
+    }
+  });
+
+  const gapsNeeded = new Set();
+  if(mode === 'arrows'){
+    moveBlocks.forEach(block=> gapsNeeded.add(block.targetGapKey));
+  }
+
+  const matchedByOrig = new Map();
+  orderedMatches.forEach(m=> matchedByOrig.set(m.origIndex, m.userIndex));
+  const missingByPosition = buildMissingByPosition(missingTokens, orderedMatches, userTokens.length);
+
+  // CRITICAL: For missing tokens, we need to find gaps based on LIS tokens only
+  // This ensures missing tokens share gaps with moveBlocks correctly
+  missingTokens.forEach(item=>{
+    // Find where this missing token should appear in the ORIGINAL order
+    // by finding its neighbors in LIS (tokens that stay in place)
+    let prevOrig = -1;
+    let nextOrig = null;
+
+    // Find neighbors in LIS ONLY (tokens that stay in place)
+    // If no LIS neighbors found, prev=-1 or next=null means gap extends to start/end
+    for(let i = item.origIndex - 1; i >= 0; i--){
+      // Check if this original position is in LIS (stays in place)
+      if(lisOrigToUser.has(i)){
+        prevOrig = i;
+        break;
+      }
+    }
+    for(let i = item.origIndex + 1; i < originalTokens.length; i++){
+      if(lisOrigToUser.has(i)){
+        nextOrig = i;
+        break;
+      }
+    }
+
+    // Now find where these neighbors are in the USER sequence
+    let prevUser = prevOrig !== -1 ? (lisOrigToUser.get(prevOrig) ?? matchedByOrig.get(prevOrig)) : -1;
+    let nextUser = nextOrig !== null ? (lisOrigToUser.get(nextOrig) ?? matchedByOrig.get(nextOrig)) : userTokens.length;
+
+    const gapKey = buildGapKey(prevOrig, nextOrig);
+    const beforeUser = prevUser;
+    const afterUser = nextUser;
+
+    // CRITICAL: Check if there's already a gap with this key (from moveBlocks)
+    // If so, reuse it. Missing tokens share gaps with moveBlocks.
+    if(!gapMeta[gapKey]){
+      gapMeta[gapKey] = {
+        before: prevOrig,
+        after: nextOrig,
+        beforeUser,
+        afterUser,
+        targetBoundary: beforeUser + 1
+      };
+      console.log(`[DEBUG] Created NEW gap for missing token ${item.token.raw} (orig_${item.origIndex}): gap=${gapKey}, prevOrig=${prevOrig}, nextOrig=${nextOrig}, beforeUser=${beforeUser}, afterUser=${afterUser}, targetBoundary=${beforeUser + 1}`);
+    } else {
+      console.log(`[DEBUG] Missing token ${item.token.raw} (orig_${item.origIndex}) SHARES gap ${gapKey} (prevOrig=${prevOrig}, nextOrig=${nextOrig}) with existing element (boundary=${gapMeta[gapKey].targetBoundary})`);
+    }
+    // CRITICAL: Save the correct gapKey to the missing token object
+    item.gapKey = gapKey;
+    gapsNeeded.add(gapKey);
+  });
+
+  const crossedBoundaries = boundaryCounts
+    .map((count, idx)=>({boundary: idx, count}))
+    .filter(item=>item.count > 0);
+
+  return {
+    mode,
+    moveBlocks,
+    rewriteGroups,
+    tokenMeta: metaByUser,
+    gapMeta,
+    gapsNeeded,
+    missingByPosition,
+    missingTokens, // CRITICAL: Return missingTokens with correct gapKey
+    boundaryCounts,
+    crossedBoundaries,
+    overloadedBoundaries: Array.from(overloadedBoundaries)
+  };
+}
+
+function buildMoveBlocks(movableMatches, metaByUser, gapMeta, tokensPerGap, userLength){
+  const blocks = [];
+  let current = null;
+  movableMatches.forEach(m=>{
+    const meta = metaByUser[m.userIndex] || {};
+    const gapKey = meta.targetGapKey || buildGapKey(-1, null);
+    const gap = gapMeta[gapKey] || { before: -1, after: null, beforeUser: -1, afterUser: userLength, targetBoundary: 0 };
+
+    // Calculate offset within the gap based on original position
+    const tokensInThisGap = tokensPerGap[gapKey] || [];
+    const offsetInGap = tokensInThisGap.indexOf(m.origIndex);
+    const targetBoundary = (gap.beforeUser ?? -1) + 1 + offsetInGap;
+
+    const lastOrig = current && current.origIndices.length ? current.origIndices[current.origIndices.length - 1] : -Infinity;
+    const expectedNextOrig = current ? lastOrig + 1 : null;
+    const adjacent = current
+      && current.targetGapKey === gapKey
+      && m.userIndex === current.end + 1
+      && m.origIndex === expectedNextOrig; // merge only if user-adjacent AND orig-adjacent
+    if(adjacent){
+      current.tokens.push(m.userIndex);
+      current.origIndices.push(m.origIndex);
+      current.end = m.userIndex;
+      current.hasError = current.hasError || !!meta.hasError;
+    } else {
+      if(current){
+        blocks.push(current);
+      }
+      current = {
+        id: `move-${blocks.length + 1}`,
+        tokens: [m.userIndex],
+        origIndices: [m.origIndex],
+        start: m.userIndex,
+        end: m.userIndex,
+        targetGapKey: gapKey,
+        targetGap: meta.targetGap || { before: -1, after: null },
+        beforeUser: gap.beforeUser ?? -1,
+        afterUser: gap.afterUser ?? userLength,
+        targetBoundary: targetBoundary,
+        hasError: !!meta.hasError,
+        resolvedByRewrite: false
+      };
+    }
+  });
+  if(current){
+    blocks.push(current);
+  }
+
+  console.log('[DEBUG] All moveBlocks created:', blocks.map(b => ({
+    id: b.id,
+    tokens: b.tokens,
+    start: b.start,
+    end: b.end,
+    targetBoundary: b.targetBoundary,
+    beforeUser: b.beforeUser,
+    afterUser: b.afterUser,
+    targetGapKey: b.targetGapKey
+  })));
+
+  // Filter out blocks that don't actually need to move
+  // A block doesn't need to move if it's already in the target position
+  const filtered = blocks.filter(block => {
+    // Check if the block is already in the correct position
+    // Block is at correct position if targetBoundary is between start and end+1
+    const alreadyInPlace = block.targetBoundary >= block.start && block.targetBoundary <= block.end + 1;
+    if(alreadyInPlace){
+      console.log('[DEBUG] Filtering out block:', block.id, 'tokens:', block.tokens, 'targetBoundary:', block.targetBoundary, 'start:', block.start, 'end:', block.end);
+    }
+    return !alreadyInPlace;
+  });
+  console.log('[DEBUG] Blocks before filter:', blocks.length, 'after filter:', filtered.length);
+  console.log('[DEBUG] Filtered blocks:', filtered.map(b => ({
+    id: b.id,
+    tokens: b.tokens,
+    start: b.start,
+    end: b.end,
+    targetBoundary: b.targetBoundary
+  })));
+
+  // Store all blocks (before filtering) for error rate calculation
+  filtered.allBlocksBeforeFilter = blocks;
+
+  return filtered;
+}
+
+function collectCrossedBoundaries(block){
+  const crossed = [];
+  if(block.targetBoundary < block.start){
+    for(let b = block.targetBoundary; b < block.start; b++){
+      crossed.push(b);
+    }
+  } else if(block.targetBoundary > block.end + 1){
+    for(let b = block.end + 1; b < block.targetBoundary; b++){
+      crossed.push(b);
+    }
+  }
+  return crossed;
+}
+
+function detectCrossingBlocks(blocks){
+  const set = new Set();
+  for(let i = 0; i < blocks.length; i++){
+    for(let j = i + 1; j < blocks.length; j++){
+      const a = blocks[i];
+      const b = blocks[j];
+      const orderInverts = (a.start < b.start && a.targetBoundary > b.targetBoundary) ||
+                           (a.start > b.start && a.targetBoundary < b.targetBoundary);
+      const targetInside = (a.targetBoundary > b.start && a.targetBoundary < b.end + 1) ||
+                           (b.targetBoundary > a.start && b.targetBoundary < a.end + 1);
+      if(orderInverts || targetInside){
+        set.add(a.id);
+        set.add(b.id);
+      }
+    }
+  }
+  return set;
+}
+
+function buildRewriteGroups({ moveBlocks, problemIds, matches, userTokens, originalTokens, metaByUser, missingTokens = [] }){ // eslint-disable-line max-params
+  if(!problemIds.size || !moveBlocks.length){
+    return [];
+  }
+  const problemBlocks = moveBlocks.filter(b=>problemIds.has(b.id));
+  console.log(`[DEBUG] buildRewriteGroups: moveBlocks=${moveBlocks.length}, problemIds=${Array.from(problemIds).join(',')}, problemBlocks=${problemBlocks.length}`);
+  console.log(`[DEBUG] problemBlocks origIndices:`, problemBlocks.map(b => `${b.id}:[${b.origIndices.join(',')}]`).join(' '));
+  if(!problemBlocks.length){
+    return [];
+  }
+  // Start with coverage based on sources/targets to include all crossed boundaries
+  let coverUserMin = Infinity;
+  let coverUserMax = -Infinity;
+  problemBlocks.forEach(block=>{
+    const coverStart = Math.min(block.start, block.targetBoundary);
+    const coverEnd = Math.max(block.end, block.targetBoundary - 1);
+    coverUserMin = Math.min(coverUserMin, coverStart);
+    coverUserMax = Math.max(coverUserMax, coverEnd);
+  });
+  let origMin = Infinity;
+  let origMax = -Infinity;
+  problemBlocks.forEach(block=>{
+    block.origIndices.forEach(idx=>{
+      origMin = Math.min(origMin, idx);
+      origMax = Math.max(origMax, idx);
+    });
+  });
+
+  // CRITICAL: Include missing tokens in the initial range calculation
+  // This ensures that missing tokens between problemBlocks are included in the rewrite group
+  if(missingTokens && missingTokens.length > 0){
+    console.log(`[DEBUG] Checking ${missingTokens.length} missing tokens for range expansion`);
+    missingTokens.forEach(item => {
+      // Temporarily expand range to see if this missing token is "near" the problem area
+      const nearProblemArea = item.origIndex >= origMin - 1 && item.origIndex <= origMax + 1;
+      if(nearProblemArea){
+        console.log(`[DEBUG] Including missing token ${item.token.raw} (orig_${item.origIndex}) in rewrite range`);
+        origMin = Math.min(origMin, item.origIndex);
+        origMax = Math.max(origMax, item.origIndex);
+      }
+    });
+  }
+
+  if(!Number.isFinite(origMin) || !Number.isFinite(origMax)){
+    return [];
+  }
+  let userMin = Number.isFinite(coverUserMin) ? coverUserMin : Infinity;
+  let userMax = Number.isFinite(coverUserMax) ? coverUserMax : -Infinity;
+  matches.forEach(m=>{
+    if(m.origIndex >= origMin && m.origIndex <= origMax){
+      userMin = Math.min(userMin, m.userIndex);
+      userMax = Math.max(userMax, m.userIndex);
+    }
+  });
+  if(!Number.isFinite(userMin)){
+    userMin = 0;
+    userMax = userTokens.length ? userTokens.length - 1 : 0;
+  }
+  matches.forEach(m=>{
+    if(m.userIndex >= userMin && m.userIndex <= userMax){
+      origMin = Math.min(origMin, m.origIndex);
+      origMax = Math.max(origMax, m.origIndex);
+    }
+  });
+  // Expand student span again to ensure we cover all tokens mapping to expanded orig span
+  matches.forEach(m=>{
+    if(m.origIndex >= origMin && m.origIndex <= origMax){
+      userMin = Math.min(userMin, m.userIndex);
+      userMax = Math.max(userMax, m.userIndex);
+    }
+  });
+  const correctTokens = originalTokens.filter(t=>t.index >= origMin && t.index <= origMax);
+  const correctText = correctTokens.map(t=>t.raw).join(' ');
+  const group = {
+    id: 'rewrite-1',
+    start: userMin,
+    end: userMax,
+    origMin,
+    origMax,
+    targetGapKey: buildGapKey(origMin - 1, origMax + 1),
+    correctText
+  };
+  console.log(`[DEBUG] Created rewrite group: origMin=${origMin}, origMax=${origMax}, userMin=${userMin}, userMax=${userMax}, correctText="${correctText}"`);
+  for(let i = group.start; i <= group.end; i++){
+    metaByUser[i] = metaByUser[i] || {};
+    metaByUser[i].rewriteGroupId = group.id;
+    metaByUser[i].targetGapKey = group.targetGapKey;
+  }
+  moveBlocks.forEach(block=>{
+    if(problemIds.has(block.id)){
+      block.resolvedByRewrite = true;
+    }
+  });
+  return [group];
+}
+
+function buildMissingByPosition(missing, matches, userLength){
+  const map = {};
+  if(!missing || !missing.length){
+    return map;
+  }
+  const matchedByOrig = new Map();
+  matches.forEach(m=>{
+    matchedByOrig.set(m.origIndex, m.userIndex);
+  });
+  const sortedMissing = [...missing].sort((a,b)=>a.origIndex - b.origIndex);
+  sortedMissing.forEach(item=>{
+    let prevOrig = -1;
+    let prevUser = -1;
+    let nextOrig = null;
+    matchedByOrig.forEach((userIdx, origIdx)=>{
+      if(origIdx < item.origIndex && origIdx > prevOrig){
+        prevOrig = origIdx;
+        prevUser = userIdx;
+      }
+      if(origIdx > item.origIndex){
+        if(nextOrig === null || origIdx < nextOrig){
+          nextOrig = origIdx;
+        }
+      }
+    });
+    const gapKey = buildGapKey(prevOrig, nextOrig);
+    const pos = Math.max(0, prevUser + 1);
+    if(!map[pos]){
+      map[pos] = [];
+    }
+    map[pos].push({ token: item.token, gapKey });
+  });
+  Object.keys(map).forEach(key=>{
+    map[key] = map[key].sort((a,b)=>a.token.index - b.token.index);
+  });
+  if(map[userLength]){
+    map[userLength] = map[userLength].sort((a,b)=>a.token.index - b.token.index);
+  }
+  return map;
+}
+
+function renderComparisonResult(resultEl, comparison){
+  resultEl.innerHTML = '';
+  const wrapper = document.createElement('div');
+  wrapper.className = 'dictation-comparison';
+
+  if(comparison.isCorrect){
+    const success = document.createElement('div');
+    success.className = 'dictation-success-msg';
+    success.textContent = 'Perfect! Well done!';
+    wrapper.appendChild(success);
+    resultEl.appendChild(wrapper);
+    return;
+  }
+
+  const errorCount = comparison.errorCount || 0;
+  const errorWord = errorCount === 1 ? 'error' : 'errors';
+  const summary = document.createElement('div');
+  summary.className = 'dictation-errors-summary';
+  summary.textContent = `Found ${errorCount} ${errorWord}`;
+  wrapper.appendChild(summary);
+
+  const visual = document.createElement('div');
+  visual.className = 'dictation-visual';
+
+  const userRow = buildUserLine(comparison);
+  const correctRow = buildCorrectLine(comparison);
+  visual.appendChild(userRow);
+  visual.appendChild(correctRow);
+
+  wrapper.appendChild(visual);
+  resultEl.appendChild(wrapper);
+
+  requestAnimationFrame(()=> drawDictationArrows(visual));
+}
+
+function buildUserLine(comparison){
+  const row = document.createElement('div');
+  row.className = 'dictation-comparison-row';
+  const label = document.createElement('div');
+  label.className = 'dictation-comparison-label';
+  label.textContent = 'Your answer:';
+  const line = document.createElement('div');
+  line.className = 'dictation-line dictation-line-user';
+
+  const gapsNeeded = comparison.movePlan.gapsNeeded || new Set();
+  const gapMeta = comparison.movePlan.gapMeta || {};
+  const missingTokens = comparison.movePlan.missingTokens || [];
+  const rewriteGroups = comparison.movePlan.rewriteGroups || [];
+
+  // Filter out missing tokens that are inside rewrite groups
+  // They should not be inserted separately as they're already handled in the rewrite block
+  const rewriteOrigRanges = rewriteGroups.map(g => ({
+    origMin: g.origMin,
+    origMax: g.origMax
+  }));
+
+  const filteredMissingTokens = missingTokens.filter(item => {
+    // Check if this missing token is inside any rewrite group
+    const insideRewrite = rewriteOrigRanges.some(range =>
+      item.origIndex >= range.origMin && item.origIndex <= range.origMax
+    );
+    if(insideRewrite){
+      console.log(`[DEBUG] Excluding missing token ${item.token.raw} (orig_${item.origIndex}) - inside rewrite group`);
+    }
+    return !insideRewrite;
+  });
+
+  // Build missingByGapKey map using the CORRECT gapKey from filteredMissingTokens
+  const missingByGapKey = new Map();
+  filteredMissingTokens.forEach(item => {
+    const gapKey = item.gapKey; // Use the corrected gapKey from planMovesAndGaps
+    if(!gapKey){
+      console.warn('[WARN] Missing token without gapKey:', item);
+      return;
+    }
+    if(!missingByGapKey.has(gapKey)){
+      missingByGapKey.set(gapKey, []);
+    }
+    missingByGapKey.get(gapKey).push(item);
+  });
+
+  // Calculate adjusted boundaries accounting for moveBlocks
+  // moveBlocks will be skipped, so gaps after them need to shift left
+  const moveBlockIndices = new Set();
+  comparison.movePlan.moveBlocks.forEach(block => {
+    for(let i = block.start; i <= block.end; i++){
+      moveBlockIndices.add(i);
+    }
+  });
+
+  const gapsByBoundary = new Map();
+  // Use actual moveBlocks' targetBoundary instead of gapMeta baseline
+  comparison.movePlan.moveBlocks.forEach(block => {
+    const key = block.targetGapKey;
+    if(!gapsNeeded.has(key)) return;
+
+    let boundary = block.targetBoundary;
+
+    // Adjust boundary: subtract number of moveBlock tokens before this boundary
+    let adjustment = 0;
+    for(let i = 0; i < boundary; i++){
+      if(moveBlockIndices.has(i)){
+        adjustment++;
+      }
+    }
+    boundary -= adjustment;
+
+    const clamped = Math.max(0, Math.min(boundary, comparison.userTokens.length));
+    console.log(`[DEBUG] Gap ${key}: original boundary=${block.targetBoundary}, adjustment=${adjustment}, final boundary=${boundary}`);
+    if(!gapsByBoundary.has(clamped)){
+      gapsByBoundary.set(clamped, []);
+    }
+    // Store gap only once per boundary (avoid duplicates)
+    if(!gapsByBoundary.get(clamped).includes(key)){
+      gapsByBoundary.get(clamped).push(key);
+    }
+  });
+
+  // Helper function to check if token is punctuation
+  const isPunctuation = (text) => {
+    return /^[.,!?;:—–\-…]$/.test(text.trim());
+  };
+
+  const insertAnchors = (boundaryIdx)=>{
+    const list = gapsByBoundary.get(boundaryIdx) || [];
+    console.log(`[DEBUG] insertAnchors(${boundaryIdx}): gaps=${list.length > 0 ? list.join(', ') : 'none'}`);
+    list.forEach(key=>{
+      // Get all missing tokens for this gap
+      const missingForGap = missingByGapKey.get(key) || [];
+
+      // Find all moveBlocks that target this gap to determine their origIndex
+      const moveBlocksForGap = comparison.movePlan.moveBlocks.filter(b => b.targetGapKey === key);
+      const moveBlockOrigIndices = moveBlocksForGap.flatMap(b => b.origIndices || []);
+
+      // Find min origIndex among moveBlocks (anchor represents where they'll go)
+      const minMoveBlockOrigIndex = moveBlockOrigIndices.length > 0 ? Math.min(...moveBlockOrigIndices) : Infinity;
+
+      // Sort missing tokens by origIndex
+      const sortedMissing = [...missingForGap].sort((a, b) => a.origIndex - b.origIndex);
+
+      // Split missing tokens into BEFORE and AFTER anchor based on origIndex
+      const missingBefore = sortedMissing.filter(m => m.origIndex < minMoveBlockOrigIndex);
+      const missingAfter = sortedMissing.filter(m => m.origIndex >= minMoveBlockOrigIndex);
+
+      console.log(`[DEBUG] Gap ${key} at boundary ${boundaryIdx}: moveBlock origIndices=${moveBlockOrigIndices.join(',')}, missing before=${missingBefore.map(m => `${m.token.raw}(${m.origIndex})`).join(', ')}, missing after=${missingAfter.map(m => `${m.token.raw}(${m.origIndex})`).join(', ')}`);
+
+      // If there are no moveBlocks for this gap, we cannot determine correct position
+      // These missing tokens will be shown inline with user tokens instead
+      if(moveBlockOrigIndices.length === 0){
+        console.log(`[DEBUG] Skipping gap ${key} - no moveBlocks to anchor missing tokens`);
+        return;
+      }
+
+      // Insert missing tokens BEFORE anchor (those with origIndex < moveBlock origIndex)
+      missingBefore.forEach(miss=>{
+        const isPunc = isPunctuation(miss.token.raw);
+        const missSpan = document.createElement('span');
+        missSpan.className = isPunc ? 'dictation-missing-token dictation-missing-punctuation' : 'dictation-missing-token';
+        const word = document.createElement('span');
+        word.className = 'dictation-missing-word';
+        word.textContent = miss.token.raw;
+        missSpan.appendChild(word);
+        // Only add caret if NOT punctuation
+        if (!isPunc) {
+          const caret = document.createElement('span');
+          caret.className = 'dictation-missing-caret';
+          missSpan.appendChild(caret);
+        }
+        line.appendChild(missSpan);
+        console.log(`[DEBUG] Inserted missing token BEFORE anchor: ${miss.token.raw} (orig_${miss.origIndex})${isPunc ? ' [PUNCTUATION]' : ''}`);
+      });
+
+      // Insert anchor for move blocks
+      const anchor = document.createElement('span');
+      anchor.className = 'dictation-gap-anchor';
+      anchor.dataset.gapAnchor = key;
+      const mark = document.createElement('span');
+      mark.className = 'dictation-gap-mark';
+      anchor.appendChild(mark);
+      line.appendChild(anchor);
+
+      // Insert missing tokens AFTER anchor (those with origIndex >= moveBlock origIndex)
+      missingAfter.forEach(miss=>{
+        const isPunc = isPunctuation(miss.token.raw);
+        const missSpan = document.createElement('span');
+        missSpan.className = isPunc ? 'dictation-missing-token dictation-missing-punctuation' : 'dictation-missing-token';
+        const word = document.createElement('span');
+        word.className = 'dictation-missing-word';
+        word.textContent = miss.token.raw;
+        missSpan.appendChild(word);
+        // Only add caret if NOT punctuation
+        if (!isPunc) {
+          const caret = document.createElement('span');
+          caret.className = 'dictation-missing-caret';
+          missSpan.appendChild(caret);
+        }
+        line.appendChild(missSpan);
+        console.log(`[DEBUG] Inserted missing token AFTER anchor: ${miss.token.raw} (orig_${miss.origIndex})${isPunc ? ' [PUNCTUATION]' : ''}`);
+      });
+    });
+  };
+
+  insertAnchors(0);
+  const meta = comparison.movePlan.tokenMeta || [];
+
+  // Build mapping: for each user position, which missing tokens should come AFTER it
+  // This is ONLY for gaps with no moveBlocks (otherwise they're handled by anchor)
+  const gapsWithMoveBlocks = new Set();
+  comparison.movePlan.moveBlocks.forEach(block => {
+    gapsWithMoveBlocks.add(block.targetGapKey);
+  });
+
+  const missingAfterUserPos = new Map();
+  filteredMissingTokens.forEach(item => {
+    // Skip if this missing token's gap has moveBlocks (will be handled by anchor)
+    if(gapsWithMoveBlocks.has(item.gapKey)){
+      return;
+    }
+
+    // Find which user token this missing token should come after
+    // It should go after the last user token that has origIndex < item.origIndex
+    let afterUserIdx = -1;
+    for(let i = 0; i < comparison.userTokens.length; i++){
+      const userMeta = meta[i];
+      if(userMeta && userMeta.match && userMeta.match.origIndex < item.origIndex){
+        afterUserIdx = i;
+      }
+    }
+    if(!missingAfterUserPos.has(afterUserIdx)){
+      missingAfterUserPos.set(afterUserIdx, []);
+    }
+    missingAfterUserPos.get(afterUserIdx).push(item);
+  });
+
+  // Sort missing tokens by origIndex for each position
+  missingAfterUserPos.forEach((tokens, pos) => {
+    tokens.sort((a, b) => a.origIndex - b.origIndex);
+  });
+
+  let idx = 0;
+  let renderedPos = 0; // Track actual rendered position (excluding moved blocks)
+  while(idx < comparison.userTokens.length){
+    const token = comparison.userTokens[idx];
+    const metaInfo = meta[idx] || {};
+    if(metaInfo.rewriteGroupId){
+      const group = comparison.movePlan.rewriteGroups.find(r=>r.id === metaInfo.rewriteGroupId);
+      const start = group ? group.start : idx;
+      const end = group ? group.end : idx;
+      const segmentTokens = comparison.userTokens.slice(start, end + 1).map(t=>t.raw).join(' ');
+      const rewriteEl = document.createElement('span');
+      rewriteEl.className = 'dictation-rewrite-block';
+      // NOTE: Rewrite blocks don't need arrows - they show the correction inline
+      // Do NOT set data-target-gap here
+      const corrected = document.createElement('span');
+      corrected.className = 'dictation-rewrite-correct';
+      corrected.textContent = group ? group.correctText : '';
+      const original = document.createElement('span');
+      original.className = 'dictation-rewrite-original';
+      original.textContent = segmentTokens;
+      rewriteEl.appendChild(corrected);
+      rewriteEl.appendChild(original);
+      line.appendChild(rewriteEl);
+      idx = end + 1;
+      renderedPos++; // Rewrite block counts as one position
+      insertAnchors(renderedPos);
+      continue;
+    }
+    if(metaInfo.moveBlockId){
+      const block = comparison.movePlan.moveBlocks.find(b=>b.id === metaInfo.moveBlockId);
+      // Skip if block was filtered out (doesn't actually need to move)
+      if(!block){
+        const span = createTokenSpan(token, metaInfo);
+        line.appendChild(span);
+        idx++;
+        renderedPos++;
+        insertAnchors(renderedPos);
+        continue;
+      }
+      const blockEl = document.createElement('span');
+      blockEl.className = 'dictation-move-block';
+      blockEl.dataset.targetGap = metaInfo.targetGapKey;
+      block.tokens.forEach(tIdx=>{
+        const tMeta = meta[tIdx] || {};
+        const t = comparison.userTokens[tIdx];
+        const span = createTokenSpan(t, tMeta);
+        span.classList.add('dictation-token-move');
+        blockEl.appendChild(span);
+      });
+      line.appendChild(blockEl);
+      idx = block.end + 1;
+      // Move blocks don't add to renderedPos - they're moved elsewhere
+      continue;
+    }
+    const span = createTokenSpan(token, metaInfo);
+    line.appendChild(span);
+
+    // Insert missing tokens that should come AFTER this user token
+    const missingAfter = missingAfterUserPos.get(idx) || [];
+    missingAfter.forEach(miss => {
+      const isPunc = isPunctuation(miss.token.raw);
+      const missSpan = document.createElement('span');
+      missSpan.className = isPunc ? 'dictation-missing-token dictation-missing-punctuation' : 'dictation-missing-token';
+      const word = document.createElement('span');
+      word.className = 'dictation-missing-word';
+      word.textContent = miss.token.raw;
+      missSpan.appendChild(word);
+      // Only add caret if NOT punctuation
+      if (!isPunc) {
+        const caret = document.createElement('span');
+        caret.className = 'dictation-missing-caret';
+        missSpan.appendChild(caret);
+      }
+      line.appendChild(missSpan);
+      console.log(`[DEBUG] Inserted missing token inline AFTER user token ${idx}: ${miss.token.raw} (orig_${miss.origIndex})${isPunc ? ' [PUNCTUATION]' : ''}`);
+    });
+
+    idx++;
+    renderedPos++;
+    insertAnchors(renderedPos);
+  }
+  row.appendChild(label);
+  row.appendChild(line);
+  return row;
+}
+
+function buildCorrectLine(comparison){
+  const row = document.createElement('div');
+  row.className = 'dictation-comparison-row';
+  const label = document.createElement('div');
+  label.className = 'dictation-comparison-label';
+  label.textContent = 'Correct answer:';
+  const line = document.createElement('div');
+  line.className = 'dictation-line dictation-line-correct';
+  comparison.originalTokens.forEach((token, idx)=>{
+    const span = document.createElement('span');
+    span.className = 'dictation-token dictation-token-ok';
+    span.textContent = token.raw;
+    line.appendChild(span);
+  });
+
+  row.appendChild(label);
+  row.appendChild(line);
+  return row;
+}
+
+function createTokenSpan(token, meta){
+  const wrapper = document.createElement('span');
+  wrapper.className = 'dictation-token';
+
+  const hasError = meta && meta.hasError;
+  if(hasError){
+    wrapper.classList.add('dictation-token-has-correction');
+    const correction = document.createElement('span');
+    correction.className = 'dictation-token-correction';
+    correction.textContent = meta && meta.match ? meta.match.origToken.raw : '';
+    wrapper.appendChild(correction);
+  }
+
+  const inner = document.createElement('span');
+  inner.className = 'dictation-token-inner';
+  inner.textContent = token.raw;
+
+  // Apply state classes to inner to keep backgrounds on the user row only
+  if(meta && meta.match && meta.inLis && !hasError){
+    inner.classList.add('dictation-token-ok');
+  }
+  if(meta && meta.needsMove){
+    inner.classList.add('dictation-token-move');
+  }
+  if(!meta || (!meta.match && !meta.hasError && !meta.moveBlockId && !meta.rewriteGroupId)){
+    inner.classList.add('dictation-token-extra');
+  }
+
+  // Colors: user text always white; corrections are red; strikethrough is red over white text
+  inner.classList.add('dictation-token-user');
+  if(hasError){
+    inner.classList.add('dictation-token-wrong-text');
+  }
+
+  wrapper.appendChild(inner);
+  return wrapper;
+}
+
+function drawDictationArrows(container){
+  const svgNS = 'http://www.w3.org/2000/svg';
+  const old = container.querySelector('.dictation-arrow-layer');
+  if(old){
+    old.remove();
+  }
+  const blocks = container.querySelectorAll('[data-target-gap]');
+  const anchors = container.querySelectorAll('[data-gap-anchor]');
+  if(!blocks.length || !anchors.length){
+    return;
+  }
+  const svg = document.createElementNS(svgNS, 'svg');
+  svg.classList.add('dictation-arrow-layer');
+  svg.setAttribute('width', container.offsetWidth);
+  svg.setAttribute('height', container.offsetHeight);
+  svg.setAttribute('viewBox', `0 0 ${container.offsetWidth} ${container.offsetHeight}`);
+  const containerRect = container.getBoundingClientRect();
+  blocks.forEach(block=>{
+    const gapKey = block.dataset.targetGap;
+    const target = container.querySelector(`[data-gap-anchor="${gapKey}"]`);
+    if(!target){
+      return;
+    }
+    const blockRect = block.getBoundingClientRect();
+    const targetRect = target.getBoundingClientRect();
+
+    // Start: top center of the block that needs to move
+    const startX = blockRect.left + (blockRect.width / 2) - containerRect.left;
+    const startY = blockRect.top - containerRect.top;
+
+    // End: center of target anchor
+    const endX = targetRect.left + (targetRect.width / 2) - containerRect.left;
+    const endY = targetRect.top + (targetRect.height / 2) - containerRect.top;
+
+    // Calculate distances
+    const horizontalDist = Math.abs(endX - startX);
+    const verticalDist = Math.abs(endY - startY);
+    const totalDistance = Math.sqrt(horizontalDist * horizontalDist + verticalDist * verticalDist);
+
+    // Horizontal control points direction
+    const direction = Math.sign(endX - startX);
+
+    // Check if multiline (words on different lines)
+    const isMultiline = verticalDist > 30;
+
+    let cx1, cy1, cx2, cy2, arcHeight;
+
+    if (isMultiline) {
+      // MULTILINE: Use S-curve for vertical transitions
+      // Dynamic arc height based on total distance
+      arcHeight = Math.max(20, totalDistance * 0.25);
+
+      // S-curve with two bends
+      cx1 = startX + direction * horizontalDist * 0.3;
+      cy1 = startY - arcHeight * 0.6;
+      cx2 = endX - direction * horizontalDist * 0.2;
+      cy2 = endY - arcHeight * 0.8;
+    } else {
+      // SINGLE LINE: Shallow arc parallel to text (original behavior)
+      arcHeight = 20;
+
+      // First control point - small rise above text
+      cy1 = startY - arcHeight;
+      // Second control point - EXACTLY ABOVE endX at same height
+      // This creates vertical 90 drop
+      cy2 = startY - arcHeight;
+
+      // First control point at 40% of the way
+      cx1 = startX + direction * horizontalDist * 0.4;
+      // Second control point EXACTLY ABOVE endX (same X-coordinate!)
+      // This forces arrow to drop vertically at 90
+      cx2 = endX;
+    }
+
+    // Draw smooth curved path
+    const p = document.createElementNS(svgNS, 'path');
+    const d = `M ${startX} ${startY} C ${cx1} ${cy1}, ${cx2} ${cy2}, ${endX} ${endY}`;
+    p.setAttribute('d', d);
+    p.setAttribute('fill', 'none');
+    p.setAttribute('stroke', '#ef4444');
+    p.setAttribute('stroke-width', '2.5');
+    p.setAttribute('stroke-linecap', 'round');
+    svg.appendChild(p);
+
+    // Professional arrowhead using cubic Bezier derivative at t=0.95 (closer to endpoint for precise landing)
+    const t = 0.95;
+    const mt = 1 - t;
+    const mt2 = mt * mt;
+    const mt3 = mt2 * mt;
+    const t2 = t * t;
+    const t3 = t2 * t;
+
+    // Cubic Bezier derivative: B'(t) = 3(1-t)?(P1-P0) + 6(1-t)t(P2-P1) + 3t?(P3-P2)
+    const dx = 3*mt2*(cx1 - startX) + 6*mt*t*(cx2 - cx1) + 3*t2*(endX - cx2);
+    const dy = 3*mt2*(cy1 - startY) + 6*mt*t*(cy2 - cy1) + 3*t2*(endY - cy2);
+
+    const mag = Math.hypot(dx, dy) || 1;
+    const ux = dx / mag;
+    const uy = dy / mag;
+
+    // Larger, more visible arrowhead
+    const arrowLength = 12;
+    const arrowWidth = 5;
+
+    const tipX = endX;
+    const tipY = endY;
+    const baseX = tipX - ux * arrowLength;
+    const baseY = tipY - uy * arrowLength;
+
+    // Perpendicular vector for arrow wings
+    const perpX = -uy;
+    const perpY = ux;
+
+    const leftX = baseX + perpX * arrowWidth;
+    const leftY = baseY + perpY * arrowWidth;
+    const rightX = baseX - perpX * arrowWidth;
+    const rightY = baseY - perpY * arrowWidth;
+
+    const poly = document.createElementNS(svgNS, 'polygon');
+    poly.setAttribute('points', `${tipX},${tipY} ${leftX},${leftY} ${rightX},${rightY}`);
+    poly.setAttribute('fill', '#ef4444');
+    poly.setAttribute('stroke', 'none');
+    svg.appendChild(poly);
+  });
+  container.appendChild(svg);
+}
+
+export { compareTexts, renderComparisonResult };
@@ -0,0 +1,116 @@
+// Web Push subscription for due-card reminders. Loaded by flashcards.js when the page is idle.
+export function createPush({ baseurl, debugLog, interfaceLang }){
+    const PUSH_SUBSCRIPTION_KEY = 'flashcards_push_subscribed';
+
+    async function initPushNotifications() {
+      if (!('serviceWorker' in navigator) || !('PushManager' in window)) {
+        debugLog('[Push] Push notifications not supported');
+        return;
+      }
+
+      // Check if already subscribed
+      const alreadySubscribed = localStorage.getItem(PUSH_SUBSCRIPTION_KEY) === 'true';
+      if (alreadySubscribed) {
+        debugLog('[Push] Already subscribed');
+        return;
+      }
+
+      // Wait a bit before showing permission request (not immediately on load)
+      // Only ask after user has used the app for a while
+      const visitCount = parseInt(localStorage.getItem('flashcards_visit_count') || '0', 10);
+      localStorage.setItem('flashcards_visit_count', String(visitCount + 1));
+
+      // Ask for permission after 3rd visit
+      if (visitCount < 3) {
+        debugLog('[Push] Waiting for more visits before asking for permission');
+        return;
+      }
+
+      // Check current permission state
+      if (Notification.permission === 'denied') {
+        debugLog('[Push] Notification permission denied');
+        return;
+      }
+
+      // If permission not yet granted, we'll need to ask
+      // For now, we auto-subscribe if permission is already granted
+      if (Notification.permission === 'granted') {
+        await subscribeToPush();
+      }
+    }
+
+    async function subscribeToPush() {
+      try {
+        // Get VAPID public key from server
+        const vapidResp = await fetch(baseurl + 'ajax.php?cmid=0&action=get_vapid_key&sesskey=' + M.cfg.sesskey);
+        const vapidData = await vapidResp.json();
+
+        if (!vapidData.ok || !vapidData.data?.publicKey) {
+          debugLog('[Push] VAPID key not available');
+          return;
+        }
+
+        const vapidPublicKey = vapidData.data.publicKey;
+
+        // Get service worker registration
+        const registration = await navigator.serviceWorker.ready;
+
+        // Subscribe to push
+        const subscription = await registration.pushManager.subscribe({
+          userVisibleOnly: true,
+          applicationServerKey: urlBase64ToUint8Array(vapidPublicKey)
+        });
+
+        // Send subscription to server
+        const lang = interfaceLang() || 'en';
+        const resp = await fetch(baseurl + 'ajax.php?cmid=0&action=push_subscribe&sesskey=' + M.cfg.sesskey, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({
+            subscription: subscription.toJSON(),
+            lang: lang
+          })
+        });
+
+        const result = await resp.json();
+        if (result.ok) {
+          localStorage.setItem(PUSH_SUBSCRIPTION_KEY, 'true');
+          debugLog('[Push] Subscribed successfully');
+        } else {
+          debugLog('[Push] Subscription failed:', result);
+        }
+      } catch (err) {
+        debugLog('[Push] Error subscribing:', err);
+      }
+    }
+
+    async function updatePushSubscriptionLang(newLang) {
+      if (localStorage.getItem(PUSH_SUBSCRIPTION_KEY) !== 'true') {
+        return;
+      }
+
+      try {
+        await fetch(baseurl + 'ajax.php?cmid=0&action=push_update_lang&sesskey=' + M.cfg.sesskey, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ lang: newLang })
+        });
+        debugLog('[Push] Language updated to:', newLang);
+      } catch (err) {
+        debugLog('[Push] Error updating language:', err);
+      }
+    }
+
+    function urlBase64ToUint8Array(base64String) {
+      const padding = '='.repeat((4 - base64String.length % 4) % 4);
+      const base64 = (base64String + padding).replace(/-/g, '+').replace(/_/g, '/');
+      const rawData = window.atob(base64);
+      const outputArray = new Uint8Array(rawData.length);
+      for (let i = 0; i < rawData.length; ++i) {
+        outputArray[i] = rawData.charCodeAt(i);
+      }
+      return outputArray;
+    }
+
+    return { initPushNotifications, updatePushSubscriptionLang };
+}
@@ -24,9 +24,16 @@ class access_manager {
     /** Grace period: 30 days */
     const GRACE_PERIOD_DAYS = 30;
 
+    /** Access rows written per bulk UPDATE */
+    const BULK_CHUNK = 1000;
+
     /**
      * Check user's access to flashcards system
      *
+     * The result is kept for a few minutes in the access_status cache (per user), so the
+     * request path does not read flashcards_user_access on every call. A forced refresh
+     * and the nightly bulk refresh replace or drop the cached entry.
+     *
      * @param int $userid User ID
      * @param bool $forcerefresh Force refresh from database (skip cache)
      * @return array ['can_create' => bool, 'can_review' => bool, 'can_view' => bool, 'status' => string, 'days_remaining' => int]
@@ -56,6 +63,14 @@ class access_manager {
             ];
         }
 
+        $cache = \cache::make('mod_flashcards', 'access_status');
+        if (!$forcerefresh) {
+            $cached = $cache->get($userid);
+            if (is_array($cached)) {
+                return $cached;
+            }
+        }
+
         // Get or create access record.
         $access = $DB->get_record('flashcards_user_access', ['userid' => $userid]);
 
@@ -74,7 +89,9 @@ class access_manager {
         }
 
         // Calculate permissions based on status.
-        return self::calculate_permissions($access);
+        $result = self::calculate_permissions($access);
+        $cache->set($userid, $result);
+        return $result;
     }
 
     /**
@@ -120,39 +137,9 @@ class access_manager {
         global $DB;
 
         $now = time();
-        $hasaccess = self::has_active_enrolment($userid);
-
-        // State machine for access status.
-        if ($hasaccess) {
-            // User has active enrolment → set to active.
-            $access->status = self::STATUS_ACTIVE;
-            // Moodle requires 0 instead of null for nullable int fields
-            $access->grace_period_start = 0;
-            $access->blocked_at = 0;
-        } else {
-            // No active enrolment.
-            if ($access->status === self::STATUS_ACTIVE) {
-                // Transition: active → grace.
-                $access->status = self::STATUS_GRACE;
-                $access->grace_period_start = $now;
-                self::send_notification($userid, 'grace_period_started');
-            } else if ($access->status === self::STATUS_GRACE) {
-                // Check if grace period expired.
-                $graceend = $access->grace_period_start + ($access->grace_period_days * 86400);
-                if ($now > $graceend) {
-                    // Transition: grace → expired.
-                    $access->status = self::STATUS_EXPIRED;
-                    $access->blocked_at = $now;
-                    self::send_notification($userid, 'access_expired');
-                } else {
-                    // Still in grace period - check if warning needed.
-                    $daysleft = ceil(($graceend - $now) / 86400);
-                    if ($daysleft == 7) {
-                        self::send_notification($userid, 'access_expiring_soon');
-                    }
-                }
-            }
-            // If already expired, stay expired.
+        $notification = self::apply_transition($access, self::has_active_enrolment($userid), $now);
+        if ($notification !== null) {
+            \mod_flashcards\task\send_access_notification::queue((int)$userid, $notification);
         }
 
         $access->last_enrolment_check = $now;
@@ -171,6 +158,83 @@ class access_manager {
         return $access;
     }
 
+    /**
+     * Access state machine: move a record to its next status for the current enrolment state
+     *
+     * @param stdClass $access Access record, updated in place (status, grace_period_start, blocked_at)
+     * @param bool $hasaccess User has an active enrolment in a flashcards course
+     * @param int $now
+     * @return string|null Notification type to send, if any
+     */
+    private static function apply_transition($access, $hasaccess, $now) {
+        if ($hasaccess) {
+            // User has active enrolment → set to active.
+            $access->status = self::STATUS_ACTIVE;
+            // Moodle requires 0 instead of null for nullable int fields
+            $access->grace_period_start = 0;
+            $access->blocked_at = 0;
+            return null;
+        }
+
+        // No active enrolment.
+        if ($access->status === self::STATUS_ACTIVE) {
+            // Transition: active → grace.
+            $access->status = self::STATUS_GRACE;
+            $access->grace_period_start = $now;
+            return 'grace_period_started';
+        }
+        if ($access->status === self::STATUS_GRACE) {
+            // Check if grace period expired.
+            $graceend = $access->grace_period_start + ($access->grace_period_days * 86400);
+            if ($now > $graceend) {
+                // Transition: grace → expired.
+                $access->status = self::STATUS_EXPIRED;
+                $access->blocked_at = $now;
+                return 'access_expired';
+            }
+            // Still in grace period - check if warning needed.
+            $daysleft = ceil(($graceend - $now) / 86400);
+            if ($daysleft == 7) {
+                return 'access_expiring_soon';
+            }
+        }
+        // If already expired, stay expired.
+        return null;
+    }
+
+    /**
+     * Users tracked in flashcards_user_access as active or grace who have an active
+     * enrolment in a flashcards course (same rules as has_active_enrolment), in one query
+     *
+     * @return array userid => true
+     */
+    private static function tracked_users_with_active_enrolment() {
+        global $DB;
+
+        $now = time();
+        $sql = "SELECT DISTINCT ue.userid
+                FROM {user_enrolments} ue
+                JOIN {enrol} e ON e.id = ue.enrolid
+                JOIN {course_modules} cm ON cm.course = e.courseid
+                JOIN {modules} m ON m.id = cm.module
+                JOIN {flashcards_user_access} a ON a.userid = ue.userid
+                WHERE a.status IN (:active, :grace)
+                  AND ue.status = 0
+                  AND e.status = 0
+                  AND m.name = 'flashcards'
+                  AND (ue.timestart = 0 OR ue.timestart <= :now1)
+                  AND (ue.timeend = 0 OR ue.timeend > :now2)";
+
+        $userids = $DB->get_fieldset_sql($sql, [
+            'active' => self::STATUS_ACTIVE,
+            'grace' => self::STATUS_GRACE,
+            'now1' => $now,
+            'now2' => $now
+        ]);
+
+        return array_fill_keys(array_map('intval', $userids), true);
+    }
+
     /**
      * Check if user has active enrolment in any flashcards-enabled course
      *
@@ -279,12 +343,12 @@ class access_manager {
     }
 
     /**
-     * Send notification to user
+     * Send notification to user (run by the send_access_notification adhoc task)
      *
      * @param int $userid
      * @param string $type Notification type (grace_period_started | access_expiring_soon | access_expired)
      */
-    private static function send_notification($userid, $type) {
+    public static function send_notification($userid, $type) {
         global $DB;
 
         $user = $DB->get_record('user', ['id' => $userid]);
@@ -328,28 +392,67 @@ class access_manager {
     /**
      * Bulk refresh all users' access status (called by scheduled task)
      *
-     * @return array Statistics: ['checked' => int, 'transitioned' => int]
+     * Active enrolment of every tracked user comes from one query; transitions are decided in
+     * memory and written with a few UPDATE ... WHERE id IN (...) statements per outcome, in
+     * chunks of BULK_CHUNK rows. Notifications are queued as adhoc tasks.
+     *
+     * @return array Statistics: ['checked' => int, 'transitioned' => int, 'notifications' => int]
      */
     public static function bulk_refresh_all_users() {
         global $DB;
 
-        $stats = ['checked' => 0, 'transitioned' => 0];
-
-        // Get all users with active or grace status.
-        $users = $DB->get_records_select('flashcards_user_access',
+        $stats = ['checked' => 0, 'transitioned' => 0, 'notifications' => 0];
+        $now = time();
+        $enrolled = self::tracked_users_with_active_enrolment();
+
+        // Row ids per outcome: unchanged rows only get the check time, changed rows get the
+        // new status fields (all transitions of one run share $now, so there are few outcomes).
+        $outcomes = [];
+        $notifications = [];
+        $transitioned = [];
+        $rs = $DB->get_recordset_select('flashcards_user_access',
             "status IN (?, ?)",
-            [self::STATUS_ACTIVE, self::STATUS_GRACE]);
-
-        foreach ($users as $access) {
-            $oldstatus = $access->status;
-            $access = self::refresh_user_status($access->userid, $access);
+            [self::STATUS_ACTIVE, self::STATUS_GRACE],
+            'id',
+            'id, userid, status, grace_period_days, grace_period_start, blocked_at');
+        foreach ($rs as $access) {
+            $before = [$access->status, (int)$access->grace_period_start, (int)$access->blocked_at];
+            $notification = self::apply_transition($access, isset($enrolled[(int)$access->userid]), $now);
+            $after = [$access->status, (int)$access->grace_period_start, (int)$access->blocked_at];
+            $outcomes[$before === $after ? '' : implode('|', $after)][] = (int)$access->id;
+            if ($notification !== null) {
+                $notifications[] = [(int)$access->userid, $notification];
+            }
+            if ($before[0] !== $after[0]) {
+                $transitioned[] = (int)$access->userid;
+            }
             $stats['checked']++;
-
-            if ($oldstatus !== $access->status) {
-                $stats['transitioned']++;
+        }
+        $rs->close();
+
+        foreach ($outcomes as $outcome => $ids) {
+            $set = 'last_enrolment_check = :checked, timemodified = :modified';
+            $params = ['checked' => $now, 'modified' => $now];
+            if ($outcome !== '') {
+                [$status, $gracestart, $blockedat] = explode('|', $outcome);
+                $set .= ', status = :status, grace_period_start = :gracestart, blocked_at = :blockedat';
+                $params += ['status' => $status, 'gracestart' => (int)$gracestart, 'blockedat' => (int)$blockedat];
+            }
+            foreach (array_chunk($ids, self::BULK_CHUNK) as $chunk) {
+                [$insql, $inparams] = $DB->get_in_or_equal($chunk, SQL_PARAMS_NAMED, 'ua');
+                $DB->execute("UPDATE {flashcards_user_access} SET {$set} WHERE id {$insql}", $params + $inparams);
             }
         }
 
+        foreach ($notifications as [$userid, $type]) {
+            \mod_flashcards\task\send_access_notification::queue($userid, $type);
+        }
+        if ($transitioned) {
+            \cache::make('mod_flashcards', 'access_status')->delete_many($transitioned);
+        }
+
+        $stats['transitioned'] = count($transitioned);
+        $stats['notifications'] = count($notifications);
         return $stats;
     }
 }
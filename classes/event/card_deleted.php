@@ -0,0 +1,58 @@
+<?php
+/**
+ * Card deleted event.
+ *
+ * @package    mod_flashcards
+ * @copyright  2025
+ * @license    http://www.gnu.org/copyleft/gpl.html GNU GPL v3 or later
+ */
+
+namespace mod_flashcards\event;
+
+defined('MOODLE_INTERNAL') || die();
+
+/**
+ * Triggered when a card is removed from flashcards_cards.
+ *
+ * other: deckid (int) and cardid (string) of the card.
+ */
+class card_deleted extends \core\event\base {
+
+    /**
+     * Init method.
+     */
+    protected function init() {
+        $this->data['crud'] = 'd';
+        $this->data['edulevel'] = self::LEVEL_PARTICIPATING;
+        $this->data['objecttable'] = 'flashcards_cards';
+    }
+
+    /**
+     * Returns localised event name.
+     *
+     * @return string
+     */
+    public static function get_name() {
+        return get_string('event_card_deleted', 'mod_flashcards');
+    }
+
+    /**
+     * Returns non-localised description.
+     *
+     * @return string
+     */
+    public function get_description() {
+        return "The user with id '{$this->userid}' deleted the card '{$this->other['cardid']}' "
+            . "of deck '{$this->other['deckid']}'.";
+    }
+
+    /**
+     * Validates the custom data.
+     */
+    protected function validate_data() {
+        parent::validate_data();
+        if (!isset($this->other['deckid']) || !isset($this->other['cardid'])) {
+            throw new \coding_exception('The \'deckid\' and \'cardid\' values must be set in other.');
+        }
+    }
+}
@@ -856,6 +856,10 @@ USERPROMPT;
         if (!$words) {
             return null;
         }
+        // Resolve the whole phrase with one pron_dict query.
+        pronunciation_manager::prefetch(array_map(function($word) {
+            return self::strip_articles_and_markers($word);
+        }, $words));
 
         $transcriptions = [];
         $foundAny = false;
@@ -1287,8 +1291,29 @@ USERPROMPT;
         return trim($text ?? '');
     }
 
-    public function check_norwegian_text(string $text, string $language, int $userid): array {
+    /**
+     * Check a learner text sentence by sentence, reusing the results of unchanged sentences.
+     *
+     * The text is split at spaCy's sentence boundaries. Each sentence's check_norwegian_text()
+     * result is kept in the 'text_check' cache, keyed by the normalised sentence, the
+     * explanation language and the checker configuration (model, sampling settings, prompts),
+     * so after an edit only the changed sentences reach the model. When several sentences are
+     * new, their first-stage requests are sent together and check_norwegian_text() finds the
+     * answers in the AI answer cache. The sentence results are reassembled into one answer for
+     * the whole text; every error gets 'sentence' (index) and 'start'/'end' (character offsets
+     * in the checked text).
+     *
+     * @param string $text
+     * @param string $language Interface language for explanations
+     * @param int $userid
+     * @return array Same shape as check_norwegian_text(), plus per-sentence debugTiming
+     */
+    public function check_text_by_sentence(string $text, string $language, int $userid): array {
         $text = $this->normalize_whitespace_simple($text);
+        if ($text === '' || !$this->openai->is_enabled()) {
+            return $this->check_norwegian_text($text, $language, $userid);
+        }
+        $overallstart = microtime(true);
         $languagemap = [
             'uk' => 'Ukrainian',
             'ru' => 'Russian',
@@ -1296,11 +1321,229 @@ USERPROMPT;
             'no' => 'Norwegian',
         ];
         $langname = $languagemap[$language] ?? 'English';
-        $debugtiming = [];
-        $overallstart = microtime(true);
-        $totalUsage = []; // Accumulate token usage across all API calls
+        $config = get_config('mod_flashcards');
+        $reflection = new \ReflectionClass($this->openai);
+        $getModelMethod = $reflection->getMethod('get_model_for_task');
+        $getModelMethod->setAccessible(true);
+        $model = $getModelMethod->invoke($this->openai, 'correction');
 
-        // First request: Find errors
+        $t0 = microtime(true);
+        $sentences = $this->split_sentences($text);
+        $debugtiming = ['split' => microtime(true) - $t0, 'sentences' => count($sentences)];
+
+        $signature = sha1(json_encode([
+            $model,
+            !empty($config->ai_multisampling_enabled),
+            (int)($config->ai_multisampling_quorum ?? 2),
+            !empty($config->ai_doublecheck_correction),
+            $this->text_check_prompts('', $langname),
+        ], JSON_UNESCAPED_UNICODE));
+        $keys = [];
+        foreach ($sentences as $i => $sentence) {
+            $keys[$i] = sha1($language . "\n" . $signature . "\n" . $sentence['text']);
+        }
+        $cache = \cache::make('mod_flashcards', 'text_check');
+        $results = [];
+        foreach ($cache->get_many(array_values(array_unique($keys))) as $key => $cached) {
+            if (is_array($cached)) {
+                $results[$key] = $cached;
+            }
+        }
+        $missing = [];
+        foreach ($keys as $i => $key) {
+            if (!isset($results[$key]) && !isset($missing[$key])) {
+                $missing[$key] = $i;
+            }
+        }
+        $debugtiming['cachedSentences'] = count($sentences) - count(array_intersect($keys, array_keys($missing)));
+        $debugtiming['checkedSentences'] = count($missing);
+
+        $totalUsage = [];
+        $recordMethod = $reflection->getMethod('record_usage');
+        $recordMethod->setAccessible(true);
+        // Several new sentences: send their first-stage requests together (single-request strategy only).
+        $scheduler = $this->openai->scheduler();
+        if (count($missing) > 1 && empty($config->ai_multisampling_enabled)
+                && $scheduler->ttl('check_norwegian_text') > 0) {
+            $payloads = [];
+            foreach ($missing as $i) {
+                [$systemprompt, $userprompt] = $this->text_check_prompts($sentences[$i]['text'], $langname);
+                $payloads[$i] = $this->text_check_payload($this->openai, $model, $systemprompt, $userprompt);
+            }
+            $modelkey = core_text::strtolower(trim((string)$model));
+            $timeout = ($modelkey !== '' && $this->requires_default_temperature($modelkey)) ? 90 : 30;
+            $t0 = microtime(true);
+            foreach ($scheduler->send_many($payloads, 'check_norwegian_text', $timeout) as $result) {
+                if ($result['json'] !== null && isset($result['json']->usage)) {
+                    $recordMethod->invoke($this->openai, $userid, $result['json']->usage);
+                    $this->accumulate_usage($result['json']->usage, $totalUsage);
+                }
+            }
+            $debugtiming['prefetch'] = microtime(true) - $t0;
+        }
+
+        $persentence = [];
+        foreach ($missing as $key => $i) {
+            $t0 = microtime(true);
+            $result = $this->check_norwegian_text($sentences[$i]['text'], $language, $userid);
+            $persentence[$i] = microtime(true) - $t0;
+            if (!empty($result['usage']) && is_array($result['usage'])) {
+                $this->accumulate_usage((object)$result['usage'], $totalUsage);
+            }
+            // Failed checks come back without debugTiming; only real answers are kept.
+            $checked = isset($result['debugTiming']);
+            unset($result['usage'], $result['debugTiming']);
+            $results[$key] = $result;
+            if ($checked) {
+                $cache->set($key, $result);
+            }
+        }
+        $debugtiming['perSentence'] = $persentence;
+
+        $combined = $this->assemble_sentence_results($text, $sentences, array_map(function($key) use ($results) {
+            return $results[$key];
+        }, $keys));
+        $debugtiming['overall'] = microtime(true) - $overallstart;
+        $combined['debugTiming'] = $debugtiming;
+        if (!empty($totalUsage)) {
+            $combined['usage'] = $totalUsage;
+        }
+        return $combined;
+    }
+
+    /**
+     * Sentences of a text as spaCy splits them, with character offsets into the text.
+     *
+     * Falls back to the whole text as one sentence when spaCy is unavailable or its
+     * boundaries do not cover the text.
+     *
+     * @param string $text Whitespace-normalised text
+     * @return array<int,array{text:string,start:int,end:int}>
+     */
+    protected function split_sentences(string $text): array {
+        $whole = [['text' => $text, 'start' => 0, 'end' => core_text::strlen($text)]];
+        $spacy = new spacy_client();
+        if (!$spacy->is_enabled()) {
+            return $whole;
+        }
+        try {
+            $sents = $spacy->analyze_text($text)['sents'] ?? [];
+        } catch (Throwable $e) {
+            error_log('split_sentences: spaCy failed: ' . $e->getMessage());
+            return $whole;
+        }
+        $out = [];
+        $pos = 0;
+        foreach ($sents as $sent) {
+            $start = (int)($sent['start'] ?? -1);
+            $end = (int)($sent['end'] ?? -1);
+            if ($start < $pos || $end <= $start) {
+                return $whole;
+            }
+            $raw = core_text::substr($text, $start, $end - $start);
+            $sentence = trim($raw);
+            // Nothing but whitespace may fall between sentences.
+            if (trim(core_text::substr($text, $pos, $start - $pos)) !== '') {
+                return $whole;
+            }
+            if ($sentence === '') {
+                continue;
+            }
+            $start += core_text::strlen($raw) - core_text::strlen(ltrim($raw));
+            $out[] = ['text' => $sentence, 'start' => $start, 'end' => $start + core_text::strlen($sentence)];
+            $pos = $end;
+        }
+        if (!$out || trim(core_text::substr($text, $pos)) !== '') {
+            return $whole;
+        }
+        return $out;
+    }
+
+    /**
+     * Join per-sentence check results into the result for the whole text.
+     *
+     * @param string $text
+     * @param array $sentences From split_sentences()
+     * @param array $results check_norwegian_text() result per sentence, same order
+     * @return array
+     */
+    protected function assemble_sentence_results(string $text, array $sentences, array $results): array {
+        $corrected = '';
+        $alternative = '';
+        $suggestion = '';
+        $hassuggestion = false;
+        $errors = [];
+        $explanations = [];
+        $model = '';
+        $reasoning = '';
+        $pos = 0;
+        foreach ($sentences as $i => $sentence) {
+            $result = $results[$i];
+            $gap = core_text::substr($text, $pos, $sentence['start'] - $pos);
+            $pos = $sentence['end'];
+            $fixed = (string)($result['correctedText'] ?? $sentence['text']);
+            $corrected .= $gap . $fixed;
+            $alternative .= $gap . (string)($result['alternativeText'] ?? $fixed);
+            $suggestion .= $gap . (!empty($result['suggestion']) ? (string)$result['suggestion'] : $fixed);
+            $hassuggestion = $hassuggestion || !empty($result['suggestion']);
+            foreach ((array)($result['errors'] ?? []) as $error) {
+                if (!is_array($error)) {
+                    continue;
+                }
+                $error['sentence'] = $i;
+                $original = (string)($error['original'] ?? '');
+                $offset = $original !== '' ? core_text::strpos($sentence['text'], $original) : false;
+                if ($offset !== false) {
+                    $error['start'] = $sentence['start'] + $offset;
+                    $error['end'] = $error['start'] + core_text::strlen($original);
+                }
+                $errors[] = $error;
+            }
+            if (!empty($result['errors']) && trim((string)($result['explanation'] ?? '')) !== '') {
+                $explanations[] = trim((string)$result['explanation']);
+            }
+            $model = $model ?: (string)($result['model'] ?? '');
+            $reasoning = $reasoning ?: (string)($result['reasoning_effort'] ?? '');
+        }
+
+        if (!$errors) {
+            $first = $results[0] ?? [];
+            $combined = [
+                'hasErrors' => false,
+                'errors' => [],
+                'correctedText' => $text,
+                'alternativeText' => $text,
+                'explanation' => (string)($first['explanation'] ?? ''),
+            ];
+        } else {
+            $combined = [
+                'hasErrors' => true,
+                'errors' => $errors,
+                'correctedText' => $corrected,
+                'alternativeText' => $alternative,
+                'explanation' => implode(' ', $explanations),
+            ];
+        }
+        if ($hassuggestion) {
+            $combined['suggestion'] = $suggestion;
+        }
+        if ($model !== '') {
+            $combined['model'] = $model;
+        }
+        if ($reasoning !== '') {
+            $combined['reasoning_effort'] = $reasoning;
+        }
+        return $combined;
+    }
+
+    /**
+     * System and user prompt of the first text-check request for one sentence.
+     *
+     * @param string $text
+     * @param string $langname Language of the explanations
+     * @return array{0:string,1:string}
+     */
+    protected function text_check_prompts(string $text, string $langname): array {
         $systemprompt1 = <<<"SYSTEMPROMPT"
 You are a Norwegian (Bokm?l) language assistant.
 
@@ -1373,6 +1616,54 @@ Rules for JSON:
 - No comments, no extra text, no markdown, no backticks.
 Before you output your final answer, do a brief internal self-check to avoid unnecessary changes.
 USERPROMPT;
+        return [$systemprompt1, $userprompt1];
+    }
+
+    /**
+     * Payload of the single-request first stage of check_norwegian_text().
+     *
+     * @param openai_client $client
+     * @param string $model
+     * @param string $systemprompt
+     * @param string $userprompt
+     * @return array
+     */
+    protected function text_check_payload(openai_client $client, string $model, string $systemprompt, string $userprompt): array {
+        $payload = [
+            'model' => $model,
+            'temperature' => 0.3,
+            'messages' => [
+                ['role' => 'system', 'content' => $systemprompt],
+                ['role' => 'user', 'content' => $userprompt],
+            ],
+        ];
+        $reflection = new \ReflectionClass($client);
+        $requiresDefaultTempMethod = $reflection->getMethod('requires_default_temperature');
+        $requiresDefaultTempMethod->setAccessible(true);
+        if ($requiresDefaultTempMethod->invoke($client, core_text::strtolower(trim($model)))) {
+            $getReasoningMethod = $reflection->getMethod('get_reasoning_effort_for_task');
+            $getReasoningMethod->setAccessible(true);
+            $payload['reasoning_effort'] = $getReasoningMethod->invoke($client, 'correction');
+            unset($payload['temperature']);
+        }
+        return $payload;
+    }
+
+    public function check_norwegian_text(string $text, string $language, int $userid): array {
+        $text = $this->normalize_whitespace_simple($text);
+        $languagemap = [
+            'uk' => 'Ukrainian',
+            'ru' => 'Russian',
+            'en' => 'English',
+            'no' => 'Norwegian',
+        ];
+        $langname = $languagemap[$language] ?? 'English';
+        $debugtiming = [];
+        $overallstart = microtime(true);
+        $totalUsage = []; // Accumulate token usage across all API calls
+
+        // First request: Find errors
+        [$systemprompt1, $userprompt1] = $this->text_check_prompts($text, $langname);
         $client = new openai_client();
         if (!$client->is_enabled()) {
             return [
@@ -1406,9 +1697,14 @@ USERPROMPT;
                 ['temperature' => 0.2, 'weight' => 0.8],  // Creative
             ];
 
+            // Stop at the first $quorum agreeing samples (ai_multisampling_quorum, 0 = wait for all).
+            $quorum = isset($config->ai_multisampling_quorum) ? (int)$config->ai_multisampling_quorum : 2;
+
             $t1 = microtime(true);
-            $multisamplingResult = $this->request_parallel_curlmulti($requests, $systemprompt1, $userprompt1, $model, $userid);
+            $multisamplingResult = $this->request_parallel_curlmulti($requests, $systemprompt1, $userprompt1, $model,
+                $userid, $quorum);
             $debugtiming['api_stage1_multisampling'] = microtime(true) - $t1;
+            $debugtiming['multisampling_decision'] = $multisamplingResult['decision'] ?? null;
 
             // Extract responses and errors
             $responses = $multisamplingResult['responses'] ?? [];
@@ -1703,26 +1999,11 @@ USERPROMPT2;
         if (!$enableMultisampling) {
             // === ORIGINAL STRATEGY (single request) ===
         // STAGE 1: First API call - Find errors
-        $payload1 = [
-            'model' => $model,
-            'temperature' => 0.3,
-            'messages' => [
-                ['role' => 'system', 'content' => $systemprompt1],
-                ['role' => 'user', 'content' => $userprompt1],
-            ],
-        ];
-
-        $reasoningUsed = null;
+        $payload1 = $this->text_check_payload($client, $model, $systemprompt1, $userprompt1);
+        $reasoningUsed = $payload1['reasoning_effort'] ?? null;
         $modelkey = core_text::strtolower(trim($model));
         $requiresDefaultTempMethod = $reflection->getMethod('requires_default_temperature');
         $requiresDefaultTempMethod->setAccessible(true);
-        if ($requiresDefaultTempMethod->invoke($client, $modelkey)) {
-            $getReasoningMethod = $reflection->getMethod('get_reasoning_effort_for_task');
-            $getReasoningMethod->setAccessible(true);
-            $payload1['reasoning_effort'] = $getReasoningMethod->invoke($client, 'correction');
-            $reasoningUsed = $payload1['reasoning_effort'];
-            unset($payload1['temperature']);
-        }
 
         try {
             $method = $reflection->getMethod('request');
@@ -2362,16 +2643,23 @@ If NO constructions found, return empty constructions array.";
     }
 
     /**
-     * Execute multiple parallel requests with curl_multi (TRUE parallelism)
+     * Execute multiple parallel requests with curl_multi (TRUE parallelism) via llm_scheduler
+     *
+     * Responses are evaluated as they arrive. Once $quorum of them agree on correctedText and
+     * errors the remaining requests are cancelled and only the agreeing responses are returned;
+     * otherwise every response is returned for the full consensus merge.
      *
      * @param array $requests Array of ['temperature' => float, 'weight' => float]
      * @param string $systemprompt System prompt
      * @param string $userprompt User prompt
      * @param string $model Model to use
      * @param int $userid User ID for usage tracking
-     * @return array Array with 'responses' (parsed responses) and 'errors' (error details for debugging)
+     * @param int $quorum Agreeing responses that end sampling early (0 = wait for all)
+     * @return array Array with 'responses' (parsed responses), 'errors' (error details for debugging)
+     *               and 'decision' (quorum, earlyExit, timeToDecisionMs, cancelled, tokensUsed, tokensSaved)
      */
-    protected function request_parallel_curlmulti(array $requests, string $systemprompt, string $userprompt, string $model, int $userid): array {
+    protected function request_parallel_curlmulti(array $requests, string $systemprompt, string $userprompt, string $model,
+            int $userid, int $quorum = 0): array {
         $client = new openai_client();
 
         // Check if client is enabled
@@ -2382,22 +2670,6 @@ If NO constructions found, return empty constructions array.";
 
         $reflection = new \ReflectionClass($client);
 
-        // Get API key and base URL directly from config (same as openai_client constructor)
-        $config = get_config('mod_flashcards');
-        $apikey = trim($config->openai_apikey ?? '') ?: getenv('FLASHCARDS_OPENAI_KEY') ?: null;
-        $baseurl = trim($config->openai_baseurl ?? '');
-        if ($baseurl === '') {
-            $baseurl = 'https://api.openai.com/v1/chat/completions';
-        }
-
-        if (empty($apikey)) {
-            error_log('request_parallel_curlmulti: No API key available');
-            return [];
-        }
-
-        // Initialize curl_multi handle
-        $mh = curl_multi_init();
-        $handles = [];
         $payloads = [];
         $errors = []; // Collect error details for debugging
 
@@ -2407,14 +2679,10 @@ If NO constructions found, return empty constructions array.";
         $timeout = $useDefaultTemp ? 90 : 30; // Reasoning models are MUCH slower
 
         error_log('request_parallel_curlmulti: Starting with ' . count($requests) . ' requests');
-        error_log('request_parallel_curlmulti: API URL = ' . $baseurl);
         error_log('request_parallel_curlmulti: Model ' . $model . ' requires default temperature = ' .
                   ($useDefaultTemp ? 'YES (will use reasoning_effort)' : 'NO (will use temperature)'));
-        error_log('request_parallel_curlmulti: Timeout set to ' . $timeout . ' seconds');
 
-        // Create all curl handles
         foreach ($requests as $idx => $req) {
-            // Build base payload
             $payload = [
                 'model' => $model,
                 'messages' => [
@@ -2422,160 +2690,133 @@ If NO constructions found, return empty constructions array.";
                     ['role' => 'user', 'content' => $userprompt],
                 ],
             ];
-
-            // Add temperature OR reasoning_effort depending on model type
+            // Reasoning models (gpt-5-mini, gpt-5-nano, o1-mini) don't support temperature.
             if ($useDefaultTemp) {
-                // Reasoning models (gpt-5-mini, gpt-5-nano, o1-mini) don't support temperature
-                // Use reasoning_effort instead
                 $payload['reasoning_effort'] = 'medium';
-                error_log('request_parallel_curlmulti [req ' . $idx . ']: reasoning_effort=medium (reasoning model)');
             } else {
-                // Regular models (gpt-4o-mini etc.) support temperature
                 $payload['temperature'] = $req['temperature'];
-                error_log('request_parallel_curlmulti [req ' . $idx . ']: temperature=' . $req['temperature']);
             }
-
             $payloads[$idx] = $payload;
-
-            $ch = curl_init($baseurl);
-            curl_setopt($ch, CURLOPT_RETURNTRANSFER, true);
-            curl_setopt($ch, CURLOPT_POST, true);
-            curl_setopt($ch, CURLOPT_POSTFIELDS, json_encode($payload, JSON_UNESCAPED_UNICODE));
-            curl_setopt($ch, CURLOPT_HTTPHEADER, [
-                'Content-Type: application/json',
-                'Authorization: Bearer ' . $apikey,
-            ]);
-            // Reasoning models are MUCH slower - need longer timeout
-            $timeout = $useDefaultTemp ? 90 : 30;
-            curl_setopt($ch, CURLOPT_TIMEOUT, $timeout);
-            curl_setopt($ch, CURLOPT_CONNECTTIMEOUT, 10);
-
-            curl_multi_add_handle($mh, $ch);
-            $handles[$idx] = $ch;
         }
 
-        // Execute all requests in parallel
-        $active = null;
-        do {
-            $status = curl_multi_exec($mh, $active);
-            if ($active) {
-                // Wait for activity on any curl connection
-                curl_multi_select($mh);
-            }
-        } while ($active && $status == CURLM_OK);
-
-        error_log('request_parallel_curlmulti: All requests completed, status = ' . $status);
+        // A quorum of all samples is the same as waiting for all of them.
+        $quorum = ($quorum > 0 && $quorum < count($payloads)) ? $quorum : 0;
+        $decision = [
+            'quorum' => $quorum,
+            'samples' => count($payloads),
+            'earlyExit' => false,
+            'timeToDecisionMs' => 0,
+            'cancelled' => 0,
+            'tokensUsed' => 0,
+            'tokensSaved' => 0,
+        ];
 
-        // Collect responses
         $responses = [];
+        $agreeing = [];
+        $answered = 0;
         $recordMethod = $reflection->getMethod('record_usage');
         $recordMethod->setAccessible(true);
-
-        foreach ($handles as $idx => $ch) {
-            try {
-                $response = curl_multi_getcontent($ch);
-                $info = curl_getinfo($ch);
-
-                // Check HTTP status
-                if (!empty($info['http_code']) && $info['http_code'] >= 400) {
-                    $errorDetail = [
-                        'request_index' => $idx,
-                        'http_code' => $info['http_code'],
-                        'error_body' => substr($response, 0, 500), // First 500 chars
-                        'payload' => $payloads[$idx],
-                    ];
-                    $errors[] = $errorDetail;
-
-                    error_log('Error in request_parallel_curlmulti (request ' . $idx . '): HTTP ' . $info['http_code']);
-                    error_log('Error response body: ' . substr($response, 0, 500));
-                    error_log('Request payload was: ' . json_encode($payloads[$idx], JSON_UNESCAPED_UNICODE));
-                    curl_multi_remove_handle($mh, $ch);
-                    curl_close($ch);
-                    continue;
-                }
-
-                if ($response === false || empty($response)) {
-                    $errorDetail = [
-                        'request_index' => $idx,
-                        'error_type' => 'empty_response',
-                        'curl_error' => curl_error($ch),
-                        'payload' => $payloads[$idx],
-                    ];
-                    $errors[] = $errorDetail;
-
-                    error_log('Error in request_parallel_curlmulti (request ' . $idx . '): Empty response');
-                    curl_multi_remove_handle($mh, $ch);
-                    curl_close($ch);
-                    continue;
-                }
-
-                // Parse JSON response
-                $json = json_decode($response);
-                if (!$json) {
-                    $errorDetail = [
-                        'request_index' => $idx,
-                        'error_type' => 'invalid_json',
-                        'response_preview' => substr($response, 0, 200),
-                        'payload' => $payloads[$idx],
-                    ];
-                    $errors[] = $errorDetail;
-
-                    error_log('Error in request_parallel_curlmulti (request ' . $idx . '): Invalid JSON');
-                    curl_multi_remove_handle($mh, $ch);
-                    curl_close($ch);
-                    continue;
-                }
-
-                // Record usage
-                if (isset($json->usage)) {
-                    $recordMethod->invoke($client, $userid, $json->usage);
-                }
-
-                // Extract content
-                $content = trim($json->choices[0]->message->content ?? '');
-                if ($content === '') {
-                    curl_multi_remove_handle($mh, $ch);
-                    curl_close($ch);
-                    continue;
-                }
-
-                // Parse JSON from content
-                $jsonMatch = null;
-                if (preg_match('~\{.*\}~s', $content, $m)) {
-                    $jsonMatch = $m[0];
-                }
-                $parsed = $jsonMatch ? json_decode($jsonMatch, true) : json_decode($content, true);
-
-                if (is_array($parsed) && isset($parsed['hasErrors'])) {
-                    $responses[$idx] = $parsed;
-                }
-            } catch (\Exception $e) {
-                $errorDetail = [
+        $start = microtime(true);
+        $onresult = function($idx, array $result) use ($client, $userid, $payloads, $quorum, $recordMethod, $start,
+                &$responses, &$errors, &$agreeing, &$answered, &$decision): bool {
+            if ($result['error'] !== null) {
+                $errors[] = [
                     'request_index' => $idx,
-                    'error_type' => 'exception',
-                    'message' => $e->getMessage(),
-                    'trace' => $e->getTraceAsString(),
-                    'payload' => $payloads[$idx] ?? null,
+                    'error_type' => $result['kind'] === 'json' ? 'invalid_json' : 'http',
+                    'http_code' => $result['http'],
+                    'error_body' => substr($result['body'] !== '' ? $result['body'] : $result['error'], 0, 500),
+                    'payload' => $payloads[$idx],
                 ];
-                $errors[] = $errorDetail;
+                error_log('Error in request_parallel_curlmulti (request ' . $idx . '): ' . $result['error']);
+                return false;
+            }
+            $json = $result['json'];
+            if (isset($json->usage)) {
+                $recordMethod->invoke($client, $userid, $json->usage);
+                $decision['tokensUsed'] += (int)($json->usage->total_tokens ?? 0) ?: (int)($json->usage->cached_tokens ?? 0);
+                $answered++;
+            }
+            $content = trim($json->choices[0]->message->content ?? '');
+            if ($content === '') {
+                return false;
+            }
+            $jsonMatch = null;
+            if (preg_match('~\{.*\}~s', $content, $m)) {
+                $jsonMatch = $m[0];
+            }
+            $parsed = $jsonMatch ? json_decode($jsonMatch, true) : json_decode($content, true);
+            if (!is_array($parsed) || !isset($parsed['hasErrors'])) {
+                return false;
+            }
+            $responses[$idx] = $parsed;
+            if ($quorum > 0 && ($agreeing = $this->sample_quorum($responses, $quorum))) {
+                $decision['timeToDecisionMs'] = (int)round((microtime(true) - $start) * 1000);
+                return true;
+            }
+            return false;
+        };
+        $results = $client->scheduler()->send_many($payloads, 'check_norwegian_text', $timeout, true, $onresult);
 
-                error_log('Error in request_parallel_curlmulti (request ' . $idx . '): ' . $e->getMessage());
-            } finally {
-                curl_multi_remove_handle($mh, $ch);
-                curl_close($ch);
+        foreach ($results as $result) {
+            if ($result['kind'] === 'cancelled') {
+                $decision['cancelled']++;
             }
         }
+        if ($agreeing) {
+            $decision['earlyExit'] = true;
+            $decision['tokensSaved'] = $answered ? (int)round($decision['cancelled'] * $decision['tokensUsed'] / $answered) : 0;
+            $responses = array_intersect_key($responses, array_flip($agreeing));
+        } else {
+            $decision['timeToDecisionMs'] = (int)round((microtime(true) - $start) * 1000);
+        }
 
-        curl_multi_close($mh);
-
-        error_log('request_parallel_curlmulti: Returning ' . count($responses) . ' valid responses and ' . count($errors) . ' errors');
+        error_log('request_parallel_curlmulti: Returning ' . count($responses) . ' valid responses and ' . count($errors) . ' errors'
+            . ($decision['earlyExit'] ? ', quorum of ' . $quorum . ' after ' . $decision['timeToDecisionMs'] . 'ms, '
+                . $decision['cancelled'] . ' cancelled' : ''));
 
         return [
             'responses' => $responses,
             'errors' => $errors,
+            'decision' => $decision,
         ];
     }
 
+    /**
+     * Indices of $quorum responses that agree on correctedText and errors, if there are that many.
+     *
+     * Responses agree when their whitespace-normalised correctedText and their set of
+     * original => corrected pairs are the same; no-op errors are ignored.
+     *
+     * @param array $responses Parsed responses keyed by request index
+     * @param int $quorum
+     * @return array Agreeing request indices, empty when no quorum yet
+     */
+    protected function sample_quorum(array $responses, int $quorum): array {
+        $groups = [];
+        foreach ($responses as $idx => $response) {
+            $pairs = [];
+            foreach ((array)($response['errors'] ?? []) as $error) {
+                if (!is_array($error) || !isset($error['original'], $error['corrected'])) {
+                    continue;
+                }
+                $original = trim((string)$error['original']);
+                $corrected = trim((string)$error['corrected']);
+                if ($original !== $corrected) {
+                    $pairs[] = $original . "\t" . $corrected;
+                }
+            }
+            sort($pairs);
+            $corrected = trim(preg_replace('/\s+/u', ' ', (string)($response['correctedText'] ?? '')));
+            $groups[sha1($corrected . "\n" . implode("\n", $pairs))][] = $idx;
+        }
+        foreach ($groups as $indices) {
+            if (count($indices) >= $quorum) {
+                return $indices;
+            }
+        }
+        return [];
+    }
+
     /**
      * Check if model requires default temperature (no custom temperature support)
      *
@@ -11,6 +11,11 @@ use stdClass;
 defined('MOODLE_INTERNAL') || die();
 
 class api {
+    /** Review events accepted per review_cards() call. */
+    const REVIEW_BATCH_MAX = 200;
+    /** Applied review event ids are remembered this long (clients resend within minutes). */
+    const REVIEW_EVENT_TTL = 30 * DAYSECS;
+
     public static function fetch_progress($flashcardsid, $userid) {
         global $DB;
     
@@ -39,40 +44,29 @@ class api {
         return $out;
     }
     
+    /**
+     * Progress rows changed since a sync cursor, plus tombstones (see progress_sync).
+     *
+     * @param int|null $flashcardsid
+     * @param int $userid
+     * @param string|null $since cursor from the previous pull (null: full snapshot)
+     * @param int $limit
+     * @return array
+     */
+    public static function fetch_progress_changes($flashcardsid, $userid, $since = null, $limit = progress_sync::PAGE_SIZE) {
+        return progress_sync::changes($flashcardsid, (int)$userid, $since, (int)$limit);
+    }
+
+    /**
+     * Save client progress as one bulk upsert; stale records (older lastAt) are returned as conflicts.
+     *
+     * @param int|null $flashcardsid
+     * @param int $userid
+     * @param array $records
+     * @return array{saved:int, conflicts:array}
+     */
     public static function save_progress_batch($flashcardsid, $userid, array $records) {
-        global $DB;
-        $now = time();
-        foreach ($records as $rec) {
-            $deckid = clean_param($rec['deckId'] ?? '', PARAM_RAW_TRIMMED);
-            $cardid = clean_param($rec['cardId'] ?? '', PARAM_RAW_TRIMMED);
-            if ($deckid === '' || $cardid === '') { continue; }
-            $data = new stdClass();
-            $data->flashcardsid = $flashcardsid;
-            $data->userid = $userid;
-            $data->deckid = $deckid;
-            $data->cardid = $cardid;
-            $data->step = isset($rec['step']) ? (int)$rec['step'] : 0;
-            $data->due = isset($rec['due']) ? (int)$rec['due'] : 0;
-            $data->addedat = isset($rec['addedAt']) ? (int)$rec['addedAt'] : 0;
-            $data->lastat = isset($rec['lastAt']) ? (int)$rec['lastAt'] : 0;
-            // SYNC FIX: Accept hidden state from frontend (for shared cards user wants to hide)
-            $data->hidden = empty($rec['hidden']) ? 0 : 1;
-            $data->timemodified = $now;
-    
-            // PROGRESS SYNC FIX: Always find by userid+cardid only (regardless of deckid or flashcardsid)
-            // This ensures progress syncs across all decks and activity/global pages
-            $existing = $DB->get_record('flashcards_progress', [
-                'userid' => $userid,
-                'cardid' => $cardid,
-            ]);
-    
-            if ($existing) {
-                $data->id = $existing->id;
-                $DB->update_record('flashcards_progress', $data);
-            } else {
-                $DB->insert_record('flashcards_progress', $data);
-            }
-        }
+        return progress_sync::save($flashcardsid, (int)$userid, $records);
     }
     
     // ----------------- New helpers: decks/cards and SRS -----------------
@@ -146,6 +140,7 @@ class api {
     
         $now = time();
         $created = 0;
+        $createdids = [];
     
         foreach ($cards as $card) {
             // Check if progress record exists
@@ -173,6 +168,7 @@ class api {
                 try {
                     $DB->insert_record('flashcards_progress', $progress);
                     $created++;
+                    $createdids[] = $card->cardid;
                 } catch (Exception $e) {
                     // Ignore duplicates (race condition)
                     error_log("Failed to create progress for card {$card->cardid}: " . $e->getMessage());
@@ -181,6 +177,8 @@ class api {
         }
     
         if ($created > 0) {
+            due_queue::refresh_user_cards((int)$userid, $createdids);
+            stage_counts::apply((int)$userid, [0 => $created]);
             error_log("Flashcards: Created {$created} missing progress records for user {$userid} in deck {$deckid}");
         }
     }
@@ -208,14 +206,13 @@ class api {
             }
         }
         $examplemap = self::fetch_example_translations([$deckid => $ids]);
+        $payloads = self::decode_payloads($recs);
     
         $out = [];
-        foreach ($recs as $r) {
+        foreach ($recs as $id => $r) {
             // In global mode, show shared cards + user's own private cards
             if ($r->scope === 'private' && (int)$r->ownerid !== (int)$userid) { continue; }
-            $payload = json_decode($r->payload, true);
-            if (!is_array($payload)) { $payload = []; }
-            $payload = self::populate_transcription_if_missing($payload);
+            $payload = self::populate_transcription_if_missing($payloads[$id]);
             if (!empty($transmap[$r->cardid])) {
                 $payload['translations'] = $transmap[$r->cardid];
             }
@@ -234,108 +231,172 @@ class api {
     }
     
     public static function get_due_cards_optimized($userid, $flashcardsid = null, $limit = 1000, $globalmode = false) {
-        global $DB;
-    
-        $now = time();
-    
-        if ($globalmode) {
-            // Global mode: get all decks user has access to (their private + shared)
-            // Get due cards with JOIN to progress table (optimized query)
-            // GLOBAL MODE FIX: Removed flashcardsid filter to show old cards
-            // GLOBAL DECK FIX: After migration, Deck 1 has userid=NULL (global deck for all users)
-            // We need to allow decks where:
-            //   - scope='private' AND userid=NULL (global "My cards" deck) OR
-            //   - scope='private' AND userid=current_user (legacy user-specific deck) OR
-            //   - scope='shared' (shared lesson decks)
-            $sql = "SELECT c.*, p.step, p.due, p.addedat, p.lastat, d.scope as deck_scope
-                    FROM {flashcards_cards} c
-                    INNER JOIN {flashcards_progress} p ON p.deckid = c.deckid AND p.cardid = c.cardid
-                    INNER JOIN {flashcards_decks} d ON d.id = c.deckid
-                    WHERE p.userid = :userid
-                      AND p.due <= :now
-                      AND p.hidden = 0
-                      AND ((d.scope = 'private' AND (d.userid IS NULL OR d.userid = :userid2))
-                           OR d.scope = 'shared')
-                      AND ((c.scope = 'private' AND c.ownerid = :ownerid)
-                           OR c.scope = 'shared')
-                    ORDER BY p.due ASC, c.id ASC";
-    
-            $params = [
-                'userid' => $userid,
-                'userid2' => $userid,
-                'ownerid' => $userid,
-                'now' => $now
-            ];
-        } else {
-            // Activity mode: access is controlled by enrollment/capabilities,
-            // but show ALL cards user has access to (same as global mode).
-            // The flashcardsid is only used for access control, NOT for filtering cards.
-            // This ensures users see all their cards regardless of which activity they're viewing.
-            $sql = "SELECT c.*, p.step, p.due, p.addedat, p.lastat, d.scope as deck_scope
-                    FROM {flashcards_cards} c
-                    INNER JOIN {flashcards_progress} p ON p.deckid = c.deckid AND p.cardid = c.cardid
-                    INNER JOIN {flashcards_decks} d ON d.id = c.deckid
-                    WHERE p.userid = :userid
-                      AND p.due <= :now
-                      AND p.hidden = 0
-                      AND ((d.scope = 'private' AND (d.userid IS NULL OR d.userid = :userid2))
-                           OR d.scope = 'shared')
-                      AND ((c.scope = 'private' AND c.ownerid = :ownerid)
-                           OR c.scope = 'shared')
-                    ORDER BY p.due ASC, c.id ASC";
-    
-            $params = [
-                'userid' => $userid,
-                'userid2' => $userid,
-                'ownerid' => $userid,
-                'now' => $now
+        // Activity and global mode show the same cards: flashcardsid is only used for access
+        // control by the caller, never to filter the queue.
+        return self::get_due_queue_page($userid, $limit)['cards'];
+    }
+
+    /**
+     * One page of the user's due queue, oldest due first.
+     *
+     * Reads the materialized due_queue (see due_queue) and pages with a keyset cursor: pass
+     * the returned 'next' values back as $afterdue/$afterid to continue. Decoded, normalized
+     * card payloads come from the due_payload cache, keyed by card row, timemodified and language.
+     *
+     * @param int $userid
+     * @param int $limit page size
+     * @param int|null $afterdue
+     * @param int|null $afterid
+     * @return array{cards: array, next: array|null}
+     */
+    public static function get_due_queue_page($userid, $limit = 1000, $afterdue = null, $afterid = null) {
+        $userid = (int)$userid;
+        $limit = max(1, min((int)$limit, 5000));
+        due_queue::ensure_built($userid);
+        $rows = due_queue::fetch_page($userid, $limit, $afterdue === null ? null : (int)$afterdue,
+            $afterid === null ? null : (int)$afterid);
+        if (!$rows) {
+            return ['cards' => [], 'next' => null];
+        }
+
+        $cards = self::load_due_cards($rows);
+        $out = [];
+        foreach ($rows as $row) {
+            $card = $cards[(int)$row->cardrowid] ?? null;
+            if (!$card) {
+                continue; // Card row deleted since the queue row was written.
+            }
+            $card['progress'] = [
+                'step' => (int)$row->step,
+                'due' => (int)$row->due,
+                'addedAt' => (int)$row->addedat,
+                'lastAt' => (int)$row->lastat,
             ];
+            $out[] = $card;
         }
-    
-        $recs = $DB->get_records_sql($sql, $params, 0, $limit);
-    
-        // Preload translations for all fetched cards
+        $last = end($rows);
+        $next = count($rows) < $limit ? null : ['due' => (int)$last->due, 'id' => (int)$last->cardrowid];
+        return ['cards' => $out, 'next' => $next];
+    }
+
+    /**
+     * Card entries (without progress) for due queue rows, through the due_payload cache.
+     *
+     * @param array<int,stdClass> $rows queue rows with cardrowid and cardmodified
+     * @return array<int,array> keyed by card row id
+     */
+    protected static function load_due_cards(array $rows): array {
+        global $DB;
+        $lang = function_exists('current_language') ? current_language() : null;
+        $keys = [];
+        $modified = [];
+        foreach ($rows as $row) {
+            $modified[(int)$row->cardrowid] = (int)$row->cardmodified;
+            $keys[(int)$row->cardrowid] = 'c' . (int)$row->cardrowid . '_' . (int)$row->cardmodified . '_'
+                . preg_replace('/[^a-zA-Z0-9]/', '', (string)$lang);
+        }
+        $cache = null;
+        try {
+            $cache = \cache::make('mod_flashcards', 'due_payload');
+        } catch (\Throwable $e) {
+            $cache = null;
+        }
+        $hits = $cache ? $cache->get_many(array_values($keys)) : [];
+        $out = [];
+        $missing = [];
+        foreach ($keys as $cardrowid => $key) {
+            if (isset($hits[$key]) && is_array($hits[$key])) {
+                $out[$cardrowid] = $hits[$key];
+            } else {
+                $missing[] = $cardrowid;
+            }
+        }
+        if (!$missing) {
+            return $out;
+        }
+
+        [$insql, $inparams] = $DB->get_in_or_equal($missing, SQL_PARAMS_NAMED, 'r');
+        $recs = $DB->get_records_select('flashcards_cards', 'id ' . $insql, $inparams);
         $transmap = [];
-        $examplemap = [];
-        if (!empty($recs)) {
-            $bydeck = [];
-            foreach ($recs as $r) { $bydeck[(int)$r->deckid][] = $r->cardid; }
-            foreach ($bydeck as $dk => $ids) {
-                list($insql, $inparams) = $DB->get_in_or_equal($ids, SQL_PARAMS_NAMED, 'c');
-                $rows = $DB->get_records_select('flashcards_card_trans', 'deckid = :deckid AND cardid ' . $insql, ['deckid' => $dk] + $inparams);
-                foreach ($rows as $row) {
-                    $transmap[$dk.'::'.$row->cardid][strtolower($row->lang)] = $row->text;
-                }
+        $bydeck = [];
+        foreach ($recs as $r) { $bydeck[(int)$r->deckid][] = $r->cardid; }
+        foreach ($bydeck as $dk => $ids) {
+            list($insql, $inparams) = $DB->get_in_or_equal($ids, SQL_PARAMS_NAMED, 'c');
+            $trows = $DB->get_records_select('flashcards_card_trans', 'deckid = :deckid AND cardid ' . $insql, ['deckid' => $dk] + $inparams);
+            foreach ($trows as $trow) {
+                $transmap[$dk.'::'.$trow->cardid][strtolower($trow->lang)] = $trow->text;
             }
-            $examplemap = self::fetch_example_translations($bydeck);
         }
+        $examplemap = self::fetch_example_translations($bydeck);
+        $payloads = self::decode_payloads($recs);
 
-        $out = [];
-        foreach ($recs as $r) {
-            $payload = json_decode($r->payload, true);
-            if (!is_array($payload)) { $payload = []; }
-            $payload = self::populate_transcription_if_missing($payload);
+        $tocache = [];
+        foreach ($recs as $id => $r) {
+            $payload = self::populate_transcription_if_missing($payloads[$id]);
             $key = ((int)$r->deckid).'::'.$r->cardid;
             if (!empty($transmap[$key])) { $payload['translations'] = $transmap[$key]; }
-            $payload = self::normalize_examples_on_fetch($payload, $examplemap[$key] ?? [], function_exists('current_language') ? current_language() : null);
-            $out[] = [
+            $payload = self::normalize_examples_on_fetch($payload, $examplemap[$key] ?? [], $lang);
+            $out[(int)$id] = [
                 'deckId' => (int)$r->deckid,
                 'cardId' => $r->cardid,
                 'scope' => $r->scope,
                 'ownerid' => is_null($r->ownerid) ? null : (int)$r->ownerid,
                 'payload' => $payload,
                 'timemodified' => (int)$r->timemodified,
-                'progress' => [
-                    'step' => (int)$r->step,
-                    'due' => (int)$r->due,
-                    'addedAt' => (int)$r->addedat,
-                    'lastAt' => (int)$r->lastat,
-                ],
             ];
+            // Only cache the version the queue row expects; a newer card is re-read next time.
+            if (($modified[(int)$id] ?? null) === (int)$r->timemodified) {
+                $tocache[$keys[(int)$id]] = $out[(int)$id];
+            }
+        }
+        if ($cache && $tocache) {
+            $cache->set_many($tocache);
         }
         return $out;
     }
-    
+
+    /**
+     * Decode card payloads and prefetch pron_dict rows for every transcription they will need.
+     *
+     * populate_transcription_if_missing() then resolves each card from the request map
+     * instead of querying once per word.
+     *
+     * @param array<int,stdClass> $recs card records keyed by id
+     * @return array<int,array> decoded payloads keyed like $recs
+     */
+    protected static function decode_payloads(array $recs): array {
+        $payloads = [];
+        $words = [];
+        foreach ($recs as $id => $r) {
+            $payload = json_decode($r->payload, true);
+            if (!is_array($payload)) { $payload = []; }
+            $payloads[$id] = $payload;
+            if (trim((string)($payload['transcription'] ?? '')) === '') {
+                $baseform = $payload['focusBase'] ?? $payload['focus_baseform'] ?? '';
+                array_push($words, ...self::transcription_words((string)$baseform));
+            }
+        }
+        pronunciation_manager::prefetch($words);
+        return $payloads;
+    }
+
+    /**
+     * Words lookup_phrase_transcription() looks up for a phrase, articles and å removed.
+     *
+     * @param string $phrase
+     * @return string[]
+     */
+    protected static function transcription_words(string $phrase): array {
+        $words = [];
+        foreach (preg_split('/\s+/u', trim($phrase)) ?: [] as $word) {
+            $word = trim($word);
+            if ($word !== '') {
+                $words[] = self::strip_articles_and_markers($word);
+            }
+        }
+        return $words;
+    }
+
     protected static function populate_transcription_if_missing(array $payload): array {
         $current = trim((string)($payload['transcription'] ?? ''));
         if ($current !== '') {
@@ -391,23 +452,17 @@ class api {
             return null;
         }
 
-        // Split into words
-        $words = preg_split('/\s+/u', $phrase);
+        // Split into words, stripping articles/å from each
+        $words = self::transcription_words($phrase);
         if (!$words) {
             return null;
         }
+        pronunciation_manager::prefetch($words);
 
         $transcriptions = [];
         $foundAny = false;
 
-        foreach ($words as $word) {
-            $word = trim($word);
-            if ($word === '') {
-                continue;
-            }
-
-            // Strip articles/å from each word
-            $cleanWord = self::strip_articles_and_markers($word);
+        foreach ($words as $cleanWord) {
             $trans = pronunciation_manager::lookup_transcription($cleanWord, $pos);
 
             if ($trans) {
@@ -762,7 +817,8 @@ class api {
             'scope' => $scope,
             'payload' => $pjson,
             'timecreated' => $existing ? $existing->timecreated : $now,
-            'timemodified' => $now,
+            // Strictly increasing: timemodified versions the cached due-queue payload.
+            'timemodified' => $existing ? max($now, (int)$existing->timemodified + 1) : $now,
         ];
         if ($existing) { $rec->id = $existing->id; $DB->update_record('flashcards_cards', $rec); }
         else { $DB->insert_record('flashcards_cards', $rec); }
@@ -802,9 +858,18 @@ class api {
                 'timemodified' => $now,
             ];
             $DB->insert_record('flashcards_progress', $p);
+            stage_counts::apply((int)$userid, [0 => 1]);
             $isnewcard = true;
         }
 
+        // Card content, scope or owner may have changed for every learner of this card.
+        due_queue::refresh_card($deckid, $cardid);
+
+        // Publishing to a shared deck: synthesize its missing audio in the background.
+        if ($scope === 'shared' && $deck->scope === 'shared' && (!$existing || $existing->payload !== $pjson)) {
+            \mod_flashcards\task\pregenerate_deck_audio::queue($deckid, (int)$userid);
+        }
+
         // Track card creation in stats (only for new cards, not updates)
         if ($isnewcard) {
             self::update_card_creation_stats($userid);
@@ -838,9 +903,19 @@ class api {
             $DB->delete_records('flashcards_cards', ['id' => $rec->id]);
             // Delete ALL progress records for this card (not just current user)
             // Rationale: Card no longer exists, so all progress references are orphaned
+            stage_counts::before_delete('deckid = :deckid AND cardid = :cardid', ['deckid' => $deckid, 'cardid' => $cardid]);
+            progress_sync::before_delete('deckid = :deckid AND cardid = :cardid', ['deckid' => $deckid, 'cardid' => $cardid]);
             $DB->delete_records('flashcards_progress', ['deckid' => $deckid, 'cardid' => $cardid]);
+            due_queue::refresh_card((int)$deckid, (string)$cardid);
             $DB->delete_records('flashcards_card_trans', ['deckid' => $deckid, 'cardid' => $cardid]);
             $DB->delete_records('flashcards_card_example_trans', ['deckid' => $deckid, 'cardid' => $cardid]);
+            // Reviews racing with the delete may still write progress for the card; the
+            // observer queues the key so the cleanup task purges those rows directly.
+            \mod_flashcards\event\card_deleted::create([
+                'objectid' => $rec->id,
+                'context' => $context ?: \context_user::instance((int)$userid),
+                'other' => ['deckid' => (int)$deckid, 'cardid' => (string)$cardid],
+            ])->trigger();
 
             // Decrement total_cards_created counter for the card owner
             if ($rec->ownerid !== null) {
@@ -858,11 +933,23 @@ class api {
         } else {
             // User "deleting" a SHARED card → just hide it for this user
             // Card remains in database, but marked as hidden in progress
-            $DB->set_field('flashcards_progress', 'hidden', 1, [
+            $visible = $DB->get_records('flashcards_progress',
+                ['deckid' => $deckid, 'cardid' => $cardid, 'userid' => $userid, 'hidden' => 0], '', 'id, step');
+            // Bump timemodified so delta sync hands the hide to the user's other devices.
+            $DB->execute("UPDATE {flashcards_progress}
+                             SET hidden = 1, timemodified = :now
+                           WHERE deckid = :deckid AND cardid = :cardid AND userid = :userid", [
+                'now' => time(),
                 'deckid' => $deckid,
                 'cardid' => $cardid,
                 'userid' => $userid
             ]);
+            due_queue::refresh_user_cards((int)$userid, [(string)$cardid]);
+            $stagedeltas = [];
+            foreach ($visible as $row) {
+                $stagedeltas[(int)$row->step] = ($stagedeltas[(int)$row->step] ?? 0) - 1;
+            }
+            stage_counts::apply((int)$userid, $stagedeltas);
         }
     }
     
@@ -912,20 +999,24 @@ class api {
         $rows = $DB->get_records('flashcards_progress', ['flashcardsid' => $flashcardsid, 'userid' => $userid]);
         foreach ($rows as $r) { $prog[$r->deckid.'::'.$r->cardid] = $r; }
     
-        $out = [];
-        foreach ($cards as $c) {
+        $due = [];
+        foreach ($cards as $id => $c) {
             if ($c->scope === 'private' && (int)$c->ownerid !== (int)$userid) { continue; }
             $key = $c->deckid.'::'.$c->cardid;
             $p = $prog[$key] ?? null;
             if ($p) {
                 if ((int)$p->due <= $now && (int)$p->hidden === 0) {
-                    $payload = json_decode($c->payload, true);
-                    if (!is_array($payload)) { $payload = []; }
-                    $payload = self::populate_transcription_if_missing($payload);
-                    $out[] = ['deckId' => (int)$c->deckid, 'cardId' => $c->cardid, 'payload' => $payload];
+                    $due[$id] = $c;
                 }
             }
         }
+        $payloads = self::decode_payloads($due);
+
+        $out = [];
+        foreach ($due as $id => $c) {
+            $payload = self::populate_transcription_if_missing($payloads[$id]);
+            $out[] = ['deckId' => (int)$c->deckid, 'cardId' => $c->cardid, 'payload' => $payload];
+        }
         return $out;
     }
     
@@ -950,34 +1041,218 @@ class api {
                 'timemodified' => $now,
             ];
             $p->id = $DB->insert_record('flashcards_progress', $p);
+            stage_counts::apply((int)$userid, [0 => 1]);
         }
     
+        $oldstep = (int)$p->step;
+        self::apply_rating($p, $rating, $now);
+        $p->timemodified = $now;
+        $DB->update_record('flashcards_progress', $p);
+        due_queue::refresh_user_cards((int)$userid, [(string)$cardid]);
+        $hidden = (int)$p->hidden === 1;
+        stage_counts::apply((int)$userid, stage_counts::transition($oldstep, $hidden, (int)$p->step, $hidden));
+
+        // Track review stats
+        // TODO: Calculate actual study time (time between card shown and rated)
+        // For now, use 0 as we don't track card show time yet
+        self::update_review_stats($userid, $rating, 0);
+    }
+
+    /**
+     * Apply an ordered batch of review events in one transaction.
+     *
+     * Each event is ['id' => client event id, 'deckId', 'cardId', 'rating' => 1..3,
+     * 'reviewedAt' => unix time]. Events already applied (same user and id) are skipped, so
+     * clients can resend a batch after a lost response. Progress rows are updated once per
+     * card, and stats/daily log once per batch.
+     *
+     * @param int $userid
+     * @param int|null $flashcardsid
+     * @param array $events
+     * @return array{applied:string[], duplicates:string[], rejected:array, progress:array}
+     *         progress holds the resulting rows in the fetch_progress() shape
+     */
+    public static function review_cards($userid, $flashcardsid, array $events) {
+        global $DB;
+        $userid = (int)$userid;
+        $now = time();
+        $chunk = progress_sync::QUERY_CHUNK;
+
+        $valid = [];
+        $rejected = [];
+        foreach (array_slice($events, 0, self::REVIEW_BATCH_MAX) as $ev) {
+            $id = clean_param((string)($ev['id'] ?? ''), PARAM_ALPHANUMEXT);
+            $cardid = clean_param((string)($ev['cardId'] ?? ''), PARAM_RAW_TRIMMED);
+            $rating = (int)($ev['rating'] ?? 0);
+            if ($id === '' || strlen($id) > 64 || $cardid === '' || $rating < 1 || $rating > 3) {
+                $rejected[] = ['id' => $id, 'reason' => 'invalid'];
+                continue;
+            }
+            if (isset($valid[$id])) {
+                continue;
+            }
+            // Offline reviews keep their time, but never in the future.
+            $reviewedat = (int)($ev['reviewedAt'] ?? 0);
+            $valid[$id] = (object)[
+                'id' => $id,
+                'deckid' => (int)($ev['deckId'] ?? 0),
+                'cardid' => $cardid,
+                'rating' => $rating,
+                'time' => $reviewedat > 0 ? min($reviewedat, $now) : $now,
+            ];
+        }
+
+        // Idempotency: drop events this user already sent.
+        $duplicates = [];
+        foreach (array_chunk(array_keys($valid), $chunk) as $ids) {
+            [$insql, $params] = $DB->get_in_or_equal(array_map('strval', $ids), SQL_PARAMS_NAMED, 'ev');
+            $params['userid'] = $userid;
+            foreach ($DB->get_fieldset_select('flashcards_review_events', 'eventid',
+                    "userid = :userid AND eventid {$insql}", $params) as $seen) {
+                unset($valid[$seen]);
+                $duplicates[] = $seen;
+            }
+        }
+
+        // Cards must exist (review_card's MUST_EXIST), progress is matched by userid + cardid.
+        $cardids = array_values(array_unique(array_map(function($ev) {
+            return $ev->cardid;
+        }, $valid)));
+        $cards = [];
+        $progress = [];
+        foreach (array_chunk($cardids, $chunk) as $ids) {
+            [$insql, $params] = $DB->get_in_or_equal($ids, SQL_PARAMS_NAMED, 'cid');
+            $rs = $DB->get_recordset_select('flashcards_cards', "cardid {$insql}", $params, '', 'id, deckid, cardid');
+            foreach ($rs as $c) {
+                $cards[$c->deckid . '/' . $c->cardid] = true;
+            }
+            $rs->close();
+            $params['userid'] = $userid;
+            $rs = $DB->get_recordset_select('flashcards_progress', "userid = :userid AND cardid {$insql}", $params, 'id ASC');
+            foreach ($rs as $p) {
+                if (!isset($progress[$p->cardid])) {
+                    $progress[$p->cardid] = $p;
+                }
+            }
+            $rs->close();
+        }
+
+        $applied = [];
+        $touched = [];
+        $oldstate = [];
+        $ratings = [];
+        foreach ($valid as $ev) {
+            if (!isset($cards[$ev->deckid . '/' . $ev->cardid])) {
+                $rejected[] = ['id' => $ev->id, 'reason' => 'missing_card'];
+                continue;
+            }
+            $p = $progress[$ev->cardid] ?? null;
+            if (!$p) {
+                $p = (object)[
+                    'flashcardsid' => $flashcardsid,
+                    'userid' => $userid,
+                    'deckid' => $ev->deckid,
+                    'cardid' => $ev->cardid,
+                    'step' => 0,
+                    'addedat' => $ev->time,
+                    'due' => $ev->time,
+                    'lastat' => 0,
+                    'hidden' => 0,
+                ];
+                $progress[$ev->cardid] = $p;
+            }
+            if (!array_key_exists($ev->cardid, $oldstate)) {
+                $oldstate[$ev->cardid] = isset($p->id) ? [(int)$p->step, (int)$p->hidden === 1] : null;
+            }
+            // Events older than the card's last review (another device got there first) only count in stats.
+            if ($ev->time >= (int)$p->lastat) {
+                self::apply_rating($p, $ev->rating, $ev->time);
+                $p->timemodified = $now;
+                $touched[$ev->cardid] = $p;
+            }
+            $ratings[] = [$ev->rating, $ev->time];
+            $applied[] = $ev->id;
+        }
+
+        $stagedeltas = [];
+        $inserts = [];
+        $updates = [];
+        foreach ($touched as $cardid => $p) {
+            $old = $oldstate[$cardid];
+            if ($old === null) {
+                $inserts[] = $p;
+            } else {
+                $updates[] = $p;
+            }
+            $transition = stage_counts::transition($old ? $old[0] : null, $old ? $old[1] : false,
+                (int)$p->step, (int)$p->hidden === 1);
+            foreach ($transition as $step => $delta) {
+                $stagedeltas[$step] = ($stagedeltas[$step] ?? 0) + $delta;
+            }
+        }
+
+        if ($applied) {
+            $transaction = $DB->start_delegated_transaction();
+            if ($inserts) {
+                $DB->insert_records('flashcards_progress', $inserts);
+            }
+            foreach ($updates as $p) {
+                $DB->update_record('flashcards_progress', $p);
+            }
+            $DB->insert_records('flashcards_review_events', array_map(function($id) use ($userid, $now) {
+                return ['userid' => $userid, 'eventid' => $id, 'timecreated' => $now];
+            }, $applied));
+            self::update_review_stats_batch($userid, $ratings);
+            $transaction->allow_commit();
+
+            due_queue::refresh_user_cards($userid, array_keys($touched));
+            stage_counts::apply($userid, $stagedeltas);
+        }
+
+        $out = [];
+        foreach ($progress as $p) {
+            $out[$p->deckid][$p->cardid] = progress_sync::export_row($p);
+        }
+        return ['applied' => $applied, 'duplicates' => $duplicates, 'rejected' => $rejected, 'progress' => $out];
+    }
+
+    /**
+     * Forget review event ids older than REVIEW_EVENT_TTL.
+     *
+     * @return int rows deleted
+     */
+    public static function prune_review_events(): int {
+        global $DB;
+        $cutoff = time() - self::REVIEW_EVENT_TTL;
+        $count = $DB->count_records_select('flashcards_review_events', 'timecreated < :cutoff', ['cutoff' => $cutoff]);
+        if ($count) {
+            $DB->delete_records_select('flashcards_review_events', 'timecreated < :cutoff', ['cutoff' => $cutoff]);
+        }
+        return $count;
+    }
+
+    /**
+     * Advance a progress row for one rating (1=Hard, 2=Normal, 3=Easy) given at $now.
+     *
+     * @param stdClass $p flashcards_progress row
+     * @param int $rating
+     * @param int $now
+     */
+    protected static function apply_rating(stdClass $p, int $rating, int $now): void {
         $step = (int)$p->step;
-    
-        // Rating: 1=Hard, 2=Normal, 3=Easy
         if ($rating <= 1) {
             // Hard: stage stays same, card appears tomorrow (1 minute in test mode)
-            // Step doesn't change
             $due = $now + 60; // +1 minute
         } else {
             // Normal (2) or Easy (3): advance to next stage
             $step = min($step + 1, 11); // Max stage 11 (stage 10 shows "10", stage 11 shows checkmark)
-    
-            // Calculate due date
-            $easy = ($rating >= 3); // Easy = full interval, Normal = half interval
-            $due = self::srs_due_ts($now, $step, $easy);
+
+            // Easy = full interval, Normal = half interval
+            $due = self::srs_due_ts($now, $step, $rating >= 3);
         }
-    
         $p->step = $step;
         $p->due = $due;
         $p->lastat = $now;
-        $p->timemodified = $now;
-        $DB->update_record('flashcards_progress', $p);
-
-        // Track review stats
-        // TODO: Calculate actual study time (time between card shown and rated)
-        // For now, use 0 as we don't track card show time yet
-        self::update_review_stats($userid, $rating, 0);
     }
 
     // ----------------- Dashboard & Statistics Methods -----------------
@@ -1020,55 +1295,83 @@ class api {
      * @param int $studytime Study time in seconds
      */
     public static function update_review_stats($userid, $rating, $studytime = 0) {
+        self::update_review_stats_batch($userid, [[$rating, time()]], $studytime);
+    }
+
+    /**
+     * Update user stats and daily log once for several reviews
+     * @param int $userid User ID
+     * @param array $reviews List of [rating, reviewed at] in review order
+     * @param int $studytime Study time in seconds (logged on today's row)
+     */
+    public static function update_review_stats_batch($userid, array $reviews, $studytime = 0) {
         global $DB;
+        if (!$reviews) {
+            return;
+        }
 
         $stats = self::get_user_stats($userid);
         $now = time();
-        $today = strtotime('today', $now);
+        $perday = [];
 
-        // Increment total reviews
-        $stats->total_reviews++;
+        foreach ($reviews as [$rating, $time]) {
+            $time = (int)$time;
+            $day = strtotime('today', $time);
+            $perday[$day] = ($perday[$day] ?? 0) + 1;
 
-        // Increment rating-specific counter
-        if ($rating <= 1) {
-            $stats->hard_count++;
-        } else if ($rating == 2) {
-            $stats->normal_count++;
-        } else {
-            $stats->easy_count++;
-        }
+            // Increment total reviews
+            $stats->total_reviews++;
 
-        // Update study time
-        $stats->total_study_time += $studytime;
+            // Increment rating-specific counter
+            if ($rating <= 1) {
+                $stats->hard_count++;
+            } else if ($rating == 2) {
+                $stats->normal_count++;
+            } else {
+                $stats->easy_count++;
+            }
 
-        // Calculate streak
-        $lastStudyDay = strtotime('today', $stats->last_study_date);
-        if ($stats->last_study_date == 0) {
-            // First study ever
-            $stats->first_study_date = $now;
-            $stats->current_streak_days = 1;
-        } else if ($lastStudyDay == $today) {
-            // Same day - streak doesn't change
-        } else if ($lastStudyDay == strtotime('-1 day', $today)) {
-            // Consecutive day - increment streak
-            $stats->current_streak_days++;
-        } else {
-            // Streak broken - reset to 1
-            $stats->current_streak_days = 1;
-        }
+            // Calculate streak
+            $lastStudyDay = strtotime('today', $stats->last_study_date);
+            if ($stats->last_study_date == 0) {
+                // First study ever
+                $stats->first_study_date = $time;
+                $stats->current_streak_days = 1;
+            } else if ($lastStudyDay >= $day) {
+                // Same day (or an older offline review) - streak doesn't change
+            } else if ($lastStudyDay == strtotime('-1 day', $day)) {
+                // Consecutive day - increment streak
+                $stats->current_streak_days++;
+            } else {
+                // Streak broken - reset to 1
+                $stats->current_streak_days = 1;
+            }
+
+            // Update longest streak
+            if ($stats->current_streak_days > $stats->longest_streak_days) {
+                $stats->longest_streak_days = $stats->current_streak_days;
+            }
 
-        // Update longest streak
-        if ($stats->current_streak_days > $stats->longest_streak_days) {
-            $stats->longest_streak_days = $stats->current_streak_days;
+            $stats->last_study_date = max((int)$stats->last_study_date, $time);
         }
 
-        $stats->last_study_date = $now;
+        // Update study time
+        $stats->total_study_time += $studytime;
         $stats->timemodified = $now;
         $DB->update_record('flashcards_user_stats', $stats);
 
         // Update daily log
-        self::update_daily_log($userid, $today, 'reviews_count', 1);
-        self::update_daily_log($userid, $today, 'study_time', $studytime);
+        $today = strtotime('today', $now);
+        foreach ($perday as $day => $count) {
+            $increments = ['reviews_count' => $count];
+            if ($day == $today) {
+                $increments['study_time'] = $studytime;
+            }
+            self::update_daily_log_fields($userid, $day, $increments);
+        }
+        if ($studytime && !isset($perday[$today])) {
+            self::update_daily_log_fields($userid, $today, ['study_time' => $studytime]);
+        }
     }
 
     /**
@@ -1105,6 +1408,16 @@ class api {
      * @param int $increment Amount to increment
      */
     private static function update_daily_log($userid, $logdate, $field, $increment) {
+        self::update_daily_log_fields($userid, $logdate, [$field => $increment]);
+    }
+
+    /**
+     * Update daily log for several metrics with one read and one write
+     * @param int $userid User ID
+     * @param int $logdate Date timestamp (midnight)
+     * @param array $increments Field => amount (reviews_count, cards_created, study_time)
+     */
+    private static function update_daily_log_fields($userid, $logdate, array $increments) {
         global $DB;
 
         $log = $DB->get_record('flashcards_daily_log', ['userid' => $userid, 'log_date' => $logdate]);
@@ -1117,11 +1430,17 @@ class api {
                 'cards_created' => 0,
                 'study_time' => 0
             ];
-            $log->id = $DB->insert_record('flashcards_daily_log', $log);
+            foreach ($increments as $field => $increment) {
+                $log->$field += $increment;
+            }
+            $DB->insert_record('flashcards_daily_log', $log);
+            return;
         }
 
-        // Increment the field
-        $log->$field += $increment;
+        // Increment the fields
+        foreach ($increments as $field => $increment) {
+            $log->$field += $increment;
+        }
         $DB->update_record('flashcards_daily_log', $log);
     }
 
@@ -1162,57 +1481,43 @@ class api {
         $now = time();
         $today = strtotime('today', $now);
 
-        // Get cards due today count (only cards that still exist and are visible to the user)
-        $sqlDue = "SELECT COUNT(1)
-                     FROM {flashcards_progress} p
-                     JOIN {flashcards_cards} c ON c.deckid = p.deckid AND c.cardid = p.cardid
-                     JOIN {flashcards_decks} d ON d.id = c.deckid
-                    WHERE p.userid = :userid
-                      AND p.due <= :now
-                      AND p.hidden = 0
-                      AND ((d.scope = 'private' AND (d.userid IS NULL OR d.userid = :userid2))
-                           OR d.scope = 'shared')
-                      AND ((c.scope = 'private' AND c.ownerid = :ownerid)
-                           OR c.scope = 'shared')";
-        $dueToday = (int)$DB->count_records_sql($sqlDue, [
-            'userid' => $userid,
-            'userid2' => $userid,
-            'ownerid' => $userid,
-            'now' => $now,
-        ]);
-
-        // Get stage distribution
-        $sql = "SELECT step, COUNT(*) as count
-                FROM {flashcards_progress}
-                WHERE userid = :userid AND hidden = 0
-                GROUP BY step
-                ORDER BY step ASC";
-        $stageData = $DB->get_records_sql($sql, ['userid' => $userid]);
-        $activeVocabScore = self::calculate_active_vocab_from_rows($stageData);
+        // Cards due now (only cards that still exist and are visible to the user): a range
+        // count on the due queue index.
+        due_queue::ensure_built((int)$userid);
+        $dueToday = (int)$DB->count_records_select('flashcards_due_queue',
+            'userid = :userid AND hidden = 0 AND due <= :now', ['userid' => $userid, 'now' => $now]);
 
+        // Stage distribution from the maintained histogram
+        $stageData = [];
         $stageDistribution = [];
-        foreach ($stageData as $row) {
+        foreach (stage_counts::get((int)$userid) as $step => $count) {
+            $stageData[] = (object)['step' => $step, 'count' => $count];
             $stageDistribution[] = [
-                'stage' => (int)$row->step,
-                'count' => (int)$row->count
+                'stage' => $step,
+                'count' => $count
             ];
         }
+        $activeVocabScore = self::calculate_active_vocab_from_rows($stageData);
 
-        // Get last 7 days of activity
+        // Last 7 days of activity (today included) in one range query
+        $from = strtotime('-6 days', $today);
+        $logs = [];
+        $rows = $DB->get_records_select('flashcards_daily_log', 'userid = :userid AND log_date >= :from AND log_date <= :to',
+            ['userid' => $userid, 'from' => $from, 'to' => $today], '', 'id, log_date, reviews_count, cards_created');
+        foreach ($rows as $row) {
+            $logs[(int)$row->log_date] = $row;
+        }
         $activityData = [];
         for ($i = 6; $i >= 0; $i--) {
             $date = strtotime("-{$i} days", $today);
-            $log = $DB->get_record('flashcards_daily_log', ['userid' => $userid, 'log_date' => $date]);
+            $log = $logs[$date] ?? null;
             $activityData[] = [
                 'date' => $date,
                 'reviews' => $log ? (int)$log->reviews_count : 0,
                 'cardsCreated' => $log ? (int)$log->cards_created : 0
             ];
         }
-
-        // Get today's cards created count
-        $todayLog = $DB->get_record('flashcards_daily_log', ['userid' => $userid, 'log_date' => $today]);
-        $cardsCreatedToday = $todayLog ? (int)$todayLog->cards_created : 0;
+        $cardsCreatedToday = isset($logs[$today]) ? (int)$logs[$today]->cards_created : 0;
 
         return [
             'stats' => [
@@ -1240,16 +1545,32 @@ class api {
      * @return float
      */
     public static function calculate_active_vocab($userid): float {
-        global $DB;
-
-        $sql = "SELECT step, COUNT(*) as count
-                  FROM {flashcards_progress}
-                 WHERE userid = :userid AND hidden = 0
-              GROUP BY step";
-        $rows = $DB->get_records_sql($sql, ['userid' => $userid]);
+        $rows = [];
+        foreach (stage_counts::get((int)$userid) as $step => $count) {
+            $rows[] = (object)['step' => $step, 'count' => $count];
+        }
         return self::calculate_active_vocab_from_rows($rows);
     }
 
+    /**
+     * Rebuild a user's derived dashboard data in bulk: card count, stage histogram and due queue.
+     *
+     * Repair path for drift in the incrementally maintained aggregates.
+     *
+     * @param int $userid User ID
+     * @return array{totalCardsCreated: int, activeVocab: float}
+     */
+    public static function recalculate_stats($userid): array {
+        $count = self::recalculate_total_cards($userid);
+        stage_counts::rebuild((int)$userid);
+        set_user_preference(due_queue::PREF, 0, (int)$userid);
+        due_queue::ensure_built((int)$userid);
+        return [
+            'totalCardsCreated' => $count,
+            'activeVocab' => round(self::calculate_active_vocab($userid), 2),
+        ];
+    }
+
     /**
      * Convert stage distribution rows into an active vocabulary score.
      *
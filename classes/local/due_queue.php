@@ -0,0 +1,142 @@
+<?php
+
+namespace mod_flashcards\local;
+
+defined('MOODLE_INTERNAL') || die();
+
+/**
+ * Materialized per-user due queue (flashcards_due_queue).
+ *
+ * Holds one row per progress record whose card the user can see (same deck/card scope rules
+ * get_due_cards_optimized() used to apply with a three-table join), with the SRS fields copied
+ * over, so the queue is read with a single range scan on (userid, hidden, due, cardrowid).
+ *
+ * Rows are refreshed by the api write paths (review, upsert, delete, progress sync). A user's
+ * queue is (re)built from scratch on first read and whenever QUEUE_VERSION changes.
+ */
+class due_queue {
+    /** Bump to force every user's queue to be rebuilt on next read. */
+    const QUEUE_VERSION = 1;
+    /** User preference recording the queue version built for the user. */
+    const PREF = 'mod_flashcards_duequeue';
+
+    /**
+     * Build the user's queue if it has not been built for the current QUEUE_VERSION.
+     *
+     * @param int $userid
+     */
+    public static function ensure_built(int $userid): void {
+        if ((int)get_user_preferences(self::PREF, 0, $userid) === self::QUEUE_VERSION) {
+            return;
+        }
+        self::refresh('userid = :quserid', 'p.userid = :puserid', ['quserid' => $userid, 'puserid' => $userid]);
+        set_user_preference(self::PREF, self::QUEUE_VERSION, $userid);
+    }
+
+    /**
+     * Re-derive the queue rows of some cards for one user (after progress writes).
+     *
+     * @param int $userid
+     * @param string[] $cardids
+     */
+    public static function refresh_user_cards(int $userid, array $cardids): void {
+        global $DB;
+        $cardids = array_values(array_unique(array_filter(array_map('strval', $cardids), 'strlen')));
+        if (!$cardids) {
+            return;
+        }
+        foreach (array_chunk($cardids, 500) as $chunk) {
+            [$qin, $qparams] = $DB->get_in_or_equal($chunk, SQL_PARAMS_NAMED, 'qc');
+            [$pin, $pparams] = $DB->get_in_or_equal($chunk, SQL_PARAMS_NAMED, 'pc');
+            self::refresh(
+                'userid = :quserid AND cardid ' . $qin,
+                'p.userid = :puserid AND p.cardid ' . $pin,
+                ['quserid' => $userid, 'puserid' => $userid] + $qparams + $pparams
+            );
+        }
+    }
+
+    /**
+     * Re-derive the queue rows of one card for every user (after the card changed or was deleted).
+     *
+     * @param int $deckid
+     * @param string $cardid
+     */
+    public static function refresh_card(int $deckid, string $cardid): void {
+        self::refresh(
+            'deckid = :qdeckid AND cardid = :qcardid',
+            'c.deckid = :pdeckid AND c.cardid = :pcardid',
+            ['qdeckid' => $deckid, 'qcardid' => $cardid, 'pdeckid' => $deckid, 'pcardid' => $cardid]
+        );
+    }
+
+    /**
+     * Drop queue rows that point at deleted progress records.
+     *
+     * @param int[] $progressids
+     */
+    public static function delete_progress(array $progressids): void {
+        global $DB;
+        if (!$progressids) {
+            return;
+        }
+        [$insql, $params] = $DB->get_in_or_equal($progressids, SQL_PARAMS_NAMED, 'pr');
+        $DB->delete_records_select('flashcards_due_queue', 'progressid ' . $insql, $params);
+    }
+
+    /**
+     * One page of due, visible queue rows in (due, cardrowid) order.
+     *
+     * @param int $userid
+     * @param int $limit
+     * @param int|null $afterdue keyset cursor: due of the last row already returned
+     * @param int|null $afterid keyset cursor: cardrowid of the last row already returned
+     * @return array<int,\stdClass> rows with cardrowid, due, step, addedat, lastat, cardmodified
+     */
+    public static function fetch_page(int $userid, int $limit, ?int $afterdue = null, ?int $afterid = null): array {
+        global $DB;
+        $params = ['userid' => $userid, 'now' => time()];
+        $where = 'q.userid = :userid AND q.hidden = 0 AND q.due <= :now';
+        if ($afterdue !== null && $afterid !== null) {
+            $where .= ' AND (q.due > :afterdue OR (q.due = :afterdue2 AND q.cardrowid > :afterid))';
+            $params += ['afterdue' => $afterdue, 'afterdue2' => $afterdue, 'afterid' => $afterid];
+        }
+        // Keyed by cardrowid like the old join (keyed by c.id): a card shows up once.
+        $sql = "SELECT q.cardrowid, q.due, q.step, q.addedat, q.lastat, q.cardmodified
+                  FROM {flashcards_due_queue} q
+                 WHERE {$where}
+              ORDER BY q.due ASC, q.cardrowid ASC";
+        return array_values($DB->get_records_sql($sql, $params, 0, max(1, $limit)));
+    }
+
+    /**
+     * Replace the queue rows matching $qwhere with the visible progress rows matching $pwhere.
+     *
+     * @param string $qwhere condition on the queue table
+     * @param string $pwhere condition on progress/cards (aliases p, c)
+     * @param array $params named params for both conditions
+     */
+    protected static function refresh(string $qwhere, string $pwhere, array $params): void {
+        global $DB;
+        // Param names start with q (queue side) or p (progress side).
+        $qparams = array_filter($params, function($name) {
+            return strpos($name, 'q') === 0;
+        }, ARRAY_FILTER_USE_KEY);
+        $pparams = array_diff_key($params, $qparams);
+
+        $transaction = $DB->start_delegated_transaction();
+        $DB->delete_records_select('flashcards_due_queue', $qwhere, $qparams);
+        $DB->execute("INSERT INTO {flashcards_due_queue}
+                             (userid, progressid, cardrowid, deckid, cardid, step, due, addedat, lastat, hidden, cardmodified)
+                      SELECT p.userid, p.id, c.id, c.deckid, c.cardid, p.step, p.due, p.addedat, p.lastat, p.hidden,
+                             c.timemodified
+                        FROM {flashcards_progress} p
+                        JOIN {flashcards_cards} c ON c.deckid = p.deckid AND c.cardid = p.cardid
+                        JOIN {flashcards_decks} d ON d.id = c.deckid
+                       WHERE ((d.scope = 'private' AND (d.userid IS NULL OR d.userid = p.userid))
+                              OR d.scope = 'shared')
+                         AND ((c.scope = 'private' AND c.ownerid = p.userid) OR c.scope = 'shared')
+                         AND {$pwhere}", $pparams);
+        $transaction->allow_commit();
+    }
+}
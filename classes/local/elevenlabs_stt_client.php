@@ -47,7 +47,8 @@ class elevenlabs_stt_client {
         $this->cliplimit = max(1, (int)($config->elevenlabs_stt_clip_limit ?? 15));
         $this->monthlylimit = max($this->cliplimit, (int)($config->elevenlabs_stt_monthly_limit ?? 36000));
         $this->timeout = max(5, (int)($config->elevenlabs_stt_timeout ?? 45));
-        $this->endpoint = self::DEFAULT_ENDPOINT;
+        $base = rtrim(trim($config->elevenlabs_base_url ?? ''), '/');
+        $this->endpoint = $base !== '' ? $base . '/v1/speech-to-text' : self::DEFAULT_ENDPOINT;
         $this->enabled = !empty($config->elevenlabs_stt_enabled) && !empty($this->apikey);
     }
 
@@ -112,7 +113,9 @@ class elevenlabs_stt_client {
             CURLOPT_TIMEOUT => $this->timeout,
         ]);
 
+        $start = microtime(true);
         $response = curl_exec($curl);
+        profiler::external('elevenlabs_stt', $start);
         if ($response === false) {
             $error = curl_error($curl);
             curl_close($curl);
@@ -0,0 +1,406 @@
+<?php
+
+namespace mod_flashcards\local;
+
+use core_text;
+
+defined('MOODLE_INTERNAL') || die();
+
+/**
+ * Token trie over every known multiword expression, matched against a sentence in one pass.
+ *
+ * Keys come from flashcards_orbokene (normalized and baseform), flashcards_expr_translations
+ * and the verb + preposition / reflexive frames in the ordbank tags and argstr table. Tokens
+ * are lower-cased and reflexive pronouns are folded to "seg", so "gleder meg over" finds
+ * "glede seg over". match() walks the sentence once with a set of live trie states: each
+ * token may extend a state whose last token is at most $maxgap tokens back (lemma or
+ * surface form), which is the gapped variant of an Aho-Corasick scan (with $maxgap = 0 it
+ * finds exactly the contiguous occurrences).
+ *
+ * The compiled trie lives in the expression_automaton cache. get() brings it up to date at
+ * most every REFRESH_SECONDS (or at once after changed()) by inserting the rows whose
+ * timemodified is past the stored watermark; a table that shrank is rebuilt in full.
+ */
+class expression_automaton {
+    /** Bump to discard automata compiled by older code. */
+    const VERSION = 1;
+    /** Seconds between watermark checks against the source tables. */
+    const REFRESH_SECONDS = 60;
+    /** Longest expression kept, in tokens. */
+    const MAX_TOKENS = 8;
+
+    /** Source flags of a key. */
+    const SOURCE_ORBOKENE = 1;
+    const SOURCE_EXPRESSION = 2;
+    const SOURCE_ARGSTR = 4;
+
+    /** Reflexive pronouns folded to "seg". */
+    const REFLEXIVES = ['seg', 'meg', 'deg', 'oss', 'dere', 'dem'];
+
+    /** @var self|null per-request instance */
+    protected static $instance = null;
+    /** @var bool a source table changed in this request */
+    protected static $dirty = false;
+
+    /** @var array<int,array<string,int>> node => token => child node */
+    protected $edges = [[]];
+    /** @var array<int,array<string,int>> node => key => source flags */
+    protected $out = [];
+    /** @var array<string,array{time:int,count:int}> table watermarks */
+    protected $marks = [];
+    /** @var int */
+    protected $built = 0;
+
+    /**
+     * Up-to-date automaton, compiling or refreshing the cached copy when needed.
+     *
+     * @return self|null null when the cache and the source tables are unavailable
+     */
+    public static function get(): ?self {
+        $cache = \cache::make('mod_flashcards', 'expression_automaton');
+        if (self::$instance === null) {
+            $data = $cache->get('automaton');
+            if (is_array($data) && (int)($data['version'] ?? 0) === self::VERSION) {
+                self::$instance = self::from_array($data);
+            }
+        }
+        try {
+            if (self::$instance === null) {
+                self::$instance = self::build();
+                self::store($cache, self::$instance);
+            } else if (self::$dirty || (int)$cache->get('checked') < time() - self::REFRESH_SECONDS) {
+                $fresh = self::$instance->refresh();
+                if ($fresh !== null) {
+                    self::$instance = $fresh;
+                }
+                self::store($cache, self::$instance);
+            }
+        } catch (\dml_exception $e) {
+            debugging('[flashcards] expression automaton unavailable: ' . $e->getMessage(), DEBUG_DEVELOPER);
+        }
+        self::$dirty = false;
+        return self::$instance;
+    }
+
+    /**
+     * Note that an expression row was written, so every process refreshes on its next get().
+     *
+     * Single words never become keys, so writes that only carry single words are ignored.
+     *
+     * @param string ...$phrases keys of the written row
+     */
+    public static function changed(string ...$phrases): void {
+        $multiword = false;
+        foreach ($phrases as $phrase) {
+            $multiword = $multiword || count(self::tokens($phrase)) >= 2;
+        }
+        if (!$multiword) {
+            return;
+        }
+        self::$dirty = true;
+        \cache::make('mod_flashcards', 'expression_automaton')->delete('checked');
+    }
+
+    /**
+     * Compile the automaton from all source tables.
+     *
+     * @return self
+     */
+    public static function build(): self {
+        $automaton = new self();
+        $automaton->load_table('flashcards_orbokene', 0);
+        $automaton->load_table('flashcards_expr_translations', 0);
+        $automaton->load_argstr();
+        $automaton->built = time();
+        return $automaton;
+    }
+
+    /**
+     * Tokens of an expression or sentence word as stored in the trie.
+     *
+     * @param string $phrase
+     * @return array<int,string>
+     */
+    public static function tokens(string $phrase): array {
+        if (!preg_match_all('/[\p{L}\p{M}]+/u', core_text::strtolower($phrase), $m)) {
+            return [];
+        }
+        return array_map([self::class, 'fold'], $m[0]);
+    }
+
+    /**
+     * Every occurrence of a known expression in a sentence.
+     *
+     * Positions are token indexes shared by both arrays; a position matches when either its
+     * lemma or its surface form equals the next expression token. Each key is reported once,
+     * at the occurrence that ends first; results are ordered by start.
+     *
+     * @param array<int,string> $lemmatokens
+     * @param array<int,string> $surfacetokens
+     * @param int $maxgap tokens allowed between two consecutive expression tokens
+     * @return array<int,array{key:string,sources:int,start:int,end:int,indices:array<int,int>}>
+     */
+    public function match(array $lemmatokens, array $surfacetokens, int $maxgap = 1): array {
+        $count = max(count($lemmatokens), count($surfacetokens));
+        $found = [];
+        // Live states: [node, last index, indices]; keyed by node and last index so each
+        // (prefix, position) pair is kept once - the earliest start wins.
+        $live = [];
+        for ($i = 0; $i < $count; $i++) {
+            $alts = [];
+            foreach ([$lemmatokens[$i] ?? '', $surfacetokens[$i] ?? ''] as $token) {
+                $token = self::fold(core_text::strtolower(trim((string)$token)));
+                if ($token !== '') {
+                    $alts[$token] = true;
+                }
+            }
+            $next = [];
+            foreach ($live as $id => $state) {
+                if ($i - $state[1] <= $maxgap) {
+                    // Still reachable from the next position: keep it as a possible gap.
+                    $next[$id] = $state;
+                }
+            }
+            $steps = $live;
+            $steps[] = [0, $i - 1, []];
+            foreach ($steps as $state) {
+                [$node, $last, $indices] = $state;
+                if ($i - $last - 1 > $maxgap) {
+                    continue;
+                }
+                foreach ($alts as $token => $unused) {
+                    $child = $this->edges[$node][$token] ?? null;
+                    if ($child === null) {
+                        continue;
+                    }
+                    $id = $child . ':' . $i;
+                    if (isset($next[$id])) {
+                        continue;
+                    }
+                    $path = $indices;
+                    $path[] = $i;
+                    $next[$id] = [$child, $i, $path];
+                    foreach ($this->out[$child] ?? [] as $key => $sources) {
+                        if (!isset($found[$key])) {
+                            $found[$key] = [
+                                'key' => (string)$key,
+                                'sources' => $sources,
+                                'start' => $path[0],
+                                'end' => $i,
+                                'indices' => $path,
+                            ];
+                        }
+                    }
+                }
+            }
+            $live = $next;
+        }
+        usort($found, static function(array $a, array $b): int {
+            return [$a['start'], $a['end']] <=> [$b['start'], $b['end']];
+        });
+        return $found;
+    }
+
+    /**
+     * True when the exact key (after normalize_phrase) was added with one of the $source flags.
+     *
+     * @param string $phrase
+     * @param int $source SOURCE_* flags
+     * @return bool
+     */
+    public function has(string $phrase, int $source): bool {
+        $node = 0;
+        foreach (self::tokens($phrase) as $token) {
+            $node = $this->edges[$node][$token] ?? null;
+            if ($node === null) {
+                return false;
+            }
+        }
+        $key = orbokene_repository::normalize_phrase($phrase);
+        return (($this->out[$node][$key] ?? 0) & $source) !== 0;
+    }
+
+    /**
+     * Span of one expression in a sentence, with the same gap and reflexive rules as match().
+     *
+     * @param string $phrase
+     * @param array<int,string> $lemmatokens
+     * @param array<int,string> $surfacetokens
+     * @param int $maxgap
+     * @return array{start:int,end:int,indices:array<int,int>}|null
+     */
+    public static function locate(string $phrase, array $lemmatokens, array $surfacetokens, int $maxgap = 1): ?array {
+        $single = new self();
+        $single->add($phrase, 0);
+        $hit = $single->match($lemmatokens, $surfacetokens, $maxgap)[0] ?? null;
+        if ($hit === null) {
+            return null;
+        }
+        return ['start' => $hit['start'], 'end' => $hit['end'], 'indices' => $hit['indices']];
+    }
+
+    /**
+     * Size figures for the benchmark and debugging.
+     *
+     * @return array{nodes:int,keys:int,built:int}
+     */
+    public function stats(): array {
+        $keys = 0;
+        foreach ($this->out as $keysatnode) {
+            $keys += count($keysatnode);
+        }
+        return ['nodes' => count($this->edges), 'keys' => $keys, 'built' => $this->built];
+    }
+
+    /**
+     * Insert one expression.
+     *
+     * @param string $phrase
+     * @param int $source SOURCE_* flag
+     */
+    public function add(string $phrase, int $source): void {
+        $key = orbokene_repository::normalize_phrase($phrase);
+        $tokens = self::tokens($key);
+        if (count($tokens) < 2 || count($tokens) > self::MAX_TOKENS) {
+            return;
+        }
+        $node = 0;
+        foreach ($tokens as $token) {
+            if (!isset($this->edges[$node][$token])) {
+                $this->edges[$node][$token] = count($this->edges);
+                $this->edges[] = [];
+            }
+            $node = $this->edges[$node][$token];
+        }
+        $this->out[$node][$key] = ($this->out[$node][$key] ?? 0) | $source;
+    }
+
+    /**
+     * Bring a cached automaton up to date with the tables.
+     *
+     * @return self|null a full rebuild when a table lost rows, null when updated in place
+     */
+    protected function refresh(): ?self {
+        global $DB;
+        foreach (['flashcards_orbokene', 'flashcards_expr_translations'] as $table) {
+            $mark = $this->marks[$table] ?? ['time' => 0, 'count' => 0];
+            if ($DB->count_records($table) < $mark['count']) {
+                return self::build();
+            }
+        }
+        foreach (['flashcards_orbokene', 'flashcards_expr_translations'] as $table) {
+            // Rows written in the watermark second may have been missed by the last read.
+            $this->load_table($table, (int)($this->marks[$table]['time'] ?? 0));
+        }
+        return null;
+    }
+
+    /**
+     * Insert the rows of a source table modified at or after $since and move its watermark.
+     *
+     * @param string $table
+     * @param int $since
+     */
+    protected function load_table(string $table, int $since): void {
+        global $DB;
+        $orbokene = $table === 'flashcards_orbokene';
+        $fields = $orbokene ? 'id, normalized, baseform, timemodified' : 'id, normalized, timemodified';
+        $mark = $this->marks[$table] ?? ['time' => 0, 'count' => 0];
+        $rs = $DB->get_recordset_select($table, 'timemodified >= :since', ['since' => $since], '', $fields);
+        foreach ($rs as $row) {
+            if ($orbokene) {
+                $this->add((string)$row->normalized, self::SOURCE_ORBOKENE);
+                if (!empty($row->baseform)) {
+                    // Known, but orbokene_repository::find() only reads rows by normalized.
+                    $this->add((string)$row->baseform, self::SOURCE_EXPRESSION);
+                }
+            } else {
+                $this->add((string)$row->normalized, self::SOURCE_EXPRESSION);
+            }
+            $mark['time'] = max($mark['time'], (int)$row->timemodified);
+        }
+        $rs->close();
+        $mark['count'] = $DB->count_records($table);
+        $this->marks[$table] = $mark;
+    }
+
+    /**
+     * Insert verb frames from the ordbank tags: "verb seg", "verb seg prep" and "verb prep".
+     *
+     * The ordbank is imported once, so these keys are only read on a full build.
+     */
+    protected function load_argstr(): void {
+        global $DB;
+        $dbman = $DB->get_manager();
+        if (!$dbman->table_exists(new \xmldb_table('ordbank_fullform'))
+                || !$dbman->table_exists(new \xmldb_table('ordbank_lemma'))) {
+            return;
+        }
+        $sql = "SELECT DISTINCT l.GRUNNFORM AS baseform, f.TAG AS tag
+                  FROM {ordbank_fullform} f
+                  JOIN {ordbank_lemma} l ON l.LEMMA_ID = f.LEMMA_ID
+                 WHERE " . $DB->sql_like('f.TAG', ':refl', false) . "
+                    OR " . $DB->sql_like('f.TAG', ':prep', false);
+        try {
+            $rs = $DB->get_recordset_sql($sql, ['refl' => '%<refl%', 'prep' => '%<%/%>%']);
+            foreach ($rs as $row) {
+                $verb = trim(core_text::strtolower((string)$row->baseform));
+                if ($verb === '' || str_contains($verb, ' ')) {
+                    continue;
+                }
+                $codes = ordbank_helper::extract_argcodes_from_tag((string)$row->tag);
+                foreach ($codes as $code) {
+                    $reflexive = str_starts_with($code['code'], 'refl');
+                    $preps = ordbank_helper::argcode_meta([$code])['preps'];
+                    if ($reflexive) {
+                        $this->add($verb . ' seg', self::SOURCE_ARGSTR);
+                    }
+                    foreach ($preps as $prep) {
+                        $this->add($verb . ($reflexive ? ' seg ' : ' ') . $prep, self::SOURCE_ARGSTR);
+                    }
+                }
+            }
+            $rs->close();
+        } catch (\dml_exception $e) {
+            debugging('[flashcards] expression automaton: ordbank frames skipped: ' . $e->getMessage(), DEBUG_DEVELOPER);
+        }
+    }
+
+    /**
+     * Fold reflexive pronouns to "seg".
+     *
+     * @param string $token lower-case token
+     * @return string
+     */
+    protected static function fold(string $token): string {
+        return in_array($token, self::REFLEXIVES, true) ? 'seg' : $token;
+    }
+
+    /**
+     * @param \cache $cache
+     * @param self $automaton
+     */
+    protected static function store(\cache $cache, self $automaton): void {
+        $cache->set('automaton', [
+            'version' => self::VERSION,
+            'edges' => $automaton->edges,
+            'out' => $automaton->out,
+            'marks' => $automaton->marks,
+            'built' => $automaton->built,
+        ]);
+        $cache->set('checked', time());
+    }
+
+    /**
+     * @param array $data cached form
+     * @return self
+     */
+    protected static function from_array(array $data): self {
+        $automaton = new self();
+        $automaton->edges = $data['edges'] ?? [[]];
+        $automaton->out = $data['out'] ?? [];
+        $automaton->marks = $data['marks'] ?? [];
+        $automaton->built = (int)($data['built'] ?? 0);
+        return $automaton;
+    }
+}
@@ -97,6 +97,7 @@ class expression_translation_repository {
             'timemodified' => $now,
         ];
         $DB->insert_record('flashcards_expr_translations', $record);
+        expression_automaton::changed($normalized);
     }
 
     protected static function clean_examples($examples): array {
@@ -0,0 +1,777 @@
+<?php
+
+namespace mod_flashcards\local;
+
+use moodle_exception;
+
+defined('MOODLE_INTERNAL') || die();
+
+/**
+ * Shared request layer for OpenAI-compatible chat completions.
+ *
+ * Every model call of openai_client and ai_helper goes through here:
+ * - answers are kept in the 'llm_response' application cache, keyed by model, sampling
+ *   parameters and whitespace-normalised messages, for a TTL per task (the calling
+ *   ai_helper/openai_client method, see TASK_TTL and the llm_cache_ttls setting);
+ * - identical requests are sent once: within a batch, and across processes by waiting on a
+ *   per-key lock and reading the first caller's answer from the cache;
+ * - at most llm_concurrency requests are in flight site-wide (one lock per slot) and the
+ *   estimated tokens per minute stay under llm_tokens_per_minute; requests wait for room,
+ *   and a 429/503 is retried after the delay the service asks for instead of failing;
+ * - latency and tokens per request are counted into per-task histograms (histograms()).
+ */
+class llm_scheduler {
+    /** Cache lifetime per task, seconds. */
+    const TASK_TTL = [
+        'detect_focus_data' => 7 * DAYSECS,
+        'translate_text' => 30 * DAYSECS,
+        'explain_sentence' => 30 * DAYSECS,
+        'check_norwegian_text' => 7 * DAYSECS,
+        'enrich_sentence_elements' => 7 * DAYSECS,
+        'confirm_expression_candidates' => 7 * DAYSECS,
+        'suggest_sentence_expressions' => 7 * DAYSECS,
+        'detect_constructions' => 7 * DAYSECS,
+        'generate_expression_content' => 30 * DAYSECS,
+        'choose_best_definition' => 30 * DAYSECS,
+        'answer_question' => DAYSECS,
+        'answer_ai_question' => DAYSECS,
+        'answer_ai_question_with_context' => DAYSECS,
+    ];
+    /** Cache lifetime of tasks not in TASK_TTL. */
+    const DEFAULT_TTL = DAYSECS;
+    /** Requests in flight site-wide when llm_concurrency is not set. */
+    const CONCURRENCY = 8;
+    /** Seconds a request waits for a slot or token budget before it is sent anyway. */
+    const MAX_WAIT = 60;
+    /** Retries of one request answered with 429 or 503. */
+    const MAX_RETRIES = 4;
+    /** Longest single back-off, seconds. */
+    const MAX_BACKOFF = 30;
+    /** Latency histogram upper bounds in ms; the last bucket counts everything slower. */
+    const LATENCY_BUCKETS = [250, 500, 1000, 2000, 4000, 8000, 16000, 32000];
+    /** Tokens-per-request histogram upper bounds. */
+    const TOKEN_BUCKETS = [250, 500, 1000, 2000, 4000, 8000, 16000];
+
+    /** @var array<string,array> task => counters and histograms of this process, not yet flushed */
+    protected static $stats = [];
+    /** @var bool */
+    protected static $flushregistered = false;
+    /** @var array<int,array<string,string>> handle id => response headers */
+    protected static $headers = [];
+
+    /** @var string */
+    protected $url;
+    /** @var string */
+    protected $apikey;
+    /** @var int */
+    protected $concurrency;
+    /** @var int */
+    protected $tpm;
+    /** @var array<string,int> */
+    protected $ttls;
+
+    /**
+     * @param string $url chat-completions endpoint
+     * @param string $apikey
+     */
+    public function __construct(string $url, string $apikey) {
+        $config = get_config('mod_flashcards');
+        $this->url = $url;
+        $this->apikey = $apikey;
+        $concurrency = (int)($config->llm_concurrency ?? 0);
+        $this->concurrency = $concurrency > 0 ? $concurrency : self::CONCURRENCY;
+        $this->tpm = max(0, (int)($config->llm_tokens_per_minute ?? 0));
+        $this->ttls = array_merge(self::TASK_TTL, self::parse_ttls((string)($config->llm_cache_ttls ?? '')));
+    }
+
+    /**
+     * Send one request.
+     *
+     * @param array $payload chat-completions body
+     * @param string $task
+     * @param int $timeout seconds per attempt
+     * @return object decoded response; cached answers have zero usage and ->cached = true
+     * @throws moodle_exception ai_http_error, ai_invalid_json
+     */
+    public function send(array $payload, string $task, int $timeout) {
+        $result = $this->send_many([$payload], $task, $timeout)[0];
+        if ($result['error'] !== null) {
+            if ($result['kind'] === 'json') {
+                throw new moodle_exception('ai_invalid_json', 'mod_flashcards', '',
+                    'Response preview: ' . substr($result['body'], 0, 500));
+            }
+            throw new moodle_exception('ai_http_error', 'mod_flashcards', '', null, $result['error']);
+        }
+        return $result['json'];
+    }
+
+    /**
+     * Send several requests concurrently.
+     *
+     * With $samples each payload is a separate sample of the same prompt: identical payloads
+     * are then neither merged nor answered from each other's cache entries.
+     *
+     * $onresult(index, result) is called as each result arrives, cached ones first. When it
+     * returns true the remaining transfers are aborted and their results have kind 'cancelled'.
+     *
+     * @param array<int|string,array> $payloads
+     * @param string $task
+     * @param int $timeout seconds per attempt
+     * @param bool $samples
+     * @param callable|null $onresult
+     * @return array<int|string,array{json:?object,http:int,body:string,error:?string,kind:string,cached:bool,ms:float}>
+     *         keyed like $payloads; kind is '' on success, 'http', 'json' or 'cancelled' otherwise
+     */
+    public function send_many(array $payloads, string $task, int $timeout, bool $samples = false,
+            ?callable $onresult = null): array {
+        $ttl = $this->ttl($task);
+        $cache = $ttl > 0 ? \cache::make('mod_flashcards', 'llm_response') : null;
+        $keys = [];
+        $sample = 0;
+        foreach ($payloads as $idx => $payload) {
+            $keys[$idx] = self::cache_key($payload, $samples ? $sample++ : null);
+            if (!empty($payload['stream'])) {
+                $cache = null;
+            }
+        }
+        $this->count($task, 'calls', count($payloads));
+
+        $answers = $cache ? $this->lookup($cache, array_unique(array_values($keys)), $ttl) : [];
+        $this->count($task, 'cache_hits', count(array_intersect($keys, array_keys($answers))));
+        $stop = false;
+        $notify = null;
+        if ($onresult) {
+            $notify = function(string $key, array $result) use ($keys, $onresult, &$stop): bool {
+                foreach (array_keys($keys, $key, true) as $idx) {
+                    if (!$stop && $onresult($idx, $result)) {
+                        $stop = true;
+                    }
+                }
+                return $stop;
+            };
+            foreach ($answers as $key => $result) {
+                $notify($key, $result);
+            }
+        }
+        $pending = [];
+        foreach ($payloads as $idx => $payload) {
+            $key = $keys[$idx];
+            if (isset($answers[$key])) {
+                continue;
+            }
+            if (isset($pending[$key])) {
+                $this->count($task, 'deduped');
+                continue;
+            }
+            $pending[$key] = $payload;
+        }
+
+        // Keys another process is sending right now: wait for its answer instead.
+        $locks = [];
+        $waiting = [];
+        if ($cache) {
+            foreach (array_keys($pending) as $key) {
+                if ($lock = self::lock('mod_flashcards_llm', $key, 0)) {
+                    $locks[$key] = $lock;
+                } else {
+                    $waiting[$key] = $pending[$key];
+                    unset($pending[$key]);
+                }
+            }
+        }
+        try {
+            if (!$stop) {
+                $answers += $this->transfer($pending, $task, $timeout, $cache, $notify);
+            }
+            foreach ($waiting as $key => $payload) {
+                if ($stop) {
+                    break;
+                }
+                if ($lock = self::lock('mod_flashcards_llm', $key, $timeout)) {
+                    $locks[$key] = $lock;
+                }
+                $found = $this->lookup($cache, [$key], $ttl);
+                if (isset($found[$key])) {
+                    $this->count($task, 'coalesced');
+                    $answers += $found;
+                    if ($notify) {
+                        $notify($key, $found[$key]);
+                    }
+                } else {
+                    $answers += $this->transfer([$key => $payload], $task, $timeout, $cache, $notify);
+                }
+            }
+        } finally {
+            foreach ($locks as $lock) {
+                $lock->release();
+            }
+        }
+
+        $out = [];
+        foreach ($keys as $idx => $key) {
+            $out[$idx] = $answers[$key] ?? ['json' => null, 'http' => 0, 'body' => '', 'error' => 'Cancelled',
+                'kind' => 'cancelled', 'cached' => false, 'ms' => 0.0];
+        }
+        return $out;
+    }
+
+    /**
+     * Cache lifetime of a task's answers in seconds (0 = not cached).
+     *
+     * @param string $task
+     * @return int
+     */
+    public function ttl(string $task): int {
+        return max(0, (int)($this->ttls[$task] ?? self::DEFAULT_TTL));
+    }
+
+    /**
+     * Cache key of a request: model, parameters and whitespace-normalised messages.
+     *
+     * @param array $payload
+     * @param int|null $sample sample number for multi-sample requests
+     * @return string
+     */
+    public static function cache_key(array $payload, ?int $sample = null): string {
+        $normalized = self::normalize($payload);
+        if ($sample !== null) {
+            $normalized['__sample'] = $sample;
+        }
+        return sha1(json_encode($normalized, JSON_UNESCAPED_UNICODE | JSON_UNESCAPED_SLASHES));
+    }
+
+    /**
+     * Counters and histograms of this process, per task.
+     *
+     * @return array<string,array>
+     */
+    public static function stats(): array {
+        return self::$stats;
+    }
+
+    /**
+     * Site-wide per-task counters and histograms, including this process's unflushed ones.
+     *
+     * Each task has calls, cache_hits, deduped, coalesced, requests, cancelled, retries, errors, tokens,
+     * latency_ms, queued_ms and throttled_ms totals, and 'latency' / 'tokens_hist' bucket
+     * counts for LATENCY_BUCKETS / TOKEN_BUCKETS (plus one overflow bucket).
+     *
+     * @return array<string,array>
+     */
+    public static function histograms(): array {
+        $stored = \cache::make('mod_flashcards', 'llm_state')->get('histograms') ?: [];
+        return self::merge($stored, self::$stats);
+    }
+
+    /**
+     * Forget the site-wide histograms.
+     */
+    public static function reset_histograms(): void {
+        \cache::make('mod_flashcards', 'llm_state')->delete('histograms');
+        self::$stats = [];
+    }
+
+    /**
+     * Add this process's counters to the site-wide histograms (runs at shutdown).
+     */
+    public static function flush(): void {
+        if (!self::$stats) {
+            return;
+        }
+        $lock = self::lock('mod_flashcards_llm', 'histograms', 5);
+        try {
+            $cache = \cache::make('mod_flashcards', 'llm_state');
+            $cache->set('histograms', self::merge($cache->get('histograms') ?: [], self::$stats));
+            self::$stats = [];
+        } finally {
+            if ($lock) {
+                $lock->release();
+            }
+        }
+    }
+
+    /**
+     * Run requests through curl_multi inside the concurrency and token limits.
+     *
+     * @param array<string,array> $items cache key => payload
+     * @param string $task
+     * @param int $timeout
+     * @param \cache|null $cache where successful answers are stored
+     * @param callable|null $ondone (key, result) as each result arrives; true aborts the rest
+     * @return array<string,array> cache key => result
+     */
+    protected function transfer(array $items, string $task, int $timeout, $cache, ?callable $ondone = null): array {
+        if (!$items) {
+            return [];
+        }
+        $start = microtime(true);
+        $out = [];
+        $queue = [];
+        foreach (array_keys($items) as $key) {
+            $queue[] = ['key' => $key, 'attempt' => 0, 'at' => 0.0];
+        }
+        $slots = $this->acquire_slots(count($items), $task);
+        $width = max(1, $slots === null ? count($items) : count($slots));
+        $mh = curl_multi_init();
+        $active = [];
+        try {
+            while ($queue || $active) {
+                $now = microtime(true);
+                foreach ($queue as $i => $job) {
+                    if (count($active) >= $width) {
+                        break;
+                    }
+                    if ($job['at'] > $now) {
+                        continue;
+                    }
+                    unset($queue[$i]);
+                    $job['estimate'] = $this->estimate_tokens($items[$job['key']]);
+                    $this->reserve_tokens($job['estimate'], $task);
+                    $ch = $this->handle($items[$job['key']], $timeout);
+                    $job['start'] = microtime(true);
+                    $active[self::handle_id($ch)] = [$ch, $job];
+                    curl_multi_add_handle($mh, $ch);
+                }
+                if (!$active) {
+                    $next = min(array_column($queue, 'at'));
+                    usleep((int)max(10000, ($next - microtime(true)) * 1e6));
+                    continue;
+                }
+                curl_multi_exec($mh, $running);
+                if ($running && curl_multi_select($mh, 0.2) === -1) {
+                    usleep(5000);
+                }
+                while ($done = curl_multi_info_read($mh)) {
+                    $ch = $done['handle'];
+                    $hid = self::handle_id($ch);
+                    if (!isset($active[$hid])) {
+                        continue;
+                    }
+                    [, $job] = $active[$hid];
+                    unset($active[$hid]);
+                    $headers = self::$headers[$hid] ?? [];
+                    unset(self::$headers[$hid]);
+                    $body = (string)curl_multi_getcontent($ch);
+                    $http = (int)curl_getinfo($ch, CURLINFO_HTTP_CODE);
+                    $error = $done['result'] !== CURLE_OK ? 'cURL ' . $done['result'] . ': ' . curl_error($ch) : '';
+                    $ms = (microtime(true) - $job['start']) * 1000;
+                    curl_multi_remove_handle($mh, $ch);
+                    curl_close($ch);
+                    if (($http === 429 || $http === 503) && $job['attempt'] < self::MAX_RETRIES) {
+                        // Give the estimate back; the retry reserves it again.
+                        $this->adjust_tokens(-$job['estimate']);
+                        $delay = self::retry_delay($headers, $job['attempt']);
+                        $this->count($task, 'retries');
+                        $this->count($task, 'throttled_ms', (int)($delay * 1000));
+                        $queue[] = ['key' => $job['key'], 'attempt' => $job['attempt'] + 1, 'at' => microtime(true) + $delay];
+                        continue;
+                    }
+                    $out[$job['key']] = $this->result($body, $http, $error, $ms, $task, $job['estimate']);
+                    if ($cache && $out[$job['key']]['error'] === null) {
+                        $cache->set($job['key'], ['t' => time(), 'body' => $body]);
+                    }
+                    if ($ondone && $ondone($job['key'], $out[$job['key']])) {
+                        // Decided early: drop what is still queued or in flight (closed below).
+                        foreach ($active as [, $running]) {
+                            $this->adjust_tokens(-$running['estimate']);
+                        }
+                        $this->count($task, 'cancelled', count($active) + count($queue));
+                        $queue = [];
+                        break 2;
+                    }
+                }
+            }
+        } finally {
+            foreach ($active as [$ch]) {
+                curl_multi_remove_handle($mh, $ch);
+                curl_close($ch);
+            }
+            curl_multi_close($mh);
+            foreach ($slots ?? [] as $slot) {
+                $slot->release();
+            }
+            profiler::external('openai', $start, count($out));
+        }
+        return $out;
+    }
+
+    /**
+     * Turn a finished transfer into a result and count it.
+     *
+     * @return array{json:?object,http:int,body:string,error:?string,kind:string,cached:bool,ms:float}
+     */
+    protected function result(string $body, int $http, string $error, float $ms, string $task, int $estimate): array {
+        $result = ['json' => null, 'http' => $http, 'body' => $body, 'error' => null, 'kind' => '',
+            'cached' => false, 'ms' => $ms];
+        $this->count($task, 'requests');
+        $this->count($task, 'latency_ms', (int)$ms);
+        $this->bucket($task, 'latency', self::LATENCY_BUCKETS, $ms);
+        if ($error !== '' || $http >= 400 || $body === '') {
+            $result['error'] = $error !== '' ? $error : ($body === '' && $http < 400
+                ? 'Empty response' : 'HTTP ' . $http . ': ' . substr($body, 0, 500));
+            $result['kind'] = 'http';
+        } else if (!is_object($json = json_decode($body))) {
+            $result['error'] = 'Invalid JSON';
+            $result['kind'] = 'json';
+        } else {
+            $result['json'] = $json;
+        }
+        if ($result['error'] !== null) {
+            $this->count($task, 'errors');
+            $this->adjust_tokens(-$estimate);
+            return $result;
+        }
+        $usage = (array)($result['json']->usage ?? []);
+        $tokens = (int)($usage['total_tokens'] ?? ((int)($usage['prompt_tokens'] ?? 0) + (int)($usage['completion_tokens'] ?? 0)));
+        $this->count($task, 'tokens', $tokens);
+        $this->bucket($task, 'tokens_hist', self::TOKEN_BUCKETS, $tokens);
+        if ($tokens > 0) {
+            $this->adjust_tokens($tokens - $estimate);
+        }
+        return $result;
+    }
+
+    /**
+     * Fresh cached answers for some keys, as results.
+     *
+     * @param \cache $cache
+     * @param string[] $keys
+     * @param int $ttl
+     * @return array<string,array>
+     */
+    protected function lookup($cache, array $keys, int $ttl): array {
+        $out = [];
+        foreach ($cache->get_many($keys) as $key => $entry) {
+            if (!is_array($entry) || (int)($entry['t'] ?? 0) < time() - $ttl) {
+                continue;
+            }
+            $json = json_decode((string)$entry['body']);
+            if (!is_object($json)) {
+                continue;
+            }
+            // Nothing was spent on this answer: report it with zero usage.
+            if (isset($json->usage)) {
+                $total = (int)($json->usage->total_tokens ?? 0);
+                $json->usage = (object)['prompt_tokens' => 0, 'completion_tokens' => 0, 'total_tokens' => 0,
+                    'cached_tokens' => $total];
+            }
+            $json->cached = true;
+            $out[$key] = ['json' => $json, 'http' => 200, 'body' => (string)$entry['body'], 'error' => null,
+                'kind' => '', 'cached' => true, 'ms' => 0.0];
+        }
+        return $out;
+    }
+
+    /**
+     * Up to $want concurrency slots, waiting for at least one.
+     *
+     * @param int $want
+     * @param string $task
+     * @return \core\lock\lock[]|null null when locking is unavailable (no limit)
+     */
+    protected function acquire_slots(int $want, string $task): ?array {
+        try {
+            $factory = \core\lock\lock_config::get_lock_factory('mod_flashcards_llm_slot');
+        } catch (\Throwable $e) {
+            return null;
+        }
+        $want = min($want, $this->concurrency);
+        $start = microtime(true);
+        $slots = [];
+        while (true) {
+            for ($i = 0; $i < $this->concurrency && count($slots) < $want; $i++) {
+                if (!isset($slots[$i]) && ($lock = $factory->get_lock('slot' . $i, 0))) {
+                    $slots[$i] = $lock;
+                }
+            }
+            if ($slots || microtime(true) - $start >= self::MAX_WAIT) {
+                break;
+            }
+            usleep(100000);
+        }
+        $this->count($task, 'queued_ms', (int)((microtime(true) - $start) * 1000));
+        if (!$slots) {
+            debugging('[flashcards][llm] no free request slot after ' . self::MAX_WAIT . 's, sending anyway',
+                DEBUG_DEVELOPER);
+        }
+        return $slots;
+    }
+
+    /**
+     * Take $tokens from this minute's budget, waiting for the next minute when it is spent.
+     *
+     * @param int $tokens
+     * @param string $task
+     */
+    protected function reserve_tokens(int $tokens, string $task): void {
+        if ($this->tpm <= 0) {
+            return;
+        }
+        $cache = \cache::make('mod_flashcards', 'llm_state');
+        $start = microtime(true);
+        while (true) {
+            $lock = self::lock('mod_flashcards_llm', 'tpm', 5);
+            try {
+                $minute = intdiv(time(), 60);
+                $window = $cache->get('tpm') ?: [];
+                $used = (int)($window['minute'] ?? -1) === $minute ? (int)$window['used'] : 0;
+                $fits = $used === 0 || $used + $tokens <= $this->tpm || microtime(true) - $start >= self::MAX_WAIT;
+                if ($fits) {
+                    $cache->set('tpm', ['minute' => $minute, 'used' => $used + $tokens]);
+                }
+            } finally {
+                if ($lock) {
+                    $lock->release();
+                }
+            }
+            if ($fits) {
+                break;
+            }
+            usleep((60 - time() % 60) * 1000000 + 50000);
+        }
+        $this->count($task, 'throttled_ms', (int)((microtime(true) - $start) * 1000));
+    }
+
+    /**
+     * Correct this minute's budget once the real token count is known.
+     *
+     * @param int $delta
+     */
+    protected function adjust_tokens(int $delta): void {
+        if ($this->tpm <= 0 || $delta === 0) {
+            return;
+        }
+        $cache = \cache::make('mod_flashcards', 'llm_state');
+        $lock = self::lock('mod_flashcards_llm', 'tpm', 5);
+        try {
+            $window = $cache->get('tpm') ?: [];
+            if ((int)($window['minute'] ?? -1) === intdiv(time(), 60)) {
+                $cache->set('tpm', ['minute' => $window['minute'], 'used' => max(0, (int)$window['used'] + $delta)]);
+            }
+        } finally {
+            if ($lock) {
+                $lock->release();
+            }
+        }
+    }
+
+    /**
+     * Rough token count of a request: ~4 characters per prompt token plus the completion cap.
+     *
+     * @param array $payload
+     * @return int
+     */
+    protected function estimate_tokens(array $payload): int {
+        $chars = 0;
+        foreach ($payload['messages'] ?? [] as $message) {
+            $chars += strlen(is_string($message['content'] ?? null) ? $message['content'] : json_encode($message['content'] ?? ''));
+        }
+        $completion = (int)($payload['max_completion_tokens'] ?? $payload['max_tokens'] ?? 500);
+        return (int)ceil($chars / 4) + $completion;
+    }
+
+    /**
+     * @param array $payload
+     * @param int $timeout
+     * @return \CurlHandle|resource
+     */
+    protected function handle(array $payload, int $timeout) {
+        $ch = curl_init($this->url);
+        $hid = self::handle_id($ch);
+        self::$headers[$hid] = [];
+        curl_setopt_array($ch, [
+            CURLOPT_POST => true,
+            CURLOPT_POSTFIELDS => json_encode($payload, JSON_UNESCAPED_UNICODE),
+            CURLOPT_HTTPHEADER => [
+                'Content-Type: application/json',
+                'Authorization: Bearer ' . $this->apikey,
+            ],
+            CURLOPT_RETURNTRANSFER => true,
+            CURLOPT_TIMEOUT => $timeout,
+            CURLOPT_CONNECTTIMEOUT => 10,
+            CURLOPT_HEADERFUNCTION => function($ch, string $line) use ($hid): int {
+                $parts = explode(':', $line, 2);
+                if (count($parts) === 2) {
+                    self::$headers[$hid][strtolower(trim($parts[0]))] = trim($parts[1]);
+                }
+                return strlen($line);
+            },
+        ]);
+        ordbokene_http::apply_proxy($ch);
+        return $ch;
+    }
+
+    /**
+     * Seconds to wait before retrying: Retry-After or x-ratelimit-reset-*, else exponential.
+     *
+     * @param array<string,string> $headers
+     * @param int $attempt
+     * @return float
+     */
+    protected static function retry_delay(array $headers, int $attempt): float {
+        $delay = 0.0;
+        if (isset($headers['retry-after']) && is_numeric($headers['retry-after'])) {
+            $delay = (float)$headers['retry-after'];
+        } else {
+            foreach (['x-ratelimit-reset-tokens', 'x-ratelimit-reset-requests'] as $name) {
+                // OpenAI durations look like "1s", "250ms" or "1m3.5s".
+                if (isset($headers[$name]) && preg_match_all('/([\d.]+)(ms|s|m|h)/', $headers[$name], $m, PREG_SET_ORDER)) {
+                    $seconds = 0.0;
+                    foreach ($m as [, $value, $unit]) {
+                        $seconds += (float)$value * ['ms' => 0.001, 's' => 1, 'm' => 60, 'h' => 3600][$unit];
+                    }
+                    $delay = max($delay, $seconds);
+                }
+            }
+        }
+        if ($delay <= 0) {
+            $delay = 0.5 * (2 ** $attempt);
+        }
+        return min(self::MAX_BACKOFF, $delay + mt_rand(0, 250) / 1000);
+    }
+
+    /**
+     * Recursively sorted payload with normalised message text.
+     *
+     * @param mixed $value
+     * @param string $field
+     * @return mixed
+     */
+    protected static function normalize($value, string $field = '') {
+        if (is_string($value) && $field === 'content') {
+            $value = str_replace(["\r\n", "\r"], "\n", $value);
+            $value = preg_replace(['/[ \t]+/u', '/ ?\n ?/u'], [' ', "\n"], $value) ?? $value;
+            return trim($value);
+        }
+        if (!is_array($value)) {
+            return $value;
+        }
+        $islist = array_keys($value) === range(0, count($value) - 1);
+        if (!$islist) {
+            ksort($value);
+        }
+        foreach ($value as $name => $item) {
+            $value[$name] = self::normalize($item, is_string($name) ? $name : $field);
+        }
+        return $value;
+    }
+
+    /**
+     * Parse "task = seconds" lines of the llm_cache_ttls setting.
+     *
+     * @param string $raw
+     * @return array<string,int>
+     */
+    protected static function parse_ttls(string $raw): array {
+        $out = [];
+        foreach (preg_split("/\r?\n/", $raw) as $line) {
+            $line = trim($line);
+            if ($line === '' || strpos($line, '=') === false) {
+                continue;
+            }
+            [$task, $seconds] = array_map('trim', explode('=', $line, 2));
+            if ($task !== '' && is_numeric($seconds)) {
+                $out[$task] = (int)$seconds;
+            }
+        }
+        return $out;
+    }
+
+    /**
+     * Add to a counter of this process and make sure it is flushed at shutdown.
+     *
+     * @param string $task
+     * @param string $name
+     * @param int $amount
+     */
+    protected function count(string $task, string $name, int $amount = 1): void {
+        $this->init_stats($task);
+        self::$stats[$task][$name] += $amount;
+    }
+
+    /**
+     * @param string $task
+     * @param string $name histogram
+     * @param int[] $bounds
+     * @param float $value
+     */
+    protected function bucket(string $task, string $name, array $bounds, float $value): void {
+        $i = 0;
+        while ($i < count($bounds) && $value > $bounds[$i]) {
+            $i++;
+        }
+        $this->init_stats($task);
+        self::$stats[$task][$name][$i]++;
+    }
+
+    /**
+     * Start counting for a task in this process; counters are flushed at shutdown.
+     *
+     * @param string $task
+     */
+    protected function init_stats(string $task): void {
+        if (!isset(self::$stats[$task])) {
+            self::$stats[$task] = self::empty_stats();
+        }
+        if (!self::$flushregistered) {
+            self::$flushregistered = true;
+            \core_shutdown_manager::register_function([self::class, 'flush']);
+        }
+    }
+
+    /**
+     * @return array
+     */
+    protected static function empty_stats(): array {
+        return ['calls' => 0, 'cache_hits' => 0, 'deduped' => 0, 'coalesced' => 0, 'requests' => 0,
+            'cancelled' => 0, 'retries' => 0, 'errors' => 0, 'tokens' => 0, 'latency_ms' => 0, 'queued_ms' => 0, 'throttled_ms' => 0,
+            'latency' => array_fill(0, count(self::LATENCY_BUCKETS) + 1, 0),
+            'tokens_hist' => array_fill(0, count(self::TOKEN_BUCKETS) + 1, 0)];
+    }
+
+    /**
+     * @param array $a per-task stats
+     * @param array $b per-task stats
+     * @return array sum
+     */
+    protected static function merge(array $a, array $b): array {
+        foreach ($b as $task => $stats) {
+            $sum = ($a[$task] ?? []) + self::empty_stats();
+            foreach ($stats as $name => $value) {
+                if (is_array($value)) {
+                    foreach ($value as $i => $n) {
+                        $sum[$name][$i] = ($sum[$name][$i] ?? 0) + $n;
+                    }
+                } else {
+                    $sum[$name] += $value;
+                }
+            }
+            $a[$task] = $sum;
+        }
+        return $a;
+    }
+
+    /**
+     * Lock in $type, or null when locking is unavailable or timed out.
+     *
+     * @param string $type
+     * @param string $resource
+     * @param int $timeout
+     * @return \core\lock\lock|null
+     */
+    protected static function lock(string $type, string $resource, int $timeout) {
+        try {
+            return \core\lock\lock_config::get_lock_factory($type)->get_lock($resource, $timeout) ?: null;
+        } catch (\Throwable $e) {
+            return null;
+        }
+    }
+
+    /**
+     * @param \CurlHandle|resource $ch
+     * @return int
+     */
+    protected static function handle_id($ch): int {
+        return is_object($ch) ? spl_object_id($ch) : (int)$ch;
+    }
+}
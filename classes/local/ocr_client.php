@@ -95,7 +95,9 @@ class ocr_client {
             CURLOPT_TIMEOUT => $this->timeout,
         ]);
 
+        $start = microtime(true);
         $response = curl_exec($curl);
+        profiler::external('ocr', $start);
         if ($response === false) {
             $error = curl_error($curl);
             curl_close($curl);
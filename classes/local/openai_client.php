@@ -45,6 +45,8 @@ class openai_client {
     protected $model;
     /** @var bool */
     protected $enabled;
+    /** @var llm_scheduler|null */
+    protected $scheduler = null;
 
     public function __construct() {
         $config = get_config('mod_flashcards');
@@ -973,7 +975,7 @@ PROMPT;
         return $result;
     }
 
-    protected function request(array $payload) {
+    protected function request(array $payload, string $task = '') {
         // Some newer models (e.g. gpt-5-mini/gpt-5-nano) only support the
         // default temperature and expose reasoning controls. For those,
         // drop any explicit temperature override (to avoid HTTP 400
@@ -996,61 +998,33 @@ PROMPT;
             }
         }
 
-        $curl = new \curl();
-        $headers = [
-            'Content-Type: application/json',
-            'Authorization: Bearer ' . $this->apikey,
-        ];
-
         // Use longer timeout for reasoning models (o1, gpt-5 series)
         $timeout = $useReasoningModel ? 90 : 30;
+        return $this->scheduler()->send($payload, $task !== '' ? $task : $this->caller_task(), $timeout);
+    }
 
-        $options = [
-            'CURLOPT_HTTPHEADER' => $headers,
-            'CURLOPT_TIMEOUT' => $timeout,
-            'CURLOPT_CONNECTTIMEOUT' => 10,
-        ];
-        $t0 = microtime(true);
-        $response = $curl->post($this->baseurl, json_encode($payload, JSON_UNESCAPED_UNICODE), $options);
-        $phpduration = microtime(true) - $t0;
-        if ($response === false) {
-            $errno = $curl->get_errno();
-            $error = $curl->error;
-            throw new moodle_exception('ai_http_error', 'mod_flashcards', '', null, "cURL {$errno}: {$error}");
-        }
-        $info = $curl->get_info();
-        if (!empty($info)) {
-            $httpcode = (int)($info['http_code'] ?? 0);
-            $totaltime = isset($info['total_time']) ? (float)$info['total_time'] : -1.0;
-            $namelookup = isset($info['namelookup_time']) ? (float)$info['namelookup_time'] : -1.0;
-            $connecttime = isset($info['connect_time']) ? (float)$info['connect_time'] : -1.0;
-            $appconnect = isset($info['appconnect_time']) ? (float)$info['appconnect_time'] : -1.0;
-            $pretransfer = isset($info['pretransfer_time']) ? (float)$info['pretransfer_time'] : -1.0;
-            $starttransfer = isset($info['starttransfer_time']) ? (float)$info['starttransfer_time'] : -1.0;
-            debugging('[flashcards][openai] model=' . ($model ?: 'n/a')
-                . ' http=' . $httpcode
-                . ' nl=' . sprintf('%.3f', $namelookup)
-                . ' conn=' . sprintf('%.3f', $connecttime)
-                . ' app=' . sprintf('%.3f', $appconnect)
-                . ' pre=' . sprintf('%.3f', $pretransfer)
-                . ' start=' . sprintf('%.3f', $starttransfer)
-                . ' total=' . sprintf('%.3f', $totaltime)
-                . ' php=' . sprintf('%.3f', $phpduration),
-                DEBUG_DEVELOPER);
-        }
-        if (!empty($info['http_code']) && (int)$info['http_code'] >= 400) {
-            $error_msg = 'HTTP ' . $info['http_code'] . ': ' . substr($response, 0, 500);
-            debugging('[flashcards][openai] API Error: ' . $error_msg, DEBUG_DEVELOPER);
-            debugging('[flashcards][openai] Request payload: ' . json_encode($payload), DEBUG_DEVELOPER);
-            throw new moodle_exception('ai_http_error', 'mod_flashcards', '', null, $error_msg);
-        }
-        $json = json_decode($response);
-        if (!$json) {
-            $preview = substr($response, 0, 500);
-            error_log('ai_invalid_json: response preview = ' . $preview);
-            throw new moodle_exception('ai_invalid_json', 'mod_flashcards', '', 'Response preview: ' . $preview);
-        }
-        return $json;
+    /**
+     * Shared request layer (cache, coalescing, rate limits) for this endpoint.
+     */
+    public function scheduler(): llm_scheduler {
+        if ($this->scheduler === null) {
+            $this->scheduler = new llm_scheduler($this->baseurl, (string)$this->apikey);
+        }
+        return $this->scheduler;
+    }
+
+    /**
+     * Task name for the scheduler: the ai_helper/openai_client method that asked for the request.
+     */
+    protected function caller_task(): string {
+        $skip = ['request', 'chat', 'caller_task', 'invoke', 'invokeArgs', '{closure}'];
+        foreach (debug_backtrace(DEBUG_BACKTRACE_IGNORE_ARGS, 8) as $frame) {
+            $class = $frame['class'] ?? '';
+            if (($class === self::class || $class === ai_helper::class) && !in_array($frame['function'], $skip, true)) {
+                return $frame['function'];
+            }
+        }
+        return 'chat';
     }
 
     /**
@@ -93,6 +93,7 @@ class orbokene_repository {
             $record->timecreated = time();
             $DB->insert_record('flashcards_orbokene', $record);
         }
+        expression_automaton::changed($normalized, $record->baseform);
     }
 
     protected static function decode_examples(string $json): array {
@@ -20,6 +20,8 @@ class ordbank_helper {
     protected static $hasoppslaglc = null;
     /** @var array<string,array<string,mixed>>|null */
     protected static $argstrmap = null;
+    /** @var array<string,array<string,array<string,mixed>>> find_candidates() results for this request */
+    protected static $candidatecache = [];
 
     /**
      * Return an explicit binary collation for exact byte-wise comparisons on MySQL/MariaDB.
@@ -385,22 +387,100 @@ class ordbank_helper {
      * @return array<int,array<string,mixed>>
      */
     public static function find_candidates(string $wordform): array {
-        global $DB;
-
         $normalized = core_text::strtolower(trim($wordform));
         if ($normalized === '') {
             return [];
         }
+        return self::find_candidates_batch([$normalized])[$normalized] ?? [];
+    }
+
+    /**
+     * Resolve ordbank candidates for many surface forms at once.
+     *
+     * Uses the compiled lexicon (see ordbank_lexicon) when one is installed, otherwise a
+     * single IN() query over the fullform join. Results are kept for the rest of the request,
+     * so callers can prefetch a sentence and then call find_candidates() per token.
+     *
+     * @param array<int,string> $wordforms
+     * @return array<string,array<string,array<string,mixed>>> keyed by lower-cased wordform
+     */
+    public static function find_candidates_batch(array $wordforms): array {
+        $wanted = [];
+        foreach ($wordforms as $wordform) {
+            $normalized = core_text::strtolower(trim((string)$wordform));
+            if ($normalized !== '') {
+                $wanted[$normalized] = true;
+            }
+        }
+        $missing = array_keys(array_diff_key($wanted, self::$candidatecache));
+        if (!empty($missing)) {
+            $lexicon = ordbank_lexicon::instance();
+            $rowsbyword = $lexicon ? self::lexicon_candidate_rows($lexicon, $missing) : self::db_candidate_rows($missing);
+            if ($rowsbyword !== null) {
+                // One pron_dict query for every wordform/baseform of the batch instead of
+                // up to two lookups per candidate in build_candidates().
+                $pronwords = [];
+                foreach ($rowsbyword as $rows) {
+                    foreach ($rows as $row) {
+                        $pronwords[] = (string)($row['wordform'] ?? '');
+                        $pronwords[] = (string)($row['baseform'] ?? '');
+                    }
+                }
+                pronunciation_manager::prefetch($pronwords);
+                foreach ($missing as $normalized) {
+                    self::$candidatecache[$normalized] = self::build_candidates($rowsbyword[$normalized] ?? []);
+                }
+            }
+        }
+        $out = [];
+        foreach (array_keys($wanted) as $normalized) {
+            $out[$normalized] = self::$candidatecache[$normalized] ?? [];
+        }
+        return $out;
+    }
+
+    /**
+     * Candidate rows from the compiled lexicon, shaped like the DB rows.
+     *
+     * @param ordbank_lexicon $lexicon
+     * @param array<int,string> $words normalized wordforms
+     * @return array<string,array<int,array<string,mixed>>>
+     */
+    protected static function lexicon_candidate_rows(ordbank_lexicon $lexicon, array $words): array {
+        $nullable = ['baseform', 'ordklasse', 'ordklasse_utdyping', 'boy_gruppe', 'boy_tekst', 'ordbok_tekst'];
+        $out = [];
+        foreach ($lexicon->lookup_many($words) as $word => $rows) {
+            foreach ($rows as $row) {
+                foreach ($nullable as $field) {
+                    if ($row[$field] === '') {
+                        $row[$field] = null;
+                    }
+                }
+                $out[$word][] = $row;
+            }
+        }
+        return $out;
+    }
+
+    /**
+     * Candidate rows from the ordbank tables, one query for all words.
+     *
+     * @param array<int,string> $words normalized wordforms
+     * @return array<string,array<int,array<string,mixed>>>|null null when the query failed
+     */
+    protected static function db_candidate_rows(array $words): ?array {
+        global $DB;
 
         if (self::has_oppslag_lc()) {
-            $where = 'f.OPPSLAG_LC = :w';
+            $matchexpr = 'f.OPPSLAG_LC';
         } else {
             $bin = self::mysql_bin_collation();
-            $where = 'LOWER(f.OPPSLAG) = :w';
+            $matchexpr = 'LOWER(f.OPPSLAG)';
             if ($bin) {
-                $where = 'LOWER(f.OPPSLAG) COLLATE ' . $bin . ' = :w';
+                $matchexpr = 'LOWER(f.OPPSLAG) COLLATE ' . $bin;
             }
         }
+        [$insql, $params] = $DB->get_in_or_equal($words, SQL_PARAMS_NAMED, 'w');
         $sql = "SELECT f.LEMMA_ID,
                        f.OPPSLAG AS wordform,
                        f.TAG,
@@ -416,17 +496,35 @@ class ordbank_helper {
              LEFT JOIN {ordbank_lemma} l ON l.LEMMA_ID = f.LEMMA_ID
              LEFT JOIN {ordbank_paradigme} p ON p.PARADIGME_ID = f.PARADIGME_ID
              LEFT JOIN {ordbank_boying} b ON b.BOY_NUMMER = f.BOY_NUMMER
-                 WHERE {$where}";
+                 WHERE {$matchexpr} {$insql}";
 
+        $out = [];
         try {
-            $records = $DB->get_records_sql($sql, ['w' => $normalized]);
+            $rs = $DB->get_recordset_sql($sql, $params);
+            foreach ($rs as $rec) {
+                $word = core_text::strtolower(trim((string)$rec->wordform));
+                // Single-word lookups used get_records_sql(), which keeps one row per LEMMA_ID
+                // (the first column); preserve that so both paths return the same candidates.
+                $out[$word][(int)$rec->lemma_id] = (array)$rec;
+            }
+            $rs->close();
         } catch (dml_exception $e) {
             debugging('[flashcards] ordbank_helper::find_candidates failed: ' . $e->getMessage(), DEBUG_DEVELOPER);
-            return [];
+            return null;
         }
+        return array_map('array_values', $out);
+    }
 
+    /**
+     * Turn raw candidate rows into the find_candidates() result shape.
+     *
+     * @param array<int,array<string,mixed>> $rows
+     * @return array<string,array<string,mixed>>
+     */
+    protected static function build_candidates(array $rows): array {
         $out = [];
-        foreach ($records as $rec) {
+        foreach ($rows as $rec) {
+            $rec = (object)$rec;
             $key = implode('|', [
                 (int)$rec->lemma_id,
                 (string)$rec->tag,
@@ -435,9 +533,9 @@ class ordbank_helper {
             ]);
             if (!isset($out[$key])) {
                 $pos = self::normalize_tag_to_pos($rec->tag ?? '', $rec->ordklasse ?? '');
-                $pron = \mod_flashcards\local\pronunciation_manager::lookup((string)$rec->wordform, $pos);
+                $pron = pronunciation_manager::lookup((string)$rec->wordform, $pos);
                 if (!$pron && !empty($rec->baseform)) {
-                    $pron = \mod_flashcards\local\pronunciation_manager::lookup((string)$rec->baseform, $pos);
+                    $pron = pronunciation_manager::lookup((string)$rec->baseform, $pos);
                 }
                 $ipa = $pron ? $pron['ipa'] : null;
                 $xsampa = $pron ? $pron['xsampa'] : null;
@@ -0,0 +1,161 @@
+<?php
+
+namespace mod_flashcards\local;
+
+use core_text;
+
+defined('MOODLE_INTERNAL') || die();
+
+/**
+ * Reader for the compiled ordbank lexicon built by tools/ordbank_lexicon.py.
+ *
+ * The file holds every wordform (lower-cased, sorted byte-wise) with the same candidate
+ * rows the ordbank_fullform/lemma/paradigme/boying join returns, so lookups never touch
+ * the database. Entries are found by binary search over the offset index; the file stays
+ * in the OS page cache, so each probe is a couple of small reads.
+ */
+class ordbank_lexicon {
+    /** File magic (see tools/ordbank_lexicon.py). */
+    const MAGIC = "FCLEX\0\1\0";
+    /** Header size in bytes. */
+    const HEADER_SIZE = 32;
+    /** Payload field order. */
+    const FIELDS = ['lemma_id', 'wordform', 'tag', 'paradigme_id', 'boy_nummer', 'baseform',
+        'ordklasse', 'ordklasse_utdyping', 'boy_gruppe', 'boy_tekst', 'ordbok_tekst'];
+
+    /** @var self|null|false false = looked up and unavailable */
+    protected static $instance = null;
+
+    /** @var resource */
+    protected $fh;
+    /** @var int */
+    protected $count;
+    /** @var int */
+    protected $indexoffset;
+
+    /**
+     * Shared reader for the configured lexicon file, or null when none is installed.
+     */
+    public static function instance(): ?self {
+        if (self::$instance === null) {
+            self::$instance = false;
+            $path = self::configured_path();
+            if ($path !== '' && is_readable($path)) {
+                try {
+                    self::$instance = new self($path);
+                } catch (\Throwable $e) {
+                    debugging('[flashcards] ordbank lexicon unavailable: ' . $e->getMessage(), DEBUG_DEVELOPER);
+                }
+            }
+        }
+        return self::$instance ?: null;
+    }
+
+    /**
+     * Path from the ordbank_lexicon_path setting, defaulting to moodledata/mod_flashcards/ordbank.lex.
+     */
+    public static function configured_path(): string {
+        global $CFG;
+        $path = trim((string)get_config('mod_flashcards', 'ordbank_lexicon_path'));
+        if ($path === '') {
+            $path = $CFG->dataroot . '/mod_flashcards/ordbank.lex';
+        }
+        return $path;
+    }
+
+    /**
+     * @param string $path
+     */
+    public function __construct(string $path) {
+        $fh = fopen($path, 'rb');
+        if (!$fh) {
+            throw new \moodle_exception('cannotopenfile', 'error', '', $path);
+        }
+        $header = fread($fh, self::HEADER_SIZE);
+        if (strlen($header) !== self::HEADER_SIZE || substr($header, 0, 8) !== self::MAGIC) {
+            fclose($fh);
+            throw new \moodle_exception('invalidfiletype', 'error', '', $path);
+        }
+        $meta = unpack('Vcount/Vindex/Vfields', substr($header, 8, 12));
+        if ((int)$meta['fields'] !== count(self::FIELDS)) {
+            fclose($fh);
+            throw new \moodle_exception('invalidfiletype', 'error', '', $path);
+        }
+        $this->fh = $fh;
+        $this->count = (int)$meta['count'];
+        $this->indexoffset = (int)$meta['index'];
+    }
+
+    /**
+     * Candidate rows for one wordform (empty when the word is not in ordbank).
+     *
+     * @param string $wordform
+     * @return array<int,array<string,string>>
+     */
+    public function lookup(string $wordform): array {
+        $key = core_text::strtolower(trim($wordform));
+        if ($key === '') {
+            return [];
+        }
+        $lo = 0;
+        $hi = $this->count;
+        while ($lo < $hi) {
+            $mid = ($lo + $hi) >> 1;
+            fseek($this->fh, $this->indexoffset + 4 * $mid);
+            $offset = unpack('V', fread($this->fh, 4))[1];
+            fseek($this->fh, $offset);
+            $keylen = unpack('v', fread($this->fh, 2))[1];
+            $cmp = strcmp(fread($this->fh, $keylen), $key);
+            if ($cmp < 0) {
+                $lo = $mid + 1;
+            } else if ($cmp > 0) {
+                $hi = $mid;
+            } else {
+                $length = unpack('V', fread($this->fh, 4))[1];
+                return self::decode_payload($length ? fread($this->fh, $length) : '');
+            }
+        }
+        return [];
+    }
+
+    /**
+     * Resolve all tokens of a sentence in one call.
+     *
+     * Tokens are probed in sorted order so consecutive binary searches touch nearby pages.
+     *
+     * @param array<int,string> $wordforms
+     * @return array<string,array<int,array<string,string>>> keyed by lower-cased token
+     */
+    public function lookup_many(array $wordforms): array {
+        $keys = [];
+        foreach ($wordforms as $wordform) {
+            $key = core_text::strtolower(trim((string)$wordform));
+            if ($key !== '') {
+                $keys[$key] = true;
+            }
+        }
+        $keys = array_keys($keys);
+        sort($keys, SORT_STRING);
+        $out = [];
+        foreach ($keys as $key) {
+            $out[$key] = $this->lookup($key);
+        }
+        return $out;
+    }
+
+    /**
+     * @param string $payload
+     * @return array<int,array<string,string>>
+     */
+    protected static function decode_payload(string $payload): array {
+        $rows = [];
+        foreach (explode("\n", $payload) as $line) {
+            if ($line === '') {
+                continue;
+            }
+            $values = array_pad(explode("\t", $line), count(self::FIELDS), '');
+            $rows[] = array_combine(self::FIELDS, array_slice($values, 0, count(self::FIELDS)));
+        }
+        return $rows;
+    }
+}
@@ -16,21 +16,55 @@
 
 namespace mod_flashcards\local;
 
+use core_text;
+
 defined('MOODLE_INTERNAL') || die();
 
 /**
  * Lightweight client for ord.uib.no (Ordbøkene) API.
  * No API key is required per official docs.
+ *
+ * Requests go through ordbokene_http (disk cache with revalidation, pooled connections);
+ * articles of one lookup are fetched in parallel.
  */
 class ordbokene_client {
-    /** @var string base URL for search */
-    protected const SEARCH = 'https://ord.uib.no/api/articles';
-    /** @var string base URL for article fetch */
-    protected const ARTICLE = 'https://ord.uib.no/%s/article/%d.json';
+    /** @var string default service root; the ordbokene_base_url setting overrides it */
+    protected const BASE = 'https://ord.uib.no';
+    /** @var string path for search */
+    protected const SEARCH = '/api/articles';
+    /** @var string path for article fetch */
+    protected const ARTICLE = '/%s/article/%d.json';
     /** @var int max articles to inspect for exact lemma match */
     protected const MATCH_LIMIT = 6;
     /** @var string freetext/lemma article listing endpoint */
-    protected const ARTICLES = 'https://ord.uib.no/api/articles';
+    protected const ARTICLES = '/api/articles';
+    /** @var int seconds a cached search result is used before it is revalidated */
+    public const SEARCH_TTL = DAYSECS;
+    /** @var int seconds a cached article is used before it is revalidated */
+    public const ARTICLE_TTL = 30 * DAYSECS;
+
+    /** @var string|null service root for this process */
+    protected static $baseurl = null;
+
+    /**
+     * Service root without trailing slash (setting ordbokene_base_url, default ord.uib.no).
+     */
+    public static function base_url(): string {
+        if (self::$baseurl === null) {
+            $base = trim((string)get_config('mod_flashcards', 'ordbokene_base_url'));
+            self::$baseurl = rtrim($base !== '' ? $base : self::BASE, '/');
+        }
+        return self::$baseurl;
+    }
+
+    /**
+     * Point this process at another service root, e.g. the local stand-in (CLI scripts).
+     *
+     * @param string|null $url null to go back to the configured root
+     */
+    public static function use_base_url(?string $url): void {
+        self::$baseurl = $url === null ? null : rtrim($url, '/');
+    }
 
     /**
      * Build a search URL with optional part-of-speech filter (wc).
@@ -38,7 +72,7 @@ class ordbokene_client {
      * Ordbøkene supports wc=VERB/ADJ/ADV/... and wc reduces ambiguity for entries like "slå" (noun vs verb).
      */
     protected static function build_search_url(string $param, string $value, string $lang, string $scope = 'e', string $wc = ''): string {
-        $url = self::SEARCH . '?' . $param . '=' . rawurlencode($value) . '&dict=' . ($lang === 'begge' ? 'bm,nn' : $lang) . '&scope=' . rawurlencode($scope);
+        $url = self::base_url() . self::SEARCH . '?' . $param . '=' . rawurlencode($value) . '&dict=' . ($lang === 'begge' ? 'bm,nn' : $lang) . '&scope=' . rawurlencode($scope);
         $wc = trim($wc);
         if ($wc !== '') {
             $url .= '&wc=' . rawurlencode($wc);
@@ -46,6 +80,10 @@ class ordbokene_client {
         return $url;
     }
 
+    protected static function article_url(string $dict, int $articleid): string {
+        return self::base_url() . sprintf(self::ARTICLE, $dict, $articleid);
+    }
+
     /**
      * List matching article IDs via /api/articles (supports scope=f freetext).
      *
@@ -62,15 +100,13 @@ class ordbokene_client {
         }
         $lang = in_array($lang, ['bm', 'nn', 'begge'], true) ? $lang : 'begge';
         $scope = trim($scope) !== '' ? trim($scope) : 'e';
-        $url = self::ARTICLES . '?w=' . rawurlencode($w) . '&dict=' . ($lang === 'begge' ? 'bm,nn' : $lang) . '&scope=' . rawurlencode($scope);
+        $url = self::base_url() . self::ARTICLES . '?w=' . rawurlencode($w) . '&dict=' . ($lang === 'begge' ? 'bm,nn' : $lang) . '&scope=' . rawurlencode($scope);
         $wc = trim($wc);
         if ($wc !== '') {
             $url .= '&wc=' . rawurlencode($wc);
         }
         try {
-            $curl = new \curl();
-            $resp = $curl->get($url);
-            $data = json_decode($resp, true);
+            $data = self::fetch_json([$url], self::SEARCH_TTL)[0] ?? null;
             if (!is_array($data) || empty($data['articles']) || !is_array($data['articles'])) {
                 return ['bm' => [], 'nn' => []];
             }
@@ -95,10 +131,8 @@ class ordbokene_client {
             return [];
         }
         try {
-            $articleurl = sprintf(self::ARTICLE, $dict, $articleid);
-            $curl = new \curl();
-            $resp = $curl->get($articleurl);
-            $article = json_decode($resp, true);
+            $articleurl = self::article_url($dict, $articleid);
+            $article = self::fetch_json([$articleurl], self::ARTICLE_TTL)[0] ?? null;
             if (!is_array($article)) {
                 return [];
             }
@@ -119,80 +153,27 @@ class ordbokene_client {
     }
 
     /**
-     * Fetch multiple URLs in parallel (best-effort).
+     * Fetch JSON documents in parallel through the shared cache and connection pool (best-effort).
      *
      * @param array<int,string> $urls
-     * @param int $timeout
-     * @return array<int,array{body:string,http:int}>
+     * @param int $ttl
+     * @param array<int,bool>|null $fresh set to idx => true for documents downloaded by this call
+     * @return array<int,array> decoded 2xx responses, keyed like $urls
      */
-    protected static function fetch_urls_parallel(array $urls, int $timeout = 10): array {
-        $urls = array_values(array_filter($urls, 'is_string'));
-        if (empty($urls) || !function_exists('curl_multi_init')) {
-            return [];
-        }
-        global $CFG;
-        $proxyhost = trim((string)($CFG->proxyhost ?? ''));
-        $proxyport = (int)($CFG->proxyport ?? 0);
-        $proxyuser = trim((string)($CFG->proxyuser ?? ''));
-        $proxypass = (string)($CFG->proxypassword ?? '');
-        $proxytype = strtolower(trim((string)($CFG->proxytype ?? '')));
-        $noproxy = trim((string)($CFG->proxybypass ?? ($CFG->noproxy ?? '')));
-        $proxytypeMap = [
-            'http' => CURLPROXY_HTTP,
-            'https' => defined('CURLPROXY_HTTPS') ? CURLPROXY_HTTPS : CURLPROXY_HTTP,
-            'socks5' => CURLPROXY_SOCKS5,
-            'socks4' => CURLPROXY_SOCKS4,
-            'socks4a' => defined('CURLPROXY_SOCKS4A') ? CURLPROXY_SOCKS4A : CURLPROXY_SOCKS4,
-        ];
-        $mh = curl_multi_init();
-        $handles = [];
-        foreach ($urls as $idx => $url) {
-            $ch = curl_init($url);
-            curl_setopt($ch, CURLOPT_RETURNTRANSFER, true);
-            curl_setopt($ch, CURLOPT_TIMEOUT, $timeout);
-            curl_setopt($ch, CURLOPT_CONNECTTIMEOUT, 5);
-            if ($proxyhost !== '') {
-                curl_setopt($ch, CURLOPT_PROXY, $proxyhost);
-                if ($proxyport > 0) {
-                    curl_setopt($ch, CURLOPT_PROXYPORT, $proxyport);
-                }
-                if ($proxyuser !== '') {
-                    $auth = $proxyuser;
-                    if ($proxypass !== '') {
-                        $auth .= ':' . $proxypass;
-                    }
-                    curl_setopt($ch, CURLOPT_PROXYUSERPWD, $auth);
-                }
-                if (isset($proxytypeMap[$proxytype])) {
-                    curl_setopt($ch, CURLOPT_PROXYTYPE, $proxytypeMap[$proxytype]);
-                }
-                if ($noproxy !== '') {
-                    curl_setopt($ch, CURLOPT_NOPROXY, $noproxy);
-                }
+    protected static function fetch_json(array $urls, int $ttl, ?array &$fresh = null): array {
+        $fresh = [];
+        $out = [];
+        foreach (ordbokene_http::get_many($urls, $ttl) as $idx => $response) {
+            if ($response['http'] < 200 || $response['http'] >= 300 || $response['body'] === '') {
+                continue;
+            }
+            $data = json_decode($response['body'], true);
+            if (is_array($data)) {
+                $out[$idx] = $data;
+                $fresh[$idx] = $response['fresh'];
             }
-            curl_multi_add_handle($mh, $ch);
-            $handles[$idx] = $ch;
-        }
-        $active = null;
-        do {
-            $status = curl_multi_exec($mh, $active);
-            if ($active) {
-                curl_multi_select($mh);
-            }
-        } while ($active && $status == CURLM_OK);
-        $responses = [];
-        foreach ($handles as $idx => $ch) {
-            $body = curl_multi_getcontent($ch);
-            $info = curl_getinfo($ch);
-            $responses[$idx] = [
-                'body' => is_string($body) ? $body : '',
-                'http' => (int)($info['http_code'] ?? 0),
-            ];
-            curl_multi_remove_handle($mh, $ch);
-            curl_close($ch);
         }
-        curl_multi_close($mh);
-        return $responses;
+        return $out;
     }
 
     /**
@@ -205,85 +186,40 @@ class ordbokene_client {
             return [];
         }
         $lang = in_array($lang, ['bm', 'nn', 'begge'], true) ? $lang : 'begge';
-        $curl = new \curl();
         $searches = [];
         // Primary: legacy article search with w= (supports simple phrases).
         $searches[] = self::build_search_url('w', $span, $lang, 'e', $wc);
         // Fallback: ord_2 API style with q= to match mid-phrase expressions (observed on ordbokene.no).
         $searches[] = self::build_search_url('q', $span, $lang, 'e', $wc);
 
-        $parallel = self::fetch_urls_parallel($searches, 10);
-        if (!empty($parallel)) {
-            foreach ($searches as $idx => $searchurl) {
-                $entry = $parallel[$idx] ?? null;
-                $http = is_array($entry) ? (int)($entry['http'] ?? 0) : 0;
-                $resp = is_array($entry) ? (string)($entry['body'] ?? '') : '';
-                if ($http < 200 || $http >= 300 || $resp === '') {
-                    continue;
-                }
-                $search = json_decode($resp, true);
+        try {
+            $results = self::fetch_json($searches, self::SEARCH_TTL);
+            // First article of each search, in search order.
+            $articles = [];
+            foreach (array_keys($searches) as $idx) {
+                $search = $results[$idx] ?? null;
                 if (!is_array($search) || empty($search['articles'])) {
                     continue;
                 }
-                $articleid = null;
-                $articlelang = null;
                 if (!empty($search['articles']['bm'][0])) {
-                    $articleid = (int)$search['articles']['bm'][0];
-                    $articlelang = 'bm';
+                    $articles[$idx] = ['bm', (int)$search['articles']['bm'][0]];
                 } else if (!empty($search['articles']['nn'][0])) {
-                    $articleid = (int)$search['articles']['nn'][0];
-                    $articlelang = 'nn';
-                }
-                if (!$articleid || !$articlelang) {
-                    continue;
-                }
-                $articleurl = sprintf(self::ARTICLE, $articlelang, $articleid);
-                $curl = new \curl();
-                $resp2 = $curl->get($articleurl);
-                $article = json_decode($resp2, true);
-                if (!is_array($article)) {
-                    continue;
-                }
-                $norm = self::normalize_article($article, $articlelang, $articleurl);
-                if (!empty($norm)) {
-                    return $norm;
+                    $articles[$idx] = ['nn', (int)$search['articles']['nn'][0]];
                 }
             }
-            return [];
-        }
-        foreach ($searches as $searchurl) {
-            try {
-                $resp = $curl->get($searchurl);
-                $search = json_decode($resp, true);
-                if (!is_array($search) || empty($search['articles'])) {
-                    continue;
-                }
-                $articleid = null;
-                $articlelang = null;
-                if (!empty($search['articles']['bm'][0])) {
-                    $articleid = (int)$search['articles']['bm'][0];
-                    $articlelang = 'bm';
-                } else if (!empty($search['articles']['nn'][0])) {
-                    $articleid = (int)$search['articles']['nn'][0];
-                    $articlelang = 'nn';
-                }
-                if (!$articleid || !$articlelang) {
-                    continue;
-                }
-                $articleurl = sprintf(self::ARTICLE, $articlelang, $articleid);
-                $resp2 = $curl->get($articleurl);
-                $article = json_decode($resp2, true);
-                if (!is_array($article)) {
+            $urls = array_map(fn($a) => self::article_url($a[0], $a[1]), $articles);
+            $fetched = self::fetch_json($urls, self::ARTICLE_TTL);
+            foreach ($articles as $idx => [$articlelang]) {
+                if (empty($fetched[$idx])) {
                     continue;
                 }
-                $norm = self::normalize_article($article, $articlelang, $articleurl);
+                $norm = self::normalize_article($fetched[$idx], $articlelang, $urls[$idx]);
                 if (!empty($norm)) {
                     return $norm;
                 }
-            } catch (\Throwable $e) {
-                // Try next fallback.
-                continue;
             }
+        } catch (\Throwable $e) {
+            return [];
         }
         return [];
     }
@@ -291,6 +227,9 @@ class ordbokene_client {
     /**
      * Lookup a word/expression.
      *
+     * An exact lemma match downloaded from the service is also stored in flashcards_orbokene
+     * when the dictionary cache is enabled.
+     *
      * @param string $word Word or phrase
      * @param string $lang bm|nn|begge
      * @param string $wc Optional part-of-speech filter, e.g. VERB/ADJ/ADV
@@ -304,39 +243,30 @@ class ordbokene_client {
         $lang = in_array($lang, ['bm', 'nn', 'begge'], true) ? $lang : 'begge';
         $searchurl = self::build_search_url('w', $word, $lang, 'e', $wc);
         try {
-            $curl = new \curl();
-            $resp = $curl->get($searchurl);
-            $search = json_decode($resp, true);
+            $search = self::fetch_json([$searchurl], self::SEARCH_TTL)[0] ?? null;
             if (!is_array($search) || empty($search['articles'])) {
                 return [];
             }
             $target = self::normalize_lemma_key($word);
+            $candidates = self::candidate_articles($search, self::MATCH_LIMIT);
+            $urls = array_map(fn($c) => $c['url'], $candidates);
+            $articles = self::fetch_json($urls, self::ARTICLE_TTL, $fresh);
             $fallback = null;
-            $dictOrder = ['bm', 'nn'];
-            $checked = 0;
-            foreach ($dictOrder as $dict) {
-                if (empty($search['articles'][$dict]) || !is_array($search['articles'][$dict])) {
+            foreach ($candidates as $idx => $candidate) {
+                $article = $articles[$idx] ?? null;
+                if (!is_array($article)) {
                     continue;
                 }
-                foreach ($search['articles'][$dict] as $id) {
-                    if ($checked >= self::MATCH_LIMIT) {
-                        break 2;
-                    }
-                    $checked++;
-                    $articleurl = sprintf(self::ARTICLE, $dict, (int)$id);
-                    $resp2 = $curl->get($articleurl);
-                    $article = json_decode($resp2, true);
-                    if (!is_array($article)) {
-                        continue;
-                    }
-                    $lemma = self::normalize_lemma_key((string)($article['lemmas'][0]['lemma'] ?? ''));
-                    $norm = self::normalize_article($article, $dict, $articleurl);
-                    if ($fallback === null && !empty($norm)) {
-                        $fallback = $norm;
-                    }
-                    if ($lemma !== '' && $target !== '' && $lemma === $target && !empty($norm)) {
-                        return $norm;
+                $lemma = self::normalize_lemma_key((string)($article['lemmas'][0]['lemma'] ?? ''));
+                $norm = self::normalize_article($article, $candidate['dict'], $candidate['url']);
+                if ($fallback === null && !empty($norm)) {
+                    $fallback = $norm;
+                }
+                if ($lemma !== '' && $target !== '' && $lemma === $target && !empty($norm)) {
+                    if (!empty($fresh[$idx])) {
+                        self::warm_repository($word, $norm);
                     }
+                    return $norm;
                 }
             }
             return $fallback ?? [];
@@ -364,40 +294,23 @@ class ordbokene_client {
         $searchurl = self::build_search_url('w', $word, $lang, 'e', $wc);
         $out = [];
         try {
-            $curl = new \curl();
-            $resp = $curl->get($searchurl);
-            $search = json_decode($resp, true);
+            $search = self::fetch_json([$searchurl], self::SEARCH_TTL)[0] ?? null;
             if (!is_array($search) || empty($search['articles'])) {
                 return [];
             }
-            // Flatten ids per dict preserving order.
-            $dictOrder = ['bm', 'nn'];
-            foreach ($dictOrder as $dict) {
-                if (empty($search['articles'][$dict]) || !is_array($search['articles'][$dict])) {
+            $candidates = self::candidate_articles($search, $limit);
+            $articles = self::fetch_json(array_map(fn($c) => $c['url'], $candidates), self::ARTICLE_TTL);
+            foreach ($candidates as $idx => $candidate) {
+                if (empty($articles[$idx])) {
                     continue;
                 }
-                foreach (array_slice($search['articles'][$dict], 0, $limit) as $id) {
-                    if (count($out) >= $limit) {
-                        break 2;
-                    }
-                    $articleurl = sprintf(self::ARTICLE, $dict, (int)$id);
-                    try {
-                        $resp2 = $curl->get($articleurl);
-                        $article = json_decode($resp2, true);
-                        if (!is_array($article)) {
-                            continue;
-                        }
-                        $norm = self::normalize_article($article, $dict, $articleurl);
-                        if (!empty($norm)) {
-                            $out[] = array_merge($norm, [
-                                'dict' => $dict,
-                                'id' => (int)$id,
-                                'dictmeta' => ['lang' => $dict, 'url' => $articleurl],
-                            ]);
-                        }
-                    } catch (\Throwable $e) {
-                        continue;
-                    }
+                $norm = self::normalize_article($articles[$idx], $candidate['dict'], $candidate['url']);
+                if (!empty($norm)) {
+                    $out[] = array_merge($norm, [
+                        'dict' => $candidate['dict'],
+                        'id' => $candidate['id'],
+                        'dictmeta' => ['lang' => $candidate['dict'], 'url' => $candidate['url']],
+                    ]);
                 }
             }
         } catch (\Throwable $e) {
@@ -406,6 +319,62 @@ class ordbokene_client {
         return $out;
     }
 
+    /**
+     * Article ids of a search result, bm before nn, at most $limit.
+     *
+     * @param array $search decoded /api/articles response
+     * @param int $limit
+     * @return array<int,array{dict:string,id:int,url:string}>
+     */
+    protected static function candidate_articles(array $search, int $limit): array {
+        $out = [];
+        foreach (['bm', 'nn'] as $dict) {
+            if (empty($search['articles'][$dict]) || !is_array($search['articles'][$dict])) {
+                continue;
+            }
+            foreach ($search['articles'][$dict] as $id) {
+                if (count($out) >= $limit) {
+                    break 2;
+                }
+                $out[] = ['dict' => $dict, 'id' => (int)$id, 'url' => self::article_url($dict, (int)$id)];
+            }
+        }
+        return $out;
+    }
+
+    /**
+     * Store a freshly downloaded exact match in flashcards_orbokene, so callers that read the
+     * table first (example matching, dictionary auto-fill) skip the network next time.
+     * Existing rows are left alone: they may carry translations or curated aliases.
+     *
+     * @param string $word
+     * @param array $norm normalized article
+     */
+    protected static function warm_repository(string $word, array $norm): void {
+        if (!orbokene_repository::is_enabled()) {
+            return;
+        }
+        try {
+            if (orbokene_repository::find($word) !== null) {
+                return;
+            }
+            orbokene_repository::upsert($word, [
+                'entry' => $word,
+                'baseform' => (string)($norm['baseform'] ?? $word),
+                'definition' => !empty($norm['meanings'][0]) ? (string)$norm['meanings'][0] : '',
+                'examples' => $norm['examples'] ?? [],
+                'meta' => [
+                    'source' => 'ordbokene_lookup',
+                    'dictmeta' => $norm['dictmeta'] ?? [],
+                    'pos' => $norm['pos'] ?? '',
+                    'variants' => $norm['variants'] ?? [],
+                ],
+            ]);
+        } catch (\Throwable $e) {
+            // ignore cache errors
+        }
+    }
+
     /**
      * Normalize article json to internal structure.
      *
@@ -0,0 +1,445 @@
+<?php
+// This file is part of Moodle - http://moodle.org/
+//
+// Moodle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+//
+// Moodle is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with Moodle.  If not, see <http://www.gnu.org/licenses/>.
+
+namespace mod_flashcards\local;
+
+defined('MOODLE_INTERNAL') || die();
+
+/**
+ * Cached, pooled GET transport for ordbokene_client.
+ *
+ * Responses are memoised for the request and kept on disk under
+ * moodledata/mod_flashcards/ordbokene, one JSON file per URL with the body, ETag and
+ * Last-Modified; the file's mtime is when it was last fetched or revalidated. Entries younger
+ * than their TTL are served without a request; older ones are revalidated with If-None-Match /
+ * If-Modified-Since, and a 304 just touches the file. When the
+ * service is unreachable a stale entry is served rather than nothing.
+ *
+ * Requests go through one curl_multi handle that lives as long as the PHP process (request,
+ * task run or CLI script). Finished easy handles are kept for reuse, so connections stay
+ * alive between calls and are multiplexed over HTTP/2 where curl supports it. Identical URLs
+ * in one batch are fetched once.
+ */
+class ordbokene_http {
+    /** Default number of requests in flight per call. */
+    const CONCURRENCY = 6;
+    /** Idle easy handles kept for reuse. */
+    const POOL_SIZE = 8;
+    /** Entries not revalidated for this long are removed by prune(). */
+    const MAX_AGE = 180 * DAYSECS;
+
+    /** @var array<string,array{body:string,http:int,fresh:bool}> request memo: url => response */
+    protected static $memo = [];
+    /** @var \CurlMultiHandle|resource|null */
+    protected static $mh = null;
+    /** @var array idle curl easy handles */
+    protected static $idle = [];
+    /** @var array<int,array<string,string>> handle id => response headers of the current transfer */
+    protected static $headers = [];
+    /** @var array<string,int|float> */
+    protected static $stats = ['memo_hits' => 0, 'disk_hits' => 0, 'revalidated' => 0, 'misses' => 0,
+        'deduped' => 0, 'stale' => 0, 'requests' => 0, 'connections' => 0, 'request_ms' => 0.0];
+
+    /**
+     * GET several URLs, from the memo or disk cache where possible.
+     *
+     * @param array<int|string,string> $urls
+     * @param int $ttl seconds a cached response is served without revalidation
+     * @param int $concurrency maximum requests in flight
+     * @param int $timeout per-request timeout in seconds
+     * @return array<int|string,array{body:string,http:int,fresh:bool}> keyed like $urls; fresh is
+     *         true when the body was downloaded by this call (not served from a cache)
+     */
+    public static function get_many(array $urls, int $ttl, int $concurrency = self::CONCURRENCY, int $timeout = 10): array {
+        $now = time();
+        $out = [];
+        $pending = [];
+        foreach ($urls as $idx => $url) {
+            if (!is_string($url) || $url === '') {
+                continue;
+            }
+            if (isset(self::$memo[$url])) {
+                self::$stats['memo_hits']++;
+                $out[$idx] = self::$memo[$url];
+                continue;
+            }
+            if (isset($pending[$url])) {
+                self::$stats['deduped']++;
+                continue;
+            }
+            $entry = self::read_entry($url);
+            if ($entry !== null && $entry['fetched'] + $ttl > $now) {
+                self::$stats['disk_hits']++;
+                self::$memo[$url] = $out[$idx] = ['body' => $entry['body'], 'http' => 200, 'fresh' => false];
+                continue;
+            }
+            $pending[$url] = $entry;
+        }
+
+        if ($pending) {
+            foreach (self::transfer($pending, $concurrency, $timeout) as $url => $response) {
+                self::$memo[$url] = self::store($url, $pending[$url], $response);
+            }
+        }
+        foreach ($urls as $idx => $url) {
+            if (!isset($out[$idx]) && is_string($url) && isset(self::$memo[$url])) {
+                $out[$idx] = self::$memo[$url];
+            }
+        }
+        return $out;
+    }
+
+    /**
+     * GET one URL; see get_many().
+     *
+     * @param string $url
+     * @param int $ttl
+     * @param int $timeout
+     * @return array{body:string,http:int,fresh:bool}
+     */
+    public static function get(string $url, int $ttl, int $timeout = 10): array {
+        return self::get_many([$url], $ttl, 1, $timeout)[0] ?? ['body' => '', 'http' => 0, 'fresh' => false];
+    }
+
+    /**
+     * Counters for this process: memo/disk hits, revalidations, misses, requests and connections opened.
+     *
+     * @return array<string,int|float>
+     */
+    public static function stats(): array {
+        $stats = self::$stats;
+        $stats['request_ms'] = round($stats['request_ms'], 1);
+        return $stats;
+    }
+
+    /**
+     * Forget the request memo and counters (CLI scripts and long-running tasks). Pooled
+     * connections are kept.
+     */
+    public static function reset_request_cache(): void {
+        self::$memo = [];
+        foreach (self::$stats as $name => $value) {
+            self::$stats[$name] = is_float($value) ? 0.0 : 0;
+        }
+    }
+
+    /**
+     * Close pooled connections.
+     */
+    public static function close(): void {
+        foreach (self::$idle as $ch) {
+            curl_close($ch);
+        }
+        self::$idle = [];
+        if (self::$mh !== null) {
+            curl_multi_close(self::$mh);
+            self::$mh = null;
+        }
+    }
+
+    /**
+     * Remove disk entries that have not been fetched or revalidated for $maxage seconds.
+     *
+     * @param int $maxage
+     * @return int files removed
+     */
+    public static function prune(int $maxage = self::MAX_AGE): int {
+        $dir = self::cache_dir();
+        if (!is_dir($dir)) {
+            return 0;
+        }
+        $cutoff = time() - $maxage;
+        $removed = 0;
+        foreach (glob($dir . '/*/*.json') ?: [] as $file) {
+            if (@filemtime($file) < $cutoff && @unlink($file)) {
+                $removed++;
+            }
+        }
+        return $removed;
+    }
+
+    /**
+     * Run the requests for $pending through the shared multi handle, at most $concurrency at a time.
+     *
+     * @param array<string,array|null> $pending url => cached entry to revalidate (or null)
+     * @param int $concurrency
+     * @param int $timeout
+     * @return array<string,array{body:string,http:int,etag:string,lastmodified:string}>
+     */
+    protected static function transfer(array $pending, int $concurrency, int $timeout): array {
+        $results = [];
+        $mh = self::multi();
+        if ($mh === null) {
+            return $results;
+        }
+        $start = microtime(true);
+        $queue = array_keys($pending);
+        $active = [];
+        do {
+            while (count($active) < max(1, $concurrency) && $queue) {
+                $url = array_shift($queue);
+                $ch = self::prepare($url, $pending[$url], $timeout);
+                curl_multi_add_handle($mh, $ch);
+                $active[self::handle_id($ch)] = $url;
+                self::$stats['requests']++;
+            }
+            do {
+                $status = curl_multi_exec($mh, $running);
+            } while ($status === CURLM_CALL_MULTI_PERFORM);
+
+            while ($info = curl_multi_info_read($mh)) {
+                $ch = $info['handle'];
+                $hid = self::handle_id($ch);
+                if (!isset($active[$hid])) {
+                    continue;
+                }
+                $url = $active[$hid];
+                $headers = self::$headers[$hid] ?? [];
+                unset($active[$hid], self::$headers[$hid]);
+                self::$stats['connections'] += (int)curl_getinfo($ch, CURLINFO_NUM_CONNECTS);
+                $body = curl_multi_getcontent($ch);
+                $results[$url] = [
+                    'body' => $info['result'] === CURLE_OK && is_string($body) ? $body : '',
+                    'http' => $info['result'] === CURLE_OK ? (int)curl_getinfo($ch, CURLINFO_HTTP_CODE) : 0,
+                    'etag' => $headers['etag'] ?? '',
+                    'lastmodified' => $headers['last-modified'] ?? '',
+                ];
+                curl_multi_remove_handle($mh, $ch);
+                if (count(self::$idle) < self::POOL_SIZE) {
+                    self::$idle[] = $ch;
+                } else {
+                    curl_close($ch);
+                }
+            }
+            if ($running && curl_multi_select($mh, 1.0) === -1) {
+                usleep(1000);
+            }
+        } while ($active || $queue);
+        self::$stats['request_ms'] += (microtime(true) - $start) * 1000;
+        profiler::external('ordbokene', $start, count($pending));
+        return $results;
+    }
+
+    /**
+     * A pooled easy handle set up for a (conditional) GET of $url.
+     *
+     * @param string $url
+     * @param array|null $entry cached entry to revalidate
+     * @param int $timeout
+     * @return \CurlHandle|resource
+     */
+    protected static function prepare(string $url, ?array $entry, int $timeout) {
+        $ch = self::$idle ? array_pop(self::$idle) : curl_init();
+        $hid = self::handle_id($ch);
+        self::$headers[$hid] = [];
+        $request = ['Accept: application/json'];
+        if ($entry !== null && $entry['etag'] !== '') {
+            $request[] = 'If-None-Match: ' . $entry['etag'];
+        }
+        if ($entry !== null && $entry['lastmodified'] !== '') {
+            $request[] = 'If-Modified-Since: ' . $entry['lastmodified'];
+        }
+        curl_setopt_array($ch, [
+            CURLOPT_URL => $url,
+            CURLOPT_HTTPGET => true,
+            CURLOPT_HTTPHEADER => $request,
+            CURLOPT_RETURNTRANSFER => true,
+            CURLOPT_ENCODING => '',
+            CURLOPT_TIMEOUT => $timeout,
+            CURLOPT_CONNECTTIMEOUT => 5,
+            CURLOPT_TCP_KEEPALIVE => 1,
+            CURLOPT_HEADERFUNCTION => function($ch, string $line) use ($hid): int {
+                $parts = explode(':', $line, 2);
+                if (count($parts) === 2) {
+                    self::$headers[$hid][strtolower(trim($parts[0]))] = trim($parts[1]);
+                }
+                return strlen($line);
+            },
+        ]);
+        if (defined('CURL_HTTP_VERSION_2TLS')) {
+            curl_setopt($ch, CURLOPT_HTTP_VERSION, CURL_HTTP_VERSION_2TLS);
+        }
+        self::apply_proxy($ch);
+        return $ch;
+    }
+
+    /**
+     * Moodle's proxy settings, as fetch_urls_parallel() always applied them.
+     *
+     * Also used by llm_scheduler for its own curl handles.
+     *
+     * @param \CurlHandle|resource $ch
+     */
+    public static function apply_proxy($ch): void {
+        global $CFG;
+        $proxyhost = trim((string)($CFG->proxyhost ?? ''));
+        if ($proxyhost === '') {
+            return;
+        }
+        $proxyport = (int)($CFG->proxyport ?? 0);
+        $proxyuser = trim((string)($CFG->proxyuser ?? ''));
+        $proxypass = (string)($CFG->proxypassword ?? '');
+        $proxytype = strtolower(trim((string)($CFG->proxytype ?? '')));
+        $noproxy = trim((string)($CFG->proxybypass ?? ($CFG->noproxy ?? '')));
+        $proxytypeMap = [
+            'http' => CURLPROXY_HTTP,
+            'https' => defined('CURLPROXY_HTTPS') ? CURLPROXY_HTTPS : CURLPROXY_HTTP,
+            'socks5' => CURLPROXY_SOCKS5,
+            'socks4' => CURLPROXY_SOCKS4,
+            'socks4a' => defined('CURLPROXY_SOCKS4A') ? CURLPROXY_SOCKS4A : CURLPROXY_SOCKS4,
+        ];
+        curl_setopt($ch, CURLOPT_PROXY, $proxyhost);
+        if ($proxyport > 0) {
+            curl_setopt($ch, CURLOPT_PROXYPORT, $proxyport);
+        }
+        if ($proxyuser !== '') {
+            $auth = $proxyuser;
+            if ($proxypass !== '') {
+                $auth .= ':' . $proxypass;
+            }
+            curl_setopt($ch, CURLOPT_PROXYUSERPWD, $auth);
+        }
+        if (isset($proxytypeMap[$proxytype])) {
+            curl_setopt($ch, CURLOPT_PROXYTYPE, $proxytypeMap[$proxytype]);
+        }
+        if ($noproxy !== '') {
+            curl_setopt($ch, CURLOPT_NOPROXY, $noproxy);
+        }
+    }
+
+    /**
+     * Turn a transfer result into the response handed to callers, updating the disk cache.
+     *
+     * 2xx responses replace the entry, 304 renews it, and anything else (errors, 5xx) falls
+     * back to the stale entry when there is one. Other 4xx answers are passed through uncached.
+     *
+     * @param string $url
+     * @param array|null $entry cached entry that was revalidated
+     * @param array $response
+     * @return array{body:string,http:int,fresh:bool}
+     */
+    protected static function store(string $url, ?array $entry, array $response): array {
+        $http = $response['http'];
+        if ($http === 304 && $entry !== null) {
+            self::$stats['revalidated']++;
+            @touch(self::entry_path($url));
+            return ['body' => $entry['body'], 'http' => 200, 'fresh' => false];
+        }
+        if ($http >= 200 && $http < 300 && $response['body'] !== '') {
+            self::$stats['misses']++;
+            self::write_entry($url, [
+                'url' => $url,
+                'etag' => $response['etag'],
+                'lastmodified' => $response['lastmodified'],
+                'body' => $response['body'],
+            ]);
+            return ['body' => $response['body'], 'http' => $http, 'fresh' => true];
+        }
+        if ($entry !== null && ($http === 0 || $http >= 500)) {
+            self::$stats['stale']++;
+            return ['body' => $entry['body'], 'http' => 200, 'fresh' => false];
+        }
+        self::$stats['misses']++;
+        return ['body' => $response['body'], 'http' => $http, 'fresh' => true];
+    }
+
+    /**
+     * @param string $url
+     * @return array{url:string,fetched:int,etag:string,lastmodified:string,body:string}|null
+     */
+    protected static function read_entry(string $url): ?array {
+        $file = self::entry_path($url);
+        $raw = is_readable($file) ? @file_get_contents($file) : false;
+        $mtime = $raw !== false ? @filemtime($file) : false;
+        if ($raw === false || $mtime === false) {
+            return null;
+        }
+        $entry = json_decode($raw, true);
+        if (!is_array($entry) || ($entry['url'] ?? '') !== $url || !isset($entry['body'])) {
+            return null;
+        }
+        return [
+            'url' => $url,
+            'fetched' => (int)$mtime,
+            'etag' => (string)($entry['etag'] ?? ''),
+            'lastmodified' => (string)($entry['lastmodified'] ?? ''),
+            'body' => (string)$entry['body'],
+        ];
+    }
+
+    /**
+     * Write an entry atomically (temp file + rename); failures only cost a cache miss.
+     *
+     * @param string $url
+     * @param array $entry
+     */
+    protected static function write_entry(string $url, array $entry): void {
+        $file = self::entry_path($url);
+        $dir = dirname($file);
+        if (!is_dir($dir) && !make_writable_directory($dir, false)) {
+            return;
+        }
+        $tmp = $file . '.' . getmypid() . '.tmp';
+        if (@file_put_contents($tmp, json_encode($entry, JSON_UNESCAPED_UNICODE | JSON_UNESCAPED_SLASHES)) === false) {
+            return;
+        }
+        if (!@rename($tmp, $file)) {
+            @unlink($tmp);
+        }
+    }
+
+    /**
+     * @param string $url
+     * @return string
+     */
+    protected static function entry_path(string $url): string {
+        $hash = sha1($url);
+        return self::cache_dir() . '/' . substr($hash, 0, 2) . '/' . $hash . '.json';
+    }
+
+    /**
+     * Directory of the disk cache (one subdirectory per leading hash byte).
+     *
+     * @return string
+     */
+    public static function cache_dir(): string {
+        global $CFG;
+        return $CFG->dataroot . '/mod_flashcards/ordbokene';
+    }
+
+    /**
+     * The process-wide multi handle, or null without curl_multi support.
+     *
+     * @return \CurlMultiHandle|resource|null
+     */
+    protected static function multi() {
+        if (self::$mh === null && function_exists('curl_multi_init')) {
+            self::$mh = curl_multi_init();
+            if (defined('CURLPIPE_MULTIPLEX')) {
+                curl_multi_setopt(self::$mh, CURLMOPT_PIPELINING, CURLPIPE_MULTIPLEX);
+            }
+        }
+        return self::$mh;
+    }
+
+    /**
+     * @param \CurlHandle|resource $ch
+     * @return int
+     */
+    protected static function handle_id($ch): int {
+        return is_object($ch) ? spl_object_id($ch) : (int)$ch;
+    }
+}
@@ -0,0 +1,140 @@
+<?php
+
+namespace mod_flashcards\local;
+
+defined('MOODLE_INTERNAL') || die();
+
+/**
+ * Removal of flashcards_progress rows whose card no longer exists (cleanup_orphans task).
+ *
+ * Card deletions queue their (deckid, cardid) key in flashcards_orphan_keys (see the
+ * card_deleted observer); purge_queued() deletes the progress rows of those keys directly, which
+ * catches rows a concurrent review or sync wrote after the delete. sweep() is the safety net
+ * for everything else: it walks flashcards_progress by id ranges from a cursor kept in the
+ * plugin config, checks each range against flashcards_cards and stops when its time budget is
+ * spent, so every run does a bounded amount of work and the next one continues where it ended.
+ */
+class orphan_cleanup {
+    /** Config key holding the next progress id to sweep. */
+    const CURSOR = 'orphan_sweep_cursor';
+    /** Progress ids checked per range. */
+    const RANGE = 5000;
+    /** Seconds a sweep may run per task run. */
+    const SWEEP_SECONDS = 120;
+    /** Queued keys handled per task run. */
+    const QUEUE_BATCH = 2000;
+
+    /**
+     * Queue a deleted card's key for purge_queued().
+     *
+     * @param int $deckid
+     * @param string $cardid
+     */
+    public static function enqueue(int $deckid, string $cardid): void {
+        global $DB;
+        $DB->insert_record('flashcards_orphan_keys', (object)[
+            'deckid' => $deckid,
+            'cardid' => $cardid,
+            'timecreated' => time(),
+        ], false);
+    }
+
+    /**
+     * Delete the progress rows of queued keys whose card is still gone.
+     *
+     * @param int $limit keys per call
+     * @return array{keys:int,deleted:int,elapsed:float}
+     */
+    public static function purge_queued(int $limit = self::QUEUE_BATCH): array {
+        global $DB;
+        $start = microtime(true);
+        $queued = $DB->get_records('flashcards_orphan_keys', null, 'id ASC', 'id, deckid, cardid', 0, $limit);
+        $deleted = 0;
+        $done = [];
+        foreach ($queued as $key) {
+            $done[$key->deckid . '|' . $key->cardid] = [(int)$key->deckid, (string)$key->cardid];
+        }
+        foreach ($done as [$deckid, $cardid]) {
+            $ids = $DB->get_fieldset_sql("SELECT p.id
+                                            FROM {flashcards_progress} p
+                                           WHERE p.deckid = :deckid AND p.cardid = :cardid
+                                                 AND NOT EXISTS (SELECT 1
+                                                                   FROM {flashcards_cards} c
+                                                                  WHERE c.deckid = p.deckid AND c.cardid = p.cardid)",
+                ['deckid' => $deckid, 'cardid' => $cardid]);
+            $deleted += self::delete_progress($ids);
+        }
+        if ($queued) {
+            [$insql, $params] = $DB->get_in_or_equal(array_keys($queued), SQL_PARAMS_NAMED, 'ok');
+            $DB->delete_records_select('flashcards_orphan_keys', "id {$insql}", $params);
+        }
+        return ['keys' => count($done), 'deleted' => $deleted, 'elapsed' => microtime(true) - $start];
+    }
+
+    /**
+     * Check progress ids from the stored cursor on, range by range, until the budget is spent.
+     *
+     * @param int $budget seconds
+     * @return array{from:int,to:int,scanned:int,deleted:int,elapsed:float,wrapped:bool} ids [from, to) checked
+     */
+    public static function sweep(int $budget = self::SWEEP_SECONDS): array {
+        global $DB;
+        $start = microtime(true);
+        $from = (int)get_config('mod_flashcards', self::CURSOR);
+        $maxid = (int)$DB->get_field_sql('SELECT MAX(id) FROM {flashcards_progress}');
+        if ($from > $maxid) {
+            $from = 0;
+        }
+        $cursor = $from;
+        $scanned = 0;
+        $deleted = 0;
+        while ($cursor <= $maxid && microtime(true) - $start < $budget) {
+            $hi = $cursor + self::RANGE;
+            $orphans = [];
+            $rs = $DB->get_recordset_sql("SELECT p.id, c.id AS cardrowid
+                                            FROM {flashcards_progress} p
+                                       LEFT JOIN {flashcards_cards} c
+                                              ON c.deckid = p.deckid AND c.cardid = p.cardid
+                                           WHERE p.id >= :lo AND p.id < :hi",
+                ['lo' => $cursor, 'hi' => $hi]);
+            foreach ($rs as $row) {
+                $scanned++;
+                if ($row->cardrowid === null) {
+                    $orphans[] = (int)$row->id;
+                }
+            }
+            $rs->close();
+            $deleted += self::delete_progress($orphans);
+            $cursor = $hi;
+        }
+        // Past the last id the whole table has been checked: the next run starts over.
+        $wrapped = $cursor > $maxid;
+        set_config(self::CURSOR, $wrapped ? 0 : $cursor, 'mod_flashcards');
+        return [
+            'from' => $from,
+            'to' => $cursor,
+            'scanned' => $scanned,
+            'deleted' => $deleted,
+            'elapsed' => microtime(true) - $start,
+            'wrapped' => $wrapped,
+        ];
+    }
+
+    /**
+     * Delete progress rows by id, keeping stage counts, sync tombstones and the due queue in step.
+     *
+     * @param int[] $ids
+     * @return int rows deleted
+     */
+    protected static function delete_progress(array $ids): int {
+        global $DB;
+        foreach (array_chunk($ids, 1000) as $chunk) {
+            [$insql, $params] = $DB->get_in_or_equal($chunk, SQL_PARAMS_NAMED, 'op');
+            stage_counts::before_delete("id {$insql}", $params);
+            progress_sync::before_delete("id {$insql}", $params);
+            $DB->delete_records_select('flashcards_progress', "id {$insql}", $params);
+            due_queue::delete_progress($chunk);
+        }
+        return count($ids);
+    }
+}
@@ -0,0 +1,231 @@
+<?php
+
+namespace mod_flashcards\local;
+
+defined('MOODLE_INTERNAL') || die();
+
+/**
+ * Per-action request profile for ajax.php.
+ *
+ * start() notes the wall clock, DB query count and DB time when an action begins; the
+ * clients of external services add spans through external() (spaCy, Ordbøkene, OpenAI,
+ * ElevenLabs, Polly, Whisper, OCR). At shutdown the request is written to the
+ * flashcards_perf ring buffer when it belongs to the profiling_sample_rate sample or took
+ * longer than profiling_slow_ms; everything else costs a few microtime() calls. The buffer
+ * keeps the newest profiling_buffer_size rows: every TRIM_EVERY inserts the rows that fell
+ * out of it are deleted by id. admin/performance.php reads it through summary().
+ */
+class profiler {
+    /** Default share of requests recorded, percent. */
+    const SAMPLE_RATE = 5;
+    /** Default threshold above which a request is always recorded, ms. */
+    const SLOW_MS = 3000;
+    /** Default ring buffer size, rows. */
+    const BUFFER_SIZE = 20000;
+    /** Inserts between ring buffer trims. */
+    const TRIM_EVERY = 100;
+
+    /** @var string|null action being profiled */
+    protected static $action = null;
+    /** @var bool part of the random sample (used for percentiles) */
+    protected static $sampled = false;
+    /** @var int */
+    protected static $slowms = 0;
+    /** @var float */
+    protected static $start = 0.0;
+    /** @var int */
+    protected static $queries = 0;
+    /** @var float */
+    protected static $dbtime = 0.0;
+    /** @var array<string,array{0:int,1:float}> dependency => [calls, ms] */
+    protected static $externals = [];
+
+    /**
+     * Begin profiling an action; later calls in the same request are ignored.
+     *
+     * @param string $action
+     */
+    public static function start(string $action): void {
+        global $DB;
+        if (self::$action !== null) {
+            return;
+        }
+        $config = get_config('mod_flashcards');
+        $rate = (float)($config->profiling_sample_rate ?? self::SAMPLE_RATE);
+        $slowms = (int)($config->profiling_slow_ms ?? self::SLOW_MS);
+        if ($rate <= 0 && $slowms <= 0) {
+            return;
+        }
+        self::$action = substr($action, 0, 64);
+        self::$sampled = $rate > 0 && mt_rand(0, 9999) < $rate * 100;
+        self::$slowms = $slowms;
+        self::$start = microtime(true);
+        self::$queries = (int)$DB->perf_get_queries();
+        self::$dbtime = self::db_time();
+        self::$externals = [];
+        \core_shutdown_manager::register_function([self::class, 'finish']);
+    }
+
+    /**
+     * Add a span spent in an external service since $start.
+     *
+     * @param string $dependency e.g. 'openai', 'spacy'
+     * @param float $start microtime(true) when the call began
+     * @param int $calls requests covered by the span (batches count each request)
+     */
+    public static function external(string $dependency, float $start, int $calls = 1): void {
+        if (self::$action === null) {
+            return;
+        }
+        $ms = (microtime(true) - $start) * 1000;
+        if (!isset(self::$externals[$dependency])) {
+            self::$externals[$dependency] = [0, 0.0];
+        }
+        self::$externals[$dependency][0] += $calls;
+        self::$externals[$dependency][1] += $ms;
+    }
+
+    /**
+     * Write the profile of this request when it is sampled or slow (shutdown function).
+     */
+    public static function finish(): void {
+        global $DB;
+        if (self::$action === null) {
+            return;
+        }
+        $action = self::$action;
+        self::$action = null;
+        $wallms = (int)round((microtime(true) - self::$start) * 1000);
+        if (!self::$sampled && (self::$slowms <= 0 || $wallms < self::$slowms)) {
+            return;
+        }
+        if ($DB->is_transaction_started()) {
+            return;
+        }
+        $externals = [];
+        foreach (self::$externals as $dependency => [$calls, $ms]) {
+            $externals[$dependency] = [$calls, (int)round($ms)];
+        }
+        try {
+            $id = $DB->insert_record('flashcards_perf', (object)[
+                'action' => $action,
+                'timecreated' => time(),
+                'sampled' => self::$sampled ? 1 : 0,
+                'wallms' => $wallms,
+                'dbqueries' => (int)$DB->perf_get_queries() - self::$queries,
+                'dbms' => (int)round((self::db_time() - self::$dbtime) * 1000),
+                'memory' => memory_get_peak_usage(),
+                'externals' => $externals ? json_encode($externals) : null,
+            ]);
+            if ($id % self::TRIM_EVERY === 0) {
+                $size = (int)(get_config('mod_flashcards', 'profiling_buffer_size') ?: self::BUFFER_SIZE);
+                $DB->delete_records_select('flashcards_perf', 'id <= :cut', ['cut' => $id - max(self::TRIM_EVERY, $size)]);
+            }
+        } catch (\Throwable $e) {
+            // Profiling must never break a request.
+            debugging('[flashcards][profiler] ' . $e->getMessage(), DEBUG_DEVELOPER);
+        }
+    }
+
+    /**
+     * Percentiles per action and per external dependency since $since.
+     *
+     * Percentiles use the random sample only; requests recorded for being slow appear in
+     * 'slowest'. Dependencies are measured per request that used them.
+     *
+     * @param int $since timestamp
+     * @param int $slowest number of slowest requests to list
+     * @return array{actions:array,dependencies:array,slowest:array,rows:int}
+     */
+    public static function summary(int $since, int $slowest = 20): array {
+        global $DB;
+        $actions = [];
+        $dependencies = [];
+        $slow = [];
+        $rows = 0;
+        $rs = $DB->get_recordset_select('flashcards_perf', 'timecreated >= :since', ['since' => $since], 'id',
+            'id, action, timecreated, sampled, wallms, dbqueries, dbms, memory, externals');
+        foreach ($rs as $row) {
+            $rows++;
+            $externals = $row->externals ? (json_decode($row->externals, true) ?: []) : [];
+            $slow[] = $row;
+            if (count($slow) > $slowest * 4) {
+                usort($slow, fn($a, $b) => $b->wallms <=> $a->wallms);
+                $slow = array_slice($slow, 0, $slowest);
+            }
+            if (!$row->sampled) {
+                continue;
+            }
+            $a = &$actions[$row->action];
+            $a['wall'][] = (int)$row->wallms;
+            $a['dbqueries'][] = (int)$row->dbqueries;
+            $a['dbms'][] = (int)$row->dbms;
+            $a['memory'][] = (int)$row->memory;
+            $a['externalms'] = ($a['externalms'] ?? 0) + array_sum(array_column($externals, 1));
+            unset($a);
+            foreach ($externals as $dependency => [$calls, $ms]) {
+                $d = &$dependencies[$dependency];
+                $d['ms'][] = (int)$ms;
+                $d['calls'] = ($d['calls'] ?? 0) + (int)$calls;
+                $d['actions'][$row->action] = true;
+                unset($d);
+            }
+        }
+        $rs->close();
+        usort($slow, fn($a, $b) => $b->wallms <=> $a->wallms);
+
+        $out = ['actions' => [], 'dependencies' => [], 'slowest' => array_slice($slow, 0, $slowest), 'rows' => $rows];
+        foreach ($actions as $action => $a) {
+            $out['actions'][$action] = [
+                'count' => count($a['wall']),
+                'p50' => self::percentile($a['wall'], 50),
+                'p95' => self::percentile($a['wall'], 95),
+                'p99' => self::percentile($a['wall'], 99),
+                'dbqueries' => array_sum($a['dbqueries']) / count($a['dbqueries']),
+                'dbqueries_p95' => self::percentile($a['dbqueries'], 95),
+                'dbms_p95' => self::percentile($a['dbms'], 95),
+                'memory_p95' => self::percentile($a['memory'], 95),
+                'external_share' => array_sum($a['wall']) > 0 ? $a['externalms'] / array_sum($a['wall']) : 0,
+            ];
+        }
+        uasort($out['actions'], fn($a, $b) => $b['p95'] * $b['count'] <=> $a['p95'] * $a['count']);
+        foreach ($dependencies as $dependency => $d) {
+            $out['dependencies'][$dependency] = [
+                'requests' => count($d['ms']),
+                'calls' => $d['calls'],
+                'p50' => self::percentile($d['ms'], 50),
+                'p95' => self::percentile($d['ms'], 95),
+                'p99' => self::percentile($d['ms'], 99),
+                'actions' => array_keys($d['actions']),
+            ];
+        }
+        ksort($out['dependencies']);
+        return $out;
+    }
+
+    /**
+     * Nearest-rank percentile.
+     *
+     * @param int[] $values
+     * @param float $p 0-100
+     * @return int
+     */
+    public static function percentile(array $values, float $p): int {
+        if (!$values) {
+            return 0;
+        }
+        sort($values);
+        $rank = (int)ceil($p / 100 * count($values));
+        return (int)$values[max(0, min(count($values) - 1, $rank - 1))];
+    }
+
+    /**
+     * Seconds spent in DB queries so far, when the driver tracks it.
+     *
+     * @return float
+     */
+    protected static function db_time(): float {
+        global $DB;
+        return method_exists($DB, 'perf_get_queries_time') ? (float)$DB->perf_get_queries_time() : 0.0;
+    }
+}
@@ -0,0 +1,291 @@
+<?php
+
+namespace mod_flashcards\local;
+
+use stdClass;
+
+defined('MOODLE_INTERNAL') || die();
+
+/**
+ * Incremental progress sync between the PWA and flashcards_progress.
+ *
+ * Clients keep an opaque cursor and ask for the rows changed after it, ordered by
+ * (timemodified, id), plus tombstones for progress rows that were deleted
+ * (flashcards_progress_tombs). Hidden cards come back as changed rows with hidden = 1, the
+ * marker the client already uses for hidden cards. The cursor holds one (timemodified, id)
+ * position per stream; on the last page it is held back CURSOR_SKEW seconds so rows written
+ * by requests that were still committing are re-sent on the next pull rather than skipped.
+ *
+ * Saves are applied as one bulk upsert: existing rows are loaded with one query per chunk,
+ * rows where the server has a newer lastat are left alone and reported back as conflicts,
+ * unchanged rows are skipped, and the rest is written in a single transaction.
+ */
+class progress_sync {
+    /** Tombstones are kept this long; older cursors get a full resync. */
+    const TOMBSTONE_TTL = 30 * DAYSECS;
+    /** Seconds of recent writes re-sent on every pull. */
+    const CURSOR_SKEW = 5;
+    /** Default and maximum rows per stream and page. */
+    const PAGE_SIZE = 1000;
+    const MAX_PAGE_SIZE = 5000;
+    /** Card ids per IN (...) query. */
+    const QUERY_CHUNK = 500;
+
+    /**
+     * Progress rows and tombstones changed after a cursor.
+     *
+     * @param int|null $flashcardsid activity id, or null/0 for all of the user's progress
+     * @param int $userid
+     * @param string|null $since cursor from a previous call (null: full snapshot)
+     * @param int $limit rows per stream
+     * @return array{changes:array, deleted:array, cursor:string, more:bool, reset:bool}
+     *         changes has the fetch_progress() shape (deckid => cardid => progress),
+     *         deleted is a list of ['deckId' => ..., 'cardId' => ...]
+     */
+    public static function changes($flashcardsid, int $userid, ?string $since = null, int $limit = self::PAGE_SIZE): array {
+        global $DB;
+        $now = time();
+        $settled = $now - self::CURSOR_SKEW;
+        $limit = max(1, min(self::MAX_PAGE_SIZE, $limit));
+
+        $cursor = self::parse_cursor($since);
+        $reset = $since !== null && $since !== '' && ($cursor === null || $cursor[2] < $now - self::TOMBSTONE_TTL);
+        $full = $cursor === null || $reset;
+        if ($full) {
+            // A snapshot already reflects every deletion: start the tombstone stream from now.
+            $cursor = [0, 0, $settled, 0];
+        }
+
+        $params = ['userid' => $userid, 't' => $cursor[0], 't2' => $cursor[0], 'id' => $cursor[1]];
+        $where = 'userid = :userid AND (timemodified > :t OR (timemodified = :t2 AND id > :id))';
+        if (!empty($flashcardsid)) {
+            $where .= ' AND flashcardsid = :flashcardsid';
+            $params['flashcardsid'] = $flashcardsid;
+        }
+        $rows = array_values($DB->get_records_select('flashcards_progress', $where, $params,
+            'timemodified ASC, id ASC', 'id, deckid, cardid, step, due, addedat, lastat, hidden, timemodified',
+            0, $limit + 1));
+        $tombs = [];
+        if (!$full) {
+            $tombs = array_values($DB->get_records_select('flashcards_progress_tombs',
+                'userid = :userid AND (timemodified > :t OR (timemodified = :t2 AND id > :id))',
+                ['userid' => $userid, 't' => $cursor[2], 't2' => $cursor[2], 'id' => $cursor[3]],
+                'timemodified ASC, id ASC', 'id, deckid, cardid, timemodified', 0, $limit + 1));
+        }
+
+        $moreprogress = count($rows) > $limit;
+        $moretombs = count($tombs) > $limit;
+        $rows = array_slice($rows, 0, $limit);
+        $tombs = array_slice($tombs, 0, $limit);
+
+        $changes = [];
+        foreach ($rows as $r) {
+            $changes[$r->deckid][$r->cardid] = self::export_row($r);
+        }
+        $deleted = [];
+        foreach ($tombs as $t) {
+            $deleted[] = ['deckId' => (string)$t->deckid, 'cardId' => (string)$t->cardid];
+        }
+
+        [$pt, $pid] = self::advance($rows, $moreprogress, $settled);
+        [$dt, $did] = self::advance($tombs, $moretombs, $settled);
+        return [
+            'changes' => $changes,
+            'deleted' => $deleted,
+            'cursor' => "{$pt}-{$pid}-{$dt}-{$did}",
+            'more' => $moreprogress || $moretombs,
+            'reset' => $reset,
+        ];
+    }
+
+    /**
+     * Apply a batch of client progress records as one bulk upsert.
+     *
+     * Rows are matched by (userid, cardid) like the per-card sync always did. A record whose
+     * lastAt is older than the server row's lastat loses: the server row is returned in
+     * conflicts so the client can adopt it.
+     *
+     * @param int|null $flashcardsid
+     * @param int $userid
+     * @param array $records client records (deckId, cardId, step, due, addedAt, lastAt, hidden)
+     * @return array{saved:int, conflicts:array} conflicts has the fetch_progress() shape
+     */
+    public static function save($flashcardsid, int $userid, array $records): array {
+        global $DB;
+        $now = time();
+
+        $incoming = [];
+        foreach ($records as $rec) {
+            $deckid = clean_param($rec['deckId'] ?? '', PARAM_RAW_TRIMMED);
+            $cardid = clean_param($rec['cardId'] ?? '', PARAM_RAW_TRIMMED);
+            if ($deckid === '' || $cardid === '') {
+                continue;
+            }
+            $data = new stdClass();
+            $data->flashcardsid = $flashcardsid;
+            $data->userid = $userid;
+            $data->deckid = $deckid;
+            $data->cardid = $cardid;
+            $data->step = isset($rec['step']) ? (int)$rec['step'] : 0;
+            $data->due = isset($rec['due']) ? (int)$rec['due'] : 0;
+            $data->addedat = isset($rec['addedAt']) ? (int)$rec['addedAt'] : 0;
+            $data->lastat = isset($rec['lastAt']) ? (int)$rec['lastAt'] : 0;
+            // Accept hidden state from frontend (for shared cards user wants to hide).
+            $data->hidden = empty($rec['hidden']) ? 0 : 1;
+            $data->timemodified = $now;
+            // Duplicates in one batch: the most recently reviewed copy wins.
+            if (!isset($incoming[$cardid]) || $data->lastat >= $incoming[$cardid]->lastat) {
+                $incoming[$cardid] = $data;
+            }
+        }
+        if (!$incoming) {
+            return ['saved' => 0, 'conflicts' => []];
+        }
+
+        $existing = [];
+        foreach (array_chunk(array_keys($incoming), self::QUERY_CHUNK) as $chunk) {
+            [$insql, $params] = $DB->get_in_or_equal(array_map('strval', $chunk), SQL_PARAMS_NAMED, 'cid');
+            $params['userid'] = $userid;
+            $rs = $DB->get_recordset_select('flashcards_progress', "userid = :userid AND cardid {$insql}", $params,
+                'id ASC', 'id, deckid, cardid, step, due, addedat, lastat, hidden, timemodified');
+            foreach ($rs as $row) {
+                if (!isset($existing[$row->cardid])) {
+                    $existing[$row->cardid] = $row;
+                }
+            }
+            $rs->close();
+        }
+
+        $inserts = [];
+        $updates = [];
+        $conflicts = [];
+        $stagedeltas = [];
+        foreach ($incoming as $cardid => $data) {
+            $old = $existing[$cardid] ?? null;
+            if ($old) {
+                if ($data->lastat < (int)$old->lastat) {
+                    $conflicts[$old->deckid][$old->cardid] = self::export_row($old);
+                    continue;
+                }
+                if (self::same_row($old, $data)) {
+                    continue;
+                }
+                $data->id = $old->id;
+                $updates[] = $data;
+            } else {
+                $inserts[] = $data;
+            }
+            $transition = stage_counts::transition($old ? (int)$old->step : null,
+                $old && (int)$old->hidden === 1, $data->step, $data->hidden === 1);
+            foreach ($transition as $step => $delta) {
+                $stagedeltas[$step] = ($stagedeltas[$step] ?? 0) + $delta;
+            }
+        }
+
+        if ($inserts || $updates) {
+            $transaction = $DB->start_delegated_transaction();
+            if ($inserts) {
+                $DB->insert_records('flashcards_progress', $inserts);
+            }
+            // There is no multi-row UPDATE in the DML API; changed rows only, inside the transaction.
+            foreach ($updates as $data) {
+                $DB->update_record('flashcards_progress', $data);
+            }
+            $transaction->allow_commit();
+
+            $written = array_merge(array_column($inserts, 'cardid'), array_column($updates, 'cardid'));
+            due_queue::refresh_user_cards($userid, $written);
+            stage_counts::apply($userid, $stagedeltas);
+        }
+        return ['saved' => count($inserts) + count($updates), 'conflicts' => $conflicts];
+    }
+
+    /**
+     * Record tombstones for progress rows that are about to be deleted.
+     *
+     * @param string $select SQL condition on flashcards_progress
+     * @param array $params
+     */
+    public static function before_delete(string $select, array $params): void {
+        global $DB;
+        $now = time();
+        $DB->execute("INSERT INTO {flashcards_progress_tombs} (userid, deckid, cardid, timemodified)
+                      SELECT userid, deckid, cardid, {$now}
+                        FROM {flashcards_progress}
+                       WHERE {$select}", $params);
+    }
+
+    /**
+     * Drop tombstones older than TOMBSTONE_TTL (clients that far behind resync in full).
+     *
+     * @return int rows deleted
+     */
+    public static function prune_tombstones(): int {
+        global $DB;
+        $cutoff = time() - self::TOMBSTONE_TTL;
+        $count = $DB->count_records_select('flashcards_progress_tombs', 'timemodified < :cutoff', ['cutoff' => $cutoff]);
+        if ($count) {
+            $DB->delete_records_select('flashcards_progress_tombs', 'timemodified < :cutoff', ['cutoff' => $cutoff]);
+        }
+        return $count;
+    }
+
+    /**
+     * @param string|null $since
+     * @return int[]|null [progress time, progress id, tombstone time, tombstone id]
+     */
+    protected static function parse_cursor(?string $since): ?array {
+        if ($since === null || !preg_match('/^(\d+)-(\d+)-(\d+)-(\d+)$/', $since, $m)) {
+            return null;
+        }
+        return [(int)$m[1], (int)$m[2], (int)$m[3], (int)$m[4]];
+    }
+
+    /**
+     * Next (timemodified, id) position of one stream.
+     *
+     * Intermediate pages move to their last row. After the last page everything written
+     * before $settled has been seen, so the stream restarts at $settled: the unsettled
+     * window is re-read next time, and idle streams never fall behind TOMBSTONE_TTL.
+     *
+     * @param stdClass[] $rows rows returned on this page, in cursor order
+     * @param bool $more whether the stream has further pages
+     * @param int $settled writes at or after this time may still be committing
+     * @return int[]
+     */
+    protected static function advance(array $rows, bool $more, int $settled): array {
+        if ($more) {
+            $last = end($rows);
+            return [(int)$last->timemodified, (int)$last->id];
+        }
+        return [$settled, 0];
+    }
+
+    /**
+     * @param stdClass $row flashcards_progress row
+     * @return array progress in the client's shape
+     */
+    public static function export_row(stdClass $row): array {
+        return [
+            'step' => (int)$row->step,
+            'due' => (int)$row->due,
+            'addedAt' => (int)$row->addedat,
+            'lastAt' => (int)$row->lastat,
+            'hidden' => (int)$row->hidden,
+        ];
+    }
+
+    /**
+     * @param stdClass $old stored row
+     * @param stdClass $new incoming record
+     * @return bool true when writing $new would change nothing the client can see
+     */
+    protected static function same_row(stdClass $old, stdClass $new): bool {
+        foreach (['deckid', 'step', 'due', 'addedat', 'lastat', 'hidden'] as $field) {
+            if ((string)$old->$field !== (string)$new->$field) {
+                return false;
+            }
+        }
+        return true;
+    }
+}
@@ -32,9 +32,18 @@ class pronunciation_manager {
         'other' => null,
     ];
 
+    /** Maximum wordforms per IN query. */
+    const QUERY_CHUNK = 500;
+
     /** @var bool|null */
     protected static $haswordformlc = null;
 
+    /** @var array<string,array<int,array>> request map: lower-cased wordform => dictionary rows */
+    protected static $entries = [];
+
+    /** @var \cache|null|false */
+    protected static $cache = null;
+
     /**
      * Return an explicit binary collation for exact byte-wise comparisons on MySQL/MariaDB.
      *
@@ -72,43 +81,164 @@ class pronunciation_manager {
      * Retrieve a dictionary entry for the provided wordform.
      */
     public static function lookup(string $wordform, ?string $pos = null): ?array {
-        global $DB;
         $wordform = trim($wordform);
         if ($wordform === '') {
             return null;
         }
         $normalized = core_text::strtolower($wordform);
-        $params = ['wordform' => $normalized];
-        $bin = self::mysql_bin_collation();
-        if (self::has_wordform_lc()) {
-            $wheresql = 'wordform_lc = :wordform';
-        } else {
-            $wheresql = 'LOWER(wordform) = :wordform';
-            if ($bin) {
-                $wheresql = 'LOWER(wordform) COLLATE ' . $bin . ' = :wordform';
+        self::prefetch([$normalized]);
+        return self::resolve($normalized, $pos);
+    }
+
+    /**
+     * Resolve many (wordform, pos) pairs with at most one dictionary query per chunk.
+     *
+     * @param array<int|string,array{0:string,1:?string}> $pairs
+     * @return array<int|string,array|null> entries keyed like $pairs
+     */
+    public static function lookup_many(array $pairs): array {
+        $words = [];
+        foreach ($pairs as $pair) {
+            $words[] = (string)($pair[0] ?? '');
+        }
+        self::prefetch($words);
+        $out = [];
+        foreach ($pairs as $key => $pair) {
+            $word = core_text::strtolower(trim((string)($pair[0] ?? '')));
+            $out[$key] = $word === '' ? null : self::resolve($word, $pair[1] ?? null);
+        }
+        return $out;
+    }
+
+    /**
+     * Load dictionary rows for the given wordforms into the request map.
+     *
+     * Words already seen in this request are skipped; the rest are read from the shared
+     * pron_dict cache and whatever is still missing is fetched with one IN query
+     * (chunked for very large batches). Misses are remembered too.
+     *
+     * @param array<int,string> $wordforms
+     */
+    public static function prefetch(array $wordforms): void {
+        $missing = [];
+        foreach ($wordforms as $wordform) {
+            $word = core_text::strtolower(trim((string)$wordform));
+            if ($word !== '' && !array_key_exists($word, self::$entries)) {
+                $missing[$word] = self::cache_key($word);
+            }
+        }
+        if (!$missing) {
+            return;
+        }
+
+        $cache = self::shared_cache();
+        if ($cache) {
+            $cached = $cache->get_many(array_values($missing));
+            foreach ($missing as $word => $cachekey) {
+                if (isset($cached[$cachekey]) && is_array($cached[$cachekey])) {
+                    self::$entries[$word] = $cached[$cachekey];
+                    unset($missing[$word]);
+                }
             }
         }
+        if (!$missing) {
+            return;
+        }
+
+        $loaded = self::fetch_rows(array_keys($missing));
+        if ($loaded === null) {
+            // Query failed: answer null for this request but do not poison the shared cache.
+            foreach ($missing as $word => $cachekey) {
+                self::$entries[$word] = [];
+            }
+            return;
+        }
+        $tocache = [];
+        foreach ($missing as $word => $cachekey) {
+            self::$entries[$word] = $loaded[$word] ?? [];
+            $tocache[$cachekey] = self::$entries[$word];
+        }
+        if ($cache) {
+            $cache->set_many($tocache);
+        }
+    }
+
+    /**
+     * Drop the request map (CLI scripts and long-running tasks).
+     */
+    public static function reset_request_cache(): void {
+        self::$entries = [];
+    }
+
+    /**
+     * Pick the entry get_record_select() used to return for one word: the first row, or the
+     * first row with the requested POS code.
+     */
+    protected static function resolve(string $normalized, ?string $pos): ?array {
+        $rows = self::$entries[$normalized] ?? [];
         $poscode = self::normalize_pos($pos);
-        if ($poscode !== null) {
-            $params['pos'] = $poscode;
-            $wheresql .= ' AND pos = :pos';
+        foreach ($rows as $row) {
+            if ($poscode === null || strcasecmp((string)$row['pos'], $poscode) === 0) {
+                return $row;
+            }
         }
-        try {
-            $record = $DB->get_record_select('flashcards_pron_dict', $wheresql, $params, '*', IGNORE_MULTIPLE);
-        } catch (dml_exception $e) {
-            debugging('[flashcards] Pronunciation lookup failed: ' . $e->getMessage(), DEBUG_DEVELOPER);
-            return null;
+        return null;
+    }
+
+    /**
+     * All dictionary rows for a set of lower-cased wordforms, grouped by wordform.
+     *
+     * @param array<int,string> $words
+     * @return array<string,array<int,array>>|null null when the query failed
+     */
+    protected static function fetch_rows(array $words): ?array {
+        global $DB;
+        $bin = self::mysql_bin_collation();
+        if (self::has_wordform_lc()) {
+            $column = 'wordform_lc';
+        } else {
+            $column = $bin ? 'LOWER(wordform) COLLATE ' . $bin : 'LOWER(wordform)';
         }
-        if (!$record) {
-            return null;
+        $out = [];
+        foreach (array_chunk($words, self::QUERY_CHUNK) as $chunk) {
+            [$insql, $params] = $DB->get_in_or_equal($chunk, SQL_PARAMS_NAMED, 'pw');
+            try {
+                $rs = $DB->get_recordset_select('flashcards_pron_dict', $column . ' ' . $insql, $params, 'id ASC',
+                    'id, wordform, pos, ipa, xsampa, nofabet');
+                foreach ($rs as $record) {
+                    $out[core_text::strtolower(trim((string)$record->wordform))][] = [
+                        'wordform' => $record->wordform,
+                        'pos' => $record->pos,
+                        'ipa' => $record->ipa,
+                        'xsampa' => $record->xsampa,
+                        'nofabet' => $record->nofabet,
+                    ];
+                }
+                $rs->close();
+            } catch (dml_exception $e) {
+                debugging('[flashcards] Pronunciation lookup failed: ' . $e->getMessage(), DEBUG_DEVELOPER);
+                return null;
+            }
         }
-        return [
-            'wordform' => $record->wordform,
-            'pos' => $record->pos,
-            'ipa' => $record->ipa,
-            'xsampa' => $record->xsampa,
-            'nofabet' => $record->nofabet,
-        ];
+        return $out;
+    }
+
+    /**
+     * Application cache shared across requests, or null when caching is unavailable.
+     */
+    protected static function shared_cache(): ?\cache {
+        if (self::$cache === null) {
+            try {
+                self::$cache = \cache::make('mod_flashcards', 'pron_dict');
+            } catch (\Throwable $e) {
+                self::$cache = false;
+            }
+        }
+        return self::$cache ?: null;
+    }
+
+    protected static function cache_key(string $normalized): string {
+        return sha1($normalized);
     }
 
     /**
@@ -6,12 +6,37 @@ use cache;
 
 defined('MOODLE_INTERNAL') || die();
 
+/**
+ * Client for the spaCy analysis service.
+ *
+ * Results are memoised for the request and kept in the 'spacy' application cache, keyed by
+ * text hash and the model the service last reported, so a model upgrade starts a fresh
+ * key space. Concurrent requests for the same uncached text are coalesced with a lock:
+ * the first caller analyses, the others wait and read its result from the cache.
+ */
 class spacy_client {
+    /** Cache entry holding the model name the service last reported. */
+    const MODEL_KEY = 'model';
+    /** Texts per batch request. */
+    const BATCH_SIZE = 32;
+
     /** @var string */
     private $url;
     /** @var int */
     private $timeout;
 
+    /** @var array<string,array> request memo: cache key => analysis */
+    protected static $memo = [];
+    /** @var string|null */
+    protected static $model = null;
+    /** @var cache|null|false */
+    protected static $cache = null;
+    /** @var bool set once the service rejected a batch request */
+    protected static $nobatch = false;
+    /** @var array<string,int|float> */
+    protected static $stats = ['memo_hits' => 0, 'cache_hits' => 0, 'misses' => 0, 'coalesced' => 0,
+        'requests' => 0, 'texts_sent' => 0, 'request_ms' => 0.0, 'max_request_ms' => 0.0];
+
     public function __construct(?string $url = null, int $timeout = 30) {
         if ($url === null) {
             $config = get_config('mod_flashcards');
@@ -29,7 +54,7 @@ class spacy_client {
     }
 
     /**
-     * Analyze text using spaCy API (cached by text hash).
+     * Analyze text using spaCy API (memoised, cached by text hash and model, coalesced).
      *
      * @param string $text
      * @return array
@@ -39,36 +64,269 @@ class spacy_client {
         if ($text === '' || !$this->is_enabled()) {
             return [];
         }
-        global $CFG;
-        $cacheDisabled = true;
+        $key = $this->cache_key($text);
+        $found = $this->get_cached([$key]);
+        if (isset($found[$key])) {
+            return $found[$key];
+        }
 
-        $cachekey = hash('sha256', $text);
-        $cache = null;
-        if (!$cacheDisabled) {
-            try {
-                $cache = cache::make('mod_flashcards', 'spacy');
-            } catch (\Throwable $e) {
-                $cache = null;
+        $lock = $this->acquire_lock($key);
+        try {
+            if ($lock) {
+                // Another request may have analysed the text while we waited for the lock.
+                $found = $this->get_cached([$key], false);
+                if (isset($found[$key])) {
+                    self::$stats['coalesced']++;
+                    return $found[$key];
+                }
+            }
+            self::$stats['misses']++;
+            $data = $this->normalize_result($this->post(['text' => $text]));
+            $this->store([$text => $data]);
+            return $data;
+        } finally {
+            if ($lock) {
+                $lock->release();
+            }
+        }
+    }
+
+    /**
+     * Analyze many texts, sending the uncached ones in batch requests.
+     *
+     * The service answers {"texts": [...]} with {"model": ..., "results": [...]} in input
+     * order. Services without batch support get one request per text instead.
+     *
+     * @param string[] $texts
+     * @return array<int|string,array> analyses keyed like $texts ([] for empty texts)
+     */
+    public function analyze_many(array $texts): array {
+        $out = [];
+        $keys = [];
+        foreach ($texts as $idx => $text) {
+            $text = trim((string)$text);
+            $out[$idx] = [];
+            if ($text !== '' && $this->is_enabled()) {
+                $keys[$idx] = $this->cache_key($text);
+                $texts[$idx] = $text;
             }
-            if ($cache) {
-                $cached = $cache->get($cachekey);
-                if (is_array($cached)) {
-                    return $cached;
+        }
+        if (!$keys) {
+            return $out;
+        }
+        $found = $this->get_cached(array_values(array_unique($keys)));
+        $pending = [];
+        foreach ($keys as $idx => $key) {
+            if (isset($found[$key])) {
+                $out[$idx] = $found[$key];
+            } else {
+                $pending[$key] = $texts[$idx];
+            }
+        }
+
+        foreach (array_chunk($pending, self::BATCH_SIZE, true) as $chunk) {
+            self::$stats['misses'] += count($chunk);
+            $texts = array_values($chunk);
+            $results = $this->post_batch($texts);
+            $tostore = [];
+            foreach ($texts as $i => $text) {
+                $tostore[$text] = $results[$i] ?? $this->normalize_result($this->post(['text' => $text]));
+            }
+            $this->store($tostore);
+            foreach ($chunk as $key => $text) {
+                $pending[$key] = $tostore[$text];
+            }
+        }
+        foreach ($keys as $idx => $key) {
+            $out[$idx] = $found[$key] ?? $pending[$key];
+        }
+        return $out;
+    }
+
+    /**
+     * Counters for this request: memo/cache hits, misses, coalesced waits, HTTP requests and latency.
+     *
+     * @return array<string,int|float>
+     */
+    public static function stats(): array {
+        $stats = self::$stats;
+        $stats['request_ms'] = round($stats['request_ms'], 1);
+        $stats['max_request_ms'] = round($stats['max_request_ms'], 1);
+        return $stats;
+    }
+
+    /**
+     * Forget the request memo and counters (CLI scripts and long-running tasks).
+     */
+    public static function reset_request_cache(): void {
+        self::$memo = [];
+        self::$model = null;
+        foreach (self::$stats as $name => $value) {
+            self::$stats[$name] = is_float($value) ? 0.0 : 0;
+        }
+    }
+
+    /**
+     * @param string $text trimmed text
+     * @return string
+     */
+    protected function cache_key(string $text): string {
+        return hash('sha256', $this->model() . "\n" . $text);
+    }
+
+    /**
+     * Model name last reported by the service ('' until the first response).
+     */
+    protected function model(): string {
+        if (self::$model === null) {
+            $cache = self::shared_cache();
+            $model = $cache ? $cache->get(self::MODEL_KEY) : false;
+            self::$model = is_string($model) ? $model : '';
+        }
+        return self::$model;
+    }
+
+    /**
+     * Look keys up in the request memo, then in the application cache.
+     *
+     * @param string[] $keys
+     * @param bool $count update hit counters
+     * @return array<string,array>
+     */
+    protected function get_cached(array $keys, bool $count = true): array {
+        $found = [];
+        $missing = [];
+        foreach ($keys as $key) {
+            if (isset(self::$memo[$key])) {
+                $found[$key] = self::$memo[$key];
+                if ($count) {
+                    self::$stats['memo_hits']++;
+                }
+            } else {
+                $missing[] = $key;
+            }
+        }
+        $cache = self::shared_cache();
+        if ($missing && $cache) {
+            foreach ($cache->get_many($missing) as $key => $data) {
+                if (is_array($data)) {
+                    self::$memo[$key] = $found[$key] = $data;
+                    if ($count) {
+                        self::$stats['cache_hits']++;
+                    }
                 }
             }
         }
+        return $found;
+    }
+
+    /**
+     * Remember analyses for this request and in the application cache.
+     *
+     * When the service reports a different model, the new name becomes part of the keys, so
+     * entries from the previous model are simply no longer read and expire with the TTL.
+     *
+     * @param array<string,array> $results trimmed text => analysis
+     */
+    protected function store(array $results): void {
+        $cache = self::shared_cache();
+        foreach ($results as $data) {
+            $model = (string)($data['model'] ?? '');
+            if ($model !== '' && $model !== $this->model()) {
+                self::$model = $model;
+                if ($cache) {
+                    $cache->set(self::MODEL_KEY, $model);
+                }
+            }
+        }
+        $tocache = [];
+        foreach ($results as $text => $data) {
+            $key = $this->cache_key((string)$text);
+            self::$memo[$key] = $tocache[$key] = $data;
+        }
+        if ($cache) {
+            $cache->set_many($tocache);
+        }
+    }
+
+    /**
+     * Lock used to coalesce concurrent analyses of the same text, or null when locking is unavailable.
+     *
+     * @param string $key
+     * @return \core\lock\lock|null
+     */
+    protected function acquire_lock(string $key) {
+        try {
+            $factory = \core\lock\lock_config::get_lock_factory('mod_flashcards_spacy');
+            return $factory->get_lock($key, $this->timeout) ?: null;
+        } catch (\Throwable $e) {
+            return null;
+        }
+    }
+
+    /**
+     * Send one batch; returns normalised results in input order, or [] when the service
+     * has no batch support.
+     *
+     * @param string[] $texts
+     * @return array<int,array>
+     */
+    protected function post_batch(array $texts): array {
+        if (count($texts) === 1 || self::$nobatch) {
+            return [];
+        }
+        try {
+            $response = $this->post(['texts' => $texts]);
+        } catch (\RuntimeException $e) {
+            debugging('[flashcards] spaCy batch request failed, falling back to single texts: '
+                . $e->getMessage(), DEBUG_DEVELOPER);
+            self::$nobatch = true;
+            return [];
+        }
+        $results = $response['results'] ?? null;
+        if (!is_array($results) || count($results) !== count($texts)) {
+            self::$nobatch = true;
+            return [];
+        }
+        $out = [];
+        foreach (array_values($results) as $i => $result) {
+            if (!is_array($result)) {
+                return [];
+            }
+            if (!isset($result['model']) && isset($response['model'])) {
+                $result['model'] = $response['model'];
+            }
+            $result['text'] = $result['text'] ?? $texts[$i];
+            $out[$i] = $this->normalize_result($result);
+        }
+        return $out;
+    }
 
-        $payload = json_encode(['text' => $text], JSON_UNESCAPED_UNICODE);
+    /**
+     * POST a JSON body to the service and decode the response.
+     *
+     * @param array $body
+     * @return array
+     */
+    protected function post(array $body): array {
+        $payload = json_encode($body, JSON_UNESCAPED_UNICODE);
         $headers = [
             'Content-Type: application/json',
             'Accept: application/json',
         ];
+        $start = microtime(true);
         $curl = new \curl();
         $response = $curl->post($this->url, $payload, [
             'CURLOPT_HTTPHEADER' => $headers,
             'CURLOPT_TIMEOUT' => $this->timeout,
             'CURLOPT_CONNECTTIMEOUT' => 10,
         ]);
+        $elapsed = (microtime(true) - $start) * 1000;
+        profiler::external('spacy', $start);
+        self::$stats['requests']++;
+        self::$stats['texts_sent'] += isset($body['texts']) ? count($body['texts']) : 1;
+        self::$stats['request_ms'] += $elapsed;
+        self::$stats['max_request_ms'] = max(self::$stats['max_request_ms'], $elapsed);
         if ($response === false) {
             $errno = $curl->get_errno();
             $error = $curl->error;
@@ -83,16 +341,34 @@ class spacy_client {
         if (!is_array($data)) {
             throw new \RuntimeException('Invalid JSON from spaCy.');
         }
+        return $data;
+    }
+
+    /**
+     * @param array $data
+     * @return array
+     */
+    protected function normalize_result(array $data): array {
         if (isset($data['tokens']) && is_array($data['tokens'])) {
             $data['tokens'] = array_values(array_filter($data['tokens'], fn($t) => is_array($t)));
         }
         if (isset($data['sents']) && is_array($data['sents'])) {
             $data['sents'] = array_values(array_filter($data['sents'], fn($t) => is_array($t)));
         }
+        return $data;
+    }
 
-        if ($cache && !$cacheDisabled) {
-            $cache->set($cachekey, $data);
+    /**
+     * @return cache|null
+     */
+    protected static function shared_cache(): ?cache {
+        if (self::$cache === null) {
+            try {
+                self::$cache = cache::make('mod_flashcards', 'spacy');
+            } catch (\Throwable $e) {
+                self::$cache = false;
+            }
         }
-        return $data;
+        return self::$cache ?: null;
     }
 }
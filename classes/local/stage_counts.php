@@ -0,0 +1,136 @@
+<?php
+
+namespace mod_flashcards\local;
+
+use dml_exception;
+
+defined('MOODLE_INTERNAL') || die();
+
+/**
+ * Per-user stage histogram of visible (hidden = 0) progress rows (flashcards_stage_counts).
+ *
+ * The dashboard reads the histogram instead of grouping the user's flashcards_progress rows.
+ * Progress writes in api and the cleanup task report deltas; counts are changed with
+ * in-place "cnt = cnt + x" updates so concurrent reviews do not lose increments. A user's
+ * histogram is rebuilt from flashcards_progress on first read and by api::recalculate_stats().
+ */
+class stage_counts {
+    /** Bump to force every user's histogram to be rebuilt on next read. */
+    const VERSION = 1;
+    /** User preference recording the histogram version built for the user. */
+    const PREF = 'mod_flashcards_stagecounts';
+
+    /**
+     * Histogram for the user, building it first if needed.
+     *
+     * @param int $userid
+     * @return array<int,int> step => count, ascending, zero counts omitted
+     */
+    public static function get(int $userid): array {
+        global $DB;
+        if ((int)get_user_preferences(self::PREF, 0, $userid) !== self::VERSION) {
+            self::rebuild($userid);
+        }
+        $out = [];
+        $rows = $DB->get_records('flashcards_stage_counts', ['userid' => $userid], 'step ASC', 'step, cnt');
+        foreach ($rows as $row) {
+            if ((int)$row->cnt > 0) {
+                $out[(int)$row->step] = (int)$row->cnt;
+            }
+        }
+        return $out;
+    }
+
+    /**
+     * Rebuild one user's histogram from flashcards_progress.
+     *
+     * @param int $userid
+     */
+    public static function rebuild(int $userid): void {
+        global $DB;
+        $transaction = $DB->start_delegated_transaction();
+        $DB->delete_records('flashcards_stage_counts', ['userid' => $userid]);
+        $DB->execute("INSERT INTO {flashcards_stage_counts} (userid, step, cnt)
+                      SELECT userid, step, COUNT(1)
+                        FROM {flashcards_progress}
+                       WHERE userid = :userid AND hidden = 0
+                    GROUP BY userid, step", ['userid' => $userid]);
+        $transaction->allow_commit();
+        set_user_preference(self::PREF, self::VERSION, $userid);
+    }
+
+    /**
+     * Visible-row transition of one progress record, as a delta map.
+     *
+     * @param int|null $oldstep step before the write (null: row did not exist)
+     * @param bool $oldhidden
+     * @param int|null $newstep step after the write (null: row deleted)
+     * @param bool $newhidden
+     * @return array<int,int> step => delta
+     */
+    public static function transition(?int $oldstep, bool $oldhidden, ?int $newstep, bool $newhidden): array {
+        $deltas = [];
+        if ($oldstep !== null && !$oldhidden) {
+            $deltas[$oldstep] = ($deltas[$oldstep] ?? 0) - 1;
+        }
+        if ($newstep !== null && !$newhidden) {
+            $deltas[$newstep] = ($deltas[$newstep] ?? 0) + 1;
+        }
+        return array_filter($deltas);
+    }
+
+    /**
+     * Apply step deltas to a user's histogram.
+     *
+     * Users whose histogram has not been built yet are skipped: the rebuild on first read
+     * counts everything.
+     *
+     * @param int $userid
+     * @param array<int,int> $deltas step => delta
+     */
+    public static function apply(int $userid, array $deltas): void {
+        global $DB;
+        $deltas = array_filter($deltas);
+        if (!$deltas || (int)get_user_preferences(self::PREF, 0, $userid) !== self::VERSION) {
+            return;
+        }
+        $existing = $DB->get_records_menu('flashcards_stage_counts', ['userid' => $userid], '', 'step, id');
+        foreach ($deltas as $step => $delta) {
+            $step = (int)$step;
+            if (!isset($existing[$step])) {
+                try {
+                    $DB->insert_record('flashcards_stage_counts',
+                        (object)['userid' => $userid, 'step' => $step, 'cnt' => max(0, (int)$delta)]);
+                    continue;
+                } catch (dml_exception $e) {
+                    // Inserted concurrently: fall through to the increment.
+                }
+            }
+            $DB->execute("UPDATE {flashcards_stage_counts} SET cnt = cnt + :delta WHERE userid = :userid AND step = :step",
+                ['delta' => (int)$delta, 'userid' => $userid, 'step' => $step]);
+        }
+    }
+
+    /**
+     * Decrement histograms for progress rows that are about to be deleted.
+     *
+     * @param string $select SQL condition on flashcards_progress
+     * @param array $params
+     */
+    public static function before_delete(string $select, array $params): void {
+        global $DB;
+        $sql = "SELECT userid, step, COUNT(1) AS cnt
+                  FROM {flashcards_progress}
+                 WHERE hidden = 0 AND ({$select})
+              GROUP BY userid, step";
+        $byuser = [];
+        $rs = $DB->get_recordset_sql($sql, $params);
+        foreach ($rs as $row) {
+            $byuser[(int)$row->userid][(int)$row->step] = -(int)$row->cnt;
+        }
+        $rs->close();
+        foreach ($byuser as $userid => $deltas) {
+            self::apply($userid, $deltas);
+        }
+    }
+}
@@ -0,0 +1,295 @@
+<?php
+
+namespace mod_flashcards\local;
+
+use core_text;
+
+defined('MOODLE_INTERNAL') || die();
+
+/**
+ * Reader for the ranked prefix index built by tools/suggest_index.py (front_suggest).
+ *
+ * The file holds the ordbank wordforms plus flashcards_orbokene entries and fixed
+ * expressions, sorted by key, each with a global rank. Prefixes that match many keys have a
+ * precomputed list of their best-ranked keys; shorter ranges are found by binary search and
+ * ranked on the fly, so a query costs a few dozen small reads from the OS page cache.
+ */
+class suggest_index {
+    /** File magic (see tools/suggest_index.py). */
+    const MAGIC = "FCSUG\0\1\0";
+    /** Header size in bytes. */
+    const HEADER_SIZE = 32;
+    /** Keys scanned for token-wise multiword matches. */
+    const PHRASE_SCAN = 2000;
+
+    /** @var self|null|false false = looked up and unavailable */
+    protected static $instance = null;
+
+    /** @var resource */
+    protected $fh;
+    /** @var int */
+    protected $count;
+    /** @var int */
+    protected $indexoffset;
+    /** @var int */
+    protected $prefixcount;
+    /** @var int */
+    protected $prefixoffset;
+
+    /**
+     * Shared reader for the configured index file, or null when none is installed.
+     */
+    public static function instance(): ?self {
+        if (self::$instance === null) {
+            self::$instance = false;
+            $path = self::configured_path();
+            if ($path !== '' && is_readable($path)) {
+                try {
+                    self::$instance = new self($path);
+                } catch (\Throwable $e) {
+                    debugging('[flashcards] suggest index unavailable: ' . $e->getMessage(), DEBUG_DEVELOPER);
+                }
+            }
+        }
+        return self::$instance ?: null;
+    }
+
+    /**
+     * Path from the suggest_index_path setting, defaulting to moodledata/mod_flashcards/suggest.idx.
+     */
+    public static function configured_path(): string {
+        global $CFG;
+        $path = trim((string)get_config('mod_flashcards', 'suggest_index_path'));
+        if ($path === '') {
+            $path = $CFG->dataroot . '/mod_flashcards/suggest.idx';
+        }
+        return $path;
+    }
+
+    /**
+     * @param string $path
+     */
+    public function __construct(string $path) {
+        $fh = fopen($path, 'rb');
+        if (!$fh) {
+            throw new \moodle_exception('cannotopenfile', 'error', '', $path);
+        }
+        $header = fread($fh, self::HEADER_SIZE);
+        if (strlen($header) !== self::HEADER_SIZE || substr($header, 0, 8) !== self::MAGIC) {
+            fclose($fh);
+            throw new \moodle_exception('invalidfiletype', 'error', '', $path);
+        }
+        $meta = unpack('Vcount/Vindex/Vprefixes/Vprefixindex', substr($header, 8, 16));
+        $this->fh = $fh;
+        $this->count = (int)$meta['count'];
+        $this->indexoffset = (int)$meta['index'];
+        $this->prefixcount = (int)$meta['prefixes'];
+        $this->prefixoffset = (int)$meta['prefixindex'];
+    }
+
+    /**
+     * Best-ranked suggestions whose key starts with $prefix.
+     *
+     * @param string $prefix
+     * @param int $limit
+     * @return array<int,array<string,mixed>> front_suggest items (lemma, baseform, dict, source, langs)
+     */
+    public function complete(string $prefix, int $limit): array {
+        $prefix = self::normalize($prefix);
+        if ($prefix === '') {
+            return [];
+        }
+        $ids = $this->record($prefix);
+        if ($ids === null) {
+            $ranks = [];
+            for ($i = $this->lower_bound($prefix); $i < $this->count; $i++) {
+                [$key, $rank] = $this->key_at($i);
+                if (strncmp($key, $prefix, strlen($prefix)) !== 0) {
+                    break;
+                }
+                $ranks[$i] = $rank;
+            }
+            asort($ranks);
+            $ids = array_keys($ranks);
+        }
+        return $this->items($ids, $limit);
+    }
+
+    /**
+     * Multiword entries matching a query token by token ("ta p s" finds "ta på seg").
+     *
+     * The whole query is tried as a prefix first; with three or more tokens the keys starting
+     * with the first two are also checked token-wise (at most PHRASE_SCAN of them).
+     *
+     * @param string $query
+     * @param int $limit
+     * @return array<int,array<string,mixed>>
+     */
+    public function complete_phrase(string $query, int $limit): array {
+        $query = self::normalize($query);
+        $tokens = explode(' ', $query);
+        if (count($tokens) < 2) {
+            return [];
+        }
+        $items = $this->complete($query, $limit);
+        if (count($items) >= $limit || count($tokens) < 3) {
+            return $items;
+        }
+        $head = $tokens[0] . ' ' . $tokens[1];
+        $ranks = [];
+        $start = $this->lower_bound($head);
+        $end = min($this->count, $start + self::PHRASE_SCAN);
+        for ($i = $start; $i < $end; $i++) {
+            [$key, $rank] = $this->key_at($i);
+            if (strncmp($key, $head, strlen($head)) !== 0) {
+                break;
+            }
+            $keytokens = explode(' ', $key);
+            if (count($keytokens) < count($tokens)) {
+                continue;
+            }
+            foreach ($tokens as $n => $token) {
+                if (strncmp($keytokens[$n], $token, strlen($token)) !== 0) {
+                    continue 2;
+                }
+            }
+            $ranks[$i] = $rank;
+        }
+        asort($ranks);
+        $seen = [];
+        foreach ($items as $item) {
+            $seen[core_text::strtolower($item['lemma']) . '|' . $item['dict']] = true;
+        }
+        foreach ($this->items(array_keys($ranks), $limit) as $item) {
+            $key = core_text::strtolower($item['lemma']) . '|' . $item['dict'];
+            if (!isset($seen[$key]) && count($items) < $limit) {
+                $seen[$key] = true;
+                $items[] = $item;
+            }
+        }
+        return $items;
+    }
+
+    /**
+     * @param string $text
+     * @return string lower-cased, single-spaced
+     */
+    public static function normalize(string $text): string {
+        return preg_replace('/\s+/u', ' ', core_text::strtolower(trim($text))) ?? '';
+    }
+
+    /**
+     * Expand key numbers (best first) into suggestion items.
+     *
+     * @param int[] $ids
+     * @param int $limit
+     * @return array<int,array<string,mixed>>
+     */
+    protected function items(array $ids, int $limit): array {
+        $out = [];
+        $seen = [];
+        foreach ($ids as $i) {
+            foreach ($this->rows_at($i) as [$lemma, $baseform, $dict, $langs]) {
+                $key = core_text::strtolower($lemma) . '|' . $dict;
+                if ($lemma === '' || isset($seen[$key])) {
+                    continue;
+                }
+                $seen[$key] = true;
+                if ($dict === 'ordbank') {
+                    $item = ['lemma' => $lemma, 'baseform' => $baseform !== '' ? $baseform : null,
+                        'dict' => 'ordbank', 'source' => 'ordbank'];
+                } else {
+                    $item = ['lemma' => $lemma, 'dict' => 'ordbokene', 'source' => 'ordbokene'];
+                    if ($langs !== '') {
+                        $item['langs'] = explode(',', $langs);
+                    }
+                }
+                $out[] = $item;
+                if (count($out) >= $limit) {
+                    return $out;
+                }
+            }
+        }
+        return $out;
+    }
+
+    /**
+     * Key bytes and rank of key number $i; leaves the file positioned at its payload length.
+     *
+     * @param int $i
+     * @return array{0:string,1:int}
+     */
+    protected function key_at(int $i): array {
+        fseek($this->fh, $this->indexoffset + 4 * $i);
+        $offset = unpack('V', fread($this->fh, 4))[1];
+        fseek($this->fh, $offset);
+        $keylen = unpack('v', fread($this->fh, 2))[1];
+        $key = $keylen ? fread($this->fh, $keylen) : '';
+        $rank = unpack('V', fread($this->fh, 4))[1];
+        return [$key, (int)$rank];
+    }
+
+    /**
+     * @param int $i
+     * @return array<int,array{0:string,1:string,2:string,3:string}> lemma, baseform, dict, langs
+     */
+    protected function rows_at(int $i): array {
+        $this->key_at($i);
+        $length = unpack('v', fread($this->fh, 2))[1];
+        $rows = [];
+        foreach (explode("\n", $length ? fread($this->fh, $length) : '') as $line) {
+            if ($line !== '') {
+                $rows[] = array_pad(explode("\t", $line), 4, '');
+            }
+        }
+        return $rows;
+    }
+
+    /**
+     * First key number whose key is >= $prefix.
+     *
+     * @param string $prefix
+     * @return int
+     */
+    protected function lower_bound(string $prefix): int {
+        $lo = 0;
+        $hi = $this->count;
+        while ($lo < $hi) {
+            $mid = ($lo + $hi) >> 1;
+            if (strcmp($this->key_at($mid)[0], $prefix) < 0) {
+                $lo = $mid + 1;
+            } else {
+                $hi = $mid;
+            }
+        }
+        return $lo;
+    }
+
+    /**
+     * Precomputed best key numbers for a prefix, or null when the prefix has no record.
+     *
+     * @param string $prefix
+     * @return int[]|null
+     */
+    protected function record(string $prefix): ?array {
+        $lo = 0;
+        $hi = $this->prefixcount;
+        while ($lo < $hi) {
+            $mid = ($lo + $hi) >> 1;
+            fseek($this->fh, $this->prefixoffset + 4 * $mid);
+            $offset = unpack('V', fread($this->fh, 4))[1];
+            fseek($this->fh, $offset);
+            $length = unpack('v', fread($this->fh, 2))[1];
+            $cmp = strcmp(fread($this->fh, $length), $prefix);
+            if ($cmp < 0) {
+                $lo = $mid + 1;
+            } else if ($cmp > 0) {
+                $hi = $mid;
+            } else {
+                $n = ord(fread($this->fh, 1));
+                return $n ? array_values(unpack('V' . $n, fread($this->fh, 4 * $n))) : [];
+            }
+        }
+        return null;
+    }
+}
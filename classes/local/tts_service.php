@@ -4,6 +4,7 @@ namespace mod_flashcards\local;
 
 use coding_exception;
 use context_user;
+use core_text;
 use moodle_exception;
 use moodle_url;
 
@@ -24,6 +25,8 @@ class tts_service {
     /** @var string|null */
     protected $elevenapikey;
     /** @var string */
+    protected $elevenbaseurl;
+    /** @var string */
     protected $elevenmodel;
     /** @var string */
     protected $elevenlanguagecode;
@@ -72,6 +75,7 @@ class tts_service {
     public function __construct() {
         $config = get_config('mod_flashcards');
         $this->elevenapikey = trim($config->elevenlabs_apikey ?? '') ?: getenv('FLASHCARDS_ELEVENLABS_KEY') ?: null;
+        $this->elevenbaseurl = rtrim(trim($config->elevenlabs_base_url ?? ''), '/') ?: 'https://api.elevenlabs.io';
         $this->elevenmodel = trim($config->elevenlabs_model ?? '') ?: 'eleven_monolingual_v2';
         $this->elevenlanguagecode = trim($config->elevenlabs_language_code ?? '') ?: self::ELEVEN_LANGUAGE_DEFAULT;
         $this->elevenfocusmodel = trim($config->elevenlabs_focus_model ?? '') ?: self::ELEVEN_MODEL_FOCUS;
@@ -102,6 +106,54 @@ class tts_service {
         return $this->enabled;
     }
 
+    /**
+     * Text for a card's front audio: the front itself when it has three or more words,
+     * otherwise the first example sentence.
+     *
+     * @param string $fronttext
+     * @param array $examples card examples ("no|translation" strings or ['text' => ...])
+     * @return string
+     */
+    public static function front_audio_text(string $fronttext, array $examples): string {
+        $fronttext = trim($fronttext);
+        if ($fronttext === '') {
+            return '';
+        }
+        $articles = ['en','ei','et'];
+        $markers = ['a','å','aa'];
+        $count = 0;
+        foreach (preg_split('/\s+/u', $fronttext) as $part) {
+            $clean = trim($part, " \t\n\r\0\x0B,.;:!?<>\"'()[]{}");
+            if ($clean === '') {
+                continue;
+            }
+            $lower = core_text::strtolower($clean);
+            if (in_array($lower, $articles, true) || in_array($lower, $markers, true)) {
+                continue;
+            }
+            $count++;
+        }
+        if ($count >= 3) {
+            return $fronttext;
+        }
+        if (!empty($examples)) {
+            $first = $examples[0];
+            if (is_string($first)) {
+                $parts = explode('|', $first, 2);
+                $candidate = trim($parts[0] ?? '');
+                if ($candidate !== '') {
+                    return $candidate;
+                }
+            } else if (is_array($first)) {
+                $candidate = trim((string)($first['text'] ?? $first['no'] ?? ''));
+                if ($candidate !== '') {
+                    return $candidate;
+                }
+            }
+        }
+        return $fronttext;
+    }
+
     /**
      * Generate or reuse a TTS audio file.
      *
@@ -115,7 +167,7 @@ class tts_service {
         if (!$this->is_enabled()) {
             throw new coding_exception('tts service not configured');
         }
-        $text = trim($text);
+        $text = tts_store::normalize_text($text);
         if ($text === '') {
             throw new coding_exception('Empty text for TTS');
         }
@@ -136,6 +188,20 @@ class tts_service {
         $tokens = $this->estimate_tts_tokens($text);
         $preferred = $options['provider'] ?? null;
         $resolved = $this->resolve_provider($text, $preferred);
+        // Audio that already exists costs nothing, so quota limits do not apply to it.
+        $resolvedvoice = $resolved === self::PROVIDER_POLLY ? $this->resolve_polly_voice($voice) : (string)$voice;
+        if ($resolvedvoice !== '') {
+            $spec = $this->request_spec($resolved, $text, $label, $resolvedvoice, $languagecode);
+            if ($out = $this->find_cached($userid, $spec, $label)) {
+                $out['provider_decision'] = [
+                    'preferred' => $preferred ? strtolower(trim((string)$preferred)) : null,
+                    'resolved' => $resolved,
+                    'selected' => $resolved,
+                    'reason' => 'cached',
+                ];
+                return $out;
+            }
+        }
         $provider = $this->choose_provider_with_limits($userid, $text, $preferred, $tokens);
         $decision = [
             'preferred' => $preferred ? strtolower(trim((string)$preferred)) : null,
@@ -204,36 +270,28 @@ class tts_service {
         if (!$this->elevenenabled) {
             throw new coding_exception('ElevenLabs not configured');
         }
+        $spec = $this->request_spec(self::PROVIDER_ELEVENLABS, $text, $label, $voice, $languagecode);
+        return $this->find_cached($userid, $spec, $label)
+            ?? $this->synthesize_shared($userid, $spec, $label, function() use ($spec) {
+                return $this->request_elevenlabs_stream($spec);
+            });
+    }
 
-        $model = $this->get_eleven_model_for_request($label, $text);
-        $voicesettings = $this->get_eleven_voice_settings_for_label($label);
-        $previoustext = $this->get_eleven_previous_text_for_request($label, $text);
-        $filename = $this->build_filename($label, $voice, $text, self::PROVIDER_ELEVENLABS, [
-            'model' => $model,
-            'language_code' => $languagecode,
-            'voice_settings' => $voicesettings,
-            'previous_text' => $previoustext,
-        ]);
-        $context = context_user::instance($userid);
-        $fs = get_file_storage();
-        if ($existing = $fs->get_file($context->id, 'mod_flashcards', 'media', $userid, '/', $filename)) {
-            return $this->format_file_response($context, $userid, $existing->get_filename(), $voice, self::PROVIDER_ELEVENLABS);
-        }
-
+    protected function request_elevenlabs_stream(array $spec): string {
         $payload = json_encode([
-            'text' => $text,
-            'model_id' => $model,
-            'voice_settings' => $voicesettings,
+            'text' => $spec['text'],
+            'model_id' => $spec['model'],
+            'voice_settings' => $spec['voice_settings'],
             'pronunciation_dictionary_locators' => [],
             'seed' => 0,
-            'previous_text' => $previoustext,
+            'previous_text' => $spec['previous_text'],
             'next_text' => '',
             'previous_request_ids' => [],
             'next_request_ids' => [],
             'apply_text_normalization' => 'off',
             'apply_language_text_normalization' => false,
             'use_pvc_as_ivc' => false,
-            'language_code' => $languagecode,
+            'language_code' => $spec['language_code'],
         ], JSON_UNESCAPED_UNICODE);
 
         $curl = new \curl();
@@ -242,12 +300,14 @@ class tts_service {
             'content-type: application/json',
             'xi-api-key: ' . $this->elevenapikey,
         ];
-        $endpoint = 'https://api.elevenlabs.io/v1/text-to-speech/' . rawurlencode($voice) . '?output_format=mp3_44100_128';
+        $endpoint = $this->elevenbaseurl . '/v1/text-to-speech/' . rawurlencode($spec['voice']) . '?output_format=mp3_44100_128';
+        $start = microtime(true);
         $response = $curl->post($endpoint, $payload, [
             'CURLOPT_HTTPHEADER' => $headers,
             'CURLOPT_TIMEOUT' => 40,
             'CURLOPT_CONNECTTIMEOUT' => 10,
         ]);
+        profiler::external('elevenlabs', $start);
         if ($response === false) {
             throw new moodle_exception('tts_http_error', 'mod_flashcards', '', null, $curl->error);
         }
@@ -255,28 +315,122 @@ class tts_service {
         if (!empty($info['http_code']) && (int)$info['http_code'] >= 400) {
             throw new moodle_exception('tts_http_error', 'mod_flashcards', '', null, 'HTTP ' . $info['http_code'] . ': ' . $response);
         }
-
-        $file = $this->store_audio_file($context, $userid, $filename, $response);
-        $this->record_tts_usage($userid, $text, self::PROVIDER_ELEVENLABS);
-        return $this->format_file_response($context, $userid, $file->get_filename(), $voice, self::PROVIDER_ELEVENLABS);
+        return $response;
     }
 
     protected function synthesize_with_polly(int $userid, string $text, string $label, string $voice): array {
         if (!$this->pollyenabled) {
             throw new coding_exception('Amazon Polly not configured');
         }
+        $spec = $this->request_spec(self::PROVIDER_POLLY, $text, $label, $voice, '');
+        return $this->find_cached($userid, $spec, $label)
+            ?? $this->synthesize_shared($userid, $spec, $label, function() use ($spec) {
+                return $this->request_polly_stream($spec['voice'], $spec['text']);
+            });
+    }
+
+    /**
+     * Everything that determines how a clip sounds; tts_store keys clips by it.
+     *
+     * @param string $provider
+     * @param string $text
+     * @param string $label
+     * @param string $voice provider voice id
+     * @param string $languagecode
+     * @return array{provider:string,voice:string,model:string,language_code:string,voice_settings:array,previous_text:string,text:string}
+     */
+    protected function request_spec(string $provider, string $text, string $label, string $voice, string $languagecode): array {
+        if ($provider === self::PROVIDER_POLLY) {
+            return [
+                'provider' => $provider,
+                'voice' => $voice,
+                'model' => 'standard',
+                'language_code' => '',
+                'voice_settings' => [],
+                'previous_text' => '',
+                'text' => $text,
+            ];
+        }
+        return [
+            'provider' => $provider,
+            'voice' => $voice,
+            'model' => $this->get_eleven_model_for_request($label, $text),
+            'language_code' => $languagecode,
+            'voice_settings' => $this->get_eleven_voice_settings_for_label($label),
+            'previous_text' => $this->get_eleven_previous_text_for_request($label, $text),
+            'text' => $text,
+        ];
+    }
 
-        $filename = $this->build_filename($label, $voice, $text, self::PROVIDER_POLLY);
+    /**
+     * Name of the clip in the user's media area (unchanged from before the shared store).
+     */
+    protected function user_filename(string $label, array $spec): string {
+        $meta = [];
+        if ($spec['provider'] === self::PROVIDER_ELEVENLABS) {
+            $meta = [
+                'model' => $spec['model'],
+                'language_code' => $spec['language_code'],
+                'voice_settings' => $spec['voice_settings'],
+                'previous_text' => $spec['previous_text'],
+            ];
+        }
+        return $this->build_filename($label, $spec['voice'], $spec['text'], $spec['provider'], $meta);
+    }
+
+    /**
+     * Audio that needs no provider call: the user's own earlier file or a clip in the shared store.
+     *
+     * @param int $userid
+     * @param array $spec from request_spec()
+     * @param string $label
+     * @return array|null file response, null when the clip has to be synthesized
+     */
+    protected function find_cached(int $userid, array $spec, string $label): ?array {
         $context = context_user::instance($userid);
-        $fs = get_file_storage();
-        if ($existing = $fs->get_file($context->id, 'mod_flashcards', 'media', $userid, '/', $filename)) {
-            return $this->format_file_response($context, $userid, $existing->get_filename(), $voice, self::PROVIDER_POLLY);
+        $filename = $this->user_filename($label, $spec);
+        if (get_file_storage()->get_file($context->id, 'mod_flashcards', 'media', $userid, '/', $filename)) {
+            return $this->format_file_response($context, $userid, $filename, $spec['voice'], $spec['provider']);
         }
+        $clip = tts_store::find(tts_store::key($spec));
+        if (!$clip) {
+            return null;
+        }
+        $file = tts_store::link($clip, $context, $userid, $filename);
+        return $this->format_file_response($context, $userid, $file->get_filename(), $spec['voice'], $spec['provider']);
+    }
 
-        $response = $this->request_polly_stream($voice, $text);
-        $file = $this->store_audio_file($context, $userid, $filename, $response);
-        $this->record_tts_usage($userid, $text, self::PROVIDER_POLLY);
-        return $this->format_file_response($context, $userid, $file->get_filename(), $voice, self::PROVIDER_POLLY);
+    /**
+     * Synthesize a clip into the shared store and link it for the user.
+     *
+     * Concurrent requests for the same clip wait on a lock and reuse the first one's result;
+     * only the request that actually calls the provider is charged.
+     *
+     * @param int $userid
+     * @param array $spec from request_spec()
+     * @param string $label
+     * @param callable $request returns the audio bytes
+     * @return array file response
+     */
+    protected function synthesize_shared(int $userid, array $spec, string $label, callable $request): array {
+        $key = tts_store::key($spec);
+        $lock = tts_store::lock($key, 45);
+        try {
+            $clip = $lock ? tts_store::find($key) : null;
+            if ($clip) {
+                tts_store::coalesced();
+            } else {
+                $clip = tts_store::put($key, $request());
+                $this->record_tts_usage($userid, $spec['text'], $spec['provider']);
+            }
+        } finally {
+            if ($lock) {
+                $lock->release();
+            }
+        }
+        $context = context_user::instance($userid);
+        $file = tts_store::link($clip, $context, $userid, $this->user_filename($label, $spec));
+        return $this->format_file_response($context, $userid, $file->get_filename(), $spec['voice'], $spec['provider']);
     }
 
     protected function request_polly_stream(string $voice, string $text): string {
@@ -323,11 +477,13 @@ class tts_service {
         ];
 
         $curl = new \curl();
+        $start = microtime(true);
         $response = $curl->post($endpoint, $body, [
             'CURLOPT_HTTPHEADER' => $headers,
             'CURLOPT_TIMEOUT' => 30,
             'CURLOPT_CONNECTTIMEOUT' => 10,
         ]);
+        profiler::external('polly', $start);
         if ($response === false) {
             throw new moodle_exception('tts_http_error', 'mod_flashcards', '', null, $curl->error);
         }
@@ -451,6 +607,9 @@ class tts_service {
         throw new coding_exception('No TTS providers are configured');
     }
 
+    /**
+     * Charge a provider request to the user; clips reused from the shared store are free.
+     */
     protected function record_tts_usage(int $userid, string $text, string $provider): void {
         global $DB;
         if ($userid <= 0) {
@@ -628,20 +787,4 @@ class tts_service {
         }
         return $map;
     }
-
-    protected function store_audio_file(context_user $context, int $userid, string $filename, string $contents): \stored_file {
-        $fs = get_file_storage();
-        if ($existing = $fs->get_file($context->id, 'mod_flashcards', 'media', $userid, '/', $filename)) {
-            $existing->delete();
-        }
-        $filerecord = [
-            'contextid' => $context->id,
-            'component' => 'mod_flashcards',
-            'filearea' => 'media',
-            'itemid' => $userid,
-            'filepath' => '/',
-            'filename' => $filename,
-        ];
-        return $fs->create_file_from_string($filerecord, $contents);
-    }
 }
@@ -0,0 +1,164 @@
+<?php
+
+namespace mod_flashcards\local;
+
+use context_system;
+use context_user;
+
+defined('MOODLE_INTERNAL') || die();
+
+/**
+ * Content-addressed store of synthesized audio shared by all users.
+ *
+ * Every clip is filed under the hash of what determines its sound: provider, voice, model,
+ * language code, voice settings, previous text and the whitespace-normalised text. Users get
+ * the clip in their own 'media' area as a file record pointing at the same content hash, so
+ * a clip is paid for and stored once however many learners play it.
+ */
+class tts_store {
+    /** File area in the system context. */
+    const FILEAREA = 'ttsstore';
+
+    /** @var array<string,int> */
+    protected static $stats = ['hits' => 0, 'stored' => 0, 'linked' => 0, 'coalesced' => 0];
+
+    /**
+     * Store key for a synthesis request.
+     *
+     * @param array $spec provider, voice, model, language_code, voice_settings, previous_text, text
+     * @return string sha256 hex
+     */
+    public static function key(array $spec): string {
+        $parts = [];
+        foreach (['provider', 'voice', 'model', 'language_code', 'voice_settings', 'previous_text'] as $name) {
+            $value = $spec[$name] ?? '';
+            if (is_array($value)) {
+                ksort($value);
+            }
+            $parts[$name] = $value;
+        }
+        $parts['text'] = self::normalize_text((string)($spec['text'] ?? ''));
+        return hash('sha256', json_encode($parts, JSON_UNESCAPED_UNICODE | JSON_UNESCAPED_SLASHES));
+    }
+
+    /**
+     * @param string $text
+     * @return string trimmed, single-spaced, NFC when intl is available
+     */
+    public static function normalize_text(string $text): string {
+        $text = trim(preg_replace('/\s+/u', ' ', $text) ?? $text);
+        if (class_exists('\Normalizer')) {
+            $text = \Normalizer::normalize($text, \Normalizer::FORM_C) ?: $text;
+        }
+        return $text;
+    }
+
+    /**
+     * @param string $key
+     * @return \stored_file|null
+     */
+    public static function find(string $key): ?\stored_file {
+        [$path, $name] = self::location($key);
+        $file = get_file_storage()->get_file(context_system::instance()->id, 'mod_flashcards', self::FILEAREA, 0,
+            $path, $name);
+        if ($file) {
+            self::$stats['hits']++;
+        }
+        return $file ?: null;
+    }
+
+    /**
+     * Add a clip; an existing clip under the same key wins.
+     *
+     * @param string $key
+     * @param string $contents
+     * @return \stored_file
+     */
+    public static function put(string $key, string $contents): \stored_file {
+        [$path, $name] = self::location($key);
+        $fs = get_file_storage();
+        $contextid = context_system::instance()->id;
+        if ($existing = $fs->get_file($contextid, 'mod_flashcards', self::FILEAREA, 0, $path, $name)) {
+            return $existing;
+        }
+        self::$stats['stored']++;
+        return $fs->create_file_from_string([
+            'contextid' => $contextid,
+            'component' => 'mod_flashcards',
+            'filearea' => self::FILEAREA,
+            'itemid' => 0,
+            'filepath' => $path,
+            'filename' => $name,
+        ], $contents);
+    }
+
+    /**
+     * Make a stored clip available in a user's media area under $filename.
+     *
+     * The new record shares the clip's content hash, so no audio is copied.
+     *
+     * @param \stored_file $clip
+     * @param context_user $context
+     * @param int $userid
+     * @param string $filename
+     * @return \stored_file
+     */
+    public static function link(\stored_file $clip, context_user $context, int $userid, string $filename): \stored_file {
+        $fs = get_file_storage();
+        if ($existing = $fs->get_file($context->id, 'mod_flashcards', 'media', $userid, '/', $filename)) {
+            if ($existing->get_contenthash() === $clip->get_contenthash()) {
+                return $existing;
+            }
+            $existing->delete();
+        }
+        self::$stats['linked']++;
+        return $fs->create_file_from_storedfile([
+            'contextid' => $context->id,
+            'component' => 'mod_flashcards',
+            'filearea' => 'media',
+            'itemid' => $userid,
+            'filepath' => '/',
+            'filename' => $filename,
+        ], $clip);
+    }
+
+    /**
+     * Lock that lets one process synthesize a key while others wait for its clip.
+     *
+     * @param string $key
+     * @param int $timeout seconds to wait
+     * @return \core\lock\lock|null null when locking is unavailable or timed out
+     */
+    public static function lock(string $key, int $timeout) {
+        try {
+            $factory = \core\lock\lock_config::get_lock_factory('mod_flashcards_tts');
+            return $factory->get_lock($key, $timeout) ?: null;
+        } catch (\Throwable $e) {
+            return null;
+        }
+    }
+
+    /**
+     * Note that a waiting process found the clip another one synthesized.
+     */
+    public static function coalesced(): void {
+        self::$stats['coalesced']++;
+    }
+
+    /**
+     * Counters for this request: store hits, clips stored, user links, coalesced waits.
+     *
+     * @return array<string,int>
+     */
+    public static function stats(): array {
+        return self::$stats;
+    }
+
+    /**
+     * @param string $key
+     * @return array{0:string,1:string} file path and name
+     */
+    protected static function location(string $key): array {
+        return ['/' . substr($key, 0, 2) . '/', $key . '.mp3'];
+    }
+}
@@ -40,7 +40,7 @@ class whisper_client {
         $this->cliplimit = max(1, (int)($config->whisper_clip_limit ?? 15));
         $this->monthlylimit = max($this->cliplimit, (int)($config->whisper_monthly_limit ?? 36000));
         $this->timeout = max(5, (int)($config->whisper_timeout ?? 45));
-        $this->endpoint = self::DEFAULT_ENDPOINT;
+        $this->endpoint = trim($config->whisper_endpoint ?? '') ?: self::DEFAULT_ENDPOINT;
         $this->enabled = !empty($config->whisper_enabled) && !empty($this->apikey);
     }
 
@@ -92,7 +92,9 @@ class whisper_client {
             CURLOPT_TIMEOUT => $this->timeout,
         ]);
 
+        $start = microtime(true);
         $response = curl_exec($curl);
+        profiler::external('whisper', $start);
         if ($response === false) {
             $error = curl_error($curl);
             curl_close($curl);
@@ -102,6 +102,17 @@ class observer {
         }
     }
 
+    /**
+     * Observer for card_deleted event
+     *
+     * Queue the card's key so cleanup_orphans purges its progress rows without a table scan
+     *
+     * @param \mod_flashcards\event\card_deleted $event
+     */
+    public static function card_deleted(\mod_flashcards\event\card_deleted $event) {
+        \mod_flashcards\local\orphan_cleanup::enqueue((int)$event->other['deckid'], (string)$event->other['cardid']);
+    }
+
     /**
      * Check if course has flashcards activity
      *
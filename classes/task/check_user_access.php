@@ -28,7 +28,8 @@ class check_user_access extends \core\task\scheduled_task {
 
         $stats = \mod_flashcards\access_manager::bulk_refresh_all_users();
 
-        mtrace("Checked {$stats['checked']} users, {$stats['transitioned']} status transitions");
+        mtrace("Checked {$stats['checked']} users, {$stats['transitioned']} status transitions, "
+            . "{$stats['notifications']} notifications queued");
         mtrace('Flashcards access check completed');
     }
 }
@@ -26,41 +26,31 @@ class cleanup_orphans extends scheduled_task {
     }
 
     /**
-     * Execute cleanup.
+     * Execute cleanup: queued keys of deleted cards first, then a time-boxed sweep from the stored cursor.
      */
     public function execute() {
-        global $DB;
-
-        $deleted = 0;
-        $batchsize = 500;
-
-        mtrace('Flashcards: looking for orphaned progress records...');
-
-        $sql = "SELECT p.id
-                  FROM {flashcards_progress} p
-             LEFT JOIN {flashcards_cards} c
-                    ON c.deckid = p.deckid AND c.cardid = p.cardid
-                 WHERE c.id IS NULL";
-
-        do {
-            $records = $DB->get_records_sql($sql, [], 0, $batchsize);
-            if (empty($records)) {
-                break;
-            }
-
-            $ids = array_keys($records);
-
-            list($insql, $inparams) = $DB->get_in_or_equal($ids);
-            $DB->delete_records_select('flashcards_progress', "id {$insql}", $inparams);
-            $deleted += count($ids);
-            mtrace("  - Deleted {$deleted} orphaned progress records so far...");
+        $queued = \mod_flashcards\local\orphan_cleanup::purge_queued();
+        if ($queued['keys']) {
+            mtrace(sprintf('Flashcards: purged %d progress records of %d deleted cards in %.1fs.',
+                $queued['deleted'], $queued['keys'], $queued['elapsed']));
+        }
 
-        } while (true);
+        $sweep = \mod_flashcards\local\orphan_cleanup::sweep();
+        mtrace(sprintf('Flashcards: orphan sweep scanned %d progress records (ids %d-%d), deleted %d in %.1fs%s.',
+            $sweep['scanned'], $sweep['from'], $sweep['to'] - 1, $sweep['deleted'], $sweep['elapsed'],
+            $sweep['wrapped'] ? ', full pass complete' : ', continuing next run'));
 
-        if ($deleted === 0) {
-            mtrace('Flashcards: no orphaned progress records found.');
-        } else {
-            mtrace("Flashcards: cleanup complete, deleted {$deleted} orphaned progress records.");
+        $pruned = \mod_flashcards\local\progress_sync::prune_tombstones();
+        if ($pruned) {
+            mtrace("Flashcards: pruned {$pruned} expired progress tombstones.");
+        }
+        $pruned = \mod_flashcards\local\api::prune_review_events();
+        if ($pruned) {
+            mtrace("Flashcards: pruned {$pruned} expired review event ids.");
+        }
+        $pruned = \mod_flashcards\local\ordbokene_http::prune();
+        if ($pruned) {
+            mtrace("Flashcards: pruned {$pruned} unused Ordbøkene cache entries.");
         }
     }
 }
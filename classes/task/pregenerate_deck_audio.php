@@ -0,0 +1,155 @@
+<?php
+/**
+ * Adhoc task: synthesize missing audio for a shared deck.
+ *
+ * @package    mod_flashcards
+ * @copyright  2025
+ * @license    http://www.gnu.org/copyleft/gpl.html GNU GPL v3 or later
+ */
+
+namespace mod_flashcards\task;
+
+defined('MOODLE_INTERNAL') || die();
+
+use core\task\adhoc_task;
+use mod_flashcards\local\due_queue;
+use mod_flashcards\local\tts_service;
+
+/**
+ * Generates front, focus and example audio for one slice of a shared deck's cards.
+ *
+ * A deck is split into tts_pregenerate_concurrency slices (card id modulo the slice count),
+ * one task each, so at most that many cron runners call the TTS providers for a deck at a
+ * time. Clips go to the shared tts_store; cards without front or focus audio get the new
+ * URLs in their payload. Synthesis is charged to the user who published the cards.
+ */
+class pregenerate_deck_audio extends adhoc_task {
+
+    /** Seconds to wait after a card is published, so a whole deck is handled in one run. */
+    const DELAY = 120;
+
+    /**
+     * Queue pre-generation for a deck; slices already waiting are not queued twice.
+     *
+     * @param int $deckid
+     * @param int $userid user charged for synthesis
+     * @return int slices queued (0 when pre-generation is disabled)
+     */
+    public static function queue(int $deckid, int $userid): int {
+        $slices = (int)get_config('mod_flashcards', 'tts_pregenerate_concurrency');
+        if ($slices <= 0 || !(new tts_service())->is_enabled()) {
+            return 0;
+        }
+        for ($slice = 0; $slice < $slices; $slice++) {
+            $task = new self();
+            $task->set_custom_data(['deckid' => $deckid, 'userid' => $userid, 'slice' => $slice, 'slices' => $slices]);
+            $task->set_next_run_time(time() + self::DELAY);
+            \core\task\manager::queue_adhoc_task($task, true);
+        }
+        return $slices;
+    }
+
+    /**
+     * Execute pre-generation for this task's slice.
+     */
+    public function execute() {
+        global $DB;
+
+        $data = $this->get_custom_data();
+        $deckid = (int)$data->deckid;
+        $userid = (int)$data->userid;
+        $slices = max(1, (int)$data->slices);
+        $deck = $DB->get_record('flashcards_decks', ['id' => $deckid]);
+        if (!$deck || $deck->scope !== 'shared' || !$DB->record_exists('user', ['id' => $userid, 'deleted' => 0])) {
+            return;
+        }
+        $tts = new tts_service();
+        if (!$tts->is_enabled()) {
+            return;
+        }
+
+        $select = "deckid = :deckid AND scope = 'shared' AND " . $DB->sql_modulo('id', $slices) . ' = :slice';
+        $cards = $DB->get_recordset_select('flashcards_cards', $select,
+            ['deckid' => $deckid, 'slice' => (int)$data->slice], 'id', 'id, cardid, payload, timemodified');
+        $clips = 0;
+        $updated = 0;
+        try {
+            foreach ($cards as $card) {
+                $payload = json_decode($card->payload, true);
+                if (!is_array($payload)) {
+                    continue;
+                }
+                $changed = false;
+                foreach ($this->requests($payload) as [$field, $text, $label]) {
+                    try {
+                        $audio = $tts->synthesize($userid, $text, ['label' => $label]);
+                    } catch (\moodle_exception $e) {
+                        if ($e->errorcode === 'error_tts_quota') {
+                            mtrace("Flashcards: TTS quota reached, stopping deck {$deckid} after {$clips} clips.");
+                            return;
+                        }
+                        mtrace("  - {$card->cardid}: " . $e->getMessage());
+                        continue;
+                    }
+                    $clips++;
+                    if ($field !== null) {
+                        $payload[$field] = $audio['url'];
+                        $changed = true;
+                    }
+                }
+                if ($changed) {
+                    $DB->update_record('flashcards_cards', (object)[
+                        'id' => $card->id,
+                        'payload' => json_encode($payload, JSON_UNESCAPED_UNICODE),
+                        'timemodified' => max(time(), (int)$card->timemodified + 1),
+                    ]);
+                    due_queue::refresh_card($deckid, $card->cardid);
+                    $updated++;
+                }
+            }
+        } finally {
+            $cards->close();
+            mtrace("Flashcards: deck {$deckid} slice {$data->slice}/{$slices}: {$clips} clips, {$updated} cards updated.");
+        }
+    }
+
+    /**
+     * Audio a card needs: [payload field or null, text, label]. Examples have no payload field;
+     * their clips land in the shared store for generate_front_audio to reuse.
+     *
+     * @param array $payload
+     * @return array<int,array{0:?string,1:string,2:string}>
+     */
+    protected function requests(array $payload): array {
+        $out = [];
+        $front = trim((string)($payload['text'] ?? $payload['front'] ?? ''));
+        $examples = is_array($payload['examples'] ?? null) ? $payload['examples'] : [];
+        if ($front !== '' && empty($payload['audioFront']) && empty($payload['audio']) && empty($payload['audioKey'])) {
+            $text = tts_service::front_audio_text($front, $examples);
+            if ($text !== '') {
+                $out[] = ['audioFront', $text, 'front'];
+            }
+        }
+        $focus = trim((string)($payload['fokus'] ?? '')) ?: trim((string)($payload['focusBase'] ?? ''));
+        if ($focus !== '' && empty($payload['focusAudio']) && empty($payload['audioFocus'])
+                && empty($payload['focusAudioKey'])) {
+            if (!preg_match('/[.!?]$/', $focus)) {
+                $focus .= '.';
+            }
+            $out[] = ['focusAudio', $focus, 'focus'];
+        }
+        foreach ($examples as $example) {
+            if (is_string($example)) {
+                $text = trim(explode('|', $example, 2)[0]);
+            } else if (is_array($example)) {
+                $text = trim((string)($example['text'] ?? $example['no'] ?? ''));
+            } else {
+                continue;
+            }
+            if ($text !== '') {
+                $out[] = [null, $text, 'front'];
+            }
+        }
+        return $out;
+    }
+}
@@ -0,0 +1,41 @@
+<?php
+/**
+ * Adhoc task: send one access status notification.
+ *
+ * @package    mod_flashcards
+ * @copyright  2025
+ * @license    http://www.gnu.org/copyleft/gpl.html GNU GPL v3 or later
+ */
+
+namespace mod_flashcards\task;
+
+defined('MOODLE_INTERNAL') || die();
+
+use core\task\adhoc_task;
+
+/**
+ * Sends a grace_period_started, access_expiring_soon or access_expired message, so access
+ * refreshes (the nightly bulk refresh and the request path) never wait on message delivery.
+ */
+class send_access_notification extends adhoc_task {
+
+    /**
+     * Queue a notification for a user.
+     *
+     * @param int $userid
+     * @param string $type grace_period_started | access_expiring_soon | access_expired
+     */
+    public static function queue(int $userid, string $type): void {
+        $task = new self();
+        $task->set_custom_data(['userid' => $userid, 'type' => $type]);
+        \core\task\manager::queue_adhoc_task($task);
+    }
+
+    /**
+     * Send the message.
+     */
+    public function execute() {
+        $data = $this->get_custom_data();
+        \mod_flashcards\access_manager::send_notification((int)$data->userid, (string)$data->type);
+    }
+}
@@ -0,0 +1,92 @@
+<?php
+// Moodle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+
+/**
+ * Compare waiting for every text-check sample with early-exit consensus.
+ *
+ * Runs the multi-sampling stage of ai_helper::check_norwegian_text() for each sentence twice:
+ * with quorum 0 (wait for all samples, then merge) and with --quorum. Meant for
+ * tools/standin/openai_service.py with per-sample delays, e.g.
+ *   python -m tools.standin.openai_service --sample-delay 0.2=3000 --disagree 0.15
+ * with "OpenAI endpoint" set to http://127.0.0.1:8704/v1/chat/completions. The AI answer
+ * cache is purged before every run, so use a test site.
+ *
+ * php mod/flashcards/cli/bench_consensus.php [--quorum=2] [--sentences=file.txt] [--user=ID]
+ */
+
+define('CLI_SCRIPT', true);
+
+require(__DIR__ . '/../../../config.php');
+require_once($CFG->libdir . '/clilib.php');
+
+use mod_flashcards\local\ai_helper;
+use mod_flashcards\local\openai_client;
+
+[$options, $unrecognized] = cli_get_params(
+    ['quorum' => 2, 'sentences' => '', 'user' => 0, 'help' => false],
+    ['h' => 'help']
+);
+
+if ($options['help']) {
+    echo "Benchmark early-exit consensus for multi-sample text checks.\n\n"
+        . "Options:\n"
+        . "  --quorum=N        Agreeing samples that end a check (default 2)\n"
+        . "  --sentences=FILE  One sentence per line (default: a built-in list)\n"
+        . "  --user=ID         User charged for the requests (default: the main admin)\n";
+    exit(0);
+}
+
+if (!(new openai_client())->is_enabled()) {
+    cli_error('OpenAI is not configured (API key and endpoint).');
+}
+if ($options['sentences'] !== '') {
+    $sentences = array_values(array_filter(array_map('trim', file($options['sentences']) ?: [])));
+} else {
+    $sentences = ['Jeg har bodd i Norge i tre år.', 'Hun liker å lese bøker om kvelden.',
+        'Vi skal reise til Bergen neste uke.', 'I går jeg gikk til butikken.',
+        'Barna leker ute i hagen.', 'Han har ikke spist frokost i dag.'];
+}
+$userid = (int)$options['user'] ?: (int)get_admin()->id;
+
+// Same samples and prompt shape as check_norwegian_text().
+$requests = [
+    ['temperature' => 0.1, 'weight' => 1.5],
+    ['temperature' => 0.15, 'weight' => 1.0],
+    ['temperature' => 0.2, 'weight' => 0.8],
+];
+$systemprompt = 'You are a Norwegian teacher. Check the sentence and return JSON '
+    . '{"hasErrors": bool, "correctedText": string, "errors": [{"original", "corrected", "issue"}]}.';
+
+$helper = new ai_helper();
+$reflection = new \ReflectionClass($helper);
+$sample = $reflection->getMethod('request_parallel_curlmulti');
+$sample->setAccessible(true);
+$modelmethod = (new \ReflectionClass(openai_client::class))->getMethod('get_model_for_task');
+$modelmethod->setAccessible(true);
+$model = $modelmethod->invoke(new openai_client(), 'correction');
+$cache = cache::make('mod_flashcards', 'llm_response');
+
+$totals = [0 => [0, 0, 0], (int)$options['quorum'] => [0, 0, 0]];
+foreach ($sentences as $sentence) {
+    echo $sentence . "\n";
+    foreach (array_keys($totals) as $quorum) {
+        $cache->purge();
+        $start = microtime(true);
+        $result = $sample->invoke($helper, $requests, $systemprompt, "Sentence:\n\"{$sentence}\"", $model, $userid, $quorum);
+        $ms = (microtime(true) - $start) * 1000;
+        $d = $result['decision'] ?? [];
+        printf("  quorum %d: %6.0fms, decided after %dms, %s, %d cancelled, %d tokens used, ~%d saved\n",
+            $quorum, $ms, $d['timeToDecisionMs'] ?? 0, !empty($d['earlyExit']) ? 'early exit' : 'full merge',
+            $d['cancelled'] ?? 0, $d['tokensUsed'] ?? 0, $d['tokensSaved'] ?? 0);
+        $totals[$quorum][0] += $ms;
+        $totals[$quorum][1] += $d['tokensUsed'] ?? 0;
+        $totals[$quorum][2] += $d['tokensSaved'] ?? 0;
+    }
+}
+echo "\n";
+foreach ($totals as $quorum => [$ms, $used, $saved]) {
+    printf("quorum %d: %.0fms per check, %d tokens used, ~%d saved\n", $quorum, $ms / count($sentences), $used, $saved);
+}
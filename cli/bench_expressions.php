@@ -0,0 +1,156 @@
+<?php
+// Moodle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+
+/**
+ * Compare the local expression step of sentence_elements on a corpus of sentences: one
+ * flashcards_orbokene read per 2..5-token window (the old pipeline) vs one pass of
+ * expression_automaton plus reads for the keys it found.
+ *
+ * Sentences are lemmatized with spaCy when it is configured, otherwise surface tokens are
+ * used. The windows are not POS-filtered here, so the old pipeline's read count is an upper
+ * bound. Prints the automaton build time and size, latency percentiles, table reads and the
+ * expressions found per sentence under each variant.
+ *
+ * php mod/flashcards/cli/bench_expressions.php [--file=sentences.txt] [--rounds=3] [--gap=1]
+ */
+
+define('CLI_SCRIPT', true);
+
+require(__DIR__ . '/../../../config.php');
+require_once($CFG->libdir . '/clilib.php');
+
+use mod_flashcards\local\expression_automaton;
+use mod_flashcards\local\orbokene_repository;
+use mod_flashcards\local\spacy_client;
+
+[$options, $unrecognized] = cli_get_params(
+    ['file' => '', 'rounds' => 3, 'gap' => 1, 'help' => false],
+    ['h' => 'help']
+);
+
+if ($options['help']) {
+    echo "Benchmark expression matching over a sentence corpus.\n\n"
+        . "Options:\n"
+        . "  --file=FILE   One sentence per line (default: a few built-in sentences)\n"
+        . "  --rounds=N    Passes over the corpus (default 3)\n"
+        . "  --gap=N       Tokens allowed between expression tokens (default 1, as sentence_elements)\n";
+    exit(0);
+}
+
+if ($options['file'] !== '') {
+    $sentences = array_values(array_filter(array_map('trim', file($options['file'], FILE_IGNORE_NEW_LINES) ?: [])));
+} else {
+    $sentences = [
+        'Han la merke til at døren var åpen.',
+        'Jeg ga opp å lære fransk for mange år siden.',
+        'Vi gleder oss veldig til sommeren.',
+        'Hun tok på seg jakken og gikk ut.',
+        'På grunn av været ble turen avlyst.',
+        'Barna leker ute selv om det regner.',
+        'Kan du passe på hunden i helgen?',
+        'Det er vanskelig å forstå dialektene i Norge.',
+    ];
+}
+if (!$sentences) {
+    cli_error('No sentences.');
+}
+if (!orbokene_repository::is_enabled()) {
+    cli_writeln('Note: orbokene_enabled is off, so neither variant reads flashcards_orbokene.');
+}
+$rounds = max(1, (int)$options['rounds']);
+$gap = max(0, (int)$options['gap']);
+
+// Lemma and surface tokens per sentence, as sentence_elements builds them.
+$spacy = new spacy_client();
+$corpus = [];
+foreach ($sentences as $sentence) {
+    $surface = [];
+    $lemma = [];
+    $tokens = $spacy->is_enabled() ? ($spacy->analyze_text($sentence)['tokens'] ?? []) : [];
+    if ($tokens) {
+        foreach ($tokens as $token) {
+            if (!empty($token['is_alpha'])) {
+                $surface[] = core_text::strtolower((string)$token['text']);
+                $lemma[] = core_text::strtolower((string)($token['lemma'] ?? $token['text']));
+            }
+        }
+    } else {
+        preg_match_all('/[\p{L}\p{M}]+/u', core_text::strtolower($sentence), $m);
+        $surface = $lemma = $m[0];
+    }
+    $corpus[] = [$surface, $lemma];
+}
+echo count($corpus) . ' sentences, ' . ($spacy->is_enabled() ? 'spaCy lemmas' : 'surface tokens only')
+    . ", {$rounds} rounds\n\n";
+
+$start = microtime(true);
+$automaton = expression_automaton::build();
+$stats = $automaton->stats();
+printf("automaton build: %.1f ms, %d keys, %d nodes, %.1f KB serialized\n\n",
+    (microtime(true) - $start) * 1000, $stats['keys'], $stats['nodes'],
+    strlen(serialize($automaton)) / 1024);
+
+$report = function(string $label, array $times, int $reads, int $found) use ($corpus, $rounds) {
+    sort($times);
+    $pct = fn($p) => $times[min(count($times) - 1, (int)floor($p * (count($times) - 1)))];
+    printf("%-22s p50=%7.3f ms  p95=%7.3f ms  max=%7.3f ms  reads/sentence=%5.1f  found/sentence=%4.2f\n",
+        $label, $pct(0.5), $pct(0.95), end($times), $reads / ($rounds * count($corpus)), $found / count($corpus));
+};
+
+// Old pipeline: every 2..5-token lemma window is read from the cache table.
+$times = [];
+$reads = 0;
+$found = 0;
+for ($round = 0; $round < $rounds; $round++) {
+    foreach ($corpus as [$surface, $lemma]) {
+        $start = microtime(true);
+        $before = $DB->perf_get_queries();
+        $hits = [];
+        $count = count($lemma);
+        for ($i = 0; $i < $count; $i++) {
+            for ($len = 2; $len <= 5 && $i + $len <= $count; $len++) {
+                $phrase = implode(' ', array_slice($lemma, $i, $len));
+                if (!isset($hits[$phrase]) && orbokene_repository::find($phrase) !== null) {
+                    $hits[$phrase] = true;
+                }
+            }
+        }
+        $reads += $DB->perf_get_queries() - $before;
+        $times[] = (microtime(true) - $start) * 1000;
+        if ($round === 0) {
+            $found += count($hits);
+        }
+    }
+}
+$report('windows + table reads', $times, $reads, $found);
+
+// Automaton: one pass, then reads only for the cache keys it found.
+$times = [];
+$reads = 0;
+$found = 0;
+$gapped = 0;
+for ($round = 0; $round < $rounds; $round++) {
+    foreach ($corpus as [$surface, $lemma]) {
+        $start = microtime(true);
+        $before = $DB->perf_get_queries();
+        $hits = $automaton->match($lemma, $surface, $gap);
+        foreach ($hits as $hit) {
+            if ($hit['sources'] & expression_automaton::SOURCE_ORBOKENE) {
+                orbokene_repository::find($hit['key']);
+            }
+        }
+        $reads += $DB->perf_get_queries() - $before;
+        $times[] = (microtime(true) - $start) * 1000;
+        if ($round === 0) {
+            $found += count($hits);
+            foreach ($hits as $hit) {
+                $gapped += ($hit['end'] - $hit['start'] + 1) > count($hit['indices']) ? 1 : 0;
+            }
+        }
+    }
+}
+$report('automaton', $times, $reads, $found);
+echo "\nautomaton matches with a gap: {$gapped} (windows only find contiguous ones)\n";
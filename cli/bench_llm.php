@@ -0,0 +1,87 @@
+<?php
+// Moodle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+
+/**
+ * Drive llm_scheduler with a repetitive workload, e.g. against tools/standin/openai_service.py.
+ *
+ * Sends --requests text checks drawn from --distinct different sentences in batches of
+ * --batch, as concurrent users would, and prints wall time, cache hits, merged duplicates and
+ * the requests that reached the service. Start the stand-in with --rpm/--tpm to see
+ * throttled requests wait and retry instead of failing. The run's counters are added to the
+ * site-wide totals of cli/llm_stats.php under --task.
+ *
+ * php mod/flashcards/cli/bench_llm.php [--url=http://127.0.0.1:8704/v1/chat/completions]
+ *     [--requests=200] [--distinct=40] [--batch=10] [--task=check_norwegian_text] [--cold]
+ */
+
+define('CLI_SCRIPT', true);
+
+require(__DIR__ . '/../../../config.php');
+require_once($CFG->libdir . '/clilib.php');
+
+use mod_flashcards\local\llm_scheduler;
+
+[$options, $unrecognized] = cli_get_params(
+    ['url' => 'http://127.0.0.1:8704/v1/chat/completions', 'requests' => 200, 'distinct' => 40, 'batch' => 10,
+        'task' => 'check_norwegian_text', 'cold' => false, 'help' => false],
+    ['h' => 'help']
+);
+
+if ($options['help']) {
+    echo "Benchmark the shared AI request layer.\n\n"
+        . "Options:\n"
+        . "  --url=URL      Chat-completions endpoint (default: the local stand-in)\n"
+        . "  --requests=N   Requests to send (default 200)\n"
+        . "  --distinct=N   Different prompts among them (default 40)\n"
+        . "  --batch=N      Requests per send_many() call (default 10)\n"
+        . "  --task=NAME    Task whose cache TTL applies (default check_norwegian_text)\n"
+        . "  --cold         Purge the AI answer cache first\n";
+    exit(0);
+}
+
+$requests = max(1, (int)$options['requests']);
+$distinct = max(1, (int)$options['distinct']);
+$batch = max(1, (int)$options['batch']);
+if ($options['cold']) {
+    cache::make('mod_flashcards', 'llm_response')->purge();
+}
+$scheduler = new llm_scheduler($options['url'], 'standin');
+$payload = function(int $i): array {
+    return [
+        'model' => 'gpt-4o-mini',
+        'temperature' => 0,
+        'messages' => [
+            ['role' => 'system', 'content' => 'Check the Norwegian sentence. Return JSON {"hasErrors", "correctedText", "errors"}.'],
+            ['role' => 'user', 'content' => "Sentence:\n\"Jeg har bodd i Norge i {$i} år.\""],
+        ],
+    ];
+};
+
+mt_srand(1);
+$failed = 0;
+$start = microtime(true);
+for ($sent = 0; $sent < $requests; $sent += $batch) {
+    $payloads = [];
+    for ($i = $sent; $i < min($requests, $sent + $batch); $i++) {
+        $payloads[] = $payload(mt_rand(1, $distinct));
+    }
+    foreach ($scheduler->send_many($payloads, $options['task'], 30) as $result) {
+        if ($result['error'] !== null) {
+            $failed++;
+            echo "  error: {$result['error']}\n";
+        }
+    }
+}
+$elapsed = microtime(true) - $start;
+
+$s = llm_scheduler::stats()[$options['task']] ?? [];
+printf("%d requests (%d distinct) in %.2fs, %.1f/s, %d failed\n",
+    $requests, $distinct, $elapsed, $requests / max($elapsed, 0.001), $failed);
+printf("cache hits %d, merged in batch %d, waited for another process %d\n",
+    $s['cache_hits'] ?? 0, $s['deduped'] ?? 0, $s['coalesced'] ?? 0);
+printf("sent to the service %d (retries %d), tokens %d, queued %.1fs, throttled %.1fs\n",
+    $s['requests'] ?? 0, $s['retries'] ?? 0, $s['tokens'] ?? 0,
+    ($s['queued_ms'] ?? 0) / 1000, ($s['throttled_ms'] ?? 0) / 1000);
@@ -0,0 +1,84 @@
+<?php
+// Moodle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+
+/**
+ * Compare per-sentence ordbank lookup latency: fullform join per token vs compiled lexicon.
+ *
+ * php mod/flashcards/cli/bench_ordbank_lexicon.php [--file=sentences.txt] [--repeat=5]
+ */
+
+define('CLI_SCRIPT', true);
+
+require(__DIR__ . '/../../../config.php');
+require_once($CFG->libdir . '/clilib.php');
+
+[$options, $unrecognized] = cli_get_params(
+    ['file' => '', 'repeat' => 5, 'help' => false],
+    ['h' => 'help']
+);
+
+if ($options['help']) {
+    echo "Benchmark ordbank lookups per sentence (DB join vs compiled lexicon).\n\n"
+        . "Options:\n"
+        . "  --file=PATH   One sentence per line (default: built-in sample)\n"
+        . "  --repeat=N    Passes over the sentences (default 5)\n";
+    exit(0);
+}
+
+$lexicon = \mod_flashcards\local\ordbank_lexicon::instance();
+if (!$lexicon) {
+    cli_error('No lexicon at ' . \mod_flashcards\local\ordbank_lexicon::configured_path()
+        . '. Build one with tools/ordbank_lexicon.py first.');
+}
+
+$sentences = [
+    'Hun har ikke vært i Bergen før.',
+    'Vi skal reise til Trondheim i morgen tidlig.',
+    'Kan du hjelpe meg med leksene, er du snill?',
+    'Etter at vi hadde spist, gikk vi en tur langs sjøen.',
+    'Han kjøpte tre epler og en liter melk på butikken.',
+];
+if ($options['file'] !== '') {
+    $sentences = array_filter(array_map('trim', file($options['file'])));
+}
+$tokenized = array_map(function(string $s): array {
+    return preg_split('/[^\p{L}\p{M}\'-]+/u', core_text::strtolower($s), -1, PREG_SPLIT_NO_EMPTY);
+}, $sentences);
+
+// The join find_candidates() ran per token before the lexicon existed.
+$joinsql = "SELECT f.LEMMA_ID, f.OPPSLAG AS wordform, f.TAG, f.PARADIGME_ID, f.BOY_NUMMER,
+                   l.GRUNNFORM AS baseform, p.ORDKLASSE, p.ORDKLASSE_UTDYPING,
+                   b.BOY_GRUPPE, b.BOY_TEKST, b.ORDBOK_TEKST
+              FROM {ordbank_fullform} f
+         LEFT JOIN {ordbank_lemma} l ON l.LEMMA_ID = f.LEMMA_ID
+         LEFT JOIN {ordbank_paradigme} p ON p.PARADIGME_ID = f.PARADIGME_ID
+         LEFT JOIN {ordbank_boying} b ON b.BOY_NUMMER = f.BOY_NUMMER
+             WHERE LOWER(f.OPPSLAG) = :w";
+
+$repeat = max(1, (int)$options['repeat']);
+$timings = ['join' => [], 'lexicon' => []];
+for ($pass = 0; $pass < $repeat; $pass++) {
+    foreach ($tokenized as $tokens) {
+        $start = microtime(true);
+        foreach ($tokens as $token) {
+            $DB->get_records_sql($joinsql, ['w' => $token]);
+        }
+        $timings['join'][] = (microtime(true) - $start) * 1000;
+
+        $start = microtime(true);
+        $lexicon->lookup_many($tokens);
+        $timings['lexicon'][] = (microtime(true) - $start) * 1000;
+    }
+}
+
+foreach ($timings as $label => $values) {
+    sort($values);
+    $count = count($values);
+    $p50 = $values[(int)floor(($count - 1) * 0.5)];
+    $p95 = $values[(int)floor(($count - 1) * 0.95)];
+    printf("%-8s sentences=%d  p50=%.3f ms  p95=%.3f ms  mean=%.3f ms\n",
+        $label, $count, $p50, $p95, array_sum($values) / $count);
+}
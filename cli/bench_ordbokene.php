@@ -0,0 +1,94 @@
+<?php
+// Moodle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+
+/**
+ * Measure Ordbøkene lookup latency and cache hit rate, e.g. against tools/standin/ordbokene_service.py.
+ *
+ * Runs ordbokene_client::lookup() for every word three times: as the cache stands (empty with
+ * --cold, which clears the whole Ordbøkene disk cache), in a new "request" (disk cache only)
+ * and again in the same request (memo). With --expire the second pass finds every entry
+ * past its TTL and revalidates it with a conditional request.
+ *
+ * php mod/flashcards/cli/bench_ordbokene.php [--base=http://127.0.0.1:8703]
+ *     [--words=file.txt] [--cold] [--expire]
+ */
+
+define('CLI_SCRIPT', true);
+
+require(__DIR__ . '/../../../config.php');
+require_once($CFG->libdir . '/clilib.php');
+
+use mod_flashcards\local\ordbokene_client;
+use mod_flashcards\local\ordbokene_http;
+
+[$options, $unrecognized] = cli_get_params(
+    ['base' => '', 'words' => '', 'cold' => false, 'expire' => false, 'help' => false],
+    ['h' => 'help']
+);
+
+if ($options['help']) {
+    echo "Benchmark Ordbøkene lookups through the response cache and connection pool.\n\n"
+        . "Options:\n"
+        . "  --base=URL    Service root (default: the ordbokene_base_url setting)\n"
+        . "  --words=FILE  One word per line (default: a built-in list of 40 words)\n"
+        . "  --cold        Clear the Ordbøkene disk cache before the first pass\n"
+        . "  --expire      Expire every cached response before the second pass\n";
+    exit(0);
+}
+
+if ($options['base'] !== '') {
+    ordbokene_client::use_base_url($options['base']);
+}
+if ($options['words'] !== '') {
+    $words = array_values(array_filter(array_map('trim', file($options['words']) ?: [])));
+} else {
+    $words = ['hus', 'bil', 'gå', 'spise', 'stor', 'liten', 'lese', 'skrive', 'bok', 'venn',
+        'jobb', 'skole', 'arbeid', 'tid', 'dag', 'natt', 'mat', 'vann', 'by', 'land',
+        'snakke', 'høre', 'se', 'ta', 'gi', 'komme', 'reise', 'bo', 'leie', 'kjøpe',
+        'selge', 'glad', 'trist', 'ny', 'gammel', 'lang', 'kort', 'varm', 'kald', 'vinter'];
+}
+if (!$words) {
+    cli_error('No words to look up.');
+}
+echo 'Service: ' . ordbokene_client::base_url() . ', ' . count($words) . " words\n\n";
+
+$pass = function(string $label) use ($words) {
+    $before = ordbokene_http::stats();
+    $start = microtime(true);
+    $found = 0;
+    foreach ($words as $word) {
+        if (ordbokene_client::lookup($word)) {
+            $found++;
+        }
+    }
+    $ms = (microtime(true) - $start) * 1000;
+    $s = [];
+    foreach (ordbokene_http::stats() as $name => $value) {
+        $s[$name] = $value - $before[$name];
+    }
+    $served = $s['memo_hits'] + $s['disk_hits'] + $s['revalidated'] + $s['misses'] + $s['stale'];
+    printf("%-24s %8.1f ms  %6.2f ms/word  found=%d  hit rate=%5.1f%%  requests=%d connections=%d\n",
+        $label, $ms, $ms / count($words), $found,
+        $served ? 100 * ($s['memo_hits'] + $s['disk_hits']) / $served : 0, $s['requests'], $s['connections']);
+    echo '    ' . json_encode($s) . "\n";
+};
+
+if ($options['cold']) {
+    $removed = ordbokene_http::prune(-1);
+    echo "Removed {$removed} cached responses.\n";
+}
+ordbokene_http::reset_request_cache();
+$pass('first pass');
+
+ordbokene_http::reset_request_cache();
+if ($options['expire']) {
+    // Age every entry past its TTL: the next pass sends conditional requests.
+    foreach (glob(ordbokene_http::cache_dir() . '/*/*.json') ?: [] as $file) {
+        touch($file, 1);
+    }
+}
+$pass($options['expire'] ? 'new request (expired)' : 'new request');
+$pass('same request');
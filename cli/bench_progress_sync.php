@@ -0,0 +1,120 @@
+<?php
+// Moodle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+
+/**
+ * Compare full progress fetch/save with delta sync: JSON payload size and DB round-trips.
+ *
+ * Reads the user's real progress. The save comparison re-submits --changed of the user's rows
+ * (with a newer lastAt) through the old per-row upsert and through progress_sync::save(),
+ * each inside a transaction that is rolled back, so nothing is written.
+ *
+ * php mod/flashcards/cli/bench_progress_sync.php --userid=N [--changed=20] [--repeat=5]
+ */
+
+define('CLI_SCRIPT', true);
+
+require(__DIR__ . '/../../../config.php');
+require_once($CFG->libdir . '/clilib.php');
+
+use mod_flashcards\local\api;
+use mod_flashcards\local\progress_sync;
+
+[$options, $unrecognized] = cli_get_params(
+    ['userid' => 0, 'changed' => 20, 'repeat' => 5, 'help' => false],
+    ['h' => 'help']
+);
+
+if ($options['help'] || (int)$options['userid'] <= 0) {
+    echo "Benchmark full vs delta progress sync for one user.\n\n"
+        . "Options:\n"
+        . "  --userid=N    User whose progress is read (required)\n"
+        . "  --changed=N   Rows treated as changed since the client's last sync (default 20)\n"
+        . "  --repeat=N    Timed passes per variant (default 5)\n";
+    exit(0);
+}
+
+$userid = (int)$options['userid'];
+$changed = max(0, (int)$options['changed']);
+$repeat = max(1, (int)$options['repeat']);
+
+$measure = function(callable $fn) use ($DB, $repeat): array {
+    $times = [];
+    $queries = 0;
+    $bytes = 0;
+    for ($i = 0; $i < $repeat; $i++) {
+        $start = microtime(true);
+        $q = $DB->perf_get_queries();
+        $result = $fn();
+        $queries = $DB->perf_get_queries() - $q;
+        $times[] = (microtime(true) - $start) * 1000;
+        $bytes = strlen(json_encode(['ok' => true, 'data' => $result]));
+    }
+    sort($times);
+    return ['queries' => $queries, 'bytes' => $bytes, 'p50' => $times[(int)floor((count($times) - 1) / 2)]];
+};
+$print = function(string $label, array $m) {
+    printf("%-34s queries=%-5d payload=%-9s p50=%.2f ms\n", $label, $m['queries'], display_size($m['bytes']), $m['p50']);
+};
+
+// Fetch: today's full snapshot vs a pull with nothing changed vs a pull after $changed edits.
+$rows = $DB->get_records('flashcards_progress', ['userid' => $userid], 'timemodified DESC, id DESC',
+    'id, deckid, cardid, step, due, addedat, lastat, hidden, timemodified');
+echo "User {$userid}: " . count($rows) . " progress rows\n\n";
+
+$print('fetch (full)', $measure(function() use ($userid) {
+    return api::fetch_progress(null, $userid);
+}));
+$idle = progress_sync::changes(null, $userid, null, progress_sync::MAX_PAGE_SIZE)['cursor'];
+$print('fetch_changes (nothing changed)', $measure(function() use ($userid, $idle) {
+    return progress_sync::changes(null, $userid, $idle);
+}));
+$sample = array_slice(array_values($rows), 0, $changed);
+if ($sample) {
+    $oldest = end($sample);
+    $since = ($oldest->timemodified - 1) . '-0-' . (time() - progress_sync::CURSOR_SKEW) . '-0';
+    $print("fetch_changes (~{$changed} changed)", $measure(function() use ($userid, $since) {
+        return progress_sync::changes(null, $userid, $since);
+    }));
+}
+
+// Save: old per-row get_record + update vs bulk upsert, both rolled back.
+$records = [];
+foreach ($sample as $r) {
+    $records[] = ['deckId' => $r->deckid, 'cardId' => $r->cardid, 'step' => (int)$r->step + 1,
+        'due' => (int)$r->due + DAYSECS, 'addedAt' => (int)$r->addedat, 'lastAt' => time(), 'hidden' => (int)$r->hidden];
+}
+$rolledback = function(callable $fn) use ($DB) {
+    return function() use ($DB, $fn) {
+        $transaction = $DB->start_delegated_transaction();
+        $fn();
+        try {
+            $transaction->rollback(new coding_exception('bench rollback'));
+        } catch (coding_exception $e) {
+            // Expected: rollback() rethrows.
+        }
+        return null;
+    };
+};
+if ($records) {
+    echo "\n";
+    $print('save per row (' . count($records) . ' records)', $measure($rolledback(function() use ($DB, $userid, $records) {
+        // The loop save_progress_batch() ran before delta sync.
+        foreach ($records as $rec) {
+            $existing = $DB->get_record('flashcards_progress', ['userid' => $userid, 'cardid' => $rec['cardId']]);
+            if ($existing) {
+                $existing->step = $rec['step'];
+                $existing->due = $rec['due'];
+                $existing->lastat = $rec['lastAt'];
+                $existing->timemodified = time();
+                $DB->update_record('flashcards_progress', $existing);
+            }
+        }
+        \mod_flashcards\local\due_queue::refresh_user_cards($userid, array_column($records, 'cardId'));
+    })));
+    $print('save bulk (' . count($records) . ' records)', $measure($rolledback(function() use ($userid, $records) {
+        progress_sync::save(null, $userid, $records);
+    })));
+}
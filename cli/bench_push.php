@@ -0,0 +1,66 @@
+<?php
+// Moodle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+
+/**
+ * Measure push delivery throughput against a local stand-in (tools/standin/push_service.py).
+ *
+ * php mod/flashcards/cli/bench_push.php [--endpoint=http://127.0.0.1:8702/push]
+ *     [--count=1000] [--concurrency=20,50]
+ *
+ * Uses the configured VAPID keys and fake subscriptions; nothing is written to the database.
+ */
+
+define('CLI_SCRIPT', true);
+
+require(__DIR__ . '/../../../config.php');
+require_once($CFG->libdir . '/clilib.php');
+
+[$options, $unrecognized] = cli_get_params(
+    ['endpoint' => 'http://127.0.0.1:8702/push', 'count' => 1000, 'concurrency' => '1,20', 'help' => false],
+    ['h' => 'help']
+);
+
+if ($options['help']) {
+    echo "Benchmark Web Push delivery through push_sender.\n\n"
+        . "Options:\n"
+        . "  --endpoint=URL      Stand-in push endpoint prefix (default http://127.0.0.1:8702/push)\n"
+        . "  --count=N           Messages per run (default 1000)\n"
+        . "  --concurrency=LIST  Comma-separated concurrency caps to compare (default 1,20)\n";
+    exit(0);
+}
+
+$config = get_config('mod_flashcards');
+$public = trim($config->vapid_public_key ?? '');
+$private = trim($config->vapid_private_key ?? '');
+$subject = trim($config->vapid_subject ?? '');
+if ($public === '' || $private === '' || $subject === '') {
+    cli_error('VAPID keys not configured.');
+}
+
+$b64url = function(string $data): string {
+    return rtrim(strtr(base64_encode($data), '+/', '-_'), '=');
+};
+$count = max(1, (int)$options['count']);
+$messages = [];
+for ($i = 1; $i <= $count; $i++) {
+    $messages[] = (object)[
+        'id' => $i,
+        'endpoint' => rtrim($options['endpoint'], '/') . '/bench-' . $i,
+        'p256dh' => $b64url("\x04" . random_bytes(64)),
+        'auth' => $b64url(random_bytes(16)),
+        'payload' => json_encode(['title' => 'Flashcards | ABC norsk', 'body' => 'bench', 'dueCount' => 1]),
+    ];
+}
+
+foreach (array_filter(array_map('intval', explode(',', $options['concurrency']))) as $concurrency) {
+    $sender = new \mod_flashcards\local\push_sender($public, $private, $subject, $concurrency);
+    $sender->send($messages);
+    $sender->close();
+    $stats = $sender->stats();
+    printf("concurrency=%-4d sent=%d expired=%d failed=%d connections=%d jwts=%d  %.1f ms  %.1f msg/s\n",
+        $concurrency, $stats['sent'], $stats['expired'], $stats['failed'], $stats['connections'],
+        $stats['jwt_signed'], $stats['elapsed_ms'], $count / max(0.001, $stats['elapsed_ms'] / 1000));
+}
@@ -0,0 +1,111 @@
+<?php
+// Moodle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+
+/**
+ * Replay a keystroke log through the local step of front_suggest: the ordbank LIKE query
+ * it used to run vs the compiled prefix index (tools/suggest_index.py).
+ *
+ * The log has one query per line as it was sent while typing ("ta", "ta ", "ta p", ...).
+ * --words instead expands each word or phrase of a file into its keystrokes. Prints latency
+ * percentiles and how many queries would still go to Ordbøkene under each variant.
+ *
+ * php mod/flashcards/cli/bench_suggest.php --log=keystrokes.txt [--index=suggest.idx] [--limit=12]
+ */
+
+define('CLI_SCRIPT', true);
+
+require(__DIR__ . '/../../../config.php');
+require_once($CFG->libdir . '/clilib.php');
+
+use mod_flashcards\local\suggest_index;
+
+[$options, $unrecognized] = cli_get_params(
+    ['log' => '', 'words' => '', 'index' => '', 'limit' => 12, 'help' => false],
+    ['h' => 'help']
+);
+
+if ($options['help'] || ($options['log'] === '' && $options['words'] === '')) {
+    echo "Benchmark front_suggest local lookups over a keystroke log.\n\n"
+        . "Options:\n"
+        . "  --log=FILE    One query per line, in the order they were typed\n"
+        . "  --words=FILE  One word or phrase per line, replayed keystroke by keystroke\n"
+        . "  --index=FILE  Prefix index (default: the suggest_index_path setting)\n"
+        . "  --limit=N     Suggestions per query (default 12)\n";
+    exit(0);
+}
+
+$queries = [];
+if ($options['log'] !== '') {
+    foreach (file($options['log'], FILE_IGNORE_NEW_LINES) ?: [] as $line) {
+        $queries[] = $line;
+    }
+} else {
+    foreach (file($options['words'], FILE_IGNORE_NEW_LINES) ?: [] as $line) {
+        $line = trim($line);
+        for ($i = 1; $i <= core_text::strlen($line); $i++) {
+            $queries[] = core_text::substr($line, 0, $i);
+        }
+    }
+}
+$queries = array_values(array_filter($queries, fn($q) => core_text::strlen(trim($q)) >= 2));
+if (!$queries) {
+    cli_error('No queries with at least two characters.');
+}
+$limit = max(1, (int)$options['limit']);
+$path = $options['index'] !== '' ? $options['index'] : suggest_index::configured_path();
+$index = is_readable($path) ? new suggest_index($path) : null;
+echo count($queries) . " queries, index: " . ($index ? $path : 'not installed') . "\n\n";
+
+$report = function(string $label, array $times, int $remote) use ($queries) {
+    sort($times);
+    $pct = fn($p) => $times[min(count($times) - 1, (int)floor($p * (count($times) - 1)))];
+    printf("%-22s p50=%7.3f ms  p95=%7.3f ms  p99=%7.3f ms  max=%7.3f ms  to Ordbøkene: %d/%d\n",
+        $label, $pct(0.5), $pct(0.95), $pct(0.99), end($times), $remote, count($queries));
+};
+
+// What front_suggest ran before the index: LIKE on the last token, remote unless it filled the list.
+$times = [];
+$remote = 0;
+foreach ($queries as $query) {
+    $tokens = array_values(array_filter(preg_split('/\s+/u', trim($query))));
+    $prefix = (string)end($tokens);
+    $start = microtime(true);
+    $hits = 0;
+    if (core_text::strlen($prefix) >= 2) {
+        $hits = count($DB->get_records_sql(
+            "SELECT DISTINCT f.OPPSLAG AS lemma, f.LEMMA_ID, l.GRUNNFORM AS baseform
+               FROM {ordbank_fullform} f
+          LEFT JOIN {ordbank_lemma} l ON l.LEMMA_ID = f.LEMMA_ID
+              WHERE f.OPPSLAG LIKE :q
+           ORDER BY f.OPPSLAG ASC",
+            ['q' => $prefix . '%'], 0, $limit));
+    }
+    $times[] = (microtime(true) - $start) * 1000;
+    if ($hits < $limit) {
+        $remote++;
+    }
+}
+$report('ordbank LIKE', $times, $remote);
+
+if ($index) {
+    $times = [];
+    $remote = 0;
+    foreach ($queries as $query) {
+        $tokens = array_values(array_filter(preg_split('/\s+/u', trim($query))));
+        $prefix = (string)end($tokens);
+        $start = microtime(true);
+        $phrase = count($tokens) >= 2 ? $index->complete_phrase($query, $limit) : [];
+        $hits = count($phrase);
+        if (core_text::strlen($prefix) >= 2 && $hits < $limit) {
+            $hits += count($index->complete($prefix, $limit - $hits));
+        }
+        $times[] = (microtime(true) - $start) * 1000;
+        if (!$phrase && $hits < $limit) {
+            $remote++;
+        }
+    }
+    $report('prefix index', $times, $remote);
+}
@@ -0,0 +1,117 @@
+<?php
+// Moodle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+
+/**
+ * Measure edit-and-recheck sessions: whole-text checks vs sentence-level cached checks.
+ *
+ * Each session checks a multi-sentence text, then --edits times changes one word in one
+ * sentence and checks again, as a learner fixing a text would. The same sessions run through
+ * ai_helper::check_norwegian_text() on the whole text and through check_text_by_sentence();
+ * the median and 90th percentile recheck latency and the tokens spent are printed for both.
+ * Run it against tools/standin/spacy_service.py and tools/standin/openai_service.py (set
+ * spacy_url and "OpenAI endpoint"); the AI answer and text check caches are purged first,
+ * so use a test site.
+ *
+ * php mod/flashcards/cli/bench_text_check.php [--sessions=5] [--edits=5] [--texts=file.txt] [--user=ID]
+ */
+
+define('CLI_SCRIPT', true);
+
+require(__DIR__ . '/../../../config.php');
+require_once($CFG->libdir . '/clilib.php');
+
+use mod_flashcards\local\ai_helper;
+use mod_flashcards\local\openai_client;
+
+[$options, $unrecognized] = cli_get_params(
+    ['sessions' => 5, 'edits' => 5, 'texts' => '', 'user' => 0, 'help' => false],
+    ['h' => 'help']
+);
+
+if ($options['help']) {
+    echo "Benchmark check_text_errors for edit-and-recheck sessions.\n\n"
+        . "Options:\n"
+        . "  --sessions=N  Texts to edit (default 5)\n"
+        . "  --edits=N     One-word edits per session (default 5)\n"
+        . "  --texts=FILE  One multi-sentence text per line (default: built-in texts)\n"
+        . "  --user=ID     User charged for the requests (default: the main admin)\n";
+    exit(0);
+}
+
+if (!(new openai_client())->is_enabled()) {
+    cli_error('OpenAI is not configured (API key and endpoint).');
+}
+if ($options['texts'] !== '') {
+    $texts = array_values(array_filter(array_map('trim', file($options['texts']) ?: [])));
+} else {
+    $texts = [
+        'Jeg bor i Bergen. Jeg jobber på et sykehus. Om morgenen tar jeg bussen. Kollegaene mine er hyggelige. I helgen går jeg på tur.',
+        'I går var jeg i butikken. Jeg kjøpte brød og melk. Det regnet hele dagen. Vi spiste middag sammen. Etterpå så vi en film.',
+        'Norsk er et vanskelig språk. Jeg lærer nye ord hver dag. Læreren min er veldig flink. Vi har prøve på fredag. Jeg håper det går bra.',
+    ];
+}
+$userid = (int)$options['user'] ?: (int)get_admin()->id;
+$sessions = max(1, (int)$options['sessions']);
+$edits = max(0, (int)$options['edits']);
+
+// Edit scripts are drawn once, so both modes check exactly the same texts.
+mt_srand(7);
+$scripts = [];
+for ($s = 0; $s < $sessions; $s++) {
+    $text = $texts[$s % count($texts)];
+    $versions = [$text];
+    for ($e = 0; $e < $edits; $e++) {
+        $words = explode(' ', $text);
+        $i = mt_rand(0, count($words) - 1);
+        $words[$i] = preg_match('/[.!?]$/u', $words[$i])
+            ? preg_replace('/([.!?])$/u', 'e$1', $words[$i])
+            : $words[$i] . 'e';
+        $text = implode(' ', $words);
+        $versions[] = $text;
+    }
+    $scripts[] = $versions;
+}
+
+$percentile = function(array $values, float $p): float {
+    if (!$values) {
+        return 0.0;
+    }
+    sort($values);
+    return $values[(int)min(count($values) - 1, floor($p * count($values)))];
+};
+
+$helper = new ai_helper();
+$modes = [
+    'whole text' => function(string $text) use ($helper, $userid) {
+        return $helper->check_norwegian_text($text, 'en', $userid);
+    },
+    'by sentence' => function(string $text) use ($helper, $userid) {
+        return $helper->check_text_by_sentence($text, 'en', $userid);
+    },
+];
+foreach ($modes as $label => $check) {
+    cache::make('mod_flashcards', 'llm_response')->purge();
+    cache::make('mod_flashcards', 'text_check')->purge();
+    $first = [];
+    $rechecks = [];
+    $tokens = 0;
+    foreach ($scripts as $versions) {
+        foreach ($versions as $n => $text) {
+            $start = microtime(true);
+            $result = $check($text);
+            $ms = (microtime(true) - $start) * 1000;
+            if ($n === 0) {
+                $first[] = $ms;
+            } else {
+                $rechecks[] = $ms;
+            }
+            $tokens += (int)($result['usage']['total_tokens'] ?? 0);
+        }
+    }
+    printf("%-12s first check median %6.0fms | recheck median %6.0fms, p90 %6.0fms | %d tokens (%.0f per check)\n",
+        $label, $percentile($first, 0.5), $percentile($rechecks, 0.5), $percentile($rechecks, 0.9),
+        $tokens, $tokens / max(1, count($first) + count($rechecks)));
+}
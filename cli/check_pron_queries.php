@@ -0,0 +1,76 @@
+<?php
+// Moodle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+
+/**
+ * Query-count regression check for batched pronunciation lookups.
+ *
+ * Candidate building and due-card fetches must resolve pron_dict with one query per
+ * pronunciation_manager::QUERY_CHUNK words, not one (or two) per candidate/card.
+ * Exits with status 1 when a budget is exceeded.
+ *
+ * php mod/flashcards/cli/check_pron_queries.php [--sentence="..."] [--userid=N] [--cold]
+ */
+
+define('CLI_SCRIPT', true);
+
+require(__DIR__ . '/../../../config.php');
+require_once($CFG->libdir . '/clilib.php');
+
+use mod_flashcards\local\api;
+use mod_flashcards\local\ordbank_helper;
+use mod_flashcards\local\pronunciation_manager;
+
+[$options, $unrecognized] = cli_get_params(
+    ['sentence' => 'Etter at vi hadde spist, gikk vi en tur langs sjøen og kjøpte tre epler.',
+        'userid' => 0, 'limit' => 1000, 'cold' => false, 'help' => false],
+    ['h' => 'help']
+);
+
+if ($options['help']) {
+    echo "Check that pronunciation lookups are batched.\n\n"
+        . "Options:\n"
+        . "  --sentence=TEXT  Sentence for the candidate-building check\n"
+        . "  --userid=N       Also check get_due_cards_optimized() for this user\n"
+        . "  --limit=N        Due cards to fetch (default 1000)\n"
+        . "  --cold           Purge the pron_dict application cache first\n";
+    exit(0);
+}
+
+if ($options['cold']) {
+    cache::make('mod_flashcards', 'pron_dict')->purge();
+}
+// Resolve the one-off schema probe (wordform_lc) outside the measured sections.
+pronunciation_manager::lookup_many([['og', null]]);
+pronunciation_manager::reset_request_cache();
+
+$failed = false;
+$report = function(string $label, int $queries, int $budget) use (&$failed) {
+    $ok = $queries <= $budget;
+    $failed = $failed || !$ok;
+    printf("%-4s %-28s queries=%d budget=%d\n", $ok ? 'ok' : 'FAIL', $label, $queries, $budget);
+};
+
+// Candidate building: ordbank rows (one query, none with the lexicon) + one pron_dict query.
+$tokens = preg_split('/[^\p{L}\p{M}\'-]+/u', core_text::strtolower($options['sentence']), -1, PREG_SPLIT_NO_EMPTY);
+$start = $DB->perf_get_queries();
+$candidates = ordbank_helper::find_candidates_batch($tokens);
+$count = array_sum(array_map('count', $candidates));
+$report('find_candidates_batch (' . count($tokens) . ' tokens, ' . $count . ' candidates)',
+    $DB->perf_get_queries() - $start, 2);
+
+if ((int)$options['userid'] > 0) {
+    pronunciation_manager::reset_request_cache();
+    $start = $DB->perf_get_queries();
+    $cards = api::get_due_cards_optimized((int)$options['userid'], null, (int)$options['limit'], true);
+    $queries = $DB->perf_get_queries() - $start;
+    $decks = count(array_unique(array_column($cards, 'deckId')));
+    // Cards query + translations and example translations per deck + pron_dict chunks
+    // (a base form is rarely more than four words).
+    $budget = 1 + 2 * $decks + max(1, (int)ceil(count($cards) * 4 / pronunciation_manager::QUERY_CHUNK));
+    $report('get_due_cards_optimized (' . count($cards) . ' cards)', $queries, $budget);
+}
+
+exit($failed ? 1 : 0);
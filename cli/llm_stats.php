@@ -0,0 +1,82 @@
+<?php
+// Moodle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+
+/**
+ * Print per-task AI request counters: cache hit rate, tokens and latency histograms.
+ *
+ * Counters are collected by \mod_flashcards\local\llm_scheduler in every process and added
+ * to the site-wide totals at shutdown; --reset starts a new measurement.
+ *
+ * php mod/flashcards/cli/llm_stats.php [--reset]
+ */
+
+define('CLI_SCRIPT', true);
+
+require(__DIR__ . '/../../../config.php');
+require_once($CFG->libdir . '/clilib.php');
+
+use mod_flashcards\local\llm_scheduler;
+
+[$options, $unrecognized] = cli_get_params(
+    ['reset' => false, 'help' => false],
+    ['h' => 'help']
+);
+
+if ($options['help']) {
+    echo "Per-task AI request counters since the last reset.\n\n"
+        . "Options:\n"
+        . "  --reset  Print, then clear the counters\n";
+    exit(0);
+}
+
+$histograms = llm_scheduler::histograms();
+ksort($histograms);
+if (!$histograms) {
+    echo "No AI requests recorded yet.\n";
+}
+
+$labels = function(array $bounds, string $unit): array {
+    $out = [];
+    $low = 0;
+    foreach ($bounds as $bound) {
+        $out[] = "{$low}-{$bound}{$unit}";
+        $low = $bound;
+    }
+    $out[] = ">{$low}{$unit}";
+    return $out;
+};
+$histogram = function(array $counts, array $labels): string {
+    $total = array_sum($counts);
+    $parts = [];
+    foreach ($counts as $i => $n) {
+        if ($n > 0) {
+            $parts[] = sprintf('%s %d%%', $labels[$i], round(100 * $n / $total));
+        }
+    }
+    return $parts ? implode(', ', $parts) : '-';
+};
+$latencylabels = $labels(llm_scheduler::LATENCY_BUCKETS, 'ms');
+$tokenlabels = $labels(llm_scheduler::TOKEN_BUCKETS, '');
+$scheduler = new llm_scheduler('', '');
+
+foreach ($histograms as $task => $s) {
+    $calls = max(1, $s['calls']);
+    $requests = max(1, $s['requests']);
+    printf("%s (cache ttl %ds)\n", $task, $scheduler->ttl($task));
+    printf("  calls %d: %d cached (%.1f%%), %d merged in batch, %d waited for another process\n",
+        $s['calls'], $s['cache_hits'], 100 * $s['cache_hits'] / $calls, $s['deduped'], $s['coalesced']);
+    printf("  requests %d, cancelled %d, retries %d, errors %d, tokens %d (%.0f per request)\n",
+        $s['requests'], $s['cancelled'] ?? 0, $s['retries'], $s['errors'], $s['tokens'], $s['tokens'] / $requests);
+    printf("  latency avg %.0fms, queued %.1fs, throttled %.1fs\n",
+        $s['latency_ms'] / $requests, $s['queued_ms'] / 1000, $s['throttled_ms'] / 1000);
+    echo '  latency: ' . $histogram($s['latency'], $latencylabels) . "\n";
+    echo '  tokens:  ' . $histogram($s['tokens_hist'], $tokenlabels) . "\n\n";
+}
+
+if ($options['reset']) {
+    llm_scheduler::reset_histograms();
+    echo "Counters cleared.\n";
+}
@@ -0,0 +1,227 @@
+<?php
+// Moodle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+
+/**
+ * Seed synthetic users, a shared deck and progress for the load-test suite (tools/loadtest).
+ *
+ * Meant for a disposable test site only. Users are written straight into {user} with one
+ * shared password hash (so seeding 100k users does not hash 100k passwords) and get an active
+ * flashcards_user_access row; each gets --progress rows on the shared deck, about a third of
+ * them due, with the due queue and stage histogram built so the first request is not a
+ * rebuild. Re-running tops up missing users and refreshes their access check; --purge removes
+ * everything with the prefix. --standins points the external services at tools/standin and
+ * records every request in the profiler.
+ *
+ * php mod/flashcards/cli/loadtest_seed.php --scale=10k [--cards=300] [--progress=40]
+ *     [--users-file=users.jsonl] [--standins=http://127.0.0.1] [--push] [--purge]
+ */
+
+define('CLI_SCRIPT', true);
+
+require(__DIR__ . '/../../../config.php');
+require_once($CFG->libdir . '/clilib.php');
+
+use mod_flashcards\local\due_queue;
+use mod_flashcards\local\stage_counts;
+
+[$options, $unrecognized] = cli_get_params(
+    ['scale' => '1k', 'cards' => 300, 'progress' => 40, 'prefix' => 'fcload', 'password' => 'Loadtest-2025!',
+        'users-file' => '', 'standins' => '', 'push' => false, 'purge' => false, 'seed' => 1, 'help' => false],
+    ['h' => 'help']
+);
+
+if ($options['help']) {
+    echo "Seed synthetic load-test data.\n\n"
+        . "Options:\n"
+        . "  --scale=N          Users: 1k, 10k, 100k or a number (default 1k)\n"
+        . "  --cards=N          Cards in the shared load-test deck (default 300)\n"
+        . "  --progress=N       Progress rows per user (default 40)\n"
+        . "  --prefix=S         Username prefix, also used for the deck and card ids (default fcload)\n"
+        . "  --password=S       Password of every seeded user (default Loadtest-2025!)\n"
+        . "  --users-file=PATH  Write {\"username\", \"password\"} JSON lines for tools.loadtest.run\n"
+        . "  --standins=URL     Point spaCy, Ordbøkene, OpenAI, ElevenLabs and Whisper at the stand-ins\n"
+        . "                     on this host (ports 8701-8705) and profile every request\n"
+        . "  --push             Give every user a push subscription on the push stand-in (port 8702)\n"
+        . "  --purge            Delete the prefix's users, deck and progress instead\n"
+        . "  --seed=N           Random seed (default 1)\n";
+    exit(0);
+}
+
+$scale = strtolower(trim($options['scale']));
+$users = (int)(substr($scale, -1) === 'k' ? (float)$scale * 1000 : $scale);
+if ($users <= 0) {
+    cli_error('Invalid --scale: ' . $options['scale']);
+}
+$prefix = clean_param($options['prefix'], PARAM_ALPHANUM);
+if ($prefix === '') {
+    cli_error('Invalid --prefix');
+}
+$ncards = max(1, (int)$options['cards']);
+$nprogress = min($ncards, max(0, (int)$options['progress']));
+$decktitle = "Load test ({$prefix})";
+$now = time();
+
+$userids = function() use ($DB, $prefix): array {
+    return $DB->get_records_select_menu('user', $DB->sql_like('username', ':prefix') . ' AND deleted = 0',
+        ['prefix' => $prefix . '\_%'], 'id', 'id, username');
+};
+
+if ($options['purge']) {
+    $existing = $userids();
+    mtrace('Purging ' . count($existing) . ' users...');
+    foreach (array_chunk(array_keys($existing), 1000) as $chunk) {
+        [$insql, $params] = $DB->get_in_or_equal($chunk, SQL_PARAMS_NAMED);
+        foreach (['flashcards_progress', 'flashcards_due_queue', 'flashcards_stage_counts', 'flashcards_user_access',
+                'flashcards_user_stats', 'flashcards_daily_log', 'flashcards_push_subs', 'flashcards_review_events',
+                'flashcards_progress_tombs'] as $table) {
+            $DB->delete_records_select($table, 'userid ' . $insql, $params);
+        }
+        foreach ($chunk as $userid) {
+            delete_user($DB->get_record('user', ['id' => $userid]));
+        }
+        mtrace('  ' . count($chunk) . ' users deleted');
+    }
+    if ($deck = $DB->get_record('flashcards_decks', ['title' => $decktitle, 'scope' => 'shared'])) {
+        $DB->delete_records('flashcards_cards', ['deckid' => $deck->id]);
+        $DB->delete_records('flashcards_decks', ['id' => $deck->id]);
+    }
+    mtrace('Done.');
+    exit(0);
+}
+
+mt_srand((int)$options['seed']);
+$words = ['hus', 'bil', 'bok', 'skole', 'vann', 'mat', 'venn', 'by', 'tog', 'fjell', 'dag', 'natt', 'arbeid', 'spise',
+    'lese', 'skrive', 'snakke', 'komme', 'gå', 'se', 'stor', 'liten', 'ny', 'gammel', 'god', 'kald', 'varm', 'glad'];
+
+// Shared deck and cards.
+$deck = $DB->get_record('flashcards_decks', ['title' => $decktitle, 'scope' => 'shared']);
+if (!$deck) {
+    $deck = (object)['courseid' => null, 'userid' => null, 'scope' => 'shared', 'title' => $decktitle,
+        'createdby' => get_admin()->id, 'timecreated' => $now, 'timemodified' => $now];
+    $deck->id = $DB->insert_record('flashcards_decks', $deck);
+}
+$have = $DB->get_records_menu('flashcards_cards', ['deckid' => $deck->id], '', 'cardid, id');
+$cards = [];
+for ($i = 1; $i <= $ncards; $i++) {
+    $cardid = "{$prefix}-{$i}";
+    if (!isset($have[$cardid])) {
+        $word = $words[$i % count($words)];
+        $cards[] = ['deckid' => $deck->id, 'cardid' => $cardid, 'ownerid' => null, 'scope' => 'shared',
+            'payload' => json_encode(['text' => "{$word} {$i}", 'translation' => "{$word} ({$i})",
+                'explanation' => '', 'transcription' => "[{$word}]", 'examples' => ["Jeg ser {$word} nummer {$i}."]],
+                JSON_UNESCAPED_UNICODE),
+            'timecreated' => $now, 'timemodified' => $now];
+    }
+}
+foreach (array_chunk($cards, 1000) as $chunk) {
+    $DB->insert_records('flashcards_cards', $chunk);
+}
+mtrace("Deck {$deck->id}: " . (count($have) + count($cards)) . ' cards (' . count($cards) . ' new)');
+
+// Users.
+$existing = array_flip($userids());
+$hash = hash_internal_user_password($options['password']);
+$new = [];
+for ($i = 1; $i <= $users; $i++) {
+    $username = sprintf('%s_%06d', $prefix, $i);
+    if (!isset($existing[$username])) {
+        $new[] = ['auth' => 'manual', 'confirmed' => 1, 'mnethostid' => $CFG->mnet_localhost_id,
+            'username' => $username, 'password' => $hash, 'firstname' => 'Load', 'lastname' => sprintf('Test %06d', $i),
+            'email' => "{$username}@example.invalid", 'lang' => 'en', 'timecreated' => $now, 'timemodified' => $now];
+    }
+}
+foreach (array_chunk($new, 1000) as $chunk) {
+    $DB->insert_records('user', $chunk);
+}
+$existing = $userids();
+$seeded = array_slice($existing, 0, $users, true);
+mtrace(count($seeded) . ' users (' . count($new) . ' new)');
+
+// Access, progress, due queue and stage histogram.
+$cardids = array_map(function($i) use ($prefix) {
+    return "{$prefix}-{$i}";
+}, range(1, $ncards));
+$done = 0;
+foreach (array_chunk(array_keys($seeded), 500) as $chunk) {
+    [$insql, $params] = $DB->get_in_or_equal($chunk, SQL_PARAMS_NAMED);
+    $DB->delete_records_select('flashcards_user_access', 'userid ' . $insql, $params);
+    $access = [];
+    foreach ($chunk as $userid) {
+        $access[] = ['userid' => $userid, 'status' => 'active', 'last_enrolment_check' => $now,
+            'grace_period_days' => 30, 'timemodified' => $now];
+    }
+    $DB->insert_records('flashcards_user_access', $access);
+
+    $withprogress = array_flip($DB->get_fieldset_sql("SELECT DISTINCT userid FROM {flashcards_progress}
+                                                       WHERE userid {$insql}", $params));
+    $progress = [];
+    foreach ($chunk as $userid) {
+        if (isset($withprogress[$userid]) || !$nprogress) {
+            continue;
+        }
+        $pick = $cardids;
+        shuffle($pick);
+        foreach (array_slice($pick, 0, $nprogress) as $cardid) {
+            $due = mt_rand(0, 2) === 0 ? $now - mt_rand(0, 7 * DAYSECS) : $now + mt_rand(HOURSECS, 30 * DAYSECS);
+            $progress[] = ['flashcardsid' => null, 'userid' => $userid, 'deckid' => $deck->id, 'cardid' => $cardid,
+                'step' => mt_rand(0, 9), 'due' => $due, 'addedat' => $now - 30 * DAYSECS, 'lastat' => $now - DAYSECS,
+                'hidden' => 0, 'timemodified' => $now];
+        }
+    }
+    foreach (array_chunk($progress, 2000) as $rows) {
+        $DB->insert_records('flashcards_progress', $rows);
+    }
+    foreach ($chunk as $userid) {
+        if (!isset($withprogress[$userid])) {
+            due_queue::ensure_built($userid);
+            stage_counts::rebuild($userid);
+        }
+    }
+
+    if ($options['push'] && !empty($options['standins'])) {
+        $DB->delete_records_select('flashcards_push_subs', 'userid ' . $insql, $params);
+        $subs = [];
+        foreach ($chunk as $userid) {
+            $subs[] = ['userid' => $userid, 'endpoint' => rtrim($options['standins'], '/') . ":8702/push/{$prefix}-{$userid}",
+                'p256dh' => rtrim(strtr(base64_encode("\x04" . random_bytes(64)), '+/', '-_'), '='),
+                'auth' => rtrim(strtr(base64_encode(random_bytes(16)), '+/', '-_'), '='),
+                'lang' => 'en', 'enabled' => 1, 'timecreated' => $now, 'timemodified' => $now];
+        }
+        $DB->insert_records('flashcards_push_subs', $subs);
+    }
+    $done += count($chunk);
+    mtrace("  {$done} users ready");
+}
+
+if (!empty($options['standins'])) {
+    $host = rtrim($options['standins'], '/');
+    $settings = [
+        'spacy_url' => "{$host}:8701/analyze",
+        'ordbokene_base_url' => "{$host}:8703",
+        'openai_baseurl' => "{$host}:8704/v1/chat/completions",
+        'elevenlabs_base_url' => "{$host}:8705",
+        'whisper_endpoint' => "{$host}:8705/v1/audio/transcriptions",
+        'profiling_sample_rate' => 100,
+    ];
+    foreach (['openai_apikey', 'elevenlabs_apikey', 'whisper_apikey'] as $key) {
+        if (trim((string)get_config('mod_flashcards', $key)) === '') {
+            $settings[$key] = 'standin';
+        }
+    }
+    foreach ($settings as $name => $value) {
+        set_config($name, $value, 'mod_flashcards');
+        mtrace("  mod_flashcards/{$name} = {$value}");
+    }
+}
+
+if ($options['users-file'] !== '') {
+    $lines = '';
+    foreach ($seeded as $username) {
+        $lines .= json_encode(['username' => $username, 'password' => $options['password']]) . "\n";
+    }
+    file_put_contents($options['users-file'], $lines);
+    mtrace('Wrote ' . count($seeded) . " users to {$options['users-file']}");
+}
@@ -0,0 +1,56 @@
+<?php
+// Moodle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+
+/**
+ * Print request profiles (flashcards_perf) as JSON lines, e.g. for tools/loadtest/run.py --server-profiles.
+ *
+ * php mod/flashcards/cli/perf_export.php --since=TIMESTAMP [--until=TIMESTAMP] [--action=NAME]
+ */
+
+define('CLI_SCRIPT', true);
+
+require(__DIR__ . '/../../../config.php');
+require_once($CFG->libdir . '/clilib.php');
+
+[$options, $unrecognized] = cli_get_params(
+    ['since' => 0, 'until' => 0, 'action' => '', 'help' => false],
+    ['h' => 'help']
+);
+
+if ($options['help']) {
+    echo "Export request profiles as JSON lines.\n\n"
+        . "Options:\n"
+        . "  --since=TS    First timecreated to include (default: everything in the buffer)\n"
+        . "  --until=TS    Last timecreated to include\n"
+        . "  --action=S    Only this ajax action\n";
+    exit(0);
+}
+
+$where = 'timecreated >= :since';
+$params = ['since' => (int)$options['since']];
+if ((int)$options['until'] > 0) {
+    $where .= ' AND timecreated <= :until';
+    $params['until'] = (int)$options['until'];
+}
+if ($options['action'] !== '') {
+    $where .= ' AND action = :action';
+    $params['action'] = $options['action'];
+}
+
+$rs = $DB->get_recordset_select('flashcards_perf', $where, $params, 'id');
+foreach ($rs as $row) {
+    echo json_encode([
+        'action' => $row->action,
+        'time' => (int)$row->timecreated,
+        'sampled' => (bool)$row->sampled,
+        'wallms' => (int)$row->wallms,
+        'dbqueries' => (int)$row->dbqueries,
+        'dbms' => (int)$row->dbms,
+        'memory' => (int)$row->memory,
+        'externals' => $row->externals ? json_decode($row->externals, true) : new stdClass(),
+    ]) . "\n";
+}
+$rs->close();
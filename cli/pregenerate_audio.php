@@ -0,0 +1,53 @@
+<?php
+// Moodle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+
+/**
+ * Queue audio pre-generation for shared decks that were published before it existed.
+ *
+ * Cron then synthesizes the missing front/focus/example audio through
+ * \mod_flashcards\task\pregenerate_deck_audio, tts_pregenerate_concurrency tasks per deck.
+ * Synthesis is charged to --user (default: the deck creator).
+ *
+ * php mod/flashcards/cli/pregenerate_audio.php (--deck=ID | --all) [--user=ID]
+ */
+
+define('CLI_SCRIPT', true);
+
+require(__DIR__ . '/../../../config.php');
+require_once($CFG->libdir . '/clilib.php');
+
+use mod_flashcards\task\pregenerate_deck_audio;
+
+[$options, $unrecognized] = cli_get_params(
+    ['deck' => 0, 'all' => false, 'user' => 0, 'help' => false],
+    ['h' => 'help']
+);
+
+if ($options['help'] || (!$options['deck'] && !$options['all'])) {
+    echo "Queue TTS pre-generation for shared decks.\n\n"
+        . "Options:\n"
+        . "  --deck=ID  One shared deck\n"
+        . "  --all      Every shared deck\n"
+        . "  --user=ID  User charged for synthesis (default: the deck creator)\n";
+    exit(0);
+}
+
+$params = ['scope' => 'shared'];
+if ($options['deck']) {
+    $params['id'] = (int)$options['deck'];
+}
+$decks = $DB->get_records('flashcards_decks', $params, 'id', 'id, title, createdby');
+if (!$decks) {
+    cli_error('No shared decks found.');
+}
+foreach ($decks as $deck) {
+    $userid = (int)$options['user'] ?: (int)$deck->createdby;
+    $queued = pregenerate_deck_audio::queue((int)$deck->id, $userid);
+    if (!$queued) {
+        cli_error('Pre-generation is disabled (TTS not configured or tts_pregenerate_concurrency = 0).');
+    }
+    echo "Deck {$deck->id} ({$deck->title}): {$queued} tasks queued, charged to user {$userid}\n";
+}
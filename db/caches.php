@@ -21,4 +21,51 @@ $definitions = [
         'simpledata' => true,
         'ttl' => 1209600, // 14 days
     ],
+    // pron_dict rows per lower-cased wordform (sha1 key), misses included.
+    'pron_dict' => [
+        'mode' => cache_store::MODE_APPLICATION,
+        'simplekeys' => true,
+        'simpledata' => true,
+        'ttl' => 604800, // 7 days
+    ],
+    // Raw chat-completions answers keyed by normalized request (llm_scheduler); per-task TTL checked on read.
+    'llm_response' => [
+        'mode' => cache_store::MODE_APPLICATION,
+        'simplekeys' => true,
+        'simpledata' => true,
+        'ttl' => 2592000, // 30 days
+    ],
+    // check_text_errors result per sentence, keyed by sentence, language and checker configuration.
+    'text_check' => [
+        'mode' => cache_store::MODE_APPLICATION,
+        'simplekeys' => true,
+        'simpledata' => true,
+        'ttl' => 604800, // 7 days
+    ],
+    // llm_scheduler token-per-minute window and per-task histograms.
+    'llm_state' => [
+        'mode' => cache_store::MODE_APPLICATION,
+        'simplekeys' => true,
+        'simpledata' => true,
+    ],
+    // Decoded, normalized due-queue card entries keyed by card row, timemodified and language.
+    'due_payload' => [
+        'mode' => cache_store::MODE_APPLICATION,
+        'simplekeys' => true,
+        'simpledata' => true,
+        'ttl' => 604800, // 7 days
+    ],
+    // Compiled expression trie (expression_automaton) and its last refresh check.
+    'expression_automaton' => [
+        'mode' => cache_store::MODE_APPLICATION,
+        'simplekeys' => true,
+        'simpledata' => true,
+    ],
+    // check_user_access() permissions per userid on the request path.
+    'access_status' => [
+        'mode' => cache_store::MODE_APPLICATION,
+        'simplekeys' => true,
+        'simpledata' => true,
+        'ttl' => 300, // 5 minutes
+    ],
 ];
@@ -22,4 +22,8 @@ $observers = [
         'eventname' => '\core\event\user_enrolment_deleted',
         'callback' => '\mod_flashcards\observer::user_enrolment_deleted',
     ],
+    [
+        'eventname' => '\mod_flashcards\event\card_deleted',
+        'callback' => '\mod_flashcards\observer::card_deleted',
+    ],
 ];
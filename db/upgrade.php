@@ -1085,5 +1085,170 @@ function xmldb_flashcards_upgrade($oldversion) {
         upgrade_mod_savepoint(true, 2025122600, 'flashcards');
     }
 
+    if ($oldversion < 2025122602) {
+        mtrace('Flashcards: Adding materialized due queue table...');
+
+        $table = new xmldb_table('flashcards_due_queue');
+        $table->add_field('id', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, XMLDB_SEQUENCE, null);
+        $table->add_field('userid', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, null, null);
+        $table->add_field('progressid', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, null, null);
+        $table->add_field('cardrowid', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, null, null);
+        $table->add_field('deckid', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, null, null);
+        $table->add_field('cardid', XMLDB_TYPE_CHAR, '64', null, XMLDB_NOTNULL, null, null);
+        $table->add_field('step', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, null, '0');
+        $table->add_field('due', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, null, '0');
+        $table->add_field('addedat', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, null, '0');
+        $table->add_field('lastat', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, null, '0');
+        $table->add_field('hidden', XMLDB_TYPE_INTEGER, '1', null, XMLDB_NOTNULL, null, '0');
+        $table->add_field('cardmodified', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, null, '0');
+
+        $table->add_key('primary', XMLDB_KEY_PRIMARY, ['id']);
+        $table->add_index('user_hidden_due_idx', XMLDB_INDEX_NOTUNIQUE, ['userid', 'hidden', 'due', 'cardrowid']);
+        $table->add_index('progress_uix', XMLDB_INDEX_UNIQUE, ['progressid']);
+        $table->add_index('deck_card_idx', XMLDB_INDEX_NOTUNIQUE, ['deckid', 'cardid']);
+
+        if (!$dbman->table_exists($table)) {
+            $dbman->create_table($table);
+            mtrace('  - Created flashcards_due_queue table (queues are built per user on first load)');
+        }
+
+        upgrade_mod_savepoint(true, 2025122602, 'flashcards');
+    }
+
+    if ($oldversion < 2025122603) {
+        mtrace('Flashcards: Adding per-user stage histogram table...');
+
+        $table = new xmldb_table('flashcards_stage_counts');
+        $table->add_field('id', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, XMLDB_SEQUENCE, null);
+        $table->add_field('userid', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, null, null);
+        $table->add_field('step', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, null, '0');
+        $table->add_field('cnt', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, null, '0');
+
+        $table->add_key('primary', XMLDB_KEY_PRIMARY, ['id']);
+        $table->add_index('user_step_uix', XMLDB_INDEX_UNIQUE, ['userid', 'step']);
+
+        if (!$dbman->table_exists($table)) {
+            $dbman->create_table($table);
+            mtrace('  - Created flashcards_stage_counts table (histograms are built per user on first load)');
+        }
+
+        upgrade_mod_savepoint(true, 2025122603, 'flashcards');
+    }
+
+    if ($oldversion < 2025122604) {
+        mtrace('Flashcards: Adding delta progress sync index and tombstone table...');
+
+        $table = new xmldb_table('flashcards_progress');
+        $index = new xmldb_index('user_modified_idx', XMLDB_INDEX_NOTUNIQUE, ['userid', 'timemodified']);
+        if (!$dbman->index_exists($table, $index)) {
+            $dbman->add_index($table, $index);
+        }
+
+        $table = new xmldb_table('flashcards_progress_tombs');
+        $table->add_field('id', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, XMLDB_SEQUENCE, null);
+        $table->add_field('userid', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, null, null);
+        $table->add_field('deckid', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, null, '0');
+        $table->add_field('cardid', XMLDB_TYPE_CHAR, '100', null, XMLDB_NOTNULL, null, '');
+        $table->add_field('timemodified', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, null, '0');
+
+        $table->add_key('primary', XMLDB_KEY_PRIMARY, ['id']);
+        $table->add_index('user_modified_idx', XMLDB_INDEX_NOTUNIQUE, ['userid', 'timemodified']);
+        $table->add_index('modified_idx', XMLDB_INDEX_NOTUNIQUE, ['timemodified']);
+
+        if (!$dbman->table_exists($table)) {
+            $dbman->create_table($table);
+            mtrace('  - Created flashcards_progress_tombs table');
+        }
+
+        upgrade_mod_savepoint(true, 2025122604, 'flashcards');
+    }
+
+    if ($oldversion < 2025122605) {
+        mtrace('Flashcards: Adding review event table for batched reviews...');
+
+        $table = new xmldb_table('flashcards_review_events');
+        $table->add_field('id', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, XMLDB_SEQUENCE, null);
+        $table->add_field('userid', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, null, null);
+        $table->add_field('eventid', XMLDB_TYPE_CHAR, '64', null, XMLDB_NOTNULL, null, null);
+        $table->add_field('timecreated', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, null, '0');
+
+        $table->add_key('primary', XMLDB_KEY_PRIMARY, ['id']);
+        $table->add_index('user_event_uix', XMLDB_INDEX_UNIQUE, ['userid', 'eventid']);
+        $table->add_index('timecreated_idx', XMLDB_INDEX_NOTUNIQUE, ['timecreated']);
+
+        if (!$dbman->table_exists($table)) {
+            $dbman->create_table($table);
+            mtrace('  - Created flashcards_review_events table');
+        }
+
+        upgrade_mod_savepoint(true, 2025122605, 'flashcards');
+    }
+
+    if ($oldversion < 2025122608) {
+        mtrace('Flashcards: Adding request profile table...');
+
+        $table = new xmldb_table('flashcards_perf');
+        $table->add_field('id', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, XMLDB_SEQUENCE, null);
+        $table->add_field('action', XMLDB_TYPE_CHAR, '64', null, XMLDB_NOTNULL, null, '');
+        $table->add_field('timecreated', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, null, '0');
+        $table->add_field('sampled', XMLDB_TYPE_INTEGER, '1', null, XMLDB_NOTNULL, null, '0');
+        $table->add_field('wallms', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, null, '0');
+        $table->add_field('dbqueries', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, null, '0');
+        $table->add_field('dbms', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, null, '0');
+        $table->add_field('memory', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, null, '0');
+        $table->add_field('externals', XMLDB_TYPE_TEXT, null, null, null, null, null);
+
+        $table->add_key('primary', XMLDB_KEY_PRIMARY, ['id']);
+        $table->add_index('timecreated_idx', XMLDB_INDEX_NOTUNIQUE, ['timecreated']);
+
+        if (!$dbman->table_exists($table)) {
+            $dbman->create_table($table);
+            mtrace('  - Created flashcards_perf table');
+        }
+
+        upgrade_mod_savepoint(true, 2025122608, 'flashcards');
+    }
+
+    if ($oldversion < 2025122609) {
+        mtrace('Flashcards: Indexing expression tables by timemodified...');
+
+        // The expression automaton reads rows changed since its last refresh.
+        foreach (['flashcards_orbokene', 'flashcards_expr_translations'] as $tablename) {
+            $table = new xmldb_table($tablename);
+            $index = new xmldb_index('timemodified_idx', XMLDB_INDEX_NOTUNIQUE, ['timemodified']);
+            if ($dbman->table_exists($table) && !$dbman->index_exists($table, $index)) {
+                $dbman->add_index($table, $index);
+            }
+        }
+
+        upgrade_mod_savepoint(true, 2025122609, 'flashcards');
+    }
+
+    if ($oldversion < 2025122610) {
+        mtrace('Flashcards: Adding orphan key queue...');
+
+        $table = new xmldb_table('flashcards_orphan_keys');
+        $table->add_field('id', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, XMLDB_SEQUENCE, null);
+        $table->add_field('deckid', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, null, '0');
+        $table->add_field('cardid', XMLDB_TYPE_CHAR, '100', null, XMLDB_NOTNULL, null, '');
+        $table->add_field('timecreated', XMLDB_TYPE_INTEGER, '10', null, XMLDB_NOTNULL, null, '0');
+
+        $table->add_key('primary', XMLDB_KEY_PRIMARY, ['id']);
+
+        if (!$dbman->table_exists($table)) {
+            $dbman->create_table($table);
+            mtrace('  - Created flashcards_orphan_keys table');
+        }
+
+        // Card deletes and the queued purge look progress up by card key.
+        $table = new xmldb_table('flashcards_progress');
+        $index = new xmldb_index('deck_card_idx', XMLDB_INDEX_NOTUNIQUE, ['deckid', 'cardid']);
+        if (!$dbman->index_exists($table, $index)) {
+            $dbman->add_index($table, $index);
+        }
+
+        upgrade_mod_savepoint(true, 2025122610, 'flashcards');
+    }
+
     return true;
 }
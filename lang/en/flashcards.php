@@ -135,6 +135,32 @@ $string['mediareport_audio_focus'] = 'Focus audio';
 $string['mediareport_noaudio'] = 'No stored audio for this card.';
 $string['mediareport_cardid'] = 'Card ID: {$a}';
 $string['mediareport_deck'] = 'Deck: {$a}';
+$string['perfreport_title'] = 'Flashcards performance';
+$string['perfreport_period'] = 'Period';
+$string['perfreport_hours'] = 'Last {$a} h';
+$string['perfreport_empty'] = 'No profiles recorded in this period. Check the request profiling settings.';
+$string['perfreport_summary'] = '{$a->rows} profiles, {$a->sampled} of them in the random sample.';
+$string['perfreport_actions'] = 'Actions (random sample)';
+$string['perfreport_dependencies'] = 'External services (per request that used them)';
+$string['perfreport_slowest'] = 'Slowest requests';
+$string['perfreport_action'] = 'Action';
+$string['perfreport_dependency'] = 'Service';
+$string['perfreport_count'] = 'Requests';
+$string['perfreport_calls'] = 'Calls';
+$string['perfreport_p50'] = 'p50, ms';
+$string['perfreport_p95'] = 'p95, ms';
+$string['perfreport_p99'] = 'p99, ms';
+$string['perfreport_dbqueries'] = 'DB queries (avg / p95)';
+$string['perfreport_dbms'] = 'DB p95, ms';
+$string['perfreport_memory'] = 'Peak memory p95';
+$string['perfreport_external_share'] = 'External share';
+$string['perfreport_usedby'] = 'Used by';
+$string['perfreport_time'] = 'Time';
+$string['perfreport_wall'] = 'Wall, ms';
+$string['perfreport_db'] = 'DB queries / time';
+$string['perfreport_externals'] = 'External calls';
+$string['perfreport_peakmemory'] = 'Peak memory';
+$string['perfreport_sampled'] = 'Sampled';
 
 $string['ttsusage_title'] = 'TTS usage';
 $string['ttsusage_desc'] = 'Per-user text-to-speech usage for {$a}.';
@@ -309,6 +335,7 @@ $string['browse_courses'] = 'Browse available courses';
 // Scheduled tasks
 $string['task_check_user_access'] = 'Check flashcards user access and grace periods';
 $string['task_cleanup_orphans'] = 'Cleanup orphaned flashcards progress records';
+$string['event_card_deleted'] = 'Card deleted';
 
 $string['cards_remaining'] = 'cards remaining';
 $string['rating_actions'] = 'Rating actions';
@@ -382,6 +409,12 @@ $string['settings_openai_model'] = 'OpenAI model';
 $string['settings_openai_model_desc'] = 'For example gpt-4o-mini. The helper uses chat-completions.';
 $string['settings_openai_url'] = 'OpenAI endpoint';
 $string['settings_openai_url_desc'] = 'Override only when using a proxy-compatible endpoint.';
+$string['settings_llm_concurrency'] = 'AI requests in flight';
+$string['settings_llm_concurrency_desc'] = 'Maximum number of OpenAI requests running at the same time across the site. Further requests wait for a free slot instead of being rejected.';
+$string['settings_llm_tokens_per_minute'] = 'AI tokens per minute';
+$string['settings_llm_tokens_per_minute_desc'] = 'Estimated prompt plus completion tokens the site may send per minute, e.g. your OpenAI tier limit. Requests over the budget wait for the next minute; 429 answers are retried after the delay the service asks for. 0 disables the limit.';
+$string['settings_llm_cache_ttls'] = 'AI answer cache lifetimes';
+$string['settings_llm_cache_ttls_desc'] = 'Identical AI requests (same model, parameters and prompt) are answered from a shared cache and charge no tokens. One task per line as task = seconds overrides the defaults, e.g. check_norwegian_text = 86400; 0 turns caching off for that task. Tasks are the helper methods: detect_focus_data, translate_text, explain_sentence, check_norwegian_text, enrich_sentence_elements and others. Run cli/llm_stats.php for per-task hit rates and latency.';
 $string['settings_openai_correction_model'] = 'Correction model (Check text)';
 $string['settings_openai_correction_model_desc'] = 'Optional model used for grammar checking and explanations (e.g. gpt-4o-mini). Leave empty to reuse the main OpenAI model.';
 
@@ -433,11 +466,15 @@ $string['settings_ai_doublecheck_correction'] = 'Double-check corrections';
 $string['settings_ai_doublecheck_correction_desc'] = 'Run a second AI pass to verify the suggested correction and optionally propose a more natural alternative. Disable to reduce latency with slower models.';
 $string['settings_ai_multisampling'] = 'Multi-sampling (Self-Consistency)';
 $string['settings_ai_multisampling_desc'] = 'Generate 3 variants of text checking with different temperatures and select by consensus (weighted voting). Reduces false positives and hallucinations, but increases API cost ~3x. Recommended for maximum quality.';
+$string['settings_ai_multisampling_quorum'] = 'Multi-sampling quorum';
+$string['settings_ai_multisampling_quorum_desc'] = 'Number of samples that must agree on the corrected text and errors before the check answers. The remaining samples are cancelled, so the user waits for the fastest agreeing samples instead of the slowest one; when the samples disagree, all of them are merged by weighted voting as before. 0 always waits for every sample.';
 
 $string['settings_tts_section'] = 'Text-to-Speech';
 $string['settings_tts_section_desc'] = 'Configure speech providers for full sentences (ElevenLabs) and short focus phrases (Amazon Polly).';
 $string['settings_elevenlabs_key'] = 'ElevenLabs API key';
 $string['settings_elevenlabs_key_desc'] = 'Stored securely on the server and never exposed to learners.';
+$string['settings_elevenlabs_base_url'] = 'ElevenLabs API URL';
+$string['settings_elevenlabs_base_url_desc'] = 'Root of the ElevenLabs API, used for text-to-speech and speech-to-text. Point it at tools/standin/speech_service.py for offline testing.';
 $string['settings_elevenlabs_voice'] = 'Default voice ID';
 $string['settings_elevenlabs_voice_desc'] = 'Used when the learner does not select a specific voice.';
 $string['settings_elevenlabs_voice_map'] = 'Voice options';
@@ -478,11 +515,19 @@ $string['settings_polly_tts_limit'] = 'Monthly Polly quota (characters per user)
 $string['settings_polly_tts_limit_desc'] = '0 disables the limit. Requests beyond the cap are rejected.';
 $string['settings_polly_tts_limit_global'] = 'Monthly Polly quota (all users)';
 $string['settings_polly_tts_limit_global_desc'] = 'Global monthly character limit across all users. 0 disables the limit. Requests beyond the cap are rejected.';
+$string['settings_tts_pregenerate_concurrency'] = 'Audio pre-generation workers';
+$string['settings_tts_pregenerate_concurrency_desc'] = 'Parallel background tasks that synthesize missing front, focus and example audio when cards are published to a shared deck. Clips are stored once for all users and reused without being charged again. 0 disables pre-generation.';
 
 $string['settings_orbokene_section'] = 'Orbøkene dictionary';
 $string['settings_orbokene_section_desc'] = 'When enabled the AI helper will try to enrich detected expressions with data from the flashcards_orbokene table.';
 $string['settings_orbokene_enable'] = 'Enable dictionary auto-fill';
 $string['settings_orbokene_enable_desc'] = 'If enabled, matching entries in the Orbøkene cache populate definition, translation and examples.';
+$string['settings_ordbokene_base_url'] = 'Ordbøkene service URL';
+$string['settings_ordbokene_base_url_desc'] = 'Root of the Ordbøkene API. Responses are cached in moodledata/mod_flashcards/ordbokene and revalidated with the service when they expire (searches after a day, articles after 30 days). Point it at tools/standin/ordbokene_service.py for offline testing.';
+$string['settings_ordbank_lexicon_path'] = 'Compiled ordbank lexicon';
+$string['settings_suggest_index_path'] = 'Autocomplete prefix index';
+$string['settings_suggest_index_path_desc'] = 'Path to the index built with tools/suggest_index.py. Front-side autocomplete answers from this file and only asks Ordbøkene when it has no match. Leave empty to use moodledata/mod_flashcards/suggest.idx when present; without a file every suggestion request queries ordbank and Ordbøkene.';
+$string['settings_ordbank_lexicon_path_desc'] = 'Path to the lexicon file built with tools/ordbank_lexicon.py. Word lookups read this file instead of joining the ordbank tables. Leave empty to use moodledata/mod_flashcards/ordbank.lex when present; without a file the database is used.';
 
 
 $string['settings_whisper_section'] = 'Whisper speech-to-text';
@@ -491,6 +536,8 @@ $string['settings_whisper_enable'] = 'Enable Whisper transcription';
 $string['settings_whisper_enable_desc'] = 'Allow the Record Audio button to call Whisper via the Moodle server.';
 $string['settings_whisper_key'] = 'OpenAI API key for Whisper';
 $string['settings_whisper_key_desc'] = 'Stored securely on the server. Never exposed to learners.';
+$string['settings_whisper_endpoint'] = 'Whisper endpoint';
+$string['settings_whisper_endpoint_desc'] = 'Transcription endpoint (OpenAI audio/transcriptions). Point it at tools/standin/speech_service.py for offline testing.';
 $string['settings_whisper_model'] = 'Whisper model';
 $string['settings_whisper_model_desc'] = 'Default whisper-1. Update if OpenAI releases a newer STT model.';
 $string['settings_whisper_language'] = 'Recognition language';
@@ -589,6 +636,16 @@ $string['settings_vapid_private'] = 'VAPID private key';
 $string['settings_vapid_private_desc'] = 'The private key for Web Push (base64url encoded). Keep this secret!';
 $string['settings_vapid_subject'] = 'VAPID subject';
 $string['settings_vapid_subject_desc'] = 'Contact email for push service (e.g., mailto:admin@example.com).';
+$string['settings_push_concurrency'] = 'Push delivery concurrency';
+$string['settings_push_concurrency_desc'] = 'Maximum number of push requests in flight while the daily reminder task runs. Connections to each push service are reused across requests.';
+$string['settings_profiling_section'] = 'Request profiling';
+$string['settings_profiling_section_desc'] = 'ajax.php records wall time, database queries and time, time spent in external services and peak memory for a sample of requests. See the Flashcards performance report.';
+$string['settings_profiling_sample_rate'] = 'Profiling sample rate (%)';
+$string['settings_profiling_sample_rate_desc'] = 'Share of ajax.php requests recorded for the percentile tables. Unsampled requests only cost a few timer reads. 0 turns sampling off.';
+$string['settings_profiling_slow_ms'] = 'Always record requests slower than (ms)';
+$string['settings_profiling_slow_ms_desc'] = 'Requests that take longer than this are recorded even when they are not in the sample, so rare slow requests show up in the report. 0 turns this off; with both settings at 0 profiling is off.';
+$string['settings_profiling_buffer_size'] = 'Profiles kept';
+$string['settings_profiling_buffer_size_desc'] = 'The newest profiles are kept; older ones are deleted as new ones arrive.';
 
 // Push notification task
 $string['task_send_push_notifications'] = 'Send push notifications for due cards';
@@ -131,6 +131,32 @@ $string['mediareport_audio_focus'] = 'Фокусное аудио';
 $string['mediareport_noaudio'] = 'Нет сохраненного аудио для этой карточки.';
 $string['mediareport_cardid'] = 'ID карточки: {$a}';
 $string['mediareport_deck'] = 'Колода: {$a}';
+$string['perfreport_title'] = 'Производительность карточек';
+$string['perfreport_period'] = 'Период';
+$string['perfreport_hours'] = 'Последние {$a} ч';
+$string['perfreport_empty'] = 'За этот период профили не записаны. Проверьте настройки профилирования запросов.';
+$string['perfreport_summary'] = 'Профилей: {$a->rows}, из них в случайной выборке: {$a->sampled}.';
+$string['perfreport_actions'] = 'Действия (случайная выборка)';
+$string['perfreport_dependencies'] = 'Внешние сервисы (на запрос, который их использовал)';
+$string['perfreport_slowest'] = 'Самые медленные запросы';
+$string['perfreport_action'] = 'Действие';
+$string['perfreport_dependency'] = 'Сервис';
+$string['perfreport_count'] = 'Запросов';
+$string['perfreport_calls'] = 'Вызовов';
+$string['perfreport_p50'] = 'p50, мс';
+$string['perfreport_p95'] = 'p95, мс';
+$string['perfreport_p99'] = 'p99, мс';
+$string['perfreport_dbqueries'] = 'Запросы к БД (средн. / p95)';
+$string['perfreport_dbms'] = 'БД p95, мс';
+$string['perfreport_memory'] = 'Пиковая память p95';
+$string['perfreport_external_share'] = 'Доля внешних';
+$string['perfreport_usedby'] = 'Используется в';
+$string['perfreport_time'] = 'Время';
+$string['perfreport_wall'] = 'Всего, мс';
+$string['perfreport_db'] = 'Запросы к БД / время';
+$string['perfreport_externals'] = 'Внешние вызовы';
+$string['perfreport_peakmemory'] = 'Пиковая память';
+$string['perfreport_sampled'] = 'В выборке';
 $string['ttsusage_title'] = 'Использование TTS';
 $string['ttsusage_desc'] = 'Помесячное использование синтеза речи по пользователям за {$a}.';
 $string['ttsusage_month'] = 'Месяц';
@@ -286,6 +312,7 @@ $string['browse_courses'] = 'Просмотреть доступные курс
 // Scheduled tasks
 $string['task_check_user_access'] = 'Проверить доступ пользователей к карточкам и льготные периоды';
 $string['task_cleanup_orphans'] = 'Очистить осиротевшие записи прогресса карточек';
+$string['event_card_deleted'] = 'Карточка удалена';
 
 $string['cards_remaining'] = 'карточек осталось';
 $string['rating_actions'] = 'Действия оценивания';
@@ -357,6 +384,12 @@ $string['settings_openai_model'] = 'Модель OpenAI';
 $string['settings_openai_model_desc'] = 'Например, gpt-4o-mini. Помощник использует chat-completions.';
 $string['settings_openai_url'] = 'Конечная точка OpenAI';
 $string['settings_openai_url_desc'] = 'Измените только при использовании конечной точки, совместимой с прокси.';
+$string['settings_llm_concurrency'] = 'Одновременные запросы к ИИ';
+$string['settings_llm_concurrency_desc'] = 'Максимальное число одновременных запросов к OpenAI по всему сайту. Остальные запросы ждут свободного слота, а не отклоняются.';
+$string['settings_llm_tokens_per_minute'] = 'Токенов ИИ в минуту';
+$string['settings_llm_tokens_per_minute_desc'] = 'Оценка токенов запроса и ответа, которые сайт может отправить за минуту (например, лимит вашего тарифа OpenAI). Запросы сверх бюджета ждут следующей минуты; ответы 429 повторяются после указанной сервисом задержки. 0 = без ограничений.';
+$string['settings_llm_cache_ttls'] = 'Время жизни кеша ответов ИИ';
+$string['settings_llm_cache_ttls_desc'] = 'Одинаковые запросы к ИИ (та же модель, параметры и промпт) получают ответ из общего кеша и не расходуют токены. По одной задаче в строке в виде task = seconds переопределяет значения по умолчанию, например check_norwegian_text = 86400; 0 отключает кеш для задачи. Статистика по задачам: cli/llm_stats.php.';
 $string['settings_ai_sentence_explain_model'] = 'Модель объяснения предложения';
 $string['settings_ai_sentence_explain_model_desc'] = 'Дополнительная модель для AI-объяснения предложения (Analyse). Оставьте пустым, чтобы использовать основную модель.';
 $string['settings_ai_sentence_explain_reasoning_effort'] = 'Уровень рассуждений для объяснения предложения';
@@ -368,6 +401,8 @@ $string['settings_tts_section'] = 'Синтез речи';
 $string['settings_tts_section_desc'] = 'Настройте провайдеров речи для полных предложений (ElevenLabs) и коротких фокусных фраз (Amazon Polly).';
 $string['settings_elevenlabs_key'] = 'Ключ ElevenLabs API';
 $string['settings_elevenlabs_key_desc'] = 'Хранится безопасно на сервере и никогда не отображается ученикам.';
+$string['settings_elevenlabs_base_url'] = 'URL API ElevenLabs';
+$string['settings_elevenlabs_base_url_desc'] = 'Корневой адрес API ElevenLabs для синтеза и распознавания речи. Для офлайн-тестирования укажите tools/standin/speech_service.py.';
 $string['settings_elevenlabs_voice'] = 'ID голоса по умолчанию';
 $string['settings_elevenlabs_voice_desc'] = 'Используется, когда ученик не выбирает конкретный голос.';
 $string['settings_elevenlabs_voice_map'] = 'Параметры голоса';
@@ -408,6 +443,8 @@ $string['settings_polly_tts_limit'] = 'Месячный лимит Polly (сим
 $string['settings_polly_tts_limit_desc'] = '0 = без ограничений. Запросы сверх лимита будут отклонены.';
 $string['settings_polly_tts_limit_global'] = 'Месячный лимит Polly (все пользователи)';
 $string['settings_polly_tts_limit_global_desc'] = 'Глобальный лимит символов в месяц для всех пользователей. 0 = без ограничений. Запросы сверх лимита будут отклонены.';
+$string['settings_tts_pregenerate_concurrency'] = 'Потоки предварительной озвучки';
+$string['settings_tts_pregenerate_concurrency_desc'] = 'Количество параллельных фоновых задач, которые озвучивают недостающие фронт, фокус и примеры при публикации карточек в общую колоду. Аудио хранится один раз для всех пользователей и повторно не оплачивается. 0 отключает предварительную озвучку.';
 
 $string['settings_whisper_section'] = 'Распознавание речи Whisper';
 $string['settings_whisper_section_desc'] = 'Настройте OpenAI Whisper, чтобы автоматически превращать записи учащихся в текст лицевой стороны.';
@@ -415,6 +452,8 @@ $string['settings_whisper_enable'] = 'Включить транскрипцию
 $string['settings_whisper_enable_desc'] = 'Разрешить кнопке «Записать аудио» вызывать Whisper через сервер Moodle.';
 $string['settings_whisper_key'] = 'API-ключ OpenAI для Whisper';
 $string['settings_whisper_key_desc'] = 'Хранится безопасно на сервере. Никогда не показывается учащимся.';
+$string['settings_whisper_endpoint'] = 'Адрес Whisper';
+$string['settings_whisper_endpoint_desc'] = 'Адрес распознавания речи (OpenAI audio/transcriptions). Для офлайн-тестирования укажите tools/standin/speech_service.py.';
 $string['settings_whisper_language'] = 'Язык распознавания';
 $string['settings_whisper_language_desc'] = 'Двухбуквенный код, передаваемый в Whisper (по умолчанию nb для норвежского букмола).';
 $string['settings_whisper_model'] = 'Модель Whisper';
@@ -485,6 +524,16 @@ $string['settings_vapid_private'] = 'Приватный ключ VAPID';
 $string['settings_vapid_private_desc'] = 'Приватный ключ для Web Push (base64url). Храните в секрете!';
 $string['settings_vapid_subject'] = 'Тема VAPID';
 $string['settings_vapid_subject_desc'] = 'Контактный email для push-сервиса (например, mailto:admin@example.com).';
+$string['settings_push_concurrency'] = 'Параллельность отправки push';
+$string['settings_push_concurrency_desc'] = 'Максимальное число одновременных push-запросов при выполнении ежедневной задачи напоминаний. Соединения с каждым push-сервисом переиспользуются.';
+$string['settings_profiling_section'] = 'Профилирование запросов';
+$string['settings_profiling_section_desc'] = 'ajax.php записывает для выборки запросов общее время, число и время запросов к базе, время во внешних сервисах и пиковую память. См. отчёт о производительности карточек.';
+$string['settings_profiling_sample_rate'] = 'Доля профилируемых запросов (%)';
+$string['settings_profiling_sample_rate_desc'] = 'Доля запросов ajax.php, записываемых для таблиц перцентилей. Остальные запросы стоят лишь нескольких чтений таймера. 0 отключает выборку.';
+$string['settings_profiling_slow_ms'] = 'Всегда записывать запросы дольше (мс)';
+$string['settings_profiling_slow_ms_desc'] = 'Запросы дольше этого порога записываются, даже если не попали в выборку, чтобы редкие медленные запросы были видны в отчёте. 0 отключает; если оба значения 0, профилирование выключено.';
+$string['settings_profiling_buffer_size'] = 'Хранить профилей';
+$string['settings_profiling_buffer_size_desc'] = 'Хранятся самые новые профили; старые удаляются по мере поступления новых.';
 
 // Push notification task
 $string['task_send_push_notifications'] = 'Отправка push-уведомлений о карточках к повторению';
@@ -510,6 +559,8 @@ $string['settings_orbokene_section'] = 'Словарь Orbøkene';
 $string['settings_orbokene_section_desc'] = 'Если включено, AI помощник попытается обогатить выявленные выражения данными из таблицы flashcards_orbokene.';
 $string['settings_orbokene_enable'] = 'Включить автозаполнение словаря';
 $string['settings_orbokene_enable_desc'] = 'Если включено, соответствующие записи в кеше Orbøkene заполняют определение, перевод и примеры.';
+$string['settings_ordbokene_base_url'] = 'URL сервиса Ordbøkene';
+$string['settings_ordbokene_base_url_desc'] = 'Корневой адрес API Ordbøkene. Ответы кешируются в moodledata/mod_flashcards/ordbokene и перепроверяются у сервиса по истечении срока (поиск через день, статьи через 30 дней). Для офлайн-тестирования укажите tools/standin/ordbokene_service.py.';
 
 // Fill field dialog
 $string['fill_field'] = 'Пожалуйста, заполните: {$a}';
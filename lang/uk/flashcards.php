@@ -441,6 +441,8 @@ $string['settings_vapid_private'] = 'Приватний ключ VAPID';
 $string['settings_vapid_private_desc'] = 'Приватний ключ для Web Push (base64url). Зберігайте в таємниці!';
 $string['settings_vapid_subject'] = 'Тема VAPID';
 $string['settings_vapid_subject_desc'] = 'Контактний email для push-сервісу (наприклад, mailto:admin@example.com).';
+$string['settings_push_concurrency'] = 'Паралельність надсилання push';
+$string['settings_push_concurrency_desc'] = 'Максимальна кількість одночасних push-запитів під час виконання щоденного завдання нагадувань. З\'єднання з кожним push-сервісом використовуються повторно.';
 
 // Push notification task
 $string['task_send_push_notifications'] = 'Надсилати push-сповіщення про картки до повторення';
@@ -449,6 +451,8 @@ $string['settings_orbokene_section'] = 'Словник Orbøkene';
 $string['settings_orbokene_section_desc'] = 'Якщо увімкнено, AI помічник спробує збагатити виявлені вирази даними з таблиці flashcards_orbokene.';
 $string['settings_orbokene_enable'] = 'Увімкнути автозаповнення словника';
 $string['settings_orbokene_enable_desc'] = 'Якщо увімкнено, відповідні записи в кеші Orbøkene заповнюють визначення, переклад та приклади.';
+$string['settings_ordbokene_base_url'] = 'URL сервісу Ordbøkene';
+$string['settings_ordbokene_base_url_desc'] = 'Коренева адреса API Ordbøkene. Відповіді кешуються в moodledata/mod_flashcards/ordbokene і перевіряються в сервісу після закінчення терміну (пошук через день, статті через 30 днів). Для офлайн-тестування вкажіть tools/standin/ordbokene_service.py.';
 
 // Fill field dialog
 $string['fill_field'] = 'Будь ласка, заповніть: {$a}';
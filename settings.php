@@ -62,6 +62,29 @@ if ($hassiteconfig) {
         'https://api.openai.com/v1/chat/completions'
     ));
 
+    $settings->add(new admin_setting_configtext(
+        'mod_flashcards/llm_concurrency',
+        get_string('settings_llm_concurrency', 'mod_flashcards'),
+        get_string('settings_llm_concurrency_desc', 'mod_flashcards'),
+        8,
+        PARAM_INT
+    ));
+
+    $settings->add(new admin_setting_configtext(
+        'mod_flashcards/llm_tokens_per_minute',
+        get_string('settings_llm_tokens_per_minute', 'mod_flashcards'),
+        get_string('settings_llm_tokens_per_minute_desc', 'mod_flashcards'),
+        0,
+        PARAM_INT
+    ));
+
+    $settings->add(new admin_setting_configtextarea(
+        'mod_flashcards/llm_cache_ttls',
+        get_string('settings_llm_cache_ttls', 'mod_flashcards'),
+        get_string('settings_llm_cache_ttls_desc', 'mod_flashcards'),
+        ''
+    ));
+
     $settings->add(new admin_setting_configtext(
         'mod_flashcards/openai_correction_model',
         get_string('settings_openai_correction_model', 'mod_flashcards'),
@@ -210,6 +233,14 @@ if ($hassiteconfig) {
         0
     ));
 
+    $settings->add(new admin_setting_configtext(
+        'mod_flashcards/ai_multisampling_quorum',
+        get_string('settings_ai_multisampling_quorum', 'mod_flashcards'),
+        get_string('settings_ai_multisampling_quorum_desc', 'mod_flashcards'),
+        2,
+        PARAM_INT
+    ));
+
     // ElevenLabs TTS
     $settings->add(new admin_setting_heading(
         'mod_flashcards/tts_heading',
@@ -224,6 +255,14 @@ if ($hassiteconfig) {
         ''
     ));
 
+    $settings->add(new admin_setting_configtext(
+        'mod_flashcards/elevenlabs_base_url',
+        get_string('settings_elevenlabs_base_url', 'mod_flashcards'),
+        get_string('settings_elevenlabs_base_url_desc', 'mod_flashcards'),
+        'https://api.elevenlabs.io',
+        PARAM_URL
+    ));
+
     $settings->add(new admin_setting_configtext(
         'mod_flashcards/elevenlabs_default_voice',
         get_string('settings_elevenlabs_voice', 'mod_flashcards'),
@@ -374,6 +413,14 @@ if ($hassiteconfig) {
         PARAM_INT
     ));
 
+    $settings->add(new admin_setting_configtext(
+        'mod_flashcards/tts_pregenerate_concurrency',
+        get_string('settings_tts_pregenerate_concurrency', 'mod_flashcards'),
+        get_string('settings_tts_pregenerate_concurrency_desc', 'mod_flashcards'),
+        2,
+        PARAM_INT
+    ));
+
     // Orbøkene dictionary
     $settings->add(new admin_setting_heading(
         'mod_flashcards/orbokene_heading',
@@ -388,6 +435,30 @@ if ($hassiteconfig) {
         0
     ));
 
+    $settings->add(new admin_setting_configtext(
+        'mod_flashcards/ordbokene_base_url',
+        get_string('settings_ordbokene_base_url', 'mod_flashcards'),
+        get_string('settings_ordbokene_base_url_desc', 'mod_flashcards'),
+        'https://ord.uib.no',
+        PARAM_URL
+    ));
+
+    $settings->add(new admin_setting_configtext(
+        'mod_flashcards/ordbank_lexicon_path',
+        get_string('settings_ordbank_lexicon_path', 'mod_flashcards'),
+        get_string('settings_ordbank_lexicon_path_desc', 'mod_flashcards'),
+        '',
+        PARAM_RAW_TRIMMED
+    ));
+
+    $settings->add(new admin_setting_configtext(
+        'mod_flashcards/suggest_index_path',
+        get_string('settings_suggest_index_path', 'mod_flashcards'),
+        get_string('settings_suggest_index_path_desc', 'mod_flashcards'),
+        '',
+        PARAM_RAW_TRIMMED
+    ));
+
     // Whisper STT (OpenAI)
     $settings->add(new admin_setting_heading(
         'mod_flashcards/whisper_heading',
@@ -409,6 +480,14 @@ if ($hassiteconfig) {
         ''
     ));
 
+    $settings->add(new admin_setting_configtext(
+        'mod_flashcards/whisper_endpoint',
+        get_string('settings_whisper_endpoint', 'mod_flashcards'),
+        get_string('settings_whisper_endpoint_desc', 'mod_flashcards'),
+        'https://api.openai.com/v1/audio/transcriptions',
+        PARAM_URL
+    ));
+
     $settings->add(new admin_setting_configtext(
         'mod_flashcards/whisper_model',
         get_string('settings_whisper_model', 'mod_flashcards'),
@@ -607,6 +686,44 @@ if ($hassiteconfig) {
         'mailto:admin@example.com'
     ));
 
+    $settings->add(new admin_setting_configtext(
+        'mod_flashcards/push_concurrency',
+        get_string('settings_push_concurrency', 'mod_flashcards'),
+        get_string('settings_push_concurrency_desc', 'mod_flashcards'),
+        20,
+        PARAM_INT
+    ));
+
+    $settings->add(new admin_setting_heading(
+        'mod_flashcards/profiling_heading',
+        get_string('settings_profiling_section', 'mod_flashcards'),
+        get_string('settings_profiling_section_desc', 'mod_flashcards')
+    ));
+
+    $settings->add(new admin_setting_configtext(
+        'mod_flashcards/profiling_sample_rate',
+        get_string('settings_profiling_sample_rate', 'mod_flashcards'),
+        get_string('settings_profiling_sample_rate_desc', 'mod_flashcards'),
+        \mod_flashcards\local\profiler::SAMPLE_RATE,
+        PARAM_FLOAT
+    ));
+
+    $settings->add(new admin_setting_configtext(
+        'mod_flashcards/profiling_slow_ms',
+        get_string('settings_profiling_slow_ms', 'mod_flashcards'),
+        get_string('settings_profiling_slow_ms_desc', 'mod_flashcards'),
+        \mod_flashcards\local\profiler::SLOW_MS,
+        PARAM_INT
+    ));
+
+    $settings->add(new admin_setting_configtext(
+        'mod_flashcards/profiling_buffer_size',
+        get_string('settings_profiling_buffer_size', 'mod_flashcards'),
+        get_string('settings_profiling_buffer_size_desc', 'mod_flashcards'),
+        \mod_flashcards\local\profiler::BUFFER_SIZE,
+        PARAM_INT
+    ));
+
     $ADMIN->add('modsettings', new admin_externalpage(
             'mod_flashcards_ttsusage',
             get_string('ttsusage_title', 'mod_flashcards'),
@@ -627,6 +744,13 @@ if ($hassiteconfig) {
             new moodle_url('/mod/flashcards/admin/media_report.php'),
             'moodle/site:config'
         ));
+
+    $ADMIN->add('modsettings', new admin_externalpage(
+            'mod_flashcards_perfreport',
+            get_string('perfreport_title', 'mod_flashcards'),
+            new moodle_url('/mod/flashcards/admin/performance.php'),
+            'moodle/site:config'
+        ));
     }
 } else {
     $settings = null;
@@ -0,0 +1,77 @@
+<?php
+// This file is part of Moodle - http://moodle.org/
+//
+// Moodle is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// (at your option) any later version.
+
+/**
+ * Serves the service worker from the plugin root, so its scope covers my/index.php and view.php.
+ *
+ * The script is app/sw.js with the precache manifest (app/precache.json, written by
+ * tools/sw_manifest.py) prepended. The browser compares the script byte by byte on every update
+ * check, so a changed asset hash is what rolls out a new worker and cache version. When a listed
+ * file is newer than the manifest (an edit without a tools/sw_manifest.py run), the hashes are
+ * recomputed here the same way the tool does.
+ *
+ * @package    mod_flashcards
+ * @copyright  2025
+ * @license    http://www.gnu.org/copyleft/gpl.html GNU GPL v3 or later
+ */
+
+define('NO_MOODLE_COOKIES', true);
+define('ABORT_AFTER_CONFIG', true);
+
+require(__DIR__ . '/../../config.php');
+
+$script = __DIR__ . '/app/sw.js';
+$manifestfile = __DIR__ . '/app/precache.json';
+
+$manifest = null;
+if (is_readable($manifestfile)) {
+    $manifest = json_decode((string)file_get_contents($manifestfile), true);
+}
+if (is_array($manifest) && !empty($manifest['assets'])) {
+    $built = filemtime($manifestfile);
+    $stale = false;
+    foreach ($manifest['assets'] as $asset) {
+        $path = __DIR__ . '/' . $asset['url'];
+        if (!is_readable($path) || filemtime($path) > $built) {
+            $stale = true;
+            break;
+        }
+    }
+    if ($stale) {
+        $assets = [];
+        $lines = [];
+        foreach ($manifest['assets'] as $asset) {
+            $path = __DIR__ . '/' . $asset['url'];
+            if (!is_readable($path)) {
+                continue;
+            }
+            $hash = substr(hash_file('sha256', $path), 0, 16);
+            $assets[] = ['url' => $asset['url'], 'hash' => $hash];
+            $lines[] = $asset['url'] . ' ' . $hash;
+        }
+        $manifest = ['version' => substr(hash('sha256', implode("\n", $lines)), 0, 16), 'assets' => $assets];
+    }
+} else {
+    // Without a manifest the worker caches nothing and only handles notifications.
+    $manifest = null;
+}
+
+$etag = '"' . sha1(($manifest ? $manifest['version'] : '') . '|' . filemtime($script)) . '"';
+
+header('Content-Type: application/javascript; charset=utf-8');
+header('Cache-Control: no-cache');
+header('ETag: ' . $etag);
+if (isset($_SERVER['HTTP_IF_NONE_MATCH']) && trim($_SERVER['HTTP_IF_NONE_MATCH']) === $etag) {
+    http_response_code(304);
+    exit;
+}
+
+if ($manifest) {
+    echo 'self.__FLASHCARDS_PRECACHE = ' . json_encode($manifest, JSON_UNESCAPED_SLASHES) . ";\n";
+}
+readfile($script);
@@ -0,0 +1 @@
+"""Offline tooling for mod_flashcards (graders, asset scripts, benchmarks)."""
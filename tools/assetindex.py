@@ -0,0 +1,483 @@
+"""Persistent symbol/selector offset index for the big front-end assets.
+
+Replaces the tmp_print.py / tmp_preview.py / tmp_debug_status.py /
+tmp_line_numbers.py pattern (reload the asset, text.find() one needle).
+
+Usage:
+    python -m tools.assetindex build [FILE ...]
+    python -m tools.assetindex show  '.translation-reset' [--file assets/app.css]
+    python -m tools.assetindex show  compareTexts --file assets/flashcards.js
+    python -m tools.assetindex show  pref-language-field --file templates/app.mustache
+    python -m tools.assetindex lines assets/app.css 1411 1455
+    python -m tools.assetindex list  assets/flashcards.js [--grep Dictation]
+
+What gets indexed:
+- CSS: every selector of every rule (inside @media too) and at-rule preludes.
+- JS: named function declarations and `const x = (...) => {}` / function
+  expressions at any nesting depth; nested ones are also reachable as
+  `outer/inner`.
+- Mustache: {{#section}}/{{^section}} blocks as `#section` / `^section`,
+  and elements by `.class` / `#id` (open tag to matching close tag).
+
+The index lives in .assetindex/ (one JSON symbol table plus a binary table
+of line start offsets per asset). Queries stat the asset, and only re-parse
+it when both mtime/size and the content hash changed; the block itself is
+sliced from a memory-mapped view of the file, and line windows use the
+memory-mapped offset table, so a lookup never scans the asset.
+"""
+import argparse
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+INDEX_DIR = ROOT / '.assetindex'
+DEFAULT_FILES = ('assets/app.css', 'assets/flashcards.js', 'templates/app.mustache')
+INDEX_VERSION = 1
+
+_JS_IDENT = r'[A-Za-z_$][\w$]*'
+_JS_DECLS = re.compile(
+    r'\b(?:async\s+)?function\s*\*?\s*(?P<fn>' + _JS_IDENT + r')\s*\('
+    r'|\b(?:const|let|var)\s+(?P<var>' + _JS_IDENT + r')\s*=\s*(?:async\s+)?'
+    r'(?:function\b\s*\*?\s*(?:' + _JS_IDENT + r')?\s*\(|\((?=[^)]*\)\s*=>)|' + _JS_IDENT + r'\s*=>)'
+)
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORDS = ('return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'void', 'yield', 'await')
+_HTML_TAG = re.compile(r'<(/?)([a-zA-Z][\w-]*)((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>')
+_HTML_VOID = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+                        'source', 'track', 'wbr'))
+_ATTR = re.compile(r'\b(class|id)\s*=\s*"([^"]*)"')
+_MUSTACHE_SECTION = re.compile(r'{{\s*([#^/])\s*([\w.-]+)\s*}}')
+
+
+def _skip_block_comment(text, pos):
+    end = text.find('*/', pos + 2)
+    return len(text) if end == -1 else end + 2
+
+
+def _skip_string(text, pos):
+    quote = text[pos]
+    i = pos + 1
+    while i < len(text):
+        ch = text[i]
+        if ch == '\\':
+            i += 2
+            continue
+        if ch == quote or (ch == '\n' and quote != '`'):
+            return i + 1
+        i += 1
+    return i
+
+
+def parse_css(text):
+    """Return [(name, start, end)] for rules/at-rules (character offsets)."""
+    symbols = []
+    stack = []
+    prelude_start = 0
+    i = 0
+    length = len(text)
+    while i < length:
+        ch = text[i]
+        if ch == '/' and text.startswith('/*', i):
+            i = _skip_block_comment(text, i)
+            if not stack or stack[-1][2]:
+                prelude_start = i
+            continue
+        if ch in ('"', "'"):
+            i = _skip_string(text, i)
+            continue
+        if ch == '{':
+            prelude = text[prelude_start:i]
+            lead = len(prelude) - len(prelude.lstrip())
+            stack.append((prelude.strip(), prelude_start + lead, prelude.strip().startswith('@')))
+            prelude_start = i + 1
+        elif ch == '}':
+            if stack:
+                prelude, start, is_group = stack.pop()
+                if prelude:
+                    names = [prelude] if is_group else [s for s in prelude.split(',')]
+                    for name in names:
+                        name = ' '.join(name.split())
+                        if name:
+                            symbols.append((name, start, i + 1))
+            prelude_start = i + 1
+        elif ch == ';' and (not stack or stack[-1][2]):
+            prelude_start = i + 1
+        i += 1
+    return symbols
+
+
+def _js_scan(text):
+    """One pass over JS source: brace matches and non-code (string/comment) spans."""
+    braces = {}
+    skipped = []
+    stack = []
+    modes = []  # 'template' entries mark `${` braces inside template literals
+    i = 0
+    length = len(text)
+    last_sig = ''
+    last_word = ''
+    while i < length:
+        ch = text[i]
+        if ch in ' \t\r\n':
+            i += 1
+            continue
+        if ch == '/' and i + 1 < length and text[i + 1] == '/':
+            end = text.find('\n', i)
+            end = length if end == -1 else end
+            skipped.append((i, end))
+            i = end
+            continue
+        if ch == '/' and i + 1 < length and text[i + 1] == '*':
+            end = _skip_block_comment(text, i)
+            skipped.append((i, end))
+            i = end
+            continue
+        if ch == '/' and (not last_sig or last_sig in _REGEX_PRECEDERS or last_word in _REGEX_KEYWORDS):
+            j = i + 1
+            in_class = False
+            while j < length and text[j] != '\n':
+                c = text[j]
+                if c == '\\':
+                    j += 2
+                    continue
+                if c == '[':
+                    in_class = True
+                elif c == ']':
+                    in_class = False
+                elif c == '/' and not in_class:
+                    break
+                j += 1
+            skipped.append((i, j + 1))
+            i = j + 1
+            last_sig, last_word = 'a', ''
+            continue
+        if ch in ('"', "'"):
+            end = _skip_string(text, i)
+            skipped.append((i, end))
+            i = end
+            last_sig, last_word = 'a', ''
+            continue
+        if ch == '`' or (ch == '}' and modes and modes[-1] == 'template'):
+            if ch == '}':
+                modes.pop()
+                stack.pop()
+            start = i
+            j = i + 1
+            while j < length:
+                c = text[j]
+                if c == '\\':
+                    j += 2
+                    continue
+                if c == '`':
+                    j += 1
+                    break
+                if c == '$' and j + 1 < length and text[j + 1] == '{':
+                    stack.append(j + 1)
+                    modes.append('template')
+                    j += 2
+                    break
+                j += 1
+            skipped.append((start, j))
+            i = j
+            last_sig, last_word = 'a', ''
+            continue
+        if ch == '{':
+            stack.append(i)
+            modes.append('code')
+        elif ch == '}':
+            if stack:
+                braces[stack.pop()] = i
+                modes.pop()
+        if ch.isalnum() or ch in '_$':
+            j = i + 1
+            while j < length and (text[j].isalnum() or text[j] in '_$'):
+                j += 1
+            last_word = text[i:j]
+            last_sig = 'a'
+            i = j
+            continue
+        last_sig, last_word = ch, ''
+        i += 1
+    skipped.sort()
+    return braces, skipped
+
+
+def _in_spans(spans, starts, pos):
+    k = bisect.bisect_right(starts, pos) - 1
+    return k >= 0 and spans[k][0] <= pos < spans[k][1]
+
+
+def parse_js(text):
+    braces, skipped = _js_scan(text)
+    starts = [s for s, _ in skipped]
+    found = []
+    for match in _JS_DECLS.finditer(text):
+        if _in_spans(skipped, starts, match.start()):
+            continue
+        name = match.group('fn') or match.group('var')
+        pos = match.end()
+        if text[pos - 1] == '(':
+            depth = 1
+            while pos < len(text) and depth:
+                if text[pos] == '(':
+                    depth += 1
+                elif text[pos] == ')':
+                    depth -= 1
+                pos += 1
+        arrow = text.find('=>', match.start(), pos + 4)
+        if arrow != -1 and arrow >= pos - 2:
+            pos = arrow + 2
+        while pos < len(text) and text[pos] in ' \t\r\n':
+            pos += 1
+        if pos < len(text) and text[pos] == '{' and pos in braces:
+            end = braces[pos] + 1
+        else:
+            line_end = text.find('\n', pos)
+            end = len(text) if line_end == -1 else line_end
+        line_start = text.rfind('\n', 0, match.start()) + 1
+        found.append((name, line_start, end))
+    # Qualify nested declarations with their enclosing function names.
+    found.sort(key=lambda item: (item[1], -item[2]))
+    symbols = []
+    enclosing = []
+    for name, start, end in found:
+        while enclosing and enclosing[-1][2] <= start:
+            enclosing.pop()
+        path = '/'.join([e[0] for e in enclosing] + [name])
+        symbols.append((name, start, end))
+        if enclosing:
+            symbols.append((path, start, end))
+        enclosing.append((path, start, end))
+    return symbols
+
+
+def parse_mustache(text):
+    symbols = []
+    sections = []
+    for match in _MUSTACHE_SECTION.finditer(text):
+        kind, name = match.group(1), match.group(2)
+        if kind in '#^':
+            sections.append((kind + name, name, match.start()))
+            continue
+        for k in range(len(sections) - 1, -1, -1):
+            if sections[k][1] == name:
+                key, _name, start = sections.pop(k)
+                symbols.append((key, start, match.end()))
+                break
+    stack = []
+    for match in _HTML_TAG.finditer(text):
+        closing, tag, attrs = match.group(1), match.group(2).lower(), match.group(3)
+        if closing:
+            for k in range(len(stack) - 1, -1, -1):
+                if stack[k][0] == tag:
+                    _tag, start, keys = stack.pop(k)
+                    del stack[k:]
+                    symbols.extend((key, start, match.end()) for key in keys)
+                    break
+            continue
+        keys = []
+        for attr in _ATTR.finditer(attrs):
+            if attr.group(1) == 'id':
+                keys.append('#' + attr.group(2).strip())
+            else:
+                keys.extend('.' + cls for cls in attr.group(2).split() if '{{' not in cls)
+        if tag in _HTML_VOID or attrs.rstrip().endswith('/'):
+            symbols.extend((key, match.start(), match.end()) for key in keys)
+        else:
+            stack.append((tag, match.start(), keys))
+    return symbols
+
+
+PARSERS = {'.css': parse_css, '.js': parse_js, '.mustache': parse_mustache}
+
+
+def _index_paths(relative):
+    stem = relative.replace('/', '__').replace('\\', '__')
+    return INDEX_DIR / f'{stem}.json', INDEX_DIR / f'{stem}.lines'
+
+
+def build_index(relative):
+    """Parse one asset and write its symbol table + line offset table."""
+    path = ROOT / relative
+    raw = path.read_bytes()
+    text = raw.decode('utf-8')
+    parser = PARSERS.get(path.suffix)
+    if parser is None:
+        raise SystemExit(f'no parser for {relative}')
+
+    line_offsets = array('I', [0])
+    pos = raw.find(b'\n')
+    while pos != -1:
+        line_offsets.append(pos + 1)
+        pos = raw.find(b'\n', pos + 1)
+
+    # Character offsets -> byte offsets in one forward walk.
+    raw_symbols = parser(text)
+    points = sorted({p for _n, s, e in raw_symbols for p in (s, e)})
+    byte_at = {}
+    char_pos = 0
+    byte_pos = 0
+    for point in points:
+        byte_pos += len(text[char_pos:point].encode('utf-8'))
+        char_pos = point
+        byte_at[point] = byte_pos
+
+    symbols = {}
+    for name, start, end in raw_symbols:
+        b_start, b_end = byte_at[start], byte_at[end]
+        first_line = bisect.bisect_right(line_offsets, b_start)
+        last_line = bisect.bisect_right(line_offsets, max(b_start, b_end - 1))
+        symbols.setdefault(name, []).append([b_start, b_end, first_line, last_line])
+
+    stat = path.stat()
+    meta = {
+        'version': INDEX_VERSION,
+        'file': relative,
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha1': hashlib.sha1(raw).hexdigest(),
+        'lines': len(line_offsets),
+        'symbols': symbols,
+    }
+    INDEX_DIR.mkdir(exist_ok=True)
+    json_path, lines_path = _index_paths(relative)
+    lines_path.write_bytes(struct.pack(f'<{len(line_offsets)}I', *line_offsets))
+    tmp = json_path.with_suffix('.tmp')
+    tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding='utf-8')
+    os.replace(tmp, json_path)
+    return meta
+
+
+def load_index(relative):
+    """Return the index for an asset, re-parsing only if its content changed."""
+    json_path, lines_path = _index_paths(relative)
+    path = ROOT / relative
+    stat = path.stat()
+    try:
+        meta = json.loads(json_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return build_index(relative)
+    if meta.get('version') != INDEX_VERSION or not lines_path.exists():
+        return build_index(relative)
+    if meta['mtime_ns'] == stat.st_mtime_ns and meta['size'] == stat.st_size:
+        return meta
+    if meta['size'] == stat.st_size and hashlib.sha1(path.read_bytes()).hexdigest() == meta['sha1']:
+        meta['mtime_ns'] = stat.st_mtime_ns
+        json_path.write_text(json.dumps(meta, ensure_ascii=False), encoding='utf-8')
+        return meta
+    return build_index(relative)
+
+
+class Asset:
+    """Memory-mapped view of an indexed asset."""
+
+    def __init__(self, relative):
+        self.relative = relative
+        self.meta = load_index(relative)
+        self._file = open(ROOT / relative, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.meta['size'] else b''
+        lines_path = _index_paths(relative)[1]
+        self._lines_file = open(lines_path, 'rb')
+        self._lines = mmap.mmap(self._lines_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._lines.close()
+        self._file.close()
+        self._lines_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def line_offset(self, line):
+        """Byte offset of 1-based line `line` (end of file past the last line)."""
+        if line > self.meta['lines']:
+            return self.meta['size']
+        return struct.unpack_from('<I', self._lines, (max(line, 1) - 1) * 4)[0]
+
+    def lines(self, first, last):
+        return self._data[self.line_offset(first):self.line_offset(last + 1)].decode('utf-8', 'replace')
+
+    def lookup(self, name):
+        return self.meta['symbols'].get(name, [])
+
+    def block(self, entry, context=0):
+        start, end, first, last = entry
+        if context:
+            return self.lines(max(1, first - context), last + context)
+        return self._data[start:end].decode('utf-8', 'replace')
+
+    def names(self):
+        return self.meta['symbols'].keys()
+
+
+def _candidate_keys(name, suffix):
+    if suffix == '.mustache' and name[:1] not in '.#^':
+        return [name, '.' + name, '#' + name, '#' + name]
+    return [name, ' '.join(name.split())]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Query the asset symbol index.')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p_build = sub.add_parser('build', help='(re)index assets')
+    p_build.add_argument('files', nargs='*', default=list(DEFAULT_FILES))
+    p_show = sub.add_parser('show', help='print the block(s) for a selector/function/section')
+    p_show.add_argument('name')
+    p_show.add_argument('--file', action='append', help='limit to asset(s)')
+    p_show.add_argument('--context', type=int, default=0, help='print whole lines plus N around')
+    p_lines = sub.add_parser('lines', help='print a 1-based inclusive line window')
+    p_lines.add_argument('file')
+    p_lines.add_argument('first', type=int)
+    p_lines.add_argument('last', type=int)
+    p_list = sub.add_parser('list', help='list indexed names')
+    p_list.add_argument('file')
+    p_list.add_argument('--grep', default='')
+    args = parser.parse_args(argv)
+
+    if args.cmd == 'build':
+        for relative in args.files:
+            meta = build_index(relative)
+            print(f'{relative}: {len(meta["symbols"])} names, {meta["lines"]} lines')
+        return 0
+    if args.cmd == 'lines':
+        with Asset(args.file) as asset:
+            for number in range(args.first, args.last + 1):
+                text = asset.lines(number, number).rstrip('\r\n')
+                print(f'{number}: {text}')
+        return 0
+    if args.cmd == 'list':
+        with Asset(args.file) as asset:
+            for name in sorted(asset.names()):
+                if args.grep in name:
+                    print(name)
+        return 0
+
+    found = False
+    for relative in args.file or DEFAULT_FILES:
+        with Asset(relative) as asset:
+            for key in dict.fromkeys(_candidate_keys(args.name, Path(relative).suffix)):
+                for entry in asset.lookup(key):
+                    found = True
+                    print(f'--- {relative}:{entry[2]}-{entry[3]} {key}')
+                    print(asset.block(entry, args.context))
+    if not found:
+        print(f'{args.name}: not in index', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
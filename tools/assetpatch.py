@@ -0,0 +1,204 @@
+"""Apply a manifest of anchored edits to plugin assets in one pass per file.
+
+Replaces the one-off tmp_edit.py / tmp_replace_status.py / tmp_script.py
+pattern (read file, one str.replace, write file) when a release touches many
+blocks.
+
+Usage:
+    python -m tools.assetpatch manifest.json [--dry-run] [--eol lf|crlf|keep]
+
+Manifest: a JSON list of edits (or {"edits": [...]}). Each edit names a file
+relative to the plugin root and one of two anchor kinds:
+
+    {"file": "assets/app.css", "old": "<exact block>", "new": "<replacement>"}
+    {"file": "assets/flashcards.js",
+     "start": "    function compareTexts", "end": "    async function buildSlot",
+     "new_from": "patches/compare.js"}
+
+"old" edits replace the first occurrence of the block ("count": N requires
+exactly N occurrences and replaces all of them). Range edits replace from
+the start marker up to, not including, the end marker ("include_end": true
+replaces the end marker too). "new_from" reads the replacement from a file
+relative to the manifest.
+
+All anchors are located against the original text of each file with line
+endings normalised to LF, so edits never see each other's output and
+overlapping edits are rejected. Every file is checked before anything is
+written; a missing anchor anywhere aborts the whole run. Each file is then
+written once, atomically.
+"""
+import argparse
+import difflib
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+class PatchError(Exception):
+    pass
+
+
+def normalize_eol(text):
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def _dominant_eol(raw):
+    crlf = raw.count('\r\n')
+    return '\r\n' if crlf and crlf * 2 > raw.count('\n') else '\n'
+
+
+def load_manifest(path):
+    path = Path(path)
+    data = json.loads(path.read_text(encoding='utf-8'))
+    edits = data.get('edits', []) if isinstance(data, dict) else data
+    for index, edit in enumerate(edits):
+        if 'new_from' in edit:
+            edit['new'] = (path.parent / edit['new_from']).read_text(encoding='utf-8')
+        edit.setdefault('label', edit.get('id') or f'edit #{index + 1}')
+    return edits
+
+
+def _locate(text, edit):
+    """Return [(start, end, replacement)] spans for one edit against text."""
+    new = normalize_eol(edit.get('new', ''))
+    if 'old' in edit:
+        old = normalize_eol(edit['old'])
+        if not old:
+            raise PatchError(f'{edit["label"]}: empty "old" block')
+        expected = edit.get('count')
+        spans = []
+        pos = text.find(old)
+        while pos != -1:
+            spans.append((pos, pos + len(old), new))
+            if expected is None:
+                break
+            pos = text.find(old, pos + len(old))
+        if not spans:
+            raise PatchError(f'{edit["label"]}: old block not found')
+        if expected is not None and len(spans) != expected:
+            raise PatchError(f'{edit["label"]}: expected {expected} occurrence(s), found {len(spans)}')
+        return spans
+    if 'start' in edit and 'end' in edit:
+        start_marker = normalize_eol(edit['start'])
+        end_marker = normalize_eol(edit['end'])
+        start = text.find(start_marker)
+        if start == -1:
+            raise PatchError(f'{edit["label"]}: start marker not found')
+        end = text.find(end_marker, start + len(start_marker))
+        if end == -1:
+            raise PatchError(f'{edit["label"]}: end marker not found after start marker')
+        if edit.get('include_end'):
+            end += len(end_marker)
+        return [(start, end, new)]
+    raise PatchError(f'{edit["label"]}: needs either "old" or "start"/"end"')
+
+
+def plan_file(text, edits):
+    """Resolve all edits for one file; returns the patched text."""
+    spans = []
+    errors = []
+    for edit in edits:
+        try:
+            spans.extend((s, e, new, edit['label']) for s, e, new in _locate(text, edit))
+        except PatchError as exc:
+            errors.append(str(exc))
+    if errors:
+        raise PatchError('\n'.join(errors))
+    spans.sort(key=lambda item: (item[0], item[1]))
+    for previous, current in zip(spans, spans[1:]):
+        if current[0] < previous[1]:
+            raise PatchError(f'{current[3]}: overlaps {previous[3]}')
+    parts = []
+    cursor = 0
+    for start, end, new, _label in spans:
+        parts.append(text[cursor:start])
+        parts.append(new)
+        cursor = end
+    parts.append(text[cursor:])
+    return ''.join(parts)
+
+
+def _atomic_write(path, data):
+    fd, tmp = tempfile.mkstemp(prefix=f'.{path.name}.', dir=str(path.parent))
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def apply_edits(edits, root=ROOT, dry_run=False, eol='lf', out=sys.stdout):
+    """Apply edits grouped by file. Returns {file: seconds} timings.
+
+    Raises PatchError listing every failing edit; nothing is written then.
+    """
+    root = Path(root)
+    by_file = {}
+    for edit in edits:
+        by_file.setdefault(edit['file'], []).append(edit)
+
+    planned = []
+    errors = []
+    timings = {}
+    for name, file_edits in by_file.items():
+        started = time.perf_counter()
+        path = root / name
+        try:
+            raw_bytes = path.read_bytes()
+        except OSError as exc:
+            errors.append(f'{name}: {exc.strerror}')
+            continue
+        bom = raw_bytes.startswith(b'\xef\xbb\xbf')
+        raw = raw_bytes.decode('utf-8-sig')
+        text = normalize_eol(raw)
+        try:
+            patched = plan_file(text, file_edits)
+        except PatchError as exc:
+            errors.extend(f'{name}: {line}' for line in str(exc).splitlines())
+            continue
+        newline = {'lf': '\n', 'crlf': '\r\n'}.get(eol) or _dominant_eol(raw)
+        planned.append((name, path, bom, text, patched, newline, len(file_edits)))
+        timings[name] = time.perf_counter() - started
+    if errors:
+        raise PatchError('\n'.join(errors))
+
+    for name, path, bom, text, patched, newline, count in planned:
+        started = time.perf_counter()
+        if dry_run:
+            diff = difflib.unified_diff(text.splitlines(keepends=True), patched.splitlines(keepends=True),
+                                        fromfile=f'a/{name}', tofile=f'b/{name}')
+            out.writelines(diff)
+        else:
+            data = patched.replace('\n', newline).encode('utf-8')
+            _atomic_write(path, (b'\xef\xbb\xbf' if bom else b'') + data)
+        timings[name] += time.perf_counter() - started
+        print(f'{name}: {count} edit(s) in {timings[name] * 1000:.1f} ms', file=sys.stderr)
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Apply anchored asset edits from a manifest.')
+    parser.add_argument('manifest')
+    parser.add_argument('--dry-run', action='store_true', help='print a unified diff, write nothing')
+    parser.add_argument('--eol', choices=('lf', 'crlf', 'keep'), default='lf',
+                        help='line endings to write (default lf, per .gitattributes)')
+    parser.add_argument('--root', default=str(ROOT))
+    args = parser.parse_args(argv)
+    try:
+        apply_edits(load_manifest(args.manifest), root=args.root, dry_run=args.dry_run, eol=args.eol)
+    except PatchError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,5 @@
+"""Server-side dictation grading (Python port of compareTexts in assets/flashcards.js)."""
+from .batch import grade_pairs
+from .engine import compare_texts, summarize
+
+__all__ = ['compare_texts', 'grade_pairs', 'summarize']
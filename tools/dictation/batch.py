@@ -0,0 +1,86 @@
+"""Batch grading of (answer, reference) pairs across a process pool.
+
+Usage:
+    python -m tools.dictation.batch answers.jsonl > grades.jsonl
+
+Each input line is a JSON object with "answer" and "reference" keys (any
+other keys, e.g. an attempt id, are copied to the output). Output lines carry
+the summary from engine.summarize(), or the full compareTexts() result with
+--full.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+
+from .engine import compare_texts, summarize
+
+
+def _grade_one(args):
+    answer, reference, full = args
+    result = compare_texts(answer, reference)
+    return result if full else summarize(result)
+
+
+def grade_pairs(pairs, workers=None, chunksize=64, full=False):
+    """Yield grades for an iterable of (answer, reference) pairs, in order.
+
+    The input is consumed lazily so very large exports can be streamed.
+    workers=1 grades in-process (useful for debugging and small batches).
+    """
+    jobs = ((answer, reference, full) for answer, reference in pairs)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for job in jobs:
+            yield _grade_one(job)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        yield from pool.imap(_grade_one, jobs, chunksize)
+
+
+def _read_records(stream):
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+class _RecordGrader:
+    """Picklable callable that grades one JSONL record and keeps its extra keys."""
+
+    def __init__(self, full):
+        self.full = full
+
+    def __call__(self, record):
+        grade = _grade_one((record.get('answer', ''), record.get('reference', ''), self.full))
+        extra = {k: v for k, v in record.items() if k not in ('answer', 'reference')}
+        return {**extra, 'grade': grade}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Grade stored dictation answers.')
+    parser.add_argument('input', nargs='?', default='-', help='JSONL file (default: stdin)')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunksize', type=int, default=64)
+    parser.add_argument('--full', action='store_true', help='emit the full comparison result')
+    args = parser.parse_args(argv)
+
+    grader = _RecordGrader(args.full)
+    workers = args.workers or os.cpu_count() or 1
+    stream = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    with stream:
+        records = _read_records(stream)
+        if workers == 1:
+            graded = map(grader, records)
+            for row in graded:
+                sys.stdout.write(json.dumps(row, ensure_ascii=False) + '\n')
+        else:
+            with multiprocessing.Pool(workers) as pool:
+                for row in pool.imap(grader, records, args.chunksize):
+                    sys.stdout.write(json.dumps(row, ensure_ascii=False) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""Throughput benchmark for the dictation grader.
+
+Usage:
+    python -m tools.dictation.bench [--pairs 5000] [--workers 4] [--js]
+
+Reports pairs/second for in-process grading and for the process pool, and
+optionally for the JS engine under node for comparison.
+"""
+import argparse
+import os
+import sys
+import time
+
+from .batch import grade_pairs
+from .parity import generate_cases, run_js
+
+
+def _timed(label, count, func):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed else float('inf')
+    print(f'{label:<24} {count:>7} pairs  {elapsed:8.3f}s  {rate:10.1f} pairs/s')
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark dictation grading throughput.')
+    parser.add_argument('--pairs', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunksize', type=int, default=64)
+    parser.add_argument('--js', action='store_true', help='also time the JS engine under node')
+    args = parser.parse_args(argv)
+
+    cases = generate_cases(args.pairs, seed=3)
+    _timed('python, 1 process', len(cases), lambda: list(grade_pairs(cases, workers=1)))
+    if args.workers > 1:
+        _timed(f'python, {args.workers} processes', len(cases),
+               lambda: list(grade_pairs(cases, workers=args.workers, chunksize=args.chunksize)))
+    if args.js:
+        _timed('node (incl. startup)', len(cases), lambda: run_js(cases))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,790 @@
+"""Python port of the dictation comparison engine in assets/flashcards.js.
+
+Mirrors compareTexts() and its helpers (tokenizeText, tokenSimilarity,
+buildSimilarityMatrix, solveMaxAssignment, computeLisWithTies, buildMovePlan,
+buildRewriteGroups, buildMissingByPosition). Result dicts use the same
+camelCase keys as the JS objects so both sides serialise to identical JSON;
+keep this file in sync when the JS engine changes (tools/dictation/parity.py
+checks it).
+"""
+import functools
+import math
+import re
+import unicodedata
+
+import numpy as np
+
+MIN_SIMILARITY_SCORE = 0.35
+STEM_SIMILARITY_SCORE = 0.85
+STRONG_ANCHOR_SCORE = 5
+PUNCT_MATCH_SCORE = 0.8
+PUNCT_MISMATCH_SCORE = 0.2
+TYPE_MISMATCH_SCORE = 0.05
+GAP_PENALTY = 1.0
+
+_PUNCT_MAP = {
+    '–': '-',
+    '—': '-',
+    '‑': '-',
+    '…': '...',
+    '«': '"',
+    '»': '"',
+    '“': '"',
+    '”': '"',
+    '„': '"',
+    '’': "'",
+    '‘': "'",
+    '`': "'",
+    '´': "'",
+}
+
+_WORD_EXTRA = frozenset('`{}[]')
+# JS \s also covers BOM, which str.isspace() does not.
+_JS_SPACE_EXTRA = frozenset('\ufeff')
+_STEM_SUFFIX = re.compile(r'(ene|ane|het|ers|ene|er|en|et|e)\Z')
+
+
+def _is_letter(ch):
+    return unicodedata.category(ch)[0] in ('L', 'M')
+
+
+def _is_digit(ch):
+    # JS \d is ASCII-only, even with the u flag.
+    return '0' <= ch <= '9'
+
+
+def _is_space(ch):
+    return ch.isspace() or ch in _JS_SPACE_EXTRA
+
+
+def _js_len(value):
+    """String length in UTF-16 code units, as String.prototype.length."""
+    if value and max(value) > '\uffff':
+        return len(value.encode('utf-16-le')) // 2
+    return len(value)
+
+
+def _js_units(value):
+    """Sequence comparable element-wise the way JS indexes strings."""
+    if value and max(value) > '\uffff':
+        raw = value.encode('utf-16-le')
+        return [raw[i:i + 2] for i in range(0, len(raw), 2)]
+    return value
+
+
+def tokenize_text(text):
+    tokens = []
+    if not text:
+        return tokens
+    length = len(text)
+    pos = 0
+    while pos < length:
+        ch = text[pos]
+        if _is_letter(ch) or ch in _WORD_EXTRA:
+            end = pos + 1
+            while end < length and (_is_letter(text[end]) or text[end] in _WORD_EXTRA):
+                end += 1
+        elif _is_digit(ch):
+            end = pos + 1
+            while end < length and _is_digit(text[end]):
+                end += 1
+        elif _is_space(ch):
+            pos += 1
+            continue
+        else:
+            end = pos + 1
+        raw = text[pos:end]
+        is_word = all(_is_letter(c) or _is_digit(c) or c in _WORD_EXTRA for c in raw)
+        tokens.append({
+            'raw': raw,
+            'norm': raw.lower(),
+            'type': 'word' if is_word else 'punct',
+            'index': len(tokens),
+        })
+        pos = end
+    return tokens
+
+
+def normalize_punctuation(char):
+    return _PUNCT_MAP.get(char, char)
+
+
+def simple_stem(value):
+    if not value:
+        return ''
+    normalized = value.lower()
+    start = 0
+    end = len(normalized)
+    while start < end and not _is_letter(normalized[start]):
+        start += 1
+    while end > start and not _is_letter(normalized[end - 1]):
+        end -= 1
+    return _STEM_SUFFIX.sub('', normalized[start:end], count=1)
+
+
+def levenshtein(a, b):
+    if a == b:
+        return 0
+    a = _js_units(a)
+    b = _js_units(b)
+    if not len(a):
+        return len(b)
+    if not len(b):
+        return len(a)
+    dp = list(range(len(a) + 1))
+    for j in range(1, len(b) + 1):
+        prev = j - 1
+        dp[0] = j
+        bj = b[j - 1]
+        for i in range(1, len(a) + 1):
+            temp = dp[i]
+            if a[i - 1] == bj:
+                dp[i] = prev
+            else:
+                dp[i] = 1 + min(prev, dp[i - 1], dp[i])
+            prev = temp
+    return dp[len(a)]
+
+
+def token_similarity(a, b):
+    if not a or not b:
+        return 0
+    if a['type'] != b['type']:
+        return TYPE_MISMATCH_SCORE
+    if a['type'] == 'punct':
+        same = normalize_punctuation(a['raw']) == normalize_punctuation(b['raw'])
+        return PUNCT_MATCH_SCORE if same else PUNCT_MISMATCH_SCORE
+    return word_similarity(a['norm'], b['norm'])
+
+
+@functools.lru_cache(maxsize=65536)
+def word_similarity(norm_a, norm_b):
+    """Similarity of two normalised word tokens (the word branch of tokenSimilarity).
+
+    Pure function of its inputs, so it is memoised per process; batch runs see
+    the same reference words over and over.
+    """
+    if norm_a == norm_b:
+        return STRONG_ANCHOR_SCORE
+    stem_a = simple_stem(norm_a)
+    stem_b = simple_stem(norm_b)
+    if stem_a and stem_a == stem_b:
+        return STEM_SIMILARITY_SCORE
+    distance = levenshtein(norm_a, norm_b)
+    max_len = max(_js_len(norm_a), _js_len(norm_b)) or 1
+    closeness = max(0, 1 - (distance / max_len))
+    if closeness >= 0.8:
+        return 0.6 + (closeness * 0.2)
+    if closeness >= 0.6:
+        return 0.5 + (closeness * 0.1)
+    return closeness * 0.5
+
+
+def _similarity_key(token):
+    if token['type'] == 'punct':
+        return ('punct', normalize_punctuation(token['raw']))
+    return ('word', token['norm'])
+
+
+def build_similarity_matrix(user_tokens, original_tokens):
+    """Weights matrix (rows = user tokens) as a float64 ndarray.
+
+    tokenSimilarity only depends on (type, norm) for words and on the
+    normalised character for punctuation, so the base scores are computed
+    once per distinct key pair and broadcast; the positional bonus/penalty is
+    applied in one vectorised pass with the same operation order as the JS.
+    """
+    rows = len(user_tokens)
+    cols = len(original_tokens)
+    if not rows or not cols:
+        return np.zeros((rows, cols), dtype=np.float64)
+
+    user_keys = {}
+    user_idx = np.empty(rows, dtype=np.intp)
+    user_rep = []
+    for i, token in enumerate(user_tokens):
+        key = _similarity_key(token)
+        if key not in user_keys:
+            user_keys[key] = len(user_rep)
+            user_rep.append(token)
+        user_idx[i] = user_keys[key]
+
+    orig_keys = {}
+    orig_idx = np.empty(cols, dtype=np.intp)
+    orig_rep = []
+    for j, token in enumerate(original_tokens):
+        key = _similarity_key(token)
+        if key not in orig_keys:
+            orig_keys[key] = len(orig_rep)
+            orig_rep.append(token)
+        orig_idx[j] = orig_keys[key]
+
+    base_unique = np.empty((len(user_rep), len(orig_rep)), dtype=np.float64)
+    for ui, u_token in enumerate(user_rep):
+        for oi, o_token in enumerate(orig_rep):
+            base_unique[ui, oi] = token_similarity(u_token, o_token)
+    base = base_unique[np.ix_(user_idx, orig_idx)]
+
+    max_len = max(rows, cols, 1)
+    dist = np.abs(np.arange(rows)[:, None] - np.arange(cols)[None, :]) / max_len
+    proximity_bonus = (1 - dist) * 0.35
+    distance_penalty = dist * 0.25
+    return base + proximity_bonus - distance_penalty
+
+
+def solve_max_assignment(weights):
+    """Hungarian algorithm (O(n^3)) maximising total weight.
+
+    The inner column scan is vectorised; ties resolve to the lowest column
+    index exactly like the JS loop so assignments are identical.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    if weights.ndim != 2:
+        return []
+    rows, cols = weights.shape
+    n = max(rows, cols)
+    if not n or not rows or not cols:
+        return []
+    max_weight = max(0.0, float(weights.max()))
+    big = max_weight + 1
+    cost = np.full((n, n), big, dtype=np.float64)
+    cost[:rows, :cols] = big - weights
+
+    u = np.zeros(n + 1)
+    v = np.zeros(n + 1)
+    p = np.zeros(n + 1, dtype=np.intp)
+    way = np.zeros(n + 1, dtype=np.intp)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(n + 1, np.inf)
+        used = np.zeros(n + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+            cur = cost[i0 - 1] - u[i0] - v[1:]
+            improve = free & (cur < minv[1:])
+            minv[1:][improve] = cur[improve]
+            way[1:][improve] = j0
+            candidates = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+            used_cols = np.flatnonzero(used)
+            u[p[used_cols]] += delta
+            v[used_cols] -= delta
+            minv[~used] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while True:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+            if j0 == 0:
+                break
+
+    result = []
+    for j in range(1, n + 1):
+        row = int(p[j]) - 1
+        if p[j] and row < rows and j - 1 < cols:
+            result.append({'row': row, 'col': j - 1, 'weight': float(weights[row, j - 1])})
+    return result
+
+
+def extract_matches(assignment, user_tokens, original_tokens):
+    matches = []
+    matched_user = set()
+    matched_orig = set()
+    for idx, item in enumerate(assignment):
+        if not item:
+            continue
+        row, col, weight = item['row'], item['col'], item['weight']
+        if row >= len(user_tokens) or col >= len(original_tokens):
+            continue
+        if weight < MIN_SIMILARITY_SCORE:
+            continue
+        matches.append({
+            'id': idx,
+            'userIndex': row,
+            'origIndex': col,
+            'userToken': user_tokens[row],
+            'origToken': original_tokens[col],
+            'score': weight,
+        })
+        matched_user.add(row)
+        matched_orig.add(col)
+    matches.sort(key=lambda m: m['userIndex'])
+    for index, match in enumerate(matches):
+        match['id'] = index
+    return matches, matched_user, matched_orig
+
+
+def _is_better_lis(a, b):
+    if not b:
+        return True
+    if a['len'] != b['len']:
+        return a['len'] > b['len']
+    if a['breaks'] != b['breaks']:
+        return a['breaks'] < b['breaks']
+    return a['start'] < b['start']
+
+
+def compute_lis_with_ties(matches):
+    if not matches:
+        return []
+    values = [m['origIndex'] for m in matches]
+    dp = []
+    prev = [-1] * len(values)
+    for i, value in enumerate(values):
+        dp.append({'len': 1, 'breaks': 0, 'start': i})
+        for j in range(i):
+            if values[j] < value:
+                candidate = {
+                    'len': dp[j]['len'] + 1,
+                    'breaks': dp[j]['breaks'] + (0 if value == values[j] + 1 else 1),
+                    'start': dp[j]['start'],
+                }
+                if _is_better_lis(candidate, dp[i]):
+                    dp[i] = candidate
+                    prev[i] = j
+    best_idx = 0
+    for i in range(1, len(dp)):
+        if _is_better_lis(dp[i], dp[best_idx]):
+            best_idx = i
+    result = []
+    k = best_idx
+    while k != -1:
+        result.append(k)
+        k = prev[k]
+    result.reverse()
+    return result
+
+
+def build_gap_key(before, after):
+    left = -1 if before is None else before
+    right = 'END' if after is None else after
+    return f'{left}-{right}'
+
+
+def build_empty_move_plan(length):
+    return {
+        'mode': 'arrows',
+        'moveBlocks': [],
+        'rewriteGroups': [],
+        'tokenMeta': [None] * length,
+        'gapMeta': {},
+        'gapsNeeded': [],
+        'missingByPosition': {},
+    }
+
+
+def _build_move_blocks(movable_matches, meta_by_user, gap_meta, tokens_per_gap, user_length):
+    blocks = []
+    current = None
+    for m in movable_matches:
+        meta = meta_by_user[m['userIndex']] or {}
+        gap_key = meta.get('targetGapKey') or build_gap_key(-1, None)
+        gap = gap_meta.get(gap_key) or {
+            'before': -1, 'after': None, 'beforeUser': -1, 'afterUser': user_length, 'targetBoundary': 0,
+        }
+        tokens_in_gap = tokens_per_gap.get(gap_key) or []
+        offset_in_gap = tokens_in_gap.index(m['origIndex']) if m['origIndex'] in tokens_in_gap else -1
+        before_user = gap['beforeUser'] if gap.get('beforeUser') is not None else -1
+        target_boundary = before_user + 1 + offset_in_gap
+
+        adjacent = (
+            current is not None
+            and current['targetGapKey'] == gap_key
+            and m['userIndex'] == current['end'] + 1
+            and m['origIndex'] == current['origIndices'][-1] + 1
+        )
+        if adjacent:
+            current['tokens'].append(m['userIndex'])
+            current['origIndices'].append(m['origIndex'])
+            current['end'] = m['userIndex']
+            current['hasError'] = current['hasError'] or bool(meta.get('hasError'))
+        else:
+            if current is not None:
+                blocks.append(current)
+            current = {
+                'id': f'move-{len(blocks) + 1}',
+                'tokens': [m['userIndex']],
+                'origIndices': [m['origIndex']],
+                'start': m['userIndex'],
+                'end': m['userIndex'],
+                'targetGapKey': gap_key,
+                'targetGap': meta.get('targetGap') or {'before': -1, 'after': None},
+                'beforeUser': before_user,
+                'afterUser': gap['afterUser'] if gap.get('afterUser') is not None else user_length,
+                'targetBoundary': target_boundary,
+                'hasError': bool(meta.get('hasError')),
+                'resolvedByRewrite': False,
+            }
+    if current is not None:
+        blocks.append(current)
+
+    filtered = [
+        block for block in blocks
+        if not (block['start'] <= block['targetBoundary'] <= block['end'] + 1)
+    ]
+    return filtered, blocks
+
+
+def _collect_crossed_boundaries(block):
+    if block['targetBoundary'] < block['start']:
+        return list(range(block['targetBoundary'], block['start']))
+    if block['targetBoundary'] > block['end'] + 1:
+        return list(range(block['end'] + 1, block['targetBoundary']))
+    return []
+
+
+def _build_rewrite_groups(move_blocks, problem_ids, matches, user_tokens, original_tokens,
+                          meta_by_user, missing_tokens):
+    if not problem_ids or not move_blocks:
+        return []
+    problem_blocks = [b for b in move_blocks if b['id'] in problem_ids]
+    if not problem_blocks:
+        return []
+    inf = math.inf
+    cover_user_min = inf
+    cover_user_max = -inf
+    for block in problem_blocks:
+        cover_user_min = min(cover_user_min, min(block['start'], block['targetBoundary']))
+        cover_user_max = max(cover_user_max, max(block['end'], block['targetBoundary'] - 1))
+    orig_min = inf
+    orig_max = -inf
+    for block in problem_blocks:
+        for idx in block['origIndices']:
+            orig_min = min(orig_min, idx)
+            orig_max = max(orig_max, idx)
+
+    for item in missing_tokens:
+        if orig_min - 1 <= item['origIndex'] <= orig_max + 1:
+            orig_min = min(orig_min, item['origIndex'])
+            orig_max = max(orig_max, item['origIndex'])
+
+    if not math.isfinite(orig_min) or not math.isfinite(orig_max):
+        return []
+    user_min = cover_user_min if math.isfinite(cover_user_min) else inf
+    user_max = cover_user_max if math.isfinite(cover_user_max) else -inf
+    for m in matches:
+        if orig_min <= m['origIndex'] <= orig_max:
+            user_min = min(user_min, m['userIndex'])
+            user_max = max(user_max, m['userIndex'])
+    if not math.isfinite(user_min):
+        user_min = 0
+        user_max = len(user_tokens) - 1 if user_tokens else 0
+    for m in matches:
+        if user_min <= m['userIndex'] <= user_max:
+            orig_min = min(orig_min, m['origIndex'])
+            orig_max = max(orig_max, m['origIndex'])
+    for m in matches:
+        if orig_min <= m['origIndex'] <= orig_max:
+            user_min = min(user_min, m['userIndex'])
+            user_max = max(user_max, m['userIndex'])
+
+    correct_text = ' '.join(t['raw'] for t in original_tokens if orig_min <= t['index'] <= orig_max)
+    group = {
+        'id': 'rewrite-1',
+        'start': user_min,
+        'end': user_max,
+        'origMin': orig_min,
+        'origMax': orig_max,
+        'targetGapKey': build_gap_key(orig_min - 1, orig_max + 1),
+        'correctText': correct_text,
+    }
+    for i in range(group['start'], group['end'] + 1):
+        if i >= len(meta_by_user):
+            meta_by_user.extend([None] * (i + 1 - len(meta_by_user)))
+        meta_by_user[i] = meta_by_user[i] or {}
+        meta_by_user[i]['rewriteGroupId'] = group['id']
+        meta_by_user[i]['targetGapKey'] = group['targetGapKey']
+    for block in move_blocks:
+        if block['id'] in problem_ids:
+            block['resolvedByRewrite'] = True
+    return [group]
+
+
+def build_missing_by_position(missing, matches, user_length):
+    result = {}
+    if not missing:
+        return result
+    matched_by_orig = {}
+    for m in matches:
+        matched_by_orig[m['origIndex']] = m['userIndex']
+    for item in sorted(missing, key=lambda x: x['origIndex']):
+        prev_orig = -1
+        prev_user = -1
+        next_orig = None
+        for orig_idx, user_idx in matched_by_orig.items():
+            if prev_orig < orig_idx < item['origIndex']:
+                prev_orig = orig_idx
+                prev_user = user_idx
+            if orig_idx > item['origIndex'] and (next_orig is None or orig_idx < next_orig):
+                next_orig = orig_idx
+        pos = str(max(0, prev_user + 1))
+        result.setdefault(pos, []).append({'token': item['token'], 'gapKey': build_gap_key(prev_orig, next_orig)})
+    # JS object keys that look like integers enumerate in ascending order.
+    ordered = {}
+    for key in sorted(result, key=int):
+        ordered[key] = sorted(result[key], key=lambda x: x['token']['index'])
+    return ordered
+
+
+def build_move_plan(matches, lis_set, user_tokens, original_tokens, missing):
+    missing_tokens = list(missing or [])
+    ordered_matches = list(matches)
+    lis_matches = [m for m in ordered_matches if m['id'] in lis_set]
+    lis_orig_sorted = sorted(m['origIndex'] for m in lis_matches)
+    lis_orig_to_user = {}
+    for m in lis_matches:
+        lis_orig_to_user[m['origIndex']] = m['userIndex']
+
+    meta_by_user = [None] * len(user_tokens)
+    gap_meta = {}
+    tokens_per_gap = {}
+
+    for m in ordered_matches:
+        in_lis = m['id'] in lis_set
+        prev_lis = -1
+        next_lis = None
+        for idx in lis_orig_sorted:
+            if idx < m['origIndex']:
+                prev_lis = idx
+            elif idx > m['origIndex']:
+                next_lis = idx
+                break
+        gap_key = build_gap_key(prev_lis, next_lis)
+        before_user = lis_orig_to_user.get(prev_lis, -1) if prev_lis != -1 else -1
+        after_user = lis_orig_to_user.get(next_lis, len(user_tokens)) if next_lis is not None else len(user_tokens)
+        if gap_key not in gap_meta:
+            gap_meta[gap_key] = {
+                'before': prev_lis,
+                'after': next_lis,
+                'beforeUser': before_user,
+                'afterUser': after_user,
+                'targetBoundary': before_user + 1,
+            }
+            tokens_per_gap[gap_key] = []
+        if not in_lis:
+            tokens_per_gap[gap_key].append(m['origIndex'])
+        has_error = m['score'] < 1 or m['userToken']['raw'] != m['origToken']['raw']
+        meta_by_user[m['userIndex']] = {
+            'match': m,
+            'inLis': in_lis,
+            'targetGapKey': gap_key,
+            'targetGap': {'before': prev_lis, 'after': next_lis},
+            'hasError': has_error,
+            'needsMove': not in_lis,
+        }
+
+    for gap_key in tokens_per_gap:
+        tokens_per_gap[gap_key].sort()
+
+    movable_matches = [m for m in ordered_matches if m['id'] not in lis_set]
+    move_blocks, all_blocks = _build_move_blocks(
+        movable_matches, meta_by_user, gap_meta, tokens_per_gap, len(user_tokens))
+
+    boundary_counts = [0] * (len(user_tokens) + 1)
+    for block in move_blocks:
+        crossed = _collect_crossed_boundaries(block)
+        block['crossed'] = crossed
+        for idx in crossed:
+            if idx < len(boundary_counts):
+                boundary_counts[idx] += 1
+            else:
+                # JS arrays grow on out-of-range writes (undefined || 0) + 1.
+                boundary_counts.extend([None] * (idx - len(boundary_counts)))
+                boundary_counts.append(1)
+    overloaded = [idx for idx, count in enumerate(boundary_counts) if count and count > 1]
+    overloaded_set = set(overloaded)
+    overload_blocks = [b['id'] for b in move_blocks if any(idx in overloaded_set for idx in b['crossed'])]
+
+    total_tokens = len(user_tokens)
+    error_token_count = len(movable_matches) + len(missing_tokens)
+    error_rate = error_token_count / total_tokens if total_tokens > 0 else 0
+    too_many_errors = error_rate > 0.6
+
+    mode = 'rewrite' if (overloaded or too_many_errors) else 'arrows'
+    problem_ids = {b['id'] for b in all_blocks} if too_many_errors else set(overload_blocks)
+    rewrite_groups = []
+    if mode == 'rewrite':
+        rewrite_groups = _build_rewrite_groups(
+            all_blocks if too_many_errors else move_blocks,
+            problem_ids,
+            ordered_matches,
+            user_tokens,
+            original_tokens,
+            meta_by_user,
+            missing_tokens,
+        )
+
+    tokens_in_move_blocks = set()
+    for block in move_blocks:
+        if block['resolvedByRewrite']:
+            continue
+        for idx in block['tokens']:
+            tokens_in_move_blocks.add(idx)
+            if not meta_by_user[idx]:
+                meta_by_user[idx] = {}
+            meta_by_user[idx]['moveBlockId'] = block['id']
+            meta_by_user[idx]['targetGapKey'] = block['targetGapKey']
+            meta_by_user[idx]['targetGap'] = block['targetGap']
+
+    for idx, meta in enumerate(meta_by_user):
+        if meta and meta.get('needsMove') and idx not in tokens_in_move_blocks:
+            meta['needsMove'] = False
+
+    gaps_needed = []
+
+    def need_gap(key):
+        if key not in gaps_needed:
+            gaps_needed.append(key)
+
+    if mode == 'arrows':
+        for block in move_blocks:
+            need_gap(block['targetGapKey'])
+
+    matched_by_orig = {}
+    for m in ordered_matches:
+        matched_by_orig[m['origIndex']] = m['userIndex']
+    missing_by_position = build_missing_by_position(missing_tokens, ordered_matches, len(user_tokens))
+
+    for item in missing_tokens:
+        prev_orig = -1
+        next_orig = None
+        for i in range(item['origIndex'] - 1, -1, -1):
+            if i in lis_orig_to_user:
+                prev_orig = i
+                break
+        for i in range(item['origIndex'] + 1, len(original_tokens)):
+            if i in lis_orig_to_user:
+                next_orig = i
+                break
+        prev_user = lis_orig_to_user.get(prev_orig, matched_by_orig.get(prev_orig)) if prev_orig != -1 else -1
+        next_user = (lis_orig_to_user.get(next_orig, matched_by_orig.get(next_orig))
+                     if next_orig is not None else len(user_tokens))
+        gap_key = build_gap_key(prev_orig, next_orig)
+        if gap_key not in gap_meta:
+            gap_meta[gap_key] = {
+                'before': prev_orig,
+                'after': next_orig,
+                'beforeUser': prev_user,
+                'afterUser': next_user,
+                'targetBoundary': prev_user + 1,
+            }
+        item['gapKey'] = gap_key
+        need_gap(gap_key)
+
+    crossed_boundaries = [
+        {'boundary': idx, 'count': count}
+        for idx, count in enumerate(boundary_counts) if count and count > 0
+    ]
+
+    return {
+        'mode': mode,
+        'moveBlocks': move_blocks,
+        'rewriteGroups': rewrite_groups,
+        'tokenMeta': meta_by_user,
+        'gapMeta': gap_meta,
+        'gapsNeeded': gaps_needed,
+        'missingByPosition': missing_by_position,
+        'missingTokens': missing_tokens,
+        'boundaryCounts': boundary_counts,
+        'crossedBoundaries': crossed_boundaries,
+        'overloadedBoundaries': overloaded,
+    }
+
+
+def _js_trim(value):
+    start = 0
+    end = len(value)
+    while start < end and _is_space(value[start]):
+        start += 1
+    while end > start and _is_space(value[end - 1]):
+        end -= 1
+    return value[start:end]
+
+
+def compare_texts(user_input, correct_text):
+    """Grade one dictation answer; returns the compareTexts() result shape."""
+    user_norm = _js_trim(user_input or '')
+    correct_norm = _js_trim(correct_text or '')
+
+    user_tokens = tokenize_text(user_norm)
+    original_tokens = tokenize_text(correct_norm)
+
+    if user_norm == correct_norm:
+        return {
+            'isCorrect': True,
+            'mode': 'arrows',
+            'userTokens': user_tokens,
+            'originalTokens': original_tokens,
+            'matches': [],
+            'extras': [],
+            'missing': [],
+            'movePlan': build_empty_move_plan(len(user_tokens)),
+            'errorCount': 0,
+            'orderIssues': 0,
+            'moveIssues': 0,
+        }
+
+    similarity = build_similarity_matrix(user_tokens, original_tokens)
+    assignment = solve_max_assignment(similarity)
+    matches, matched_user, matched_orig = extract_matches(assignment, user_tokens, original_tokens)
+
+    extras = [{'userIndex': i, 'token': t} for i, t in enumerate(user_tokens) if i not in matched_user]
+    missing = [{'origIndex': i, 'token': t} for i, t in enumerate(original_tokens) if i not in matched_orig]
+
+    lis_indices = compute_lis_with_ties(matches)
+    # The JS builds lisSet with .filter(Boolean), which drops match id 0;
+    # mirrored here on purpose so grades stay identical.
+    lis_set = {matches[idx]['id'] for idx in lis_indices if idx < len(matches) and matches[idx]['id']}
+
+    move_plan = build_move_plan(matches, lis_set, user_tokens, original_tokens, missing)
+
+    spelling_issues = 0
+    for m in matches:
+        raw_differs = m['userToken']['raw'] != m['origToken']['raw']
+        if m['userToken']['type'] == 'punct':
+            spelling_issues += raw_differs
+        else:
+            spelling_issues += raw_differs or m['score'] < 1
+    order_issues = sum(1 for m in matches if m['id'] not in lis_set)
+    if move_plan['mode'] == 'rewrite':
+        move_issues = 1 if move_plan['rewriteGroups'] else 0
+    else:
+        move_issues = len(move_plan['moveBlocks'])
+    error_count = len(extras) + len(missing) + spelling_issues + move_issues
+
+    return {
+        'isCorrect': error_count == 0,
+        'mode': move_plan['mode'],
+        'userTokens': user_tokens,
+        'originalTokens': original_tokens,
+        'matches': matches,
+        'extras': extras,
+        'missing': missing,
+        'movePlan': move_plan,
+        'errorCount': error_count,
+        'orderIssues': order_issues,
+        'moveIssues': move_issues,
+        'crossedBoundaries': move_plan['crossedBoundaries'],
+        'overloadedBoundaries': move_plan['overloadedBoundaries'],
+        'boundaryCounts': move_plan['boundaryCounts'],
+    }
+
+
+def summarize(result):
+    """Compact grade record used by the batch API and analytics exports."""
+    return {
+        'isCorrect': result['isCorrect'],
+        'mode': result['mode'],
+        'errorCount': result['errorCount'],
+        'orderIssues': result['orderIssues'],
+        'moveIssues': result['moveIssues'],
+        'extras': len(result['extras']),
+        'missing': len(result['missing']),
+        'matches': len(result['matches']),
+    }
@@ -0,0 +1,91 @@
+"""Per-sentence timing of the JS compareTexts() engine, before vs after a change.
+
+Usage:
+    python -m tools.dictation.jsbench [--before HEAD] [--rounds 200]
+
+"before" is the engine at the given git revision (assets/modules/dictation.js,
+or assets/flashcards.js for revisions before it moved), "after" is the
+working tree copy. Each engine grades the same 5/15/40-token sentences; every
+sentence is graded `--rounds` times with a fresh mutation each round, which
+mimics a learner retrying the same dictation.
+"""
+import argparse
+import json
+import random
+import shutil
+import subprocess
+import sys
+
+from .parity import JS_PATH, LEGACY_JS_PATH, ROOT, SEED_SENTENCES, _mutate, extract_js_engine
+
+SIZES = (5, 15, 40)
+
+
+def _sentence(rng, size):
+    words = ' '.join(SEED_SENTENCES).replace(',', '').replace('.', '').split()
+    return ' '.join(rng.choice(words) for _ in range(size)) + '.'
+
+
+def build_cases(rounds, seed=1):
+    rng = random.Random(seed)
+    cases = {}
+    for size in SIZES:
+        reference = _sentence(rng, size)
+        cases[size] = [(_mutate(reference, rng), reference) for _ in range(rounds)]
+    return cases
+
+
+def time_engine(js_source, cases):
+    harness = (
+        '(function(){\n'
+        'const console = { log(){}, warn(){}, error(){}, info(){}, debug(){} };\n'
+        + js_source +
+        '\nconst cases = JSON.parse(require("fs").readFileSync(0, "utf8"));\n'
+        'const out = {};\n'
+        'Object.keys(cases).forEach(size => {\n'
+        '  const list = cases[size];\n'
+        '  const started = process.hrtime.bigint();\n'
+        '  list.forEach(c => compareTexts(c[0], c[1]));\n'
+        '  out[size] = Number(process.hrtime.bigint() - started) / 1e6 / list.length;\n'
+        '});\n'
+        'process.stdout.write(JSON.stringify(out));\n'
+        '})();\n'
+    )
+    proc = subprocess.run([shutil.which('node') or 'node', '-e', harness], input=json.dumps(cases),
+                          capture_output=True, text=True, encoding='utf-8', check=False)
+    if proc.returncode != 0:
+        raise SystemExit('node harness failed:\n' + proc.stderr)
+    return json.loads(proc.stdout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time compareTexts() before/after a change.')
+    parser.add_argument('--before', default='HEAD', help='git revision for the baseline engine')
+    parser.add_argument('--rounds', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    for path in (JS_PATH, LEGACY_JS_PATH):
+        relative = path.relative_to(ROOT).as_posix()
+        shown = subprocess.run(['git', 'show', f'{args.before}:{relative}'], cwd=ROOT,
+                               capture_output=True, text=True, encoding='utf-8', check=False)
+        if shown.returncode == 0:
+            before_source = shown.stdout
+            break
+    else:
+        raise SystemExit(f'no dictation engine at {args.before}')
+    before_js = extract_js_engine(text=before_source)
+    after_js = extract_js_engine()
+
+    cases = build_cases(args.rounds)
+    before = time_engine(before_js, cases)
+    after = time_engine(after_js, cases)
+    print(f'{"tokens":>6}  {"before ms":>10}  {"after ms":>10}  {"speedup":>8}')
+    for size in SIZES:
+        b = before[str(size)]
+        a = after[str(size)]
+        print(f'{size:>6}  {b:10.3f}  {a:10.3f}  {b / a if a else float("inf"):7.2f}x')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""Parity check: Python grader vs the JS compareTexts() shipped in assets/modules/dictation.js.
+
+Usage:
+    python -m tools.dictation.parity [--cases 500] [--corpus answers.jsonl]
+
+Extracts the comparison block straight from assets/modules/dictation.js, runs it
+under node on the same inputs and diffs the JSON results field by field.
+Exits non-zero on the first mismatching case.
+"""
+import argparse
+import json
+import random
+import re
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+from .engine import compare_texts
+
+ROOT = Path(__file__).resolve().parents[2]
+JS_PATH = ROOT / 'assets' / 'modules' / 'dictation.js'
+# Until the engine moved to its own module it lived inside flashcardsInit() in flashcards.js.
+LEGACY_JS_PATH = ROOT / 'assets' / 'flashcards.js'
+START_MARKER = re.compile(r'^[ \t]*function compareTexts\(', re.M)
+END_MARKER = 'function renderComparisonResult('
+
+SEED_SENTENCES = [
+    'Jeg heter Ola og bor i Oslo.',
+    'Hun har ikke vært i Bergen før.',
+    'Vi skal reise til Trondheim i morgen tidlig.',
+    'Kan du hjelpe meg med leksene, er du snill?',
+    'Det regner, så vi blir hjemme i dag.',
+    'Barna leker ute i hagen etter skolen.',
+    'Han kjøpte tre epler og en liter melk.',
+    '«Hvor er toget?» spurte hun – men ingen svarte…',
+    'Når jeg kommer hjem, lager jeg middag.',
+    'Etter at vi hadde spist, gikk vi en tur langs sjøen.',
+]
+
+TYPOS = {'e': 'a', 'ø': 'o', 'å': 'a', 'æ': 'e', 'j': 'i', 'r': 'rr', 'k': 'kk'}
+
+
+def extract_js_engine(path=JS_PATH, text=None):
+    if text is None:
+        text = path.read_text(encoding='utf-8')
+    match = START_MARKER.search(text)
+    start = match.start() if match else -1
+    end = text.find(END_MARKER, start)
+    if start == -1 or end == -1:
+        raise SystemExit('compareTexts block not found in ' + str(path))
+    return text[start:end]
+
+
+def _mutate(sentence, rng):
+    words = sentence.split()
+    for _ in range(rng.randint(1, 3)):
+        if not words:
+            break
+        op = rng.choice(('swap', 'drop', 'dup', 'typo', 'case', 'move'))
+        i = rng.randrange(len(words))
+        if op == 'swap' and len(words) > 1:
+            j = rng.randrange(len(words))
+            words[i], words[j] = words[j], words[i]
+        elif op == 'drop' and len(words) > 1:
+            words.pop(i)
+        elif op == 'dup':
+            words.insert(i, words[i])
+        elif op == 'typo':
+            word = words[i]
+            for src, dst in TYPOS.items():
+                if src in word:
+                    words[i] = word.replace(src, dst, 1)
+                    break
+        elif op == 'case':
+            words[i] = words[i].swapcase()
+        elif op == 'move' and len(words) > 2:
+            words.append(words.pop(i))
+    return ' '.join(words)
+
+
+def generate_cases(count, seed=1):
+    rng = random.Random(seed)
+    cases = [(s, s) for s in SEED_SENTENCES]
+    cases += [('', SEED_SENTENCES[0]), (SEED_SENTENCES[0], '')]
+    while len(cases) < count:
+        reference = rng.choice(SEED_SENTENCES)
+        cases.append((_mutate(reference, rng), reference))
+    return cases[:count]
+
+
+def run_js(cases, js_path=JS_PATH):
+    node = shutil.which('node')
+    if not node:
+        raise SystemExit('node is required for the parity check')
+    harness = (
+        '(function(){\n'
+        'const console = { log(){}, warn(){}, error(){}, info(){}, debug(){} };\n'
+        + extract_js_engine(js_path) +
+        '\nconst cases = JSON.parse(require("fs").readFileSync(0, "utf8"));\n'
+        'const replacer = (k, v) => v instanceof Set ? Array.from(v) : v;\n'
+        'process.stdout.write(JSON.stringify(cases.map(c => compareTexts(c[0], c[1])), replacer));\n'
+        '})();\n'
+    )
+    proc = subprocess.run(
+        [node, '-e', harness],
+        input=json.dumps(cases),
+        capture_output=True,
+        text=True,
+        encoding='utf-8',
+        check=False,
+    )
+    if proc.returncode != 0:
+        raise SystemExit('node harness failed:\n' + proc.stderr)
+    return json.loads(proc.stdout)
+
+
+def first_difference(a, b, path='$'):
+    if isinstance(a, dict) and isinstance(b, dict):
+        for key in sorted(set(a) | set(b)):
+            if key not in a or key not in b:
+                return f'{path}.{key}: missing on {"python" if key not in a else "js"} side'
+            diff = first_difference(a[key], b[key], f'{path}.{key}')
+            if diff:
+                return diff
+        return None
+    if isinstance(a, list) and isinstance(b, list):
+        if len(a) != len(b):
+            return f'{path}: length {len(a)} != {len(b)}'
+        for i, (x, y) in enumerate(zip(a, b)):
+            diff = first_difference(x, y, f'{path}[{i}]')
+            if diff:
+                return diff
+        return None
+    if a != b or isinstance(a, bool) != isinstance(b, bool):
+        return f'{path}: {a!r} != {b!r}'
+    return None
+
+
+def _load_corpus(path):
+    cases = []
+    with open(path, encoding='utf-8') as handle:
+        for line in handle:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                cases.append((record.get('answer', ''), record.get('reference', '')))
+    return cases
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare Python and JS dictation grading.')
+    parser.add_argument('--cases', type=int, default=500, help='number of generated cases')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--corpus', help='JSONL with answer/reference pairs to check as well')
+    args = parser.parse_args(argv)
+
+    cases = generate_cases(args.cases, args.seed)
+    if args.corpus:
+        cases += _load_corpus(args.corpus)
+
+    js_results = run_js(cases)
+    for index, (case, js_result) in enumerate(zip(cases, js_results)):
+        py_result = json.loads(json.dumps(compare_texts(*case)))
+        diff = first_difference(py_result, js_result)
+        if diff:
+            print(f'case {index} differs: {case!r}\n  {diff}', file=sys.stderr)
+            return 1
+    print(f'{len(cases)} cases identical')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
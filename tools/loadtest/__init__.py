@@ -0,0 +1,5 @@
+"""Load generator and benchmark suite for the hot ajax.php actions; see tools/README.md."""
+from .client import MoodleClient, LoginError
+from .report import percentile, summarize
+
+__all__ = ['LoginError', 'MoodleClient', 'percentile', 'summarize']
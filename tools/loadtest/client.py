@@ -0,0 +1,128 @@
+"""Minimal Moodle web client: log in like a browser, then call mod/flashcards/ajax.php.
+
+One keep-alive connection per client, so per-request latency does not include
+a TCP (or TLS) handshake, as in a browser tab. Cookies are kept by hand; only
+the Moodle session cookie matters.
+"""
+import http.client
+import json
+import re
+import time
+import urllib.parse
+from http.cookies import SimpleCookie
+
+_LOGINTOKEN = re.compile(r'name="logintoken"\s+value="([^"]+)"')
+_SESSKEY = re.compile(r'"sesskey":"([^"]+)"')
+
+
+class LoginError(RuntimeError):
+    pass
+
+
+class Result:
+    __slots__ = ('action', 'status', 'ms', 'ok', 'data', 'error', 'bytes')
+
+    def __init__(self, action, status, ms, ok, data, error, size):
+        self.action = action
+        self.status = status
+        self.ms = ms
+        self.ok = ok
+        self.data = data
+        self.error = error
+        self.bytes = size
+
+
+class MoodleClient:
+
+    def __init__(self, base, cmid=0, timeout=60):
+        url = urllib.parse.urlsplit(base.rstrip('/'))
+        self.https = url.scheme == 'https'
+        self.host = url.netloc
+        self.root = url.path
+        self.cmid = cmid
+        self.timeout = timeout
+        self.cookies = {}
+        self.sesskey = None
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            self._conn = cls(self.host, timeout=self.timeout)
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def request(self, method, path, body=None, headers=None):
+        """(status, headers, body bytes); retries once on a dropped keep-alive connection."""
+        headers = dict(headers or {})
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        for attempt in (0, 1):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self.close()
+                if attempt:
+                    raise
+        for value in response.headers.get_all('Set-Cookie') or []:
+            for name, morsel in SimpleCookie(value).items():
+                self.cookies[name] = morsel.value
+        if response.headers.get('Connection', '').lower() == 'close':
+            self.close()
+        return response.status, response.headers, data
+
+    def _follow(self, status, headers, data, limit=5):
+        while status in (301, 302, 303, 307) and limit:
+            location = urllib.parse.urlsplit(headers.get('Location', ''))
+            path = location.path + ('?' + location.query if location.query else '')
+            status, headers, data = self.request('GET', path or self.root + '/')
+            limit -= 1
+        return status, headers, data
+
+    def login(self, username, password):
+        """Log in through /login/index.php and pick up the sesskey from the landing page."""
+        _, _, page = self.request('GET', self.root + '/login/index.php')
+        token = _LOGINTOKEN.search(page.decode('utf-8', 'replace'))
+        form = urllib.parse.urlencode({'username': username, 'password': password,
+                                       'logintoken': token.group(1) if token else ''})
+        status, headers, data = self._follow(*self.request(
+            'POST', self.root + '/login/index.php', form,
+            {'Content-Type': 'application/x-www-form-urlencoded'}))
+        found = _SESSKEY.search(data.decode('utf-8', 'replace'))
+        if not found:
+            status, headers, data = self._follow(*self.request('GET', self.root + '/my/'))
+            found = _SESSKEY.search(data.decode('utf-8', 'replace'))
+        if not found:
+            raise LoginError(f'login failed for {username} (HTTP {status})')
+        self.sesskey = found.group(1)
+
+    def call(self, action, body=None, **params):
+        """Call one ajax action like the app's api() helper; GET without a body, else POST JSON."""
+        query = {'cmid': self.cmid, 'action': action, 'sesskey': self.sesskey}
+        query.update(params)
+        path = self.root + '/mod/flashcards/ajax.php?' + urllib.parse.urlencode(query)
+        payload = None if body is None else json.dumps(body, ensure_ascii=False).encode('utf-8')
+        started = time.perf_counter()
+        try:
+            status, _, data = self.request('GET' if payload is None else 'POST', path, payload,
+                                           {'Content-Type': 'application/json'})
+        except (OSError, http.client.HTTPException) as exc:
+            self.close()
+            return Result(action, 0, (time.perf_counter() - started) * 1000, False, None, str(exc), 0)
+        ms = (time.perf_counter() - started) * 1000
+        try:
+            decoded = json.loads(data.decode('utf-8'))
+        except ValueError:
+            return Result(action, status, ms, False, None, f'HTTP {status}: not JSON', len(data))
+        ok = status == 200 and isinstance(decoded, dict) and decoded.get('ok') is True
+        error = None if ok else str((decoded or {}).get('error') or (decoded or {}).get('errorcode') or f'HTTP {status}')
+        return Result(action, status, ms, ok, decoded.get('data') if isinstance(decoded, dict) else None,
+                      error, len(data))
@@ -0,0 +1,70 @@
+"""Compare two tools.loadtest.run reports.
+
+Usage:
+    python -m tools.loadtest.diff base.json new.json [--threshold 10] [--metric p95_ms]
+
+Prints each action's latency and queries per request side by side with the
+relative change. An action regresses when --metric grew by more than
+--threshold percent, or its mean queries per request grew (when both reports
+have server profiles); the exit status is 1 if any action regressed, so the
+command can gate a CI job.
+"""
+import argparse
+import json
+import sys
+
+
+def _change(old, new):
+    if not old:
+        return 0.0 if not new else float('inf')
+    return (new - old) / old * 100
+
+
+def compare(base, new, metric='p95_ms', threshold=10.0):
+    """Rows of (action, base stats, new stats, change %, regressed)."""
+    rows = []
+    for action in sorted(set(base['actions']) | set(new['actions'])):
+        old = base['actions'].get(action)
+        cur = new['actions'].get(action)
+        oldq = (base.get('server') or {}).get(action, {}).get('queries_mean')
+        newq = (new.get('server') or {}).get(action, {}).get('queries_mean')
+        change = _change(old[metric], cur[metric]) if old and cur else None
+        regressed = bool(change is not None and change > threshold)
+        if oldq is not None and newq is not None and newq > oldq:
+            regressed = True
+        rows.append((action, old, cur, change, oldq, newq, regressed))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Diff two load-test reports.')
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--metric', default='p95_ms', choices=['p50_ms', 'p90_ms', 'p95_ms', 'p99_ms', 'mean_ms'])
+    parser.add_argument('--threshold', type=float, default=10.0, help='allowed growth of --metric, percent')
+    args = parser.parse_args(argv)
+    with open(args.base, encoding='utf-8') as handle:
+        base = json.load(handle)
+    with open(args.new, encoding='utf-8') as handle:
+        new = json.load(handle)
+
+    for key in ('scale', 'sessions', 'concurrency', 'mix', 'seed'):
+        if base['meta'].get(key) != new['meta'].get(key):
+            print(f"warning: {key} differs ({base['meta'].get(key)!r} vs {new['meta'].get(key)!r})", file=sys.stderr)
+    print(f"{base['meta'].get('label') or args.base} -> {new['meta'].get('label') or args.new} ({args.metric})")
+    print(f"{'action':<20} {'base':>9} {'new':>9} {'change':>8} {'q base':>7} {'q new':>7}")
+    regressions = 0
+    for action, old, cur, change, oldq, newq, regressed in compare(base, new, args.metric, args.threshold):
+        fmt = lambda s: f'{s[args.metric]:9.1f}' if s else f"{'-':>9}"
+        pct = f'{change:+7.1f}%' if change is not None else f"{'-':>8}"
+        qold = f'{oldq:7.1f}' if oldq is not None else f"{'-':>7}"
+        qnew = f'{newq:7.1f}' if newq is not None else f"{'-':>7}"
+        print(f"{action:<20} {fmt(old)} {fmt(cur)} {pct} {qold} {qnew}{'  REGRESSION' if regressed else ''}")
+        regressions += regressed
+    print(f"throughput {base['totals']['rps']:.1f} -> {new['totals']['rps']:.1f} req/s, "
+          f"errors {base['totals']['errors']} -> {new['totals']['errors']}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Latency summaries for tools.loadtest.run and the server-side profile merge."""
+import math
+
+
+def percentile(values, p):
+    """Nearest-rank percentile (same definition as the plugin's profiler)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(p / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered) - 1, rank - 1))]
+
+
+def summarize(results, elapsed):
+    """Per-action client-side stats from client.Result objects."""
+    actions = {}
+    for result in results:
+        actions.setdefault(result.action, []).append(result)
+    out = {}
+    for action, items in sorted(actions.items()):
+        ms = [r.ms for r in items]
+        errors = [r for r in items if not r.ok]
+        out[action] = {
+            'count': len(items),
+            'errors': len(errors),
+            'rps': round(len(items) / elapsed, 2) if elapsed else 0.0,
+            'mean_ms': round(sum(ms) / len(ms), 2),
+            'p50_ms': round(percentile(ms, 50), 2),
+            'p90_ms': round(percentile(ms, 90), 2),
+            'p95_ms': round(percentile(ms, 95), 2),
+            'p99_ms': round(percentile(ms, 99), 2),
+            'max_ms': round(max(ms), 2),
+            'mean_bytes': round(sum(r.bytes for r in items) / len(items)),
+            'error_samples': sorted({r.error for r in errors})[:5],
+        }
+    return out
+
+
+def summarize_profiles(rows):
+    """Per-action server-side stats from cli/perf_export.php JSON lines."""
+    actions = {}
+    for row in rows:
+        actions.setdefault(row['action'], []).append(row)
+    out = {}
+    for action, items in sorted(actions.items()):
+        queries = [r['dbqueries'] for r in items]
+        dbms = [r['dbms'] for r in items]
+        wall = [r['wallms'] for r in items]
+        externals = {}
+        for row in items:
+            for dependency, (calls, ms) in (row.get('externals') or {}).items():
+                entry = externals.setdefault(dependency, {'requests': 0, 'calls': 0, 'ms': []})
+                entry['requests'] += 1
+                entry['calls'] += calls
+                entry['ms'].append(ms)
+        out[action] = {
+            'profiles': len(items),
+            'queries_mean': round(sum(queries) / len(queries), 2),
+            'queries_p50': percentile(queries, 50),
+            'queries_p95': percentile(queries, 95),
+            'queries_max': max(queries),
+            'db_ms_p50': percentile(dbms, 50),
+            'db_ms_p95': percentile(dbms, 95),
+            'wall_ms_p50': percentile(wall, 50),
+            'wall_ms_p95': percentile(wall, 95),
+            'memory_p95': percentile([r['memory'] for r in items], 95),
+            'externals': {dep: {'requests': e['requests'], 'calls': e['calls'],
+                                'p50_ms': percentile(e['ms'], 50), 'p95_ms': percentile(e['ms'], 95)}
+                          for dep, e in sorted(externals.items())},
+        }
+    return out
+
+
+def print_table(report, file):
+    server = report.get('server') or {}
+    print(f"{'action':<20} {'count':>6} {'err':>4} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}"
+          f" {'q/req':>6} {'db p95':>7}", file=file)
+    for action, s in report['actions'].items():
+        srv = server.get(action, {})
+        queries = f"{srv['queries_mean']:.1f}" if srv else '-'
+        dbp95 = str(srv['db_ms_p95']) if srv else '-'
+        print(f"{action:<20} {s['count']:>6} {s['errors']:>4} {s['rps']:>7.1f} {s['p50_ms']:>8.1f} {s['p95_ms']:>8.1f}"
+              f" {s['p99_ms']:>8.1f} {s['max_ms']:>8.1f} {queries:>6} {dbp95:>7}", file=file)
+    total = report['totals']
+    print(f"{total['requests']} requests, {total['errors']} errors, {total['sessions']} sessions in "
+          f"{total['elapsed_s']:.1f}s ({total['rps']:.1f} req/s)", file=file)
@@ -0,0 +1,163 @@
+"""Replay learner sessions against a Moodle site and report latency per ajax action.
+
+Usage:
+    python -m tools.loadtest.run --base http://localhost/moodle --users users.jsonl
+        [--sessions 200] [--concurrency 20] [--mix study=6,create=3,dashboard=1]
+        [--reviews 5-25] [--think-ms 0] [--seed 1] [--scale 10k] [--label NAME]
+        [--server-profiles "php /srv/moodle/mod/flashcards/cli/perf_export.php --since={since} --until={until}"]
+        [-o report.json]
+
+--users is the JSON-lines file from cli/loadtest_seed.php. Session i runs as
+user i modulo the file (one session per user at a time; each user logs in
+once and keeps its connection). Sessions are drawn from --mix with --seed, so
+two runs issue the same requests in the same order per worker.
+
+--server-profiles runs a command after the load (through the shell; {since}
+and {until} are replaced by the run's Unix timestamps) that prints the
+plugin's request profiles as JSON lines - cli/perf_export.php, locally or
+through ssh/docker exec. Seeding with --standins sets the profiling sample
+rate to 100%, so every request has queries per request, DB time and external
+spans. The report (-o) is JSON; compare two with tools.loadtest.diff.
+"""
+import argparse
+import json
+import random
+import shlex
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .client import LoginError, MoodleClient
+from .report import print_table, summarize, summarize_profiles
+from .sessions import SESSIONS, parse_mix, plan
+
+
+def load_users(path):
+    with open(path, encoding='utf-8') as handle:
+        users = [json.loads(line) for line in handle if line.strip()]
+    if not users:
+        raise SystemExit(f'no users in {path}')
+    return users
+
+
+class Runner:
+
+    def __init__(self, args, users):
+        self.args = args
+        self.users = users
+        self.results = []
+        self.logins = []
+        self.failed_sessions = 0
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._user_locks = [threading.Lock() for _ in users]
+
+    def record(self, result):
+        with self._lock:
+            self.results.append(result)
+        return result
+
+    def _client(self, index):
+        client = self._clients.get(index)
+        if client is None:
+            user = self.users[index]
+            client = MoodleClient(self.args.base, cmid=self.args.cmid, timeout=self.args.timeout)
+            started = time.perf_counter()
+            client.login(user['username'], user['password'])
+            with self._lock:
+                self.logins.append((time.perf_counter() - started) * 1000)
+            self._clients[index] = client
+        return client
+
+    def session(self, number, kind):
+        rng = random.Random(f'{self.args.seed}:{number}')
+        index = number % len(self.users)
+        mean = self.args.think_ms / 1000
+
+        def think():
+            if mean > 0:
+                time.sleep(rng.expovariate(1 / mean))
+
+        with self._user_locks[index]:
+            try:
+                client = self._client(index)
+                SESSIONS[kind](client, rng, self.record, think, self.args.reviews)
+            except (LoginError, OSError) as exc:
+                with self._lock:
+                    self.failed_sessions += 1
+                print(f'session {number} ({kind}): {exc}', file=sys.stderr)
+
+    def run(self, kinds):
+        with ThreadPoolExecutor(max_workers=self.args.concurrency) as pool:
+            for future in [pool.submit(self.session, n, kind) for n, kind in enumerate(kinds)]:
+                future.result()
+        for client in self._clients.values():
+            client.close()
+
+
+def server_profiles(command, since, until):
+    output = subprocess.run(command.format(since=since, until=until), shell=True, check=True,
+                            capture_output=True, text=True).stdout
+    return [json.loads(line) for line in output.splitlines() if line.strip().startswith('{')]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay flashcards sessions and report ajax latency.')
+    parser.add_argument('--base', required=True, help='Moodle wwwroot, e.g. http://localhost/moodle')
+    parser.add_argument('--users', required=True, help='JSON lines from cli/loadtest_seed.php --users-file')
+    parser.add_argument('--sessions', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--mix', default='study=6,create=3,dashboard=1')
+    parser.add_argument('--reviews', default='5-25', help='review_card burst size per study session, MIN-MAX')
+    parser.add_argument('--think-ms', type=float, default=0.0, help='mean pause between reviews/steps')
+    parser.add_argument('--cmid', type=int, default=0, help='activity cmid (0 = global mode)')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--scale', default='', help='recorded in the report (the seed --scale)')
+    parser.add_argument('--label', default='', help='recorded in the report, e.g. a git revision')
+    parser.add_argument('--server-profiles', default='', metavar='CMD',
+                        help='shell command printing perf_export.php JSON lines ({since}, {until})')
+    parser.add_argument('-o', '--output', help='write the JSON report here')
+    args = parser.parse_args(argv)
+    low, _, high = args.reviews.partition('-')
+    args.reviews = (int(low), int(high or low))
+
+    users = load_users(args.users)
+    kinds = plan(args.sessions, parse_mix(args.mix), random.Random(args.seed))
+    runner = Runner(args, users)
+    since = int(time.time())
+    started = time.perf_counter()
+    runner.run(kinds)
+    elapsed = time.perf_counter() - started
+    until = int(time.time()) + 1
+
+    report = {
+        'meta': {'base': args.base, 'label': args.label, 'scale': args.scale, 'users': len(users),
+                 'sessions': args.sessions, 'concurrency': args.concurrency, 'mix': args.mix,
+                 'reviews': list(args.reviews), 'think_ms': args.think_ms, 'seed': args.seed,
+                 'started': since, 'finished': until},
+        'totals': {'sessions': args.sessions, 'failed_sessions': runner.failed_sessions,
+                   'requests': len(runner.results), 'errors': sum(1 for r in runner.results if not r.ok),
+                   'elapsed_s': round(elapsed, 3),
+                   'rps': round(len(runner.results) / elapsed, 2) if elapsed else 0.0,
+                   'logins': len(runner.logins)},
+        'actions': summarize(runner.results, elapsed),
+        'server': {},
+    }
+    if args.server_profiles:
+        try:
+            report['server'] = summarize_profiles(server_profiles(args.server_profiles, since, until))
+        except (subprocess.CalledProcessError, ValueError) as exc:
+            print(f'--server-profiles failed: {exc}', file=sys.stderr)
+    print_table(report, sys.stdout)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump(report, handle, indent=2, ensure_ascii=False)
+            handle.write('\n')
+    return 1 if report['totals']['requests'] == 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
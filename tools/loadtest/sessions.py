@@ -0,0 +1,72 @@
+"""Session scripts replayed by tools.loadtest.run.
+
+Each session is what one learner does in one sitting, in the order the app
+issues the requests:
+  study      fetch, get_due_cards, a burst of review_card, get_dashboard_data
+  create     front_suggest on every keystroke of a word (from two letters on),
+             then sentence_elements for an example sentence
+  dashboard  get_dashboard_data and fetch (opening the app on the dashboard)
+All choices come from the session's own random.Random, so a run with the same
+seed replays the same requests.
+"""
+
+WORDS = ['huset', 'skole', 'arbeid', 'spise', 'snakke', 'kjøkken', 'fjellet', 'vinter', 'sommer', 'venninne',
+         'bestemme', 'forstå', 'glede', 'ta på seg', 'gi opp', 'legge merke til', 'i stedet for', 'på grunn av']
+SENTENCES = [
+    'Jeg liker å lese bøker om kvelden.',
+    'Hun har bodd i Norge i tre år.',
+    'Vi skal ta toget til Bergen i morgen.',
+    'Han la merke til at døren var åpen.',
+    'Barna leker ute selv om det regner.',
+    'Kan du hjelpe meg med leksene mine?',
+    'Det er vanskelig å forstå dialektene i Norge.',
+    'Jeg ga opp å lære fransk for mange år siden.',
+]
+RATINGS = (1, 2, 2, 2, 3, 3)
+
+
+def study(client, rng, record, think, reviews=(5, 25)):
+    record(client.call('fetch'))
+    due = record(client.call('get_due_cards', limit=1000))
+    cards = due.data if due.ok and isinstance(due.data, list) else []
+    for card in cards[:rng.randint(*reviews)]:
+        think()
+        record(client.call('review_card', {'deckId': card.get('deckId'), 'cardId': card.get('cardId'),
+                                           'rating': rng.choice(RATINGS)}))
+    record(client.call('get_dashboard_data'))
+
+
+def create(client, rng, record, think, reviews=None):
+    word = rng.choice(WORDS)
+    for end in range(2, len(word) + 1):
+        record(client.call('front_suggest', {'query': word[:end]}))
+    think()
+    record(client.call('sentence_elements', {'text': rng.choice(SENTENCES), 'language': 'en'}))
+
+
+def dashboard(client, rng, record, think, reviews=None):
+    record(client.call('get_dashboard_data'))
+    record(client.call('fetch'))
+
+
+SESSIONS = {'study': study, 'create': create, 'dashboard': dashboard}
+
+
+def parse_mix(spec):
+    """'study=6,create=3,dashboard=1' -> [(name, weight), ...]."""
+    mix = []
+    for part in filter(None, (p.strip() for p in spec.split(','))):
+        name, _, weight = part.partition('=')
+        if name not in SESSIONS:
+            raise ValueError(f'unknown session type {name!r} (known: {", ".join(SESSIONS)})')
+        mix.append((name, float(weight or 1)))
+    if not mix or sum(w for _, w in mix) <= 0:
+        raise ValueError('empty session mix')
+    return mix
+
+
+def plan(count, mix, rng):
+    """Session type for each of count sessions, drawn with the mix weights."""
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    return rng.choices(names, weights, k=count)
@@ -0,0 +1,72 @@
+"""Start every external-service stand-in for a load test.
+
+Usage:
+    python -m tools.loadtest.standins [--host 127.0.0.1] [--latency-ms 50]
+        [--latency openai=800,speech=400] [-- extra args for every stand-in]
+
+Runs spaCy (:8701), push (:8702), Ordbøkene (:8703), OpenAI (:8704) and
+ElevenLabs/Whisper (:8705) from tools/standin as child processes until
+interrupted (Ctrl-C). --latency-ms applies to all of them; --latency NAME=MS overrides
+single services (names: spacy, push, ordbokene, openai, speech). Seed the site
+with `cli/loadtest_seed.php --standins=http://HOST` to point the plugin here.
+On exit the /stats counters of every stand-in are printed.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+import urllib.request
+
+SERVICES = {
+    'spacy': ('tools.standin.spacy_service', 8701),
+    'push': ('tools.standin.push_service', 8702),
+    'ordbokene': ('tools.standin.ordbokene_service', 8703),
+    'openai': ('tools.standin.openai_service', 8704),
+    'speech': ('tools.standin.speech_service', 8705),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run all stand-ins for a load test.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--latency', default='', help='per-service overrides, e.g. openai=800,spacy=30')
+    parser.add_argument('extra', nargs=argparse.REMAINDER, help='passed to every stand-in after --')
+    args = parser.parse_args(argv)
+    latency = {name: args.latency_ms for name in SERVICES}
+    for part in filter(None, args.latency.split(',')):
+        name, _, ms = part.partition('=')
+        if name not in SERVICES:
+            parser.error(f'unknown service {name!r}')
+        latency[name] = float(ms)
+    extra = [a for a in args.extra if a != '--']
+
+    children = {}
+    for name, (module, port) in SERVICES.items():
+        children[name] = subprocess.Popen([sys.executable, '-m', module, '--host', args.host, '--port', str(port),
+                                           '--latency-ms', str(latency[name])] + extra,
+                                          start_new_session=True)
+    try:
+        while all(child.poll() is None for child in children.values()):
+            time.sleep(0.5)
+        failed = [name for name, child in children.items() if child.poll() is not None]
+        print(f'stand-in exited: {", ".join(failed)}', file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        for name, (_, port) in SERVICES.items():
+            try:
+                with urllib.request.urlopen(f'http://{args.host}:{port}/stats', timeout=2) as response:
+                    print(f'{name}: {json.dumps(json.load(response), sort_keys=True)}', file=sys.stderr)
+            except OSError:
+                pass
+        for child in children.values():
+            child.terminate()
+        for child in children.values():
+            child.wait()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
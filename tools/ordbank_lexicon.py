@@ -0,0 +1,183 @@
+"""Compile Norsk ordbank tables into a sorted, memory-mappable lexicon file.
+
+The plugin reads the file through \\mod_flashcards\\local\\ordbank_lexicon and
+only falls back to the ordbank_* join in ordbank_helper::find_candidates()
+when no lexicon is configured.
+
+Usage:
+    python -m tools.ordbank_lexicon build --fullform fullformsliste.txt \\
+        --lemma lemma.txt --paradigme paradigme.txt --boying boying.txt \\
+        -o ordbank.lex
+    python -m tools.ordbank_lexicon lookup ordbank.lex "Hun kjøpte boka i går"
+
+Inputs are tab-separated files with a header row, either the files from the
+Norsk ordbank distribution or plain exports of the ordbank_* tables, e.g.
+    mysql --batch -e "SELECT * FROM mdl_ordbank_fullform" moodle > fullform.tsv
+Column names are matched case-insensitively.
+
+File format (all integers little-endian):
+    header  8s magic "FCLEX\\0\\1\\0", uint32 count, uint32 index offset,
+            uint32 field count, 12 reserved bytes        (32 bytes)
+    index   count x uint32 entry offset, sorted by key bytes
+    entry   uint16 key length, key (lower-cased wordform, UTF-8),
+            uint32 payload length, payload
+    payload candidate rows joined by "\\n", fields joined by "\\t" in FIELDS order
+"""
+import argparse
+import csv
+import mmap
+import re
+import struct
+import sys
+import time
+
+MAGIC = b'FCLEX\x00\x01\x00'
+HEADER = struct.Struct('<8sIII12x')
+FIELDS = ('lemma_id', 'wordform', 'tag', 'paradigme_id', 'boy_nummer', 'baseform',
+          'ordklasse', 'ordklasse_utdyping', 'boy_gruppe', 'boy_tekst', 'ordbok_tekst')
+
+csv.field_size_limit(sys.maxsize)
+
+
+def _read_table(path, encoding):
+    with open(path, encoding=encoding, newline='') as handle:
+        reader = csv.reader(handle, delimiter='\t', quoting=csv.QUOTE_NONE)
+        header = [h.strip().lower() for h in next(reader)]
+        for row in reader:
+            if row:
+                yield dict(zip(header, row))
+
+
+def _clean(value):
+    value = '' if value is None or value == 'NULL' else str(value)
+    return value.replace('\t', ' ').replace('\n', ' ').replace('\r', ' ')
+
+
+def build(fullform, lemma, paradigme, boying, output, encoding='utf-8'):
+    """Join the four tables in memory and write the lexicon file."""
+    baseforms = {r.get('lemma_id'): r.get('grunnform', '') for r in _read_table(lemma, encoding)}
+    paradigms = {
+        r.get('paradigme_id'): (r.get('ordklasse', ''), r.get('ordklasse_utdyping', ''))
+        for r in _read_table(paradigme, encoding)
+    }
+    inflections = {}
+    for r in _read_table(boying, encoding):
+        # Same as the LEFT JOIN on BOY_NUMMER: the first row per number is kept.
+        inflections.setdefault(r.get('boy_nummer'), (r.get('boy_gruppe', ''), r.get('boy_tekst', ''),
+                                                      r.get('ordbok_tekst', '')))
+
+    entries = {}
+    for r in _read_table(fullform, encoding):
+        wordform = r.get('oppslag', '')
+        key = wordform.strip().lower()
+        if not key:
+            continue
+        lemma_id = r.get('lemma_id', '')
+        paradigm = paradigms.get(r.get('paradigme_id'), ('', ''))
+        inflection = inflections.get(r.get('boy_nummer'), ('', '', ''))
+        row = (lemma_id, wordform, r.get('tag', ''), r.get('paradigme_id', ''), r.get('boy_nummer', ''),
+               baseforms.get(lemma_id, ''), paradigm[0], paradigm[1]) + inflection
+        # find_candidates() gets its rows from get_records_sql(), which keys by the
+        # first column (LEMMA_ID): one candidate per lemma, later rows win.
+        entries.setdefault(key.encode('utf-8'), {})[lemma_id] = '\t'.join(_clean(v) for v in row)
+
+    keys = sorted(entries)
+    index_offset = HEADER.size
+    offset = index_offset + 4 * len(keys)
+    offsets = []
+    blobs = []
+    for key in keys:
+        payload = '\n'.join(entries[key].values()).encode('utf-8')
+        blob = struct.pack('<H', len(key)) + key + struct.pack('<I', len(payload)) + payload
+        offsets.append(offset)
+        blobs.append(blob)
+        offset += len(blob)
+    with open(output, 'wb') as handle:
+        handle.write(HEADER.pack(MAGIC, len(keys), index_offset, len(FIELDS)))
+        handle.write(struct.pack(f'<{len(offsets)}I', *offsets))
+        for blob in blobs:
+            handle.write(blob)
+    return len(keys)
+
+
+class Lexicon:
+    """Read-only view of a compiled lexicon (binary search over the mmap)."""
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self._index, fields = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC or fields != len(FIELDS):
+            raise ValueError(f'{path}: not a flashcards lexicon')
+
+    def close(self):
+        self._data.close()
+        self._file.close()
+
+    def _entry(self, i):
+        offset = struct.unpack_from('<I', self._data, self._index + 4 * i)[0]
+        key_len = struct.unpack_from('<H', self._data, offset)[0]
+        key = self._data[offset + 2:offset + 2 + key_len]
+        return key, offset + 2 + key_len
+
+    def lookup(self, wordform):
+        key = wordform.strip().lower().encode('utf-8')
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_key, payload_at = self._entry(mid)
+            if mid_key < key:
+                lo = mid + 1
+            elif mid_key > key:
+                hi = mid
+            else:
+                length = struct.unpack_from('<I', self._data, payload_at)[0]
+                payload = self._data[payload_at + 4:payload_at + 4 + length].decode('utf-8')
+                return [dict(zip(FIELDS, line.split('\t'))) for line in payload.split('\n') if line]
+        return []
+
+    def lookup_many(self, wordforms):
+        """Resolve a batch of tokens; returns {normalised token: candidates}."""
+        result = {}
+        for wordform in wordforms:
+            key = wordform.strip().lower()
+            if key and key not in result:
+                result[key] = self.lookup(key)
+        return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build or query the compiled ordbank lexicon.')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p_build = sub.add_parser('build')
+    for name in ('fullform', 'lemma', 'paradigme', 'boying'):
+        p_build.add_argument(f'--{name}', required=True)
+    p_build.add_argument('-o', '--output', default='ordbank.lex')
+    p_build.add_argument('--encoding', default='utf-8', help='input encoding (older ordbank: latin-1)')
+    p_lookup = sub.add_parser('lookup')
+    p_lookup.add_argument('lexicon')
+    p_lookup.add_argument('sentence')
+    args = parser.parse_args(argv)
+
+    if args.cmd == 'build':
+        started = time.perf_counter()
+        count = build(args.fullform, args.lemma, args.paradigme, args.boying, args.output, args.encoding)
+        print(f'{args.output}: {count} wordforms in {time.perf_counter() - started:.1f}s')
+        return 0
+
+    lexicon = Lexicon(args.lexicon)
+    try:
+        tokens = re.findall(r"[^\W\d_]+(?:[-'][^\W\d_]+)*", args.sentence)
+        started = time.perf_counter()
+        result = lexicon.lookup_many(tokens)
+        elapsed = (time.perf_counter() - started) * 1000
+        for token, candidates in result.items():
+            print(f'{token}: ' + '; '.join(f'{c["baseform"]} {c["tag"]}' for c in candidates))
+        print(f'{len(result)} tokens in {elapsed:.3f} ms')
+    finally:
+        lexicon.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,244 @@
+"""Cold and warm start of the flashcards page, with and without the network.
+
+Usage:
+    python -m tools.pwa_startup --base http://localhost/moodle --username U --password P
+        [--path /mod/flashcards/my/index.php] [--runs 5] [--throttle 4g] [--cpu 4]
+        [--headed] [-o startup.json]
+
+Needs Playwright with Chromium (pip install playwright; playwright install
+chromium). Logs in once, then per run opens a fresh browser profile (empty
+HTTP cache, no service worker) and loads the page three times:
+
+    cold            first visit; the worker installs and precaches the shell
+    warm            second visit, controlled by the worker
+    warm-offline    third visit with the browser offline
+
+The same runs are repeated with service workers blocked (HTTP cache only),
+which is what the page got from the old, empty app/sw.js, so one report
+compares both. A cold start offline cannot work by definition and is not
+measured.
+
+Per load it reports DOMContentLoaded, the flashcards:init mark (the app
+module started), the flashcards:dashboard mark (dashboard stats rendered,
+from get_dashboard_data) and time to interactive, in ms since navigation
+start; the JavaScript the page parsed before it was interactive (decoded
+bytes, all scripts and the plugin's own); the bytes transferred over the
+network and the number of requests the worker answered. Time to interactive
+is the end of the last long task (>50 ms) before a quiet window of 5 s after
+DOMContentLoaded, so every load waits those 5 s before it is read.
+
+--throttle emulates a mobile connection and --cpu slows the CPU down by that
+factor (Chromium only); `--throttle 4g --cpu 4` is a mid-range phone. -o
+writes every sample as JSON; compare runs before and after a deploy.
+"""
+import argparse
+import json
+import statistics
+import sys
+
+QUIET_MS = 5000
+
+THROTTLE = {
+    # latency ms, down/up kbit/s
+    'slow-3g': (400, 400, 400),
+    '3g': (300, 1600, 750),
+    '4g': (150, 9000, 9000),
+}
+
+# Long tasks are not buffered by the browser: collect them from the start of every document.
+_LONG_TASKS = """
+window.__fcLongTasks = [];
+try {
+  new PerformanceObserver(list => {
+    list.getEntries().forEach(e => window.__fcLongTasks.push([e.startTime, e.startTime + e.duration]));
+  }).observe({ type: 'longtask', buffered: true });
+} catch (_e) {}
+"""
+
+_TIMINGS = """quietMs => {
+  const nav = performance.getEntriesByType('navigation')[0];
+  const mark = name => { const m = performance.getEntriesByName(name)[0]; return m ? m.startTime : null; };
+  const dcl = nav ? nav.domContentLoadedEventEnd : 0;
+  let tti = dcl;
+  for (const [start, end] of (window.__fcLongTasks || []).slice().sort((a, b) => a[0] - b[0])) {
+    if (end <= tti) continue;
+    if (start - tti >= quietMs) break;
+    tti = end;
+  }
+  const resources = performance.getEntriesByType('resource');
+  const transfer = resources.reduce((sum, r) => sum + (r.transferSize || 0), nav ? nav.transferSize || 0 : 0);
+  const scripts = resources.filter(r => r.startTime < tti
+    && /\\.js(\\?|$)|\\/(javascript|requirejs|yui_combo)\\.php/.test(r.name));
+  const decoded = list => list.reduce((sum, r) => sum + (r.decodedBodySize || 0), 0);
+  return {
+    dcl: dcl,
+    load: nav ? nav.loadEventEnd : null,
+    init: mark('flashcards:init'),
+    dashboard: mark('flashcards:dashboard'),
+    tti: tti,
+    js: decoded(scripts),
+    app_js: decoded(scripts.filter(r => r.name.includes('/mod/flashcards/'))),
+    transfer: transfer,
+    requests: resources.length + 1,
+    controlled: !!(navigator.serviceWorker && navigator.serviceWorker.controller),
+  };
+}"""
+
+_WORKER_READY = """async () => {
+  const registration = await navigator.serviceWorker.ready;
+  const worker = registration.active;
+  if (worker && worker.state !== 'activated') {
+    await new Promise(resolve => worker.addEventListener('statechange', () => worker.state === 'activated' && resolve()));
+  }
+  return (await caches.keys()).some(k => k.startsWith('fc-shell-'));
+}"""
+
+
+def login(browser, base, username, password, timeout):
+    context = browser.new_context()
+    page = context.new_page()
+    page.goto(base + '/login/index.php', timeout=timeout)
+    page.fill('#username', username)
+    page.fill('#password', password)
+    page.click('#loginbtn')
+    page.wait_for_load_state('load', timeout=timeout)
+    if '/login/' in page.url:
+        raise SystemExit(f'login failed for {username}')
+    state = context.storage_state()
+    context.close()
+    return state
+
+
+def load(context, url, throttle, cpu, timeout):
+    """(sample, page); page is None when the navigation failed."""
+    page = context.new_page()
+    if throttle or cpu > 1:
+        cdp = context.new_cdp_session(page)
+        if throttle:
+            latency, down, up = THROTTLE[throttle]
+            cdp.send('Network.enable')
+            cdp.send('Network.emulateNetworkConditions', {
+                'offline': False, 'latency': latency,
+                'downloadThroughput': down * 1024 / 8, 'uploadThroughput': up * 1024 / 8,
+            })
+        if cpu > 1:
+            cdp.send('Emulation.setCPUThrottlingRate', {'rate': cpu})
+    from_worker = []
+    page.on('response', lambda response: from_worker.append(response.from_service_worker))
+    try:
+        page.goto(url, wait_until='load', timeout=timeout)
+    except Exception as exc:  # offline without a worker: the navigation itself fails
+        page.close()
+        return {'ok': False, 'error': str(exc).splitlines()[0]}, None
+    try:
+        page.wait_for_function("performance.getEntriesByName('flashcards:dashboard').length > 0", timeout=timeout)
+    except Exception:
+        pass
+    page.wait_for_timeout(QUIET_MS)
+    sample = page.evaluate(_TIMINGS, QUIET_MS)
+    sample.update(ok=sample['init'] is not None, from_worker=sum(from_worker))
+    return sample, page
+
+
+def run_once(browser, state, url, workers, throttle, cpu, timeout):
+    context = browser.new_context(storage_state=state, service_workers='allow' if workers else 'block')
+    context.add_init_script(_LONG_TASKS)
+    samples = {}
+    samples['cold'], page = load(context, url, throttle, cpu, timeout)
+    if page is not None:
+        if workers:
+            page.evaluate(_WORKER_READY)
+        page.close()
+    for name, offline in (('warm', False), ('warm-offline', True)):
+        context.set_offline(offline)
+        samples[name], page = load(context, url, None if offline else throttle, cpu, timeout)
+        if page is not None:
+            page.close()
+    context.close()
+    return samples
+
+
+def summarize(samples):
+    ok = [s for s in samples if s.get('ok')]
+
+    def median(key, scale=1):
+        values = [s[key] / scale for s in ok if s.get(key) is not None]
+        return round(statistics.median(values), 1) if values else None
+
+    return {
+        'ok': f'{len(ok)}/{len(samples)}',
+        'dcl': median('dcl'),
+        'init': median('init'),
+        'dashboard': median('dashboard'),
+        'tti': median('tti'),
+        'js_kb': median('js', 1024),
+        'app_js_kb': median('app_js', 1024),
+        'kb': median('transfer', 1024),
+        'from_worker': median('from_worker'),
+    }
+
+
+def print_table(report, out):
+    columns = (('dcl', 'DCL ms'), ('init', 'init ms'), ('dashboard', 'dash ms'), ('tti', 'TTI ms'),
+               ('js_kb', 'JS KB'), ('app_js_kb', 'app JS KB'), ('kb', 'net KB'), ('from_worker', 'via SW'))
+    head = f'{"variant":<12} {"load":<13} {"ok":>5} ' + ' '.join(f'{title:>9}' for _, title in columns)
+    print(head, file=out)
+    print('-' * len(head), file=out)
+    for variant, loads in report.items():
+        for name, row in loads.items():
+            cells = ' '.join(f'{row[key] if row[key] is not None else "-":>9}' for key, _ in columns)
+            print(f'{variant:<12} {name:<13} {row["ok"]:>5} {cells}', file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure cold/warm start of the flashcards page, online and offline.')
+    parser.add_argument('--base', required=True, help='Moodle wwwroot')
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--path', default='/mod/flashcards/my/index.php')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--throttle', choices=sorted(THROTTLE), help='emulate a mobile connection (Chromium)')
+    parser.add_argument('--cpu', type=float, default=1.0, help='CPU slowdown factor (Chromium)')
+    parser.add_argument('--timeout', type=float, default=30.0, help='seconds per load')
+    parser.add_argument('--headed', action='store_true')
+    parser.add_argument('-o', '--output')
+    args = parser.parse_args(argv)
+
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        print('tools.pwa_startup needs Playwright: pip install playwright && playwright install chromium',
+              file=sys.stderr)
+        return 2
+
+    base = args.base.rstrip('/')
+    url = base + args.path
+    timeout = args.timeout * 1000
+    raw = {'worker': {'cold': [], 'warm': [], 'warm-offline': []},
+           'http-cache': {'cold': [], 'warm': [], 'warm-offline': []}}
+    with sync_playwright() as playwright:
+        browser = playwright.chromium.launch(headless=not args.headed)
+        state = login(browser, base, args.username, args.password, timeout)
+        for _ in range(max(1, args.runs)):
+            for variant, workers in (('worker', True), ('http-cache', False)):
+                for name, sample in run_once(browser, state, url, workers, args.throttle, args.cpu, timeout).items():
+                    raw[variant][name].append(sample)
+        browser.close()
+
+    report = {variant: {name: summarize(samples) for name, samples in loads.items()}
+              for variant, loads in raw.items()}
+    profile = [f'throttled to {args.throttle}'] if args.throttle else []
+    if args.cpu > 1:
+        profile.append(f'CPU slowed {args.cpu:g}x')
+    print(f'{url}, {args.runs} runs, medians' + ''.join(', ' + p for p in profile))
+    print_table(report, sys.stdout)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump({'url': url, 'throttle': args.throttle, 'cpu': args.cpu, 'summary': report, 'samples': raw},
+                      handle, indent=2)
+            handle.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
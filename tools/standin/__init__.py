@@ -0,0 +1,99 @@
+"""Local stand-ins for the external services the plugin calls.
+
+Each module runs a small threaded HTTP server that speaks enough of the real
+service's protocol for offline testing and benchmarking; see tools/README.md.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Counters:
+    """Thread-safe request counters served at GET /stats."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def add(self, name, amount=1):
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+
+class JSONHandler(BaseHTTPRequestHandler):
+    """Base handler: JSON in/out, artificial latency, /health and /stats."""
+
+    server_version = 'flashcards-standin'
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        if not raw:
+            return {}
+        return json.loads(raw.decode('utf-8'))
+
+    def delay(self, units=0):
+        seconds = (self.server.latency_ms + units * self.server.per_item_ms) / 1000
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/health':
+            self.send_json(200, {'ok': True})
+        elif self.path.rstrip('/') == '/stats':
+            self.send_json(200, self.server.counters.snapshot())
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+
+def base_parser(description, port):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=port)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='added to every request')
+    parser.add_argument('--per-item-ms', type=float, default=0.0,
+                        help='added per item (text, message, ...) in a request')
+    parser.add_argument('-v', '--verbose', action='store_true', help='log every request')
+    return parser
+
+
+def serve(handler, args, **attrs):
+    """Run handler on args.host:args.port until interrupted."""
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+    server.latency_ms = args.latency_ms
+    server.per_item_ms = args.per_item_ms
+    server.verbose = args.verbose
+    server.counters = Counters()
+    for name, value in attrs.items():
+        setattr(server, name, value)
+    print(f'{handler.__name__} listening on http://{args.host}:{server.server_address[1]}', file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
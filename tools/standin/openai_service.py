@@ -0,0 +1,203 @@
+"""OpenAI chat-completions stand-in for openai_client / ai_helper.
+
+Usage:
+    python -m tools.standin.openai_service [--port 8704] [--latency-ms 400]
+        [--per-item-ms 2] [--rpm 0] [--tpm 0] [--max-inflight 0]
+        [--throttle-ratio 0] [--fixtures answers.jsonl]
+        [--sample-delay 0.2=3000 ...] [--jitter-ms 0] [--disagree 0.15 ...]
+
+Answers POST .../chat/completions with a chat.completion object and a usage
+block (about four characters per token). The content comes from --fixtures, a
+JSON-lines file of {"match": "substring", "content": "..." or {...}} where the
+first entry whose substring occurs in the messages wins, or is synthetic:
+text-check prompts (those mentioning "hasErrors") get the quoted sentence back
+as correctedText with no errors, anything else gets a small JSON object
+echoing the user message. --per-item-ms is added per completion token.
+
+Multi-sample text checks send one request per temperature. --sample-delay
+TEMP=MS (repeatable) delays the sample at that temperature, --jitter-ms adds a
+random delay to every request, and --disagree TEMP (repeatable) makes that
+sample report a spurious error, so early-exit consensus can be exercised
+with slow stragglers and with samples that do not agree.
+
+Rate limits behave like the real API: past --rpm requests or --tpm tokens in
+the current minute, or --max-inflight concurrent requests, the answer is 429
+with Retry-After and x-ratelimit-* headers; --throttle-ratio additionally
+answers 429 to that share of requests at random. GET /stats counts requests,
+responses by status, prompt/completion tokens, the peak in-flight count and
+distinct prompts, which shows how many calls the plugin's cache and
+coalescing saved.
+"""
+import hashlib
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+
+from tools.standin import JSONHandler, base_parser, serve
+
+_SENTENCE = re.compile(r'Sentence:\s*"(.*?)"\s*$', re.S | re.M)
+
+
+def _tokens(text):
+    return max(1, math.ceil(len(text) / 4))
+
+
+def load_fixtures(path):
+    fixtures = []
+    if path:
+        with open(path, encoding='utf-8') as handle:
+            for line in handle:
+                line = line.strip()
+                if line:
+                    fixtures.append(json.loads(line))
+    return fixtures
+
+
+def synthetic_content(messages, disagree=False):
+    text = '\n'.join(m.get('content', '') for m in messages if isinstance(m.get('content'), str))
+    user = next((m.get('content', '') for m in reversed(messages) if m.get('role') == 'user'), '')
+    if 'hasErrors' in text:
+        found = _SENTENCE.search(user)
+        sentence = found.group(1) if found else user.strip()
+        words = sentence.split()
+        if disagree and words:
+            wrong = words[-1].rstrip('.!?')
+            fixed = wrong + 'e'
+            return {'hasErrors': True, 'correctedText': sentence.replace(wrong, fixed),
+                    'errors': [{'original': wrong, 'corrected': fixed, 'issue': 'stand-in disagreement'}]}
+        return {'hasErrors': False, 'correctedText': sentence, 'errors': []}
+    snippet = user.strip()[:200]
+    return {'answer': snippet, 'translation': snippet, 'explanation': 'stand-in answer', 'examples': []}
+
+
+class OpenAIHandler(JSONHandler):
+
+    def _limited(self, prompt_tokens):
+        """Retry-After seconds when the request is over a limit, else None (and count it)."""
+        server = self.server
+        with server.limits_lock:
+            minute = int(time.time() // 60)
+            if server.window[0] != minute:
+                server.window = [minute, 0, 0]
+            reset = 60 - time.time() % 60
+            if server.max_inflight and server.inflight >= server.max_inflight:
+                return 1.0
+            if server.rpm and server.window[1] + 1 > server.rpm:
+                return reset
+            if server.tpm and server.window[2] + prompt_tokens > server.tpm and server.window[2] > 0:
+                return reset
+            if server.throttle_ratio and server.random.random() < server.throttle_ratio:
+                return 0.5
+            server.window[1] += 1
+            server.window[2] += prompt_tokens
+            server.inflight += 1
+            if server.inflight > server.peak:
+                server.counters.add('inflight_peak', server.inflight - server.peak)
+                server.peak = server.inflight
+            return None
+
+    def _content(self, messages, temperature):
+        joined = json.dumps(messages, ensure_ascii=False)
+        for fixture in self.server.fixtures:
+            if fixture.get('match', '') in joined:
+                content = fixture.get('content', '')
+                return content if isinstance(content, str) else json.dumps(content, ensure_ascii=False)
+        disagree = temperature is not None and round(float(temperature), 3) in self.server.disagree
+        return json.dumps(synthetic_content(messages, disagree), ensure_ascii=False)
+
+    def _sample_delay(self, temperature):
+        ms = self.server.jitter_ms * self.server.random.random() if self.server.jitter_ms else 0.0
+        if temperature is not None:
+            ms += self.server.sample_delays.get(round(float(temperature), 3), 0.0)
+        if ms > 0:
+            time.sleep(ms / 1000)
+
+    def do_POST(self):
+        counters = self.server.counters
+        counters.add('requests')
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            counters.add('status_404')
+            self.send_json(404, {'error': {'message': 'not found'}})
+            return
+        if not self.headers.get('Authorization', '').startswith('Bearer '):
+            counters.add('status_401')
+            self.send_json(401, {'error': {'message': 'missing bearer token', 'type': 'invalid_request_error'}})
+            return
+        try:
+            body = self.read_json()
+        except ValueError:
+            counters.add('status_400')
+            self.send_json(400, {'error': {'message': 'invalid JSON'}})
+            return
+        messages = body.get('messages') or []
+        prompt_text = ''.join(m.get('content', '') for m in messages if isinstance(m.get('content'), str))
+        prompt_tokens = _tokens(prompt_text)
+        digest = hashlib.sha1(json.dumps(body, sort_keys=True).encode('utf-8')).hexdigest()
+        with self.server.limits_lock:
+            if digest not in self.server.prompts:
+                self.server.prompts.add(digest)
+                counters.add('distinct_prompts')
+
+        retry = self._limited(prompt_tokens)
+        if retry is not None:
+            counters.add('status_429')
+            self.send_json(429, {'error': {'message': 'Rate limit reached', 'type': 'requests',
+                                           'code': 'rate_limit_exceeded'}},
+                           {'Retry-After': f'{retry:.3f}', 'x-ratelimit-reset-requests': f'{retry:.3f}s',
+                            'x-ratelimit-reset-tokens': f'{retry:.3f}s'})
+            return
+        try:
+            temperature = body.get('temperature')
+            content = self._content(messages, temperature)
+            completion_tokens = _tokens(content)
+            self.delay(completion_tokens)
+            self._sample_delay(temperature)
+            counters.add('status_200')
+            counters.add('prompt_tokens', prompt_tokens)
+            counters.add('completion_tokens', completion_tokens)
+            self.send_json(200, {
+                'id': 'chatcmpl-standin-' + digest[:12],
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': body.get('model', 'standin'),
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': content}}],
+                'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                          'total_tokens': prompt_tokens + completion_tokens},
+            })
+        finally:
+            with self.server.limits_lock:
+                self.server.inflight -= 1
+
+
+def main(argv=None):
+    parser = base_parser('OpenAI chat-completions stand-in.', 8704)
+    parser.add_argument('--rpm', type=int, default=0, help='requests per minute before 429 (0 = unlimited)')
+    parser.add_argument('--tpm', type=int, default=0, help='prompt tokens per minute before 429 (0 = unlimited)')
+    parser.add_argument('--max-inflight', type=int, default=0, help='concurrent requests before 429')
+    parser.add_argument('--throttle-ratio', type=float, default=0.0, help='share of requests answered 429 at random')
+    parser.add_argument('--fixtures', help='JSON lines of {"match": ..., "content": ...}')
+    parser.add_argument('--sample-delay', action='append', default=[], metavar='TEMP=MS',
+                        help='extra delay for requests with this temperature (repeatable)')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='random extra delay up to this per request')
+    parser.add_argument('--disagree', action='append', type=float, default=[], metavar='TEMP',
+                        help='text checks at this temperature report a spurious error (repeatable)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+    sample_delays = {}
+    for spec in args.sample_delay:
+        temperature, _, ms = spec.partition('=')
+        sample_delays[round(float(temperature), 3)] = float(ms)
+    return serve(OpenAIHandler, args, rpm=args.rpm, tpm=args.tpm, max_inflight=args.max_inflight,
+                 throttle_ratio=args.throttle_ratio, fixtures=load_fixtures(args.fixtures),
+                 random=random.Random(args.seed), limits_lock=threading.Lock(), window=[0, 0, 0],
+                 inflight=0, peak=0, prompts=set(), sample_delays=sample_delays, jitter_ms=args.jitter_ms,
+                 disagree={round(t, 3) for t in args.disagree})
+
+
+if __name__ == '__main__':
+    sys.exit(main())
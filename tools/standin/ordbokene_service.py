@@ -0,0 +1,186 @@
+"""Ordbøkene (ord.uib.no) stand-in for ordbokene_client.
+
+Usage:
+    python -m tools.standin.ordbokene_service [--port 8703] [--latency-ms 60]
+        [--fixtures DIR] [--record https://ord.uib.no] [--no-synthetic]
+
+Serves GET /api/articles?w=...|q=...&dict=...&scope=... and
+GET /<bm|nn>/article/<id>.json. Responses come from --fixtures, a directory of
+recorded JSON laid out like the URLs:
+
+    DIR/bm/article/123.json
+    DIR/api/articles/<sha1 of the sorted query, 16 hex>.json
+
+With --record, requests missing from the directory are fetched from that
+upstream once and saved there, so a live session can be replayed offline
+later. Without a recording the answer is synthetic: a search returns stable
+article ids derived from the word and the first article's lemma is the word
+itself, so exact-match lookups behave like the real service (--no-synthetic
+answers 404 instead).
+
+Every 200 carries an ETag and Last-Modified; If-None-Match / If-Modified-Since
+get 304, which is what the plugin's cache revalidation sends. GET /stats
+counts requests, responses by status, TCP connections (keep-alive reuse shows
+as connections << requests), recordings and bytes.
+"""
+import email.utils
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from tools.standin import JSONHandler, base_parser, serve
+
+
+def _query_key(query):
+    pairs = sorted(parse_qsl(query, keep_blank_values=True))
+    return hashlib.sha1(urlencode(pairs).encode('utf-8')).hexdigest()[:16]
+
+
+def fixture_path(root, path, query):
+    """File holding the recorded response for a request path and query."""
+    parts = [p for p in path.split('/') if p and p not in ('.', '..')]
+    if parts[:2] == ['api', 'articles']:
+        return os.path.join(root, 'api', 'articles', _query_key(query) + '.json')
+    return os.path.join(root, *parts)
+
+
+def _article_ids(word):
+    base = int.from_bytes(hashlib.sha1(word.encode('utf-8')).digest()[:3], 'big') * 4 + 1
+    return {'bm': [base, base + 1], 'nn': [base + 2]}
+
+
+def synthetic_search(query, words, lock):
+    params = dict(parse_qsl(query))
+    word = (params.get('w') or params.get('q') or '').strip().lower()
+    if not word:
+        return {'articles': {}}
+    ids = _article_ids(word)
+    dicts = params.get('dict', 'bm,nn').split(',')
+    with lock:
+        for dict_ids in ids.values():
+            for rank, article_id in enumerate(dict_ids):
+                words[article_id] = (word, rank)
+    return {'meta': {}, 'articles': {d: v for d, v in ids.items() if d in dicts}}
+
+
+def synthetic_article(article_id, words, lock):
+    with lock:
+        word, rank = words.get(article_id, (f'ord{article_id}', 0))
+    lemma = word if rank == 0 else f'{word} {rank + 1}'
+    return {
+        'article_id': article_id,
+        'lemmas': [{'lemma': lemma, 'paradigm_info': []}],
+        'word_class': 'NOUN',
+        'body': {'definitions': [{'elements': [
+            {'type_': 'explanation', 'content': f'forklaring av {lemma}'},
+            {'type_': 'example', 'quote': {'content': f'Her er et eksempel med {lemma}.'}},
+        ]}]},
+    }
+
+
+class OrdbokeneHandler(JSONHandler):
+
+    def setup(self):
+        super().setup()
+        self.server.counters.add('connections')
+
+    def _send_document(self, body, mtime):
+        etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        last_modified = email.utils.formatdate(mtime, usegmt=True)
+        since = self.headers.get('If-Modified-Since')
+        not_modified = self.headers.get('If-None-Match') == etag
+        if not not_modified and since and not self.headers.get('If-None-Match'):
+            parsed = email.utils.parsedate_to_datetime(since)
+            not_modified = parsed is not None and parsed.timestamp() >= int(mtime)
+        status = 304 if not_modified else 200
+        self.server.counters.add(f'status_{status}')
+        self.send_response(status)
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        if status == 304:
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.server.counters.add('bytes', len(body))
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _recorded(self, path, query):
+        root = self.server.fixtures
+        if not root:
+            return None
+        file = fixture_path(root, path, query)
+        if os.path.isfile(file):
+            with open(file, 'rb') as fh:
+                return fh.read(), os.path.getmtime(file)
+        if not self.server.record:
+            return None
+        url = self.server.record.rstrip('/') + path + ('?' + query if query else '')
+        try:
+            with urllib.request.urlopen(url, timeout=15) as resp:
+                body = resp.read()
+        except OSError:
+            self.server.counters.add('record_errors')
+            return None
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        with open(file, 'wb') as fh:
+            fh.write(body)
+        self.server.counters.add('recorded')
+        return body, os.path.getmtime(file)
+
+    def _synthetic(self, path, query):
+        if not self.server.synthetic:
+            return None
+        parts = path.strip('/').split('/')
+        if path.rstrip('/') == '/api/articles':
+            doc = synthetic_search(query, self.server.words, self.server.words_lock)
+        elif len(parts) == 3 and parts[0] in ('bm', 'nn') and parts[1] == 'article' and parts[2].endswith('.json'):
+            try:
+                article_id = int(parts[2][:-5])
+            except ValueError:
+                return None
+            doc = synthetic_article(article_id, self.server.words, self.server.words_lock)
+        else:
+            return None
+        self.server.counters.add('synthetic')
+        return json.dumps(doc, ensure_ascii=False).encode('utf-8'), self.server.started
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path.rstrip('/') in ('/health', '/stats'):
+            super().do_GET()
+            return
+        self.server.counters.add('requests')
+        self.delay(1)
+        found = self._recorded(url.path, url.query) or self._synthetic(url.path, url.query)
+        if found is None:
+            self.server.counters.add('status_404')
+            self.send_json(404, {'error': 'not recorded'})
+            return
+        self._send_document(*found)
+
+
+def main(argv=None):
+    parser = base_parser('Ordbøkene API stand-in.', 8703)
+    parser.add_argument('--fixtures', help='directory of recorded responses')
+    parser.add_argument('--record', metavar='URL',
+                        help='fetch requests missing from --fixtures from this upstream and save them')
+    parser.add_argument('--no-synthetic', action='store_true',
+                        help='answer 404 for requests that were not recorded')
+    args = parser.parse_args(argv)
+    if args.record and not args.fixtures:
+        parser.error('--record needs --fixtures')
+    return serve(OrdbokeneHandler, args, fixtures=args.fixtures, record=args.record,
+                 synthetic=not args.no_synthetic, started=time.time(), words={},
+                 words_lock=threading.Lock())
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Web Push service stand-in for the send_push_notifications task.
+
+Usage:
+    python -m tools.standin.push_service [--port 8702] [--latency-ms 80]
+        [--expire-ratio 0.05] [--fail-ratio 0]
+
+Subscriptions whose endpoint points here (http://127.0.0.1:8702/push/<token>)
+are accepted like a real push service would: POST with an aes128gcm body and
+"Authorization: vapid t=<jwt>, k=<key>" answers 201. Requests without those
+headers get 400/401. Tokens starting with "gone" and a stable fraction of the
+others (--expire-ratio, chosen by token hash) answer 410 so expired-subscription
+cleanup can be exercised; --fail-ratio answers 500 the same way.
+
+GET /stats reports requests, responses by status, TCP connections accepted
+(keep-alive reuse shows as connections << requests), distinct VAPID JWTs and
+payload bytes. `php cli/bench_push.php` drives the real sender against it.
+"""
+import hashlib
+import re
+import sys
+import threading
+
+from tools.standin import JSONHandler, base_parser, serve
+
+_VAPID = re.compile(r'vapid\s+t=([^,\s]+)\s*,\s*k=(\S+)')
+
+
+def _bucket(token, salt):
+    """Stable value in [0, 1) for a token."""
+    digest = hashlib.sha1(f'{salt}:{token}'.encode('utf-8')).digest()
+    return int.from_bytes(digest[:4], 'big') / 2 ** 32
+
+
+class PushHandler(JSONHandler):
+
+    def setup(self):
+        super().setup()
+        self.server.counters.add('connections')
+
+    def _reply(self, status):
+        self.server.counters.add(f'status_{status}')
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        if status == 201:
+            self.send_header('Location', self.path)
+        self.end_headers()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        counters = self.server.counters
+        counters.add('requests')
+        counters.add('bytes', len(body))
+
+        token = self.path.rstrip('/').rsplit('/', 1)[-1]
+        if not self.path.startswith('/push/') or not token:
+            self._reply(404)
+            return
+        auth = _VAPID.match(self.headers.get('Authorization', ''))
+        if not auth:
+            self._reply(401)
+            return
+        if self.headers.get('Content-Encoding', '').lower() != 'aes128gcm' or not body:
+            self._reply(400)
+            return
+        with self.server.jwt_lock:
+            if auth.group(1) not in self.server.jwts:
+                self.server.jwts.add(auth.group(1))
+                counters.add('distinct_jwts')
+
+        self.delay(1)
+        if token.startswith('gone') or _bucket(token, 'expire') < self.server.expire_ratio:
+            self._reply(410)
+        elif _bucket(token, 'fail') < self.server.fail_ratio:
+            self._reply(500)
+        else:
+            self._reply(201)
+
+
+def main(argv=None):
+    parser = base_parser('Web Push service stand-in.', 8702)
+    parser.add_argument('--expire-ratio', type=float, default=0.0,
+                        help='fraction of subscriptions answered with 410 Gone')
+    parser.add_argument('--fail-ratio', type=float, default=0.0,
+                        help='fraction of subscriptions answered with 500')
+    args = parser.parse_args(argv)
+    return serve(PushHandler, args, expire_ratio=args.expire_ratio, fail_ratio=args.fail_ratio,
+                 jwts=set(), jwt_lock=threading.Lock())
+
+
+if __name__ == '__main__':
+    sys.exit(main())
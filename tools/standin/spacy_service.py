@@ -0,0 +1,168 @@
+"""spaCy analysis stand-in compatible with \\mod_flashcards\\local\\spacy_client.
+
+Usage:
+    python -m tools.standin.spacy_service [--port 8701] [--model nb_core_news_sm]
+        [--latency-ms 40] [--per-item-ms 5] [--no-batch]
+
+Point the plugin at it with
+    php admin/cli/cfg.php --component=mod_flashcards --name=spacy_url \\
+        --set=http://127.0.0.1:8701/analyze
+
+POST {"text": "..."} returns one analysis; POST {"texts": [...]} returns
+{"model": ..., "results": [...]} in input order (404 with --no-batch, like a
+service without batch support). Analyses have the shape the plugin reads:
+model, text, tokens (text, lemma, pos, tag, dep, head, idx, is_alpha,
+is_punct, is_stop) and sents (start, end, text).
+
+With --model and spaCy installed the real pipeline is used (nlp.pipe for
+batches); otherwise a small rule-based Norwegian tagger produces stable,
+plausible output. GET /stats reports requests, texts and batch sizes.
+"""
+import re
+import sys
+
+from tools.standin import JSONHandler, base_parser, serve
+
+RULE_MODEL = 'standin-nb-rules-1'
+
+_CLOSED_CLASS = {
+    'PRON': 'jeg meg du deg han ham hun henne den det vi oss dere de dem seg man noen ingen '
+            'hva hvem som min mitt mine din ditt dine sin sitt sine vår vårt våre',
+    'DET': 'en ei et hver hvert alle denne dette disse mange noe flere få',
+    'ADP': 'i på til fra med av for om under over etter før hos mot uten ved mellom langs gjennom',
+    'CCONJ': 'og eller men for så',
+    'SCONJ': 'at fordi hvis når da om mens selv enn',
+    'AUX': 'er var har hadde skal skulle vil ville kan kunne må måtte blir ble bli være vært',
+    'ADV': 'ikke også bare allerede alltid aldri her der nå da snart ofte veldig svært '
+           'hjem ute inne tidlig sent',
+    'PART': 'å',
+    'INTJ': 'ja nei hei takk',
+}
+_POS = {word: pos for pos, words in _CLOSED_CLASS.items() for word in words.split()}
+_STOP = set(_POS)
+_TOKEN = re.compile(r"\w+(?:[-']\w+)*|[^\w\s]", re.UNICODE)
+_SENT_END = {'.', '!', '?'}
+
+
+def _rule_pos(word, prev):
+    lower = word.lower()
+    if lower in _POS:
+        return _POS[lower]
+    if prev in ('å', 'skal', 'vil', 'kan', 'må', 'skulle', 'ville', 'kunne'):
+        return 'VERB'
+    if lower.endswith(('te', 'de', 'et')) and prev in ('jeg', 'du', 'han', 'hun', 'vi', 'de', 'det'):
+        return 'VERB'
+    if lower.endswith('er') and prev in ('jeg', 'du', 'han', 'hun', 'vi', 'de', 'det', 'den'):
+        return 'VERB'
+    if lower.endswith(('ig', 'lig', 'sk')):
+        return 'ADJ'
+    if word[:1].isupper() and prev not in ('', '.', '!', '?'):
+        return 'PROPN'
+    return 'NOUN'
+
+
+def _rule_lemma(word, pos):
+    lower = word.lower()
+    if pos == 'VERB':
+        for suffix, repl in (('et', 'e'), ('te', 'e'), ('de', 'e'), ('er', 'e')):
+            if lower.endswith(suffix) and len(lower) > len(suffix) + 1:
+                return lower[:-len(suffix)] + repl
+    if pos == 'NOUN':
+        for suffix in ('ene', 'en', 'er', 'et', 'a'):
+            if lower.endswith(suffix) and len(lower) > len(suffix) + 2:
+                return lower[:-len(suffix)]
+    return lower
+
+
+def rule_analyze(text):
+    tokens = []
+    sents = []
+    sent_start = 0
+    prev = ''
+    for match in _TOKEN.finditer(text):
+        word = match.group()
+        is_alpha = word.replace('-', '').replace("'", '').isalpha()
+        pos = _rule_pos(word, prev) if is_alpha else ('PUNCT' if not word.isdigit() else 'NUM')
+        tokens.append({
+            'text': word,
+            'lemma': _rule_lemma(word, pos) if is_alpha else word,
+            'pos': pos,
+            'tag': pos,
+            'dep': 'punct' if pos == 'PUNCT' else 'dep',
+            'head': len(tokens),
+            'idx': match.start(),
+            'is_alpha': is_alpha,
+            'is_punct': pos == 'PUNCT',
+            'is_stop': word.lower() in _STOP,
+        })
+        prev = word.lower()
+        if word in _SENT_END:
+            sents.append({'start': sent_start, 'end': match.end(), 'text': text[sent_start:match.end()].strip()})
+            sent_start = match.end()
+    if text[sent_start:].strip():
+        sents.append({'start': sent_start, 'end': len(text), 'text': text[sent_start:].strip()})
+    return {'model': RULE_MODEL, 'text': text, 'tokens': tokens, 'sents': sents}
+
+
+def _doc_to_dict(doc, model):
+    return {
+        'model': model,
+        'text': doc.text,
+        'tokens': [{
+            'text': t.text, 'lemma': t.lemma_, 'pos': t.pos_, 'tag': t.tag_, 'dep': t.dep_,
+            'head': t.head.i, 'idx': t.idx, 'is_alpha': t.is_alpha, 'is_punct': t.is_punct,
+            'is_stop': t.is_stop,
+        } for t in doc],
+        'sents': [{'start': s.start_char, 'end': s.end_char, 'text': s.text} for s in doc.sents],
+    }
+
+
+def make_analyzer(model_name):
+    """Return (model label, analyze_many(texts) -> list of analyses)."""
+    if model_name:
+        import spacy
+        nlp = spacy.load(model_name)
+        label = f'{nlp.meta.get("lang", "")}_{nlp.meta.get("name", model_name)}-{nlp.meta.get("version", "")}'
+        return label, lambda texts: [_doc_to_dict(doc, label) for doc in nlp.pipe(texts)]
+    return RULE_MODEL, lambda texts: [rule_analyze(text) for text in texts]
+
+
+class SpacyHandler(JSONHandler):
+
+    def do_POST(self):
+        try:
+            body = self.read_json()
+        except ValueError:
+            self.send_json(400, {'error': 'invalid JSON'})
+            return
+        counters = self.server.counters
+        if 'texts' in body:
+            if self.server.no_batch:
+                counters.add('rejected_batches')
+                self.send_json(404, {'error': 'batch analysis not supported'})
+                return
+            texts = [str(t) for t in body.get('texts') or []]
+            counters.add('batch_requests')
+            counters.add('texts', len(texts))
+            counters.add(f'batch_size_{len(texts)}')
+            self.delay(len(texts))
+            self.send_json(200, {'model': self.server.model, 'results': self.server.analyze(texts)})
+            return
+        text = str(body.get('text', ''))
+        counters.add('requests')
+        counters.add('texts')
+        self.delay(1)
+        self.send_json(200, self.server.analyze([text])[0])
+
+
+def main(argv=None):
+    parser = base_parser('spaCy-compatible analysis stand-in.', 8701)
+    parser.add_argument('--model', default='', help='spaCy pipeline to load (default: rule-based tagger)')
+    parser.add_argument('--no-batch', action='store_true', help='reject {"texts": [...]} requests')
+    args = parser.parse_args(argv)
+    model, analyze = make_analyzer(args.model)
+    return serve(SpacyHandler, args, model=model, analyze=analyze, no_batch=args.no_batch)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""ElevenLabs and Whisper stand-in for tts_service and the speech-to-text clients.
+
+Usage:
+    python -m tools.standin.speech_service [--port 8705] [--latency-ms 300]
+        [--per-item-ms 5] [--transcript "Jeg heter Kari."]
+
+Speaks three endpoints:
+  POST /v1/text-to-speech/<voice>   ElevenLabs TTS (xi-api-key header, JSON
+                                    {"text", "model_id", ...}); answers
+                                    audio/mpeg, about 1 KB per 10 characters
+  POST /v1/speech-to-text           ElevenLabs STT (xi-api-key, multipart)
+  POST /v1/audio/transcriptions     Whisper (Bearer key, multipart)
+Both transcription endpoints answer {"text": --transcript}. --per-item-ms is
+added per 10 characters synthesized or per 16 KB of uploaded audio.
+
+Set "ElevenLabs API URL" to http://127.0.0.1:8705 and "Whisper endpoint" to
+http://127.0.0.1:8705/v1/audio/transcriptions. GET /stats counts requests by
+endpoint and status, characters synthesized and audio bytes received.
+"""
+import hashlib
+import json
+import math
+import sys
+
+from tools.standin import JSONHandler, base_parser, serve
+
+# MPEG-1 Layer III frame header (128 kbit/s, 44.1 kHz); the rest of each frame is silence.
+_FRAME = b'\xff\xfb\x90\x64' + b'\x00' * 413
+
+
+def synthetic_audio(text):
+    frames = max(1, math.ceil(len(text) / 10) * 2)
+    return b'ID3\x03\x00\x00\x00\x00\x00\x00' + _FRAME * frames
+
+
+class SpeechHandler(JSONHandler):
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _fail(self, status, message):
+        self.server.counters.add(f'status_{status}')
+        self.send_json(status, {'detail': {'status': 'error', 'message': message}})
+
+    def do_POST(self):
+        counters = self.server.counters
+        counters.add('requests')
+        body = self._body()
+        path = self.path.split('?', 1)[0].rstrip('/')
+        if path.startswith('/v1/text-to-speech/'):
+            counters.add('tts_requests')
+            if not self.headers.get('xi-api-key'):
+                self._fail(401, 'missing xi-api-key')
+                return
+            try:
+                payload = json.loads(body.decode('utf-8') or '{}')
+            except ValueError:
+                self._fail(400, 'invalid JSON')
+                return
+            text = str(payload.get('text', ''))
+            counters.add('characters', len(text))
+            self.delay(math.ceil(len(text) / 10))
+            audio = synthetic_audio(text)
+            counters.add('status_200')
+            self.send_response(200)
+            self.send_header('Content-Type', 'audio/mpeg')
+            self.send_header('Content-Length', str(len(audio)))
+            self.send_header('request-id', hashlib.sha1(body).hexdigest()[:16])
+            self.end_headers()
+            self.wfile.write(audio)
+            return
+        if path in ('/v1/speech-to-text', '/v1/audio/transcriptions'):
+            whisper = path.endswith('transcriptions')
+            counters.add('whisper_requests' if whisper else 'stt_requests')
+            authorized = (self.headers.get('Authorization', '').startswith('Bearer ') if whisper
+                          else bool(self.headers.get('xi-api-key')))
+            if not authorized:
+                self._fail(401, 'missing API key')
+                return
+            if not self.headers.get('Content-Type', '').startswith('multipart/form-data'):
+                self._fail(400, 'expected multipart/form-data')
+                return
+            counters.add('audio_bytes', len(body))
+            self.delay(math.ceil(len(body) / 16384))
+            counters.add('status_200')
+            self.send_json(200, {'text': self.server.transcript, 'language_code': 'nb'})
+            return
+        counters.add('status_404')
+        self.send_json(404, {'detail': 'not found'})
+
+
+def main(argv=None):
+    parser = base_parser('ElevenLabs TTS/STT and Whisper stand-in.', 8705)
+    parser.add_argument('--transcript', default='Jeg heter Kari og bor i Oslo.',
+                        help='text returned by both transcription endpoints')
+    args = parser.parse_args(argv)
+    return serve(SpeechHandler, args, transcript=args.transcript)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
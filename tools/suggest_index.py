@@ -0,0 +1,280 @@
+"""Compile the front_suggest vocabulary into a ranked prefix index file.
+
+The plugin reads the file through \\mod_flashcards\\local\\suggest_index and
+answers autocomplete from it; Ordbøkene is only asked when the index has no
+match (see the 'front_suggest' action in ajax.php).
+
+Usage:
+    python -m tools.suggest_index build --fullform fullformsliste.txt \\
+        --lemma lemma.txt [--orbokene orbokene.tsv] [--expressions expr.tsv] \\
+        -o suggest.idx
+    python -m tools.suggest_index query suggest.idx "ta på s" [-k 12]
+
+Inputs are tab-separated files with a header row, like tools/ordbank_lexicon:
+the ordbank distribution files or exports of the ordbank_fullform and
+ordbank_lemma tables, and optionally exports of flashcards_orbokene (entry,
+normalized, baseform, meta) and flashcards_expr_translations (expression,
+normalized), e.g.
+    mysql --batch -e "SELECT entry, normalized, baseform, meta FROM mdl_flashcards_orbokene" moodle > orbokene.tsv
+
+Ranking: Ordbøkene entries and expressions first, then ordbank lemmas, then
+inflected forms; within a tier shorter keys first, then byte order.
+
+File format (all integers little-endian):
+    header  8s magic "FCSUG\\0\\1\\0", uint32 key count, uint32 key index offset,
+            uint32 prefix count, uint32 prefix index offset, uint32 k, 4 reserved (32 bytes)
+    key index     count x uint32 entry offset, sorted by key bytes
+    entry         uint16 key length, key (lower-cased, single-spaced, UTF-8),
+                  uint32 rank, uint16 payload length, payload
+    payload       rows joined by "\\n", fields joined by "\\t": lemma, baseform,
+                  dict (ordbank|ordbokene), langs (comma-separated)
+    prefix index  prefix count x uint32 record offset, sorted by prefix bytes
+    record        uint16 prefix length, prefix, uint8 n, n x uint32 key numbers
+                  (the n best-ranked keys starting with the prefix, best first)
+Only prefixes matching more than SCAN_LIMIT keys get a record; shorter ranges
+are scanned and ranked at query time.
+"""
+import argparse
+import heapq
+import json
+import mmap
+import re
+import struct
+import sys
+import time
+
+from tools.ordbank_lexicon import _clean, _read_table
+
+MAGIC = b'FCSUG\x00\x01\x00'
+HEADER = struct.Struct('<8sIIIII4x')
+SCAN_LIMIT = 64
+TOP_K = 32
+
+TIER_ORDBOKENE = 0
+TIER_LEMMA = 1
+TIER_FORM = 2
+
+
+def normalize(text):
+    return re.sub(r'\s+', ' ', (text or '').strip().lower())
+
+
+def _collect(fullform, lemma, orbokene, expressions, encoding):
+    """key => {(lemma lower, dict): (tier, lemma, baseform, dict, langs)}"""
+    rows = {}
+
+    def add(key, tier, display, baseform, dictname, langs=''):
+        if not key or len(key.encode('utf-8')) > 0xFFFF:
+            return
+        ident = (display.lower(), dictname)
+        current = rows.setdefault(key, {}).get(ident)
+        if current is None or tier < current[0]:
+            rows[key][ident] = (tier, _clean(display), _clean(baseform), dictname, langs)
+
+    baseforms = {r.get('lemma_id'): r.get('grunnform', '') for r in _read_table(lemma, encoding)}
+    for r in _read_table(fullform, encoding):
+        wordform = (r.get('oppslag') or '').strip()
+        baseform = baseforms.get(r.get('lemma_id'), '')
+        tier = TIER_LEMMA if wordform.lower() == baseform.strip().lower() else TIER_FORM
+        add(normalize(wordform), tier, wordform, baseform, 'ordbank')
+    if orbokene:
+        for r in _read_table(orbokene, encoding):
+            entry = (r.get('entry') or '').strip()
+            langs = ''
+            try:
+                meta = json.loads(r.get('meta') or '{}')
+                lang = (meta.get('dictmeta') or {}).get('lang', '') if isinstance(meta, dict) else ''
+                langs = ','.join(v for v in str(lang).split(',') if v in ('bm', 'nn'))
+            except ValueError:
+                pass
+            add(normalize(r.get('normalized') or entry), TIER_ORDBOKENE, entry, r.get('baseform') or '',
+                'ordbokene', langs)
+    if expressions:
+        for r in _read_table(expressions, encoding):
+            expression = (r.get('expression') or '').strip()
+            add(normalize(r.get('normalized') or expression), TIER_ORDBOKENE, expression, '', 'ordbokene')
+    return rows
+
+
+def _prefix_records(keys, ranks):
+    """Top TOP_K key numbers for every prefix that matches more than SCAN_LIMIT keys."""
+    records = {}
+
+    def walk(prefix, lo, hi):
+        if hi - lo <= SCAN_LIMIT:
+            return heapq.nsmallest(TOP_K, ((ranks[i], i) for i in range(lo, hi)))
+        depth = len(prefix)
+        candidates = []
+        i = lo
+        if len(keys[i]) == depth:
+            candidates.append((ranks[i], i))
+            i += 1
+        while i < hi:
+            ch = keys[i][depth]
+            j = i
+            while j < hi and keys[j][depth] == ch:
+                j += 1
+            candidates.extend(walk(prefix + ch, i, j))
+            i = j
+        best = heapq.nsmallest(TOP_K, candidates)
+        if prefix:
+            records[prefix] = [idx for _, idx in best]
+        return best
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    walk('', 0, len(keys))
+    return records
+
+
+def build(fullform, lemma, output, orbokene=None, expressions=None, encoding='utf-8'):
+    """Rank the vocabulary, compute prefix records and write the index file."""
+    rows = _collect(fullform, lemma, orbokene, expressions, encoding)
+    keys = sorted(rows)
+    order = sorted(range(len(keys)), key=lambda i: (min(r[0] for r in rows[keys[i]].values()),
+                                                    len(keys[i]), keys[i]))
+    ranks = [0] * len(keys)
+    for rank, i in enumerate(order):
+        ranks[i] = rank
+    records = _prefix_records(keys, ranks)
+
+    index_offset = HEADER.size
+    offset = index_offset + 4 * len(keys)
+    offsets = []
+    blobs = []
+    for i, key in enumerate(keys):
+        payload = '\n'.join('\t'.join(r[1:]) for r in sorted(rows[key].values())).encode('utf-8')[:0xFFFF]
+        keybytes = key.encode('utf-8')
+        blob = (struct.pack('<H', len(keybytes)) + keybytes + struct.pack('<IH', ranks[i], len(payload))
+                + payload)
+        offsets.append(offset)
+        blobs.append(blob)
+        offset += len(blob)
+    prefixes = sorted(records)
+    prefix_index = offset
+    offset += 4 * len(prefixes)
+    prefix_offsets = []
+    prefix_blobs = []
+    for prefix in prefixes:
+        pbytes = prefix.encode('utf-8')
+        top = records[prefix]
+        blob = struct.pack('<H', len(pbytes)) + pbytes + struct.pack(f'<B{len(top)}I', len(top), *top)
+        prefix_offsets.append(offset)
+        prefix_blobs.append(blob)
+        offset += len(blob)
+
+    with open(output, 'wb') as handle:
+        handle.write(HEADER.pack(MAGIC, len(keys), index_offset, len(prefixes), prefix_index, TOP_K))
+        handle.write(struct.pack(f'<{len(offsets)}I', *offsets))
+        handle.writelines(blobs)
+        handle.write(struct.pack(f'<{len(prefix_offsets)}I', *prefix_offsets))
+        handle.writelines(prefix_blobs)
+    return len(keys), len(prefixes)
+
+
+class SuggestIndex:
+    """Read-only view of a compiled index; same algorithm as the PHP reader."""
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self._index, self.prefix_count, self._prefix_index, self.k = \
+            HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path}: not a flashcards suggest index')
+
+    def close(self):
+        self._data.close()
+        self._file.close()
+
+    def _key(self, i):
+        offset = struct.unpack_from('<I', self._data, self._index + 4 * i)[0]
+        length = struct.unpack_from('<H', self._data, offset)[0]
+        return self._data[offset + 2:offset + 2 + length], offset + 2 + length
+
+    def _entry(self, i):
+        key, at = self._key(i)
+        rank, length = struct.unpack_from('<IH', self._data, at)
+        payload = self._data[at + 6:at + 6 + length].decode('utf-8')
+        return rank, key.decode('utf-8'), [line.split('\t') for line in payload.split('\n') if line]
+
+    def _lower_bound(self, prefix):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid)[0] < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _record(self, prefix):
+        lo, hi = 0, self.prefix_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = struct.unpack_from('<I', self._data, self._prefix_index + 4 * mid)[0]
+            length = struct.unpack_from('<H', self._data, offset)[0]
+            candidate = self._data[offset + 2:offset + 2 + length]
+            if candidate < prefix:
+                lo = mid + 1
+            elif candidate > prefix:
+                hi = mid
+            else:
+                n = self._data[offset + 2 + length]
+                return list(struct.unpack_from(f'<{n}I', self._data, offset + 3 + length))
+        return None
+
+    def prefix(self, text, limit=12):
+        """Best-ranked entries whose key starts with text: [(key, rows)]."""
+        prefix = normalize(text).encode('utf-8')
+        if not prefix:
+            return []
+        ids = self._record(prefix)
+        if ids is None:
+            ids = []
+            i = self._lower_bound(prefix)
+            while i < self.count and self._key(i)[0].startswith(prefix):
+                ids.append(i)
+                i += 1
+            ids.sort(key=lambda idx: self._entry(idx)[0])
+        return [self._entry(i)[1:] for i in ids[:limit]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build or query the front_suggest prefix index.')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p_build = sub.add_parser('build')
+    p_build.add_argument('--fullform', required=True)
+    p_build.add_argument('--lemma', required=True)
+    p_build.add_argument('--orbokene', help='export of flashcards_orbokene')
+    p_build.add_argument('--expressions', help='export of flashcards_expr_translations')
+    p_build.add_argument('-o', '--output', default='suggest.idx')
+    p_build.add_argument('--encoding', default='utf-8', help='input encoding (older ordbank: latin-1)')
+    p_query = sub.add_parser('query')
+    p_query.add_argument('index')
+    p_query.add_argument('prefix')
+    p_query.add_argument('-k', type=int, default=12)
+    args = parser.parse_args(argv)
+
+    if args.cmd == 'build':
+        started = time.perf_counter()
+        count, prefixes = build(args.fullform, args.lemma, args.output, args.orbokene, args.expressions,
+                                args.encoding)
+        print(f'{args.output}: {count} keys, {prefixes} prefix records '
+              f'in {time.perf_counter() - started:.1f}s')
+        return 0
+
+    index = SuggestIndex(args.index)
+    try:
+        started = time.perf_counter()
+        result = index.prefix(args.prefix, args.k)
+        elapsed = (time.perf_counter() - started) * 1000
+        for key, rows in result:
+            print(f'{key}: ' + '; '.join(f'{r[0]} [{r[2]}]' for r in rows))
+        print(f'{len(result)} keys in {elapsed:.3f} ms')
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
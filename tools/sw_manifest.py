@@ -0,0 +1,78 @@
+"""Content-hashed precache manifest for the service worker.
+
+Usage:
+    python -m tools.sw_manifest [--check]
+
+Writes app/precache.json: the app shell files the worker precaches (the
+scripts and styles my/index.php and view.php load, the ES modules
+flashcards.js imports, the web manifest and its icons), each with a hash of
+its content, plus a version hashed over all of them. sw.php prepends the
+manifest to app/sw.js, so any changed asset gives the browser a new worker
+script, which installs into a fresh fc-shell-<version> cache and deletes the
+old one on activate. Unchanged files keep their hash, so a deploy that only
+touches CSS does not invalidate anything else in the browser's HTTP cache.
+
+Run it after editing an asset and commit the result. sw.php re-hashes the
+listed files itself when one of them is newer than the manifest, so a
+forgotten run costs a few file reads per worker update check, not a stale
+cache. --check exits 1 when the manifest on disk is out of date.
+"""
+import argparse
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+MANIFEST = ROOT / 'app' / 'precache.json'
+# Relative to the plugin root, which is also the worker's location.
+SHELL = (
+    'assets/*.js',
+    'assets/*.css',
+    'assets/modules/*.js',
+    'app/manifest.webmanifest',
+    'app/icons/*.png',
+    'pix/icon-512.png',
+)
+
+
+def file_hash(path):
+    return hashlib.sha256(path.read_bytes()).hexdigest()[:16]
+
+
+def shell_files():
+    files = set()
+    for pattern in SHELL:
+        files.update(p for p in ROOT.glob(pattern) if p.is_file())
+    return sorted(p.relative_to(ROOT).as_posix() for p in files)
+
+
+def build():
+    assets = [{'url': url, 'hash': file_hash(ROOT / url)} for url in shell_files()]
+    # sw.php computes the same string when it re-hashes a stale manifest.
+    lines = '\n'.join(f'{a["url"]} {a["hash"]}' for a in assets)
+    return {'version': hashlib.sha256(lines.encode('utf-8')).hexdigest()[:16], 'assets': assets}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write the service worker precache manifest.')
+    parser.add_argument('--check', action='store_true', help='exit 1 if app/precache.json is stale')
+    args = parser.parse_args(argv)
+
+    manifest = build()
+    text = json.dumps(manifest, indent=2) + '\n'
+    current = MANIFEST.read_text(encoding='utf-8') if MANIFEST.exists() else ''
+    if args.check:
+        if current != text:
+            print(f'{MANIFEST.relative_to(ROOT)} is stale; run python -m tools.sw_manifest', file=sys.stderr)
+            return 1
+        return 0
+    if current != text:
+        MANIFEST.write_text(text, encoding='utf-8')
+    size = sum((ROOT / a['url']).stat().st_size for a in manifest['assets'])
+    print(f'{len(manifest["assets"])} files, {size / 1024:.0f} KB, version {manifest["version"]}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())